@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Stand-in for the `claude` and `codex` CLIs, used by bench/run_bench.py.
+
+Invoked exactly like the real tools (see build_claude_command /
+build_codex_command in pipeline/conversion.py): `fake_cli.py exec ... -` behaves like
+`codex exec --json` and reads the prompt from stdin; anything else behaves
+like `claude -p PROMPT --output-format json|stream-json`.  It sleeps for a
+sampled latency, writes an SVG to the "Write to:" path from the prompt and
+prints output in the shape parse_claude_tokens / parse_codex_tokens and the
+streaming accumulators expect.
+
+Behaviour is set through environment variables:
+
+    FAKE_LATENCY      fixed:S | uniform:A,B | lognormal:MEDIAN,SIGMA | exp:MEAN
+                      (seconds, default fixed:0.05)
+    FAKE_ERROR_RATE   probability of failing with FAKE_ERROR_KIND (default 0)
+    FAKE_ERROR_KIND   rate_limit | overloaded | other (default rate_limit)
+    FAKE_SVG_KB       output size in KB: N or uniform:A,B (default 8)
+    FAKE_LATENCY_PER_MP  extra seconds per megapixel of the images in the call,
+                      read from their PNG headers (default 0)
+    FAKE_CUT_RATE     probability of leaving the SVG cut off (default 0)
+    FAKE_CUT_KIND     max_turns (Claude result "error_max_turns") | timeout
+                      (hang after writing) | silent (exit as if done)
+                      (default max_turns)
+    FAKE_CUT_AT       share of the SVG written before the cut: a spec as for
+                      FAKE_LATENCY (default uniform:0.3,0.9)
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import time
+import struct
+import random
+
+ERROR_MESSAGES = {
+    "rate_limit": "API Error: 429 rate_limit_error: Number of request tokens has exceeded your rate limit",
+    "overloaded": "API Error: 529 overloaded_error: Overloaded",
+    "other": "API Error: 400 invalid_request_error: something went wrong",
+}
+
+
+def sample(spec, default):
+    """Sample a value from a distribution spec like 'uniform:1,2'."""
+    spec = spec or default
+    kind, _, args = spec.partition(":")
+    if not args:
+        return float(kind)
+    values = [float(v) for v in args.split(",")]
+    if kind == "fixed":
+        return values[0]
+    if kind == "uniform":
+        return random.uniform(values[0], values[1])
+    if kind == "lognormal":
+        return random.lognormvariate(math.log(values[0]), values[1])
+    if kind == "exp":
+        return random.expovariate(1.0 / values[0])
+    raise SystemExit(f"fake_cli: unknown distribution {spec!r}")
+
+
+def png_megapixels(path):
+    """Megapixels from a PNG's IHDR, 0 when it cannot be read."""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(24)
+    except OSError:
+        return 0.0
+    if head[:8] != b"\x89PNG\r\n\x1a\n":
+        return 0.0
+    width, height = struct.unpack(">II", head[16:24])
+    return width * height / 1e6
+
+
+def svg_body(size_kb):
+    """A valid SVG of roughly `size_kb` kilobytes."""
+    head = ('<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 1160 680" width="1160" height="680">'
+            '<g id="Frame/Main">')
+    tail = '</g><g id="Frame/ComponentVariants"/></svg>\n'
+    rect = '<rect x="{0}" y="{1}" width="40" height="24" rx="4" fill="#3B82F6"/>'
+    parts = [head]
+    size = len(head) + len(tail)
+    i = 0
+    while size < size_kb * 1024:
+        part = rect.format(i % 1100, (i // 1100) % 640)
+        parts.append(part)
+        size += len(part)
+        i += 1
+    parts.append(tail)
+    return "".join(parts)
+
+
+def main():
+    args = sys.argv[1:]
+    codex = bool(args) and args[0] == "exec"
+    if codex:
+        prompt = sys.stdin.read()
+    else:
+        prompt = args[args.index("-p") + 1] if "-p" in args else ""
+    stream = codex or "stream-json" in args
+
+    latency = sample(os.environ.get("FAKE_LATENCY"), "fixed:0.05")
+    per_mp = float(os.environ.get("FAKE_LATENCY_PER_MP", "0") or 0)
+    if per_mp:
+        images = set(re.findall(r"Read: (.+)", prompt))
+        images.update(args[i + 1] for i, arg in enumerate(args[:-1]) if arg == "--image")
+        latency += per_mp * sum(png_megapixels(p.strip()) for p in images)
+    fail = random.random() < float(os.environ.get("FAKE_ERROR_RATE", "0") or 0)
+    error = ERROR_MESSAGES.get(os.environ.get("FAKE_ERROR_KIND", "rate_limit"), ERROR_MESSAGES["other"])
+
+    if codex:
+        print(json.dumps({"type": "thread.started", "thread_id": "fake"}), flush=True)
+    elif stream:
+        print(json.dumps({"type": "system", "subtype": "init"}), flush=True)
+
+    # Spread the latency over a few events so streaming mode sees progress
+    steps = 3
+    for step in range(steps):
+        time.sleep(latency / steps)
+        if stream and not codex and step < steps - 1:
+            usage = {"input_tokens": 400, "output_tokens": 200}
+            print(json.dumps({"type": "assistant", "message": {"usage": usage}}), flush=True)
+
+    if fail:
+        if codex:
+            print(json.dumps({"type": "error", "message": error}), flush=True)
+        else:
+            sys.stderr.write(error + "\n")
+        sys.exit(1)
+
+    size_kb = sample(os.environ.get("FAKE_SVG_KB"), "8")
+    cut = random.random() < float(os.environ.get("FAKE_CUT_RATE", "0") or 0)
+    cut_kind = os.environ.get("FAKE_CUT_KIND", "max_turns")
+    for match in re.findall(r"Write to: (.+)", prompt):
+        body = svg_body(size_kb)
+        if cut:
+            body = body[:int(len(body) * min(1.0, sample(os.environ.get("FAKE_CUT_AT"), "uniform:0.3,0.9")))]
+        with open(match.strip(), "w", encoding="utf-8") as f:
+            f.write(body)
+    if cut and cut_kind == "timeout":
+        time.sleep(3600)  # killed by the caller's timeout
+
+    if codex:
+        usage = {"input_tokens": 1500, "cached_input_tokens": 300, "output_tokens": 900}
+        print(json.dumps({"type": "turn.completed", "usage": usage}), flush=True)
+        return
+    usage = {"input_tokens": 1500, "cache_creation_input_tokens": 0,
+             "cache_read_input_tokens": 300, "output_tokens": 900}
+    subtype = "error_max_turns" if cut and cut_kind == "max_turns" else "success"
+    result = {"type": "result", "subtype": subtype, "is_error": subtype != "success",
+              "usage": usage, "total_cost_usd": 0.0195}
+    print(json.dumps(result), flush=True)
+
+
+if __name__ == "__main__":
+    main()
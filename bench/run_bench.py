@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Orchestrator benchmark using the fake CLI in bench/fake_cli.py.
+
+Runs convert.py against N generated images for every combination of batch
+size, parallelism and scheduling policy, with AI_CLI_PATH pointing at the
+stand-in, so no API calls are made.  Each run happens in a fresh child process and temp folder;
+the child reports wall time, its own CPU time and peak RSS, and the run's
+metrics trace (pipeline/metrics.py) gives the time spent inside CLI calls.
+
+Reported per run:
+    throughput        images / second
+    overhead_ms       per image: slot-time not spent inside a CLI call
+                      ((wall * slots - CLI seconds) / images)
+    cpu_ms            orchestrator CPU time per image (excludes the CLIs)
+    peak_rss_mb       orchestrator peak resident set size
+
+Results are written to bench/results/bench-<timestamp>.json; pass
+--compare OLD.json to print the change against an earlier run.
+
+Scheduling policies (pipeline/scheduling.py) only differ when images differ:
+--megapixels gives the generated PNGs a spread of sizes (the same sizes for
+every policy) and --latency-per-mp makes the fake CLI slower on bigger ones.
+
+Usage:
+    python3 bench/run_bench.py
+    python3 bench/run_bench.py --sizes 10,100,1000,10000 --parallel 1,8,32
+    python3 bench/run_bench.py --provider codex --latency lognormal:0.1,0.5 --error-rate 0.05
+    python3 bench/run_bench.py --sizes 100 --parallel 8 --policy lpt,spt,name --megapixels lognormal:1,0.8 --latency-per-mp 0.2
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import math
+import random
+import struct
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import contextlib
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+PROJECT_DIR = BENCH_DIR.parent
+FAKE_CLI = BENCH_DIR / "fake_cli.py"
+RESULTS_DIR = BENCH_DIR / "results"
+
+
+def tiny_png(width=1, height=1):
+    """
+    A small PNG whose header says `width` x `height`.  Only the 1x1 one has
+    matching pixel data; the orchestrator and the fake CLI read headers only.
+    """
+    def chunk(kind, data):
+        return (struct.pack(">I", len(data)) + kind + data
+                + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF))
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header)
+            + chunk(b"IDAT", zlib.compress(b"\x00\xff\xff\xff")) + chunk(b"IEND", b""))
+
+
+CLI_PHASES = ("spawn", "startup", "model")
+
+
+def parse_list(text):
+    return [int(v) for v in text.split(",") if v.strip()]
+
+
+def parse_names(text):
+    return [v.strip() for v in text.split(",") if v.strip()]
+
+
+def image_sizes(count, spec):
+    """`count` (width, height) pairs, 16:10, with megapixels drawn from `spec` (seeded)."""
+    if not spec:
+        return [(1, 1)] * count
+    sys.path.insert(0, str(BENCH_DIR))
+    from fake_cli import sample
+
+    random.seed(count)  # every policy and parallelism sees the same images
+    sizes = []
+    for _ in range(count):
+        mp = max(0.01, sample(spec, "1"))
+        width = round(math.sqrt(mp * 1e6 * 16 / 10))
+        sizes.append((width, max(1, round(width * 10 / 16))))
+    return sizes
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the conversion orchestrator with a fake CLI.")
+    parser.add_argument("--provider", choices=("claude", "codex"), default="claude")
+    parser.add_argument("--sizes", type=parse_list, default=[10, 100, 1000],
+                        help="comma-separated batch sizes (default: 10,100,1000)")
+    parser.add_argument("--parallel", type=parse_list, default=[1, 4, 16],
+                        help="comma-separated parallelism levels (default: 1,4,16)")
+    parser.add_argument("--policy", type=parse_names, default=["lpt"],
+                        help="comma-separated scheduling policies: lpt, spt, name (default: lpt)")
+    parser.add_argument("--latency", default="fixed:0.05",
+                        help="fake CLI latency distribution (see bench/fake_cli.py)")
+    parser.add_argument("--latency-per-mp", type=float, default=0.0,
+                        help="extra fake CLI seconds per image megapixel")
+    parser.add_argument("--megapixels", default=None,
+                        help="image size distribution in megapixels, e.g. uniform:0.2,4 (default: 1x1)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-kind", default="rate_limit")
+    parser.add_argument("--svg-kb", default="8", help="output size in KB: N or uniform:A,B")
+    parser.add_argument("--no-stream", action="store_true", help="use the buffered (non-streaming) CLI path")
+    parser.add_argument("--adaptive", action="store_true", help="leave adaptive concurrency on")
+    parser.add_argument("--no-retry", action="store_true",
+                        help="disable retries (with --error-rate, backoff delays dominate otherwise)")
+    parser.add_argument("--out", type=Path, default=None, help="result file (default: bench/results/bench-<ts>.json)")
+    parser.add_argument("--compare", type=Path, default=None, help="earlier result file to compare against")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+# -- Child: one orchestrator run ---------------------------------------------------
+
+def run_child():
+    """Run convert.main() in this process and print one JSON line of measurements."""
+    sys.path.insert(0, str(PROJECT_DIR))
+    import convert
+
+    start = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        try:
+            convert.main(["--no-input"])
+        except SystemExit:
+            pass
+    wall = time.perf_counter() - start
+
+    cpu = time.process_time()
+    peak_rss_mb = None
+    try:
+        import resource
+
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KB, macOS bytes
+        peak_rss_mb = maxrss / (1024 * 1024) if sys.platform == "darwin" else maxrss / 1024
+    except ImportError:  # pragma: no cover - Windows
+        pass
+    print(json.dumps({"wall": wall, "cpu": cpu, "peak_rss_mb": peak_rss_mb}))
+
+
+# -- Parent: sweep ---------------------------------------------------------------
+
+def child_env(args, work, parallel, policy):
+    env = dict(os.environ)
+    env.update({
+        "AI_PROVIDER": args.provider,
+        "AI_CLI_PATH": str(FAKE_CLI),
+        "CLAUDE_PARALLEL": str(parallel),
+        "CODEX_PARALLEL": str(parallel),
+        "PARALLEL_MAX": str(parallel),
+        "ADAPTIVE_PARALLEL": "1" if args.adaptive else "0",
+        "RETRY_ENABLED": "0" if args.no_retry else "1",
+        "INPUT_DIR": str(work / "in"),
+        "OUTPUT_DIR": str(work / "out"),
+        "ARCHIVE_DIR": str(work / "archive"),
+        "JOURNAL_DIR": str(work / "runs"),
+        "METRICS_DIR": str(work / "metrics"),
+        "HISTORY_DB": str(work / "history.sqlite3"),  # keep fake runs out of the real history
+        "CACHE_ENABLED": "0",
+        "DEDUPE": "0",
+        "PREPROCESS": "0",
+        "WATCH": "0",
+        "SCHEDULE": policy,
+        "STREAM_OUTPUT": "0" if args.no_stream else "1",
+        "FAKE_LATENCY": args.latency,
+        "FAKE_ERROR_RATE": str(args.error_rate),
+        "FAKE_ERROR_KIND": args.error_kind,
+        "FAKE_SVG_KB": args.svg_kb,
+        "FAKE_LATENCY_PER_MP": str(args.latency_per_mp),
+    })
+    return env
+
+
+def read_trace(metrics_dir):
+    """Return (attempts, successes, CLI seconds) from the run's trace file(s)."""
+    attempts = successes = 0
+    cli_seconds = 0.0
+    for trace in metrics_dir.glob("trace-*.jsonl"):
+        with open(trace, encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                attempts += 1
+                successes += bool(entry["success"])
+                cli_seconds += sum(entry["phases"].get(p, 0.0) for p in CLI_PHASES)
+    return attempts, successes, cli_seconds
+
+
+def run_one(args, images, parallel, policy):
+    work = Path(tempfile.mkdtemp(prefix="figma-bench-"))
+    try:
+        (work / "in").mkdir()
+        for i, (width, height) in enumerate(image_sizes(images, args.megapixels)):
+            (work / "in" / f"screen_{i:05d}.png").write_bytes(tiny_png(width, height))
+
+        proc = subprocess.run(
+            [sys.executable, str(Path(__file__).resolve()), "--child"],
+            env=child_env(args, work, parallel, policy), capture_output=True, text=True)
+        if proc.returncode != 0 or not proc.stdout.strip():
+            raise RuntimeError(f"benchmark child failed:\n{proc.stderr[-2000:]}")
+        child = json.loads(proc.stdout.strip().splitlines()[-1])
+
+        attempts, successes, cli_seconds = read_trace(work / "metrics")
+        slots = max(1, min(parallel, images))
+        wall = child["wall"]
+        return {
+            "provider": args.provider,
+            "images": images,
+            "parallel": parallel,
+            "policy": policy,
+            "stream": not args.no_stream,
+            "wall_s": round(wall, 3),
+            "throughput": round(images / wall, 2) if wall else None,
+            "attempts": attempts,
+            "converted": successes,
+            "cli_s": round(cli_seconds, 3),
+            "overhead_ms": round(max(0.0, wall * slots - cli_seconds) / images * 1000, 2),
+            "cpu_ms": round(child["cpu"] / images * 1000, 2),
+            "peak_rss_mb": round(child["peak_rss_mb"], 1) if child["peak_rss_mb"] else None,
+        }
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_DIR,
+                             capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def row_key(row):
+    return (row["provider"], row["images"], row["parallel"], row.get("policy", "name"), row["stream"])
+
+
+def print_row(row, baseline=None):
+    line = (f"  {row['images']:>6} img  x{row['parallel']:<3} {row['policy']:<4} "
+            f"{row['wall_s']:8.2f}s  {row['throughput']:8.2f} img/s  "
+            f"overhead {row['overhead_ms']:7.2f} ms/img  cpu {row['cpu_ms']:6.2f} ms/img  "
+            f"rss {row['peak_rss_mb'] or 0:6.1f} MB  ok {row['converted']}/{row['images']}")
+    if baseline is not None and baseline.get("throughput"):
+        change = (row["throughput"] - baseline["throughput"]) / baseline["throughput"] * 100
+        line += f"  ({change:+.1f}% throughput vs baseline)"
+    print(line, flush=True)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.child:
+        run_child()
+        return
+
+    baseline = {}
+    if args.compare is not None:
+        old = json.loads(args.compare.read_text(encoding="utf-8"))
+        baseline = {row_key(row): row for row in old.get("results", [])}
+
+    print(f"Benchmark: provider={args.provider} latency={args.latency} "
+          f"errors={args.error_rate} stream={not args.no_stream}")
+    results = []
+    for images in args.sizes:
+        for parallel in args.parallel:
+            for policy in args.policy:
+                row = run_one(args, images, parallel, policy)
+                results.append(row)
+                print_row(row, baseline.get(row_key(row)))
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "params": {
+            "provider": args.provider,
+            "latency": args.latency,
+            "latency_per_mp": args.latency_per_mp,
+            "megapixels": args.megapixels,
+            "error_rate": args.error_rate,
+            "error_kind": args.error_kind,
+            "svg_kb": args.svg_kb,
+            "stream": not args.no_stream,
+            "adaptive": args.adaptive,
+            "retry": not args.no_retry,
+        },
+        "results": results,
+    }
+    out = args.out or RESULTS_DIR / f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"Results: {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -18,9 +18,94 @@ from .constants import (
     CODEX_DEFAULT_MODEL, CODEX_DEFAULT_SANDBOX,
     CODEX_DEFAULT_PARALLEL, CODEX_DEFAULT_TIMEOUT,
     IMAGE_EXTENSIONS,
+    CACHE_DEFAULT_ENABLED, CACHE_DEFAULT_DIR,
+    CACHE_DEFAULT_MAX_MB, CACHE_DEFAULT_MAX_AGE_DAYS,
+    JOURNAL_DEFAULT_ENABLED, JOURNAL_DEFAULT_DIR,
+    ADAPTIVE_DEFAULT_ENABLED, PARALLEL_DEFAULT_MIN,
+    RETRY_DEFAULT_ENABLED, RETRY_DEFAULT_BUDGET_RATIO, RETRY_DEFAULT_BUDGET_MIN,
+    STREAM_DEFAULT_ENABLED,
+    PREPROCESS_DEFAULT_ENABLED, PREPROCESS_DEFAULT_MAX_EDGE, PREPROCESS_DEFAULT_TRIM,
+    PREPROCESS_DEFAULT_FORMAT, PREPROCESS_DEFAULT_DIR,
+    DEDUPE_DEFAULT_ENABLED, DEDUPE_DEFAULT_HASH, DEDUPE_DEFAULT_THRESHOLD,
+    DEDUPE_DEFAULT_MODE, DEDUPE_DEFAULT_INDEX,
+    WATCH_DEFAULT_ENABLED, WATCH_DEFAULT_SETTLE_SECONDS, WATCH_DEFAULT_POLL_SECONDS,
+    NON_INTERACTIVE_DEFAULT, HEARTBEAT_DEFAULT_SECONDS, STATUS_DEFAULT_FILE,
+    METRICS_DEFAULT_ENABLED, METRICS_DEFAULT_DIR, PROM_TEXTFILE_NAME,
+    SVG_OPTIMIZE_DEFAULT_ENABLED, SVG_DEFAULT_PRECISION,
+    SVG_VALIDATE_DEFAULT_ENABLED, SVG_FIX_DEFAULT_ATTEMPTS,
+    ROUTING_DEFAULT_ENABLED, CLAUDE_DEFAULT_ROUTE_MODELS, CODEX_DEFAULT_ROUTE_MODELS,
+    ROUTE_DEFAULT_THRESHOLDS,
+    HISTORY_DEFAULT_ENABLED, HISTORY_DEFAULT_DB,
+    BATCH_DEFAULT_MAX, BATCH_DEFAULT_CONTEXT_SHARE, BATCH_DEFAULT_TIMEOUT_STEP,
+    SCHEDULE_DEFAULT_POLICY,
+    BUDGET_DEFAULT_USD, BUDGET_DEFAULT_TOKENS,
+    SHARD_DEFAULT_ENABLED, LEASE_DEFAULT_TTL, LEASE_DEFAULT_HEARTBEAT,
+    SCAN_DEFAULT_RECURSIVE, QUEUE_DEFAULT_WINDOW,
+    HEDGE_DEFAULT_ENABLED, HEDGE_DEFAULT_PERCENTILE, HEDGE_DEFAULT_MAX_SHARE,
+    SALVAGE_DEFAULT_ENABLED, SALVAGE_DEFAULT_ATTEMPTS,
+    TILE_DEFAULT_ENABLED, TILE_DEFAULT_MIN_HEIGHT, TILE_DEFAULT_BAND_HEIGHT, TILE_DEFAULT_OVERLAP,
 )
 
 
+def provider_settings(provider):
+    """
+    Settings block for one provider (model, parallelism, timeout, CLI path).
+
+    Provider-specific variables win over the generic AI_* fallbacks.
+    """
+    prefix = "CODEX" if provider == PROVIDER_CODEX else "CLAUDE"
+    if provider == PROVIDER_CODEX:
+        model = os.environ.get("CODEX_MODEL",
+                os.environ.get("AI_MODEL", CODEX_DEFAULT_MODEL))
+        parallel = int(os.environ.get("CODEX_PARALLEL",
+                   os.environ.get("AI_PARALLEL", str(CODEX_DEFAULT_PARALLEL))))
+        debug = os.environ.get("CODEX_DEBUG",
+                os.environ.get("AI_DEBUG", "0")) == "1"
+        timeout = int(os.environ.get("CODEX_TIMEOUT",
+                  os.environ.get("AI_TIMEOUT", str(CODEX_DEFAULT_TIMEOUT))))
+        sandbox = os.environ.get("CODEX_SANDBOX", CODEX_DEFAULT_SANDBOX)
+        max_turns = None  # Codex has no max-turns
+    else:
+        model = os.environ.get("CLAUDE_MODEL",
+                os.environ.get("AI_MODEL", CLAUDE_DEFAULT_MODEL))
+        max_turns = os.environ.get("CLAUDE_MAX_TURNS", CLAUDE_DEFAULT_MAX_TURNS)
+        parallel = int(os.environ.get("CLAUDE_PARALLEL",
+                   os.environ.get("AI_PARALLEL", str(CLAUDE_DEFAULT_PARALLEL))))
+        debug = os.environ.get("CLAUDE_DEBUG",
+                os.environ.get("AI_DEBUG", "0")) == "1"
+        timeout = int(os.environ.get("CLAUDE_TIMEOUT",
+                  os.environ.get("AI_TIMEOUT", str(CLAUDE_DEFAULT_TIMEOUT))))
+        sandbox = None
+
+    # Resolve CLI executable path (handles .cmd wrappers on Windows);
+    # *_CLI_PATH / AI_CLI_PATH point at a specific binary (e.g. the bench/ stand-in)
+    cli_name = "codex" if provider == PROVIDER_CODEX else "claude"
+    cli_path = (os.environ.get(f"{prefix}_CLI_PATH") or os.environ.get("AI_CLI_PATH")
+                or shutil.which(cli_name) or cli_name)
+
+    # Adaptive concurrency bounds (PARALLEL_MAX defaults to *_PARALLEL)
+    parallel_max = int(os.environ.get(f"{prefix}_PARALLEL_MAX",
+                       os.environ.get("PARALLEL_MAX", str(parallel))))
+
+    # Model tiers for ROUTING=1, cheapest first (empty = always `model`)
+    default_routes = CODEX_DEFAULT_ROUTE_MODELS if provider == PROVIDER_CODEX else CLAUDE_DEFAULT_ROUTE_MODELS
+    route_models = [m.strip() for m in os.environ.get(f"{prefix}_ROUTE_MODELS", default_routes).split(",")
+                    if m.strip()]
+
+    return {
+        "provider": provider,
+        "cli_path": cli_path,
+        "model": model,
+        "max_turns": max_turns,
+        "parallel": parallel,
+        "parallel_max": parallel_max,
+        "debug": debug,
+        "timeout": timeout,
+        "sandbox": sandbox,
+        "route_models": route_models,
+    }
+
+
 def load_config():
     """
     Load configuration from .env file + environment variables.
@@ -53,33 +138,14 @@ def load_config():
         else:
             provider = DEFAULT_PROVIDER  # will fail later with helpful error
 
-    # Provider-specific settings with generic AI_* fallback
-    if provider == PROVIDER_CODEX:
-        model = os.environ.get("CODEX_MODEL",
-                os.environ.get("AI_MODEL", CODEX_DEFAULT_MODEL))
-        parallel = int(os.environ.get("CODEX_PARALLEL",
-                   os.environ.get("AI_PARALLEL", str(CODEX_DEFAULT_PARALLEL))))
-        debug = os.environ.get("CODEX_DEBUG",
-                os.environ.get("AI_DEBUG", "0")) == "1"
-        timeout = int(os.environ.get("CODEX_TIMEOUT",
-                  os.environ.get("AI_TIMEOUT", str(CODEX_DEFAULT_TIMEOUT))))
-        sandbox = os.environ.get("CODEX_SANDBOX", CODEX_DEFAULT_SANDBOX)
-        max_turns = None  # Codex has no max-turns
-    else:
-        model = os.environ.get("CLAUDE_MODEL",
-                os.environ.get("AI_MODEL", CLAUDE_DEFAULT_MODEL))
-        max_turns = os.environ.get("CLAUDE_MAX_TURNS", CLAUDE_DEFAULT_MAX_TURNS)
-        parallel = int(os.environ.get("CLAUDE_PARALLEL",
-                   os.environ.get("AI_PARALLEL", str(CLAUDE_DEFAULT_PARALLEL))))
-        debug = os.environ.get("CLAUDE_DEBUG",
-                os.environ.get("AI_DEBUG", "0")) == "1"
-        timeout = int(os.environ.get("CLAUDE_TIMEOUT",
-                  os.environ.get("AI_TIMEOUT", str(CLAUDE_DEFAULT_TIMEOUT))))
-        sandbox = None
-
-    # Resolve CLI executable path (handles .cmd wrappers on Windows)
-    cli_name = "codex" if provider == PROVIDER_CODEX else "claude"
-    cli_path = shutil.which(cli_name) or cli_name
+    # Provider pool: AI_PROVIDERS=claude,codex runs both side by side;
+    # the first one is the primary (its settings fill the top-level keys)
+    pool_env = [p.strip() for p in os.environ.get("AI_PROVIDERS", "").lower().split(",")]
+    pool = [p for p in dict.fromkeys(pool_env) if p in VALID_PROVIDERS]
+    if pool:
+        provider = pool[0]
+    providers = [provider_settings(p) for p in (pool or [provider])]
+    primary = providers[0]
 
     # Paths (shared across providers)
     input_dir = Path(os.environ.get("INPUT_DIR", project_dir / "1-images-to-convert"))
@@ -88,15 +154,123 @@ def load_config():
     prompt_tpl = Path(os.environ.get("PROMPT_TEMPLATE",
                       project_dir / "prompt-template.txt"))
 
+    # Conversion cache (shared across providers; provider/model are part of the key)
+    cache_enabled = os.environ.get("CACHE_ENABLED",
+                    "1" if CACHE_DEFAULT_ENABLED else "0") == "1"
+    cache_dir = Path(os.environ.get("CACHE_DIR", project_dir / CACHE_DEFAULT_DIR))
+    cache_max_mb = int(os.environ.get("CACHE_MAX_MB", str(CACHE_DEFAULT_MAX_MB)))
+    cache_max_age_days = float(os.environ.get("CACHE_MAX_AGE_DAYS",
+                               str(CACHE_DEFAULT_MAX_AGE_DAYS)))
+
+    # Run journal (crash recovery / --resume)
+    journal_enabled = os.environ.get("JOURNAL_ENABLED",
+                      "1" if JOURNAL_DEFAULT_ENABLED else "0") == "1"
+    journal_dir = Path(os.environ.get("JOURNAL_DIR", project_dir / JOURNAL_DEFAULT_DIR))
+
+    # Adaptive concurrency bounds (around the provider's parallel setting)
+    adaptive_parallel = os.environ.get("ADAPTIVE_PARALLEL",
+                        "1" if ADAPTIVE_DEFAULT_ENABLED else "0") == "1"
+    parallel_min = int(os.environ.get("PARALLEL_MIN", str(PARALLEL_DEFAULT_MIN)))
+
+    # Retries (per-class policies in pipeline/retry.py)
+    retry_enabled = os.environ.get("RETRY_ENABLED",
+                    "1" if RETRY_DEFAULT_ENABLED else "0") == "1"
+    retry_budget_ratio = float(os.environ.get("RETRY_BUDGET_RATIO",
+                               str(RETRY_DEFAULT_BUDGET_RATIO)))
+    retry_budget_min = int(os.environ.get("RETRY_BUDGET_MIN", str(RETRY_DEFAULT_BUDGET_MIN)))
+
+    # Streaming CLI output (live tokens, early abort on error events)
+    stream = os.environ.get("STREAM_OUTPUT",
+             "1" if STREAM_DEFAULT_ENABLED else "0") == "1"
+
+    # Image preprocessing (optional, requires Pillow)
+    preprocess = os.environ.get("PREPROCESS",
+                 "1" if PREPROCESS_DEFAULT_ENABLED else "0") == "1"
+    preprocess_max_edge = int(os.environ.get("PREPROCESS_MAX_EDGE",
+                              str(PREPROCESS_DEFAULT_MAX_EDGE)))
+    preprocess_trim = os.environ.get("PREPROCESS_TRIM",
+                      "1" if PREPROCESS_DEFAULT_TRIM else "0") == "1"
+    preprocess_format = os.environ.get("PREPROCESS_FORMAT", PREPROCESS_DEFAULT_FORMAT).lower()
+    preprocess_dir = Path(os.environ.get("PREPROCESS_DIR", project_dir / PREPROCESS_DEFAULT_DIR))
+
+    # Near-duplicate detection (optional, requires Pillow)
+    dedupe = os.environ.get("DEDUPE", "1" if DEDUPE_DEFAULT_ENABLED else "0") == "1"
+    dedupe_hash = os.environ.get("DEDUPE_HASH", DEDUPE_DEFAULT_HASH).lower()
+    dedupe_threshold = int(os.environ.get("DEDUPE_THRESHOLD", str(DEDUPE_DEFAULT_THRESHOLD)))
+    dedupe_mode = os.environ.get("DEDUPE_MODE", DEDUPE_DEFAULT_MODE).lower()
+    dedupe_index = Path(os.environ.get("DEDUPE_INDEX", project_dir / DEDUPE_DEFAULT_INDEX))
+
+    # Watch mode / running as a service
+    watch = os.environ.get("WATCH", "1" if WATCH_DEFAULT_ENABLED else "0") == "1"
+    watch_settle = float(os.environ.get("WATCH_SETTLE", str(WATCH_DEFAULT_SETTLE_SECONDS)))
+    watch_poll = float(os.environ.get("WATCH_POLL", str(WATCH_DEFAULT_POLL_SECONDS)))
+    non_interactive = os.environ.get("NON_INTERACTIVE",
+                      "1" if NON_INTERACTIVE_DEFAULT else "0") == "1"
+    heartbeat_seconds = float(os.environ.get("HEARTBEAT_SECONDS", str(HEARTBEAT_DEFAULT_SECONDS)))
+    status_file = Path(os.environ.get("STATUS_FILE", project_dir / STATUS_DEFAULT_FILE))
+
+    # Metrics (phase timings, trace, Prometheus textfile)
+    metrics = os.environ.get("METRICS", "1" if METRICS_DEFAULT_ENABLED else "0") == "1"
+    metrics_dir = Path(os.environ.get("METRICS_DIR", project_dir / METRICS_DEFAULT_DIR))
+    prom_textfile = Path(os.environ.get("PROM_TEXTFILE", metrics_dir / PROM_TEXTFILE_NAME))
+
+    # SVG post-processing (pipeline/svgopt.py)
+    svg_optimize = os.environ.get("SVG_OPTIMIZE",
+                   "1" if SVG_OPTIMIZE_DEFAULT_ENABLED else "0") == "1"
+    svg_precision = int(os.environ.get("SVG_PRECISION", str(SVG_DEFAULT_PRECISION)))
+    svg_validate = os.environ.get("SVG_VALIDATE",
+                   "1" if SVG_VALIDATE_DEFAULT_ENABLED else "0") == "1"
+    svg_fix_attempts = int(os.environ.get("SVG_FIX_ATTEMPTS", str(SVG_FIX_DEFAULT_ATTEMPTS)))
+
+    # Complexity-aware model routing (pipeline/routing.py)
+    routing = os.environ.get("ROUTING", "1" if ROUTING_DEFAULT_ENABLED else "0") == "1"
+    route_thresholds = [float(v) for v in
+                        os.environ.get("ROUTE_THRESHOLDS", ROUTE_DEFAULT_THRESHOLDS).split(",") if v.strip()]
+
+    # Run history (SQLite; estimates, live ETA, `stats`)
+    history = os.environ.get("HISTORY", "1" if HISTORY_DEFAULT_ENABLED else "0") == "1"
+    history_db = Path(os.environ.get("HISTORY_DB", project_dir / HISTORY_DEFAULT_DB))
+
+    # Batched invocation (several images per CLI call; pipeline/batching.py)
+    batch_max = max(1, int(os.environ.get("BATCH_MAX", str(BATCH_DEFAULT_MAX))))
+    batch_context_share = float(os.environ.get("BATCH_CONTEXT_SHARE", str(BATCH_DEFAULT_CONTEXT_SHARE)))
+    batch_timeout_step = max(0.0, float(os.environ.get("BATCH_TIMEOUT_STEP", str(BATCH_DEFAULT_TIMEOUT_STEP))))
+
+    # Queue order (pipeline/scheduling.py)
+    schedule = os.environ.get("SCHEDULE", SCHEDULE_DEFAULT_POLICY).strip().lower()
+
+    # Hard spending limits (pipeline/budget.py); 0 = none
+    budget_usd = max(0.0, float(os.environ.get("BUDGET_USD", str(BUDGET_DEFAULT_USD)) or 0))
+    budget_tokens = max(0, int(os.environ.get("BUDGET_TOKENS", str(BUDGET_DEFAULT_TOKENS)) or 0))
+
+    # Several workers sharing INPUT_DIR through lease files (pipeline/leases.py)
+    shard = os.environ.get("SHARD", "1" if SHARD_DEFAULT_ENABLED else "0") == "1"
+    shard_worker_id = os.environ.get("SHARD_WORKER_ID", "").strip()  # empty = <host>-<pid>
+    lease_ttl = float(os.environ.get("LEASE_TTL", str(LEASE_DEFAULT_TTL)))
+    lease_heartbeat = float(os.environ.get("LEASE_HEARTBEAT", str(LEASE_DEFAULT_HEARTBEAT)))
+
+    # Lazy input walk, subfolders mirrored, bounded queue (pipeline/scan.py)
+    scan_recursive = os.environ.get("SCAN_RECURSIVE", "1" if SCAN_DEFAULT_RECURSIVE else "0") == "1"
+    queue_window = max(0, int(os.environ.get("QUEUE_WINDOW", str(QUEUE_DEFAULT_WINDOW))))
+
+    # Second attempts for stragglers (pipeline/hedging.py)
+    hedge = os.environ.get("HEDGE", "1" if HEDGE_DEFAULT_ENABLED else "0") == "1"
+    hedge_percentile = min(0.99, max(0.5, float(os.environ.get("HEDGE_PERCENTILE", str(HEDGE_DEFAULT_PERCENTILE)))))
+    hedge_max_share = min(1.0, max(0.0, float(os.environ.get("HEDGE_MAX_SHARE", str(HEDGE_DEFAULT_MAX_SHARE)))))
+
+    # Cut-off SVGs: closed locally or continued by the CLI (pipeline/salvage.py)
+    salvage = os.environ.get("SALVAGE", "1" if SALVAGE_DEFAULT_ENABLED else "0") == "1"
+    salvage_attempts = max(0, int(os.environ.get("SALVAGE_ATTEMPTS", str(SALVAGE_DEFAULT_ATTEMPTS))))
+
+    # Tall screenshots as parallel bands, stitched into one SVG (pipeline/tiling.py)
+    tile = os.environ.get("TILE", "1" if TILE_DEFAULT_ENABLED else "0") == "1"
+    tile_band_height = max(400, int(os.environ.get("TILE_BAND_HEIGHT", str(TILE_DEFAULT_BAND_HEIGHT))))
+    tile_min_height = max(tile_band_height, int(os.environ.get("TILE_MIN_HEIGHT", str(TILE_DEFAULT_MIN_HEIGHT))))
+    tile_overlap = min(tile_band_height // 4, max(0, int(os.environ.get("TILE_OVERLAP", str(TILE_DEFAULT_OVERLAP)))))
+
     return {
-        "provider": provider,
-        "cli_path": cli_path,
-        "model": model,
-        "max_turns": max_turns,
-        "parallel": parallel,
-        "debug": debug,
-        "timeout": timeout,
-        "sandbox": sandbox,
+        **primary,
+        "providers": providers,
         "script_dir": script_dir,
         "project_dir": project_dir,
         "input_dir": input_dir,
@@ -104,4 +278,64 @@ def load_config():
         "archive_dir": archive_dir,
         "prompt_tpl": prompt_tpl,
         "image_extensions": IMAGE_EXTENSIONS,
+        "cache_enabled": cache_enabled,
+        "cache_dir": cache_dir,
+        "cache_max_mb": cache_max_mb,
+        "cache_max_age_days": cache_max_age_days,
+        "journal_enabled": journal_enabled,
+        "journal_dir": journal_dir,
+        "adaptive_parallel": adaptive_parallel,
+        "parallel_min": parallel_min,
+        "retry_enabled": retry_enabled,
+        "retry_budget_ratio": retry_budget_ratio,
+        "retry_budget_min": retry_budget_min,
+        "stream": stream,
+        "preprocess": preprocess,
+        "preprocess_max_edge": preprocess_max_edge,
+        "preprocess_trim": preprocess_trim,
+        "preprocess_format": preprocess_format,
+        "preprocess_dir": preprocess_dir,
+        "dedupe": dedupe,
+        "dedupe_hash": dedupe_hash,
+        "dedupe_threshold": dedupe_threshold,
+        "dedupe_mode": dedupe_mode,
+        "dedupe_index": dedupe_index,
+        "watch": watch,
+        "watch_settle": watch_settle,
+        "watch_poll": watch_poll,
+        "non_interactive": non_interactive,
+        "heartbeat_seconds": heartbeat_seconds,
+        "status_file": status_file,
+        "metrics": metrics,
+        "metrics_dir": metrics_dir,
+        "prom_textfile": prom_textfile,
+        "svg_optimize": svg_optimize,
+        "svg_precision": svg_precision,
+        "svg_validate": svg_validate,
+        "svg_fix_attempts": svg_fix_attempts,
+        "routing": routing,
+        "route_thresholds": route_thresholds,
+        "history": history,
+        "history_db": history_db,
+        "batch_max": batch_max,
+        "batch_context_share": batch_context_share,
+        "batch_timeout_step": batch_timeout_step,
+        "schedule": schedule,
+        "budget_usd": budget_usd,
+        "budget_tokens": budget_tokens,
+        "shard": shard,
+        "shard_worker_id": shard_worker_id,
+        "lease_ttl": lease_ttl,
+        "lease_heartbeat": lease_heartbeat,
+        "scan_recursive": scan_recursive,
+        "queue_window": queue_window,
+        "hedge": hedge,
+        "hedge_percentile": hedge_percentile,
+        "hedge_max_share": hedge_max_share,
+        "salvage": salvage,
+        "salvage_attempts": salvage_attempts,
+        "tile": tile,
+        "tile_min_height": tile_min_height,
+        "tile_band_height": tile_band_height,
+        "tile_overlap": tile_overlap,
     }
@@ -35,6 +35,217 @@ TIME_ESTIMATES = {
 }
 DEFAULT_TIME_ESTIMATE = 1.0  # fallback minutes
 
+# -- Model prices (USD per million tokens: input, output) ---------------------
+# Keyed by substring match on model name, like TIME_ESTIMATES.  Claude reports
+# the real cost per call; these list prices are for derived numbers such as
+# the prompt-cache savings.
+MODEL_PRICES = {
+    "haiku": (1.00, 5.00),
+    "opus": (5.00, 25.00),
+    "sonnet": (3.00, 15.00),
+    "o4-mini": (1.10, 4.40),
+    "o3": (2.00, 8.00),
+    "codex-mini": (1.50, 6.00),
+    "gpt-5-nano": (0.05, 0.40),
+    "gpt-5-mini": (0.25, 2.00),
+    "gpt": (1.25, 10.00),
+}
+DEFAULT_MODEL_PRICE = (3.00, 15.00)
+CODEX_PRICE_MODEL = "gpt"  # price key when CODEX_MODEL is empty
+# Prompt-cache reads / writes as a multiple of the input price
+CACHE_PRICE_FACTORS = {
+    "claude": (0.10, 1.25),
+    "codex": (0.25, 1.00),  # cached input is discounted; writes cost nothing extra
+}
+
 # -- Prompt template placeholders ---------------------------------------------
 PLACEHOLDER_IMAGE = "__IMAGE_PATH__"
 PLACEHOLDER_OUTPUT = "__OUTPUT_PATH__"
+PLACEHOLDER_BASE_SVG = "__BASE_SVG__"  # follow-up prompts (pipeline/prompts.py)
+PLACEHOLDER_ISSUES = "__ISSUES__"      # validation issues in the fix prompt
+
+# -- Conversion cache ---------------------------------------------------------
+# Successful SVGs are stored by a hash of (image bytes, rendered prompt,
+# provider, model, turn settings) so unchanged inputs skip the CLI call.
+CACHE_DEFAULT_ENABLED = True
+CACHE_DEFAULT_DIR = ".cache/conversions"  # relative to the project folder
+CACHE_DEFAULT_MAX_MB = 500
+CACHE_DEFAULT_MAX_AGE_DAYS = 30
+
+# -- Run journal --------------------------------------------------------------
+# Append-only per-run log used by --resume after a crash.
+JOURNAL_DEFAULT_ENABLED = True
+JOURNAL_DEFAULT_DIR = ".cache/runs"  # relative to the project folder
+
+# -- Adaptive concurrency -----------------------------------------------------
+# The in-flight limit starts at *_PARALLEL and moves between PARALLEL_MIN and
+# PARALLEL_MAX (defaults to *_PARALLEL, i.e. only backs off unless raised).
+ADAPTIVE_DEFAULT_ENABLED = True
+PARALLEL_DEFAULT_MIN = 1
+ADAPTIVE_DECREASE_FACTOR = 0.5   # multiply limit on rate-limit / latency signal
+ADAPTIVE_LATENCY_FACTOR = 2.0    # recent latency vs baseline that counts as congestion
+ADAPTIVE_COOLDOWN = 30.0         # seconds between two decreases
+
+# -- Retries ------------------------------------------------------------------
+# Per-error-class policies live in pipeline/retry.py.  The budget caps total
+# retries at RETRY_BUDGET_MIN + RETRY_BUDGET_RATIO * images attempted.
+RETRY_DEFAULT_ENABLED = True
+RETRY_DEFAULT_BUDGET_RATIO = 0.2
+RETRY_DEFAULT_BUDGET_MIN = 3
+
+# -- Streaming output ---------------------------------------------------------
+# Read CLI output line by line (Claude: --output-format stream-json) so token
+# totals update while a conversion runs and error events abort it at once.
+STREAM_DEFAULT_ENABLED = True
+LIVE_REFRESH_SECONDS = 10  # min interval between in-flight token lines
+
+# -- Image preprocessing ------------------------------------------------------
+# Optional (needs Pillow): trim borders, cap the longest edge and re-encode the
+# copy sent to the model.  Originals are archived untouched.
+PREPROCESS_DEFAULT_ENABLED = False
+PREPROCESS_DEFAULT_MAX_EDGE = 1568     # Claude's own downscale threshold
+PREPROCESS_DEFAULT_TRIM = True
+PREPROCESS_DEFAULT_FORMAT = "webp"     # webp (lossless) | png | jpeg
+PREPROCESS_DEFAULT_DIR = ".cache/preprocessed"
+
+# -- Near-duplicate detection -------------------------------------------------
+# Optional (needs Pillow): cluster screenshots by perceptual hash and convert
+# one representative per cluster.  Others copy its SVG or get a diff prompt.
+DEDUPE_DEFAULT_ENABLED = False
+DEDUPE_DEFAULT_HASH = "dhash"          # dhash | phash
+DEDUPE_DEFAULT_THRESHOLD = 6           # max Hamming distance (of 64 bits)
+DEDUPE_DEFAULT_MODE = "diff"           # diff | copy
+DEDUPE_DEFAULT_INDEX = ".cache/phash-index.json"
+
+# -- Watch mode ---------------------------------------------------------------
+# `convert.py --watch` keeps running and converts images as they land in the
+# input folder (inotify on Linux, polling elsewhere).
+WATCH_DEFAULT_ENABLED = False
+WATCH_DEFAULT_SETTLE_SECONDS = 2.0     # file must be unchanged this long
+WATCH_DEFAULT_POLL_SECONDS = 2.0       # rescan interval without inotify
+WATCH_TICK_SECONDS = 1.0               # max sleep between loop iterations
+NON_INTERACTIVE_DEFAULT = False        # skip "Press Enter to exit" prompts
+HEARTBEAT_DEFAULT_SECONDS = 30
+STATUS_DEFAULT_FILE = ".cache/status.json"
+CACHE_EVICT_INTERVAL = 3600            # long-running: evict the cache hourly
+
+# -- Metrics ------------------------------------------------------------------
+# Per-phase timings for each conversion attempt: JSONL trace per run, a
+# Prometheus textfile and a p50/p95/max table in the summary.
+METRICS_DEFAULT_ENABLED = True
+METRICS_DEFAULT_DIR = ".cache/metrics"
+PROM_TEXTFILE_NAME = "figma_converter.prom"
+
+# -- SVG optimization ---------------------------------------------------------
+# Post-process each generated SVG (pipeline/svgopt.py): merge duplicate defs,
+# round numbers, collapse bare groups, minify.  ids and data-* are kept.
+SVG_OPTIMIZE_DEFAULT_ENABLED = True
+SVG_DEFAULT_PRECISION = 2              # decimals kept in coordinates
+
+# -- SVG validation -----------------------------------------------------------
+# Check every output against the prompt-template rules (pipeline/svgcheck.py)
+# and repair mechanical violations locally; the rest go back to the CLI with
+# a short fix prompt, at most SVG_FIX_ATTEMPTS times per image.
+SVG_VALIDATE_DEFAULT_ENABLED = True
+SVG_FIX_DEFAULT_ATTEMPTS = 1
+
+# -- Provider pool ------------------------------------------------------------
+# AI_PROVIDERS=claude,codex routes images across both CLIs
+# (pipeline/providers.py).  A provider hitting its quota sits out this long;
+# auth / missing-CLI failures take it out for the rest of the run.
+FAILOVER_QUOTA_COOLDOWN = 900.0   # seconds
+
+# -- Model routing ------------------------------------------------------------
+# ROUTING=1 scores each image locally (pipeline/routing.py, needs Pillow) and
+# picks a model tier: score < 1st threshold -> 1st model, and so on.  Failed
+# or invalid results escalate to the next tier.
+ROUTING_DEFAULT_ENABLED = False
+CLAUDE_DEFAULT_ROUTE_MODELS = "claude-haiku-4-5-20251001,claude-sonnet-4-5-20250929,claude-opus-4-6"
+CODEX_DEFAULT_ROUTE_MODELS = ""   # empty = no routing for Codex (uses CODEX_MODEL)
+ROUTE_DEFAULT_THRESHOLDS = "0.35,0.7"
+
+# -- Run history --------------------------------------------------------------
+# Every conversion attempt goes to a SQLite store (pipeline/history.py) that
+# drives the pre-run estimate, the live ETA and `convert.py stats`.
+HISTORY_DEFAULT_ENABLED = True
+HISTORY_DEFAULT_DB = ".cache/history.sqlite3"
+STATS_DEFAULT_DAYS = 30
+STATS_DEFAULT_RUNS = 10
+
+# -- Batched invocation -------------------------------------------------------
+# BATCH_MAX > 1 sends up to that many first-attempt images through one CLI
+# call (pipeline/batching.py).  A batch is also capped so its estimated image
+# tokens plus BATCH_OUTPUT_TOKENS per SVG stay within BATCH_CONTEXT_SHARE of
+# the model's context window.
+BATCH_DEFAULT_MAX = 1                  # 1 = one image per call
+BATCH_DEFAULT_CONTEXT_SHARE = 0.5      # rest: template, tool calls, reasoning
+BATCH_OUTPUT_TOKENS = 8000             # reserved per SVG written
+BATCH_DEFAULT_TIMEOUT_STEP = 0.25      # each extra image adds this share of TIMEOUT
+# Context window (tokens) by substring match on model name
+MODEL_CONTEXT_WINDOWS = {
+    "claude": 200_000,
+    "o4-mini": 200_000,
+    "o3": 200_000,
+    "gpt": 272_000,
+}
+DEFAULT_CONTEXT_WINDOW = 200_000
+
+# -- Scheduling ---------------------------------------------------------------
+# Queue order (pipeline/scheduling.py): lpt = longest predicted time first,
+# spt = shortest first, name = file-name order.
+SCHEDULE_DEFAULT_POLICY = "lpt"
+
+# -- Budget -------------------------------------------------------------------
+# Pre-flight token/cost estimate per image (pipeline/budget.py) and the hard
+# limits (BUDGET_USD / BUDGET_TOKENS, --budget-usd / --budget-tokens) that
+# stop new submissions before spending could pass them.  0 = no limit.
+BUDGET_DEFAULT_USD = 0.0
+BUDGET_DEFAULT_TOKENS = 0
+CHARS_PER_TOKEN = 4                    # prompt template length -> tokens
+# System prompt + tool definitions each CLI sends with every turn
+CLI_OVERHEAD_TOKENS = {
+    "claude": 15_000,
+    "codex": 8_000,
+}
+ESTIMATE_TURNS = 3                     # prompt -> Read image -> Write SVG
+ESTIMATE_OUTPUT_TOKENS = 10_000        # the SVG plus the model's reasoning
+
+# -- Sharding -----------------------------------------------------------------
+# SHARD=1 lets several converter processes share one INPUT_DIR: each claims
+# images by renaming them into INPUT_DIR/.leases/<worker>/ (pipeline/leases.py).
+SHARD_DEFAULT_ENABLED = False
+LEASE_DEFAULT_TTL = 120.0        # seconds without a heartbeat before a worker's images are reclaimed
+LEASE_DEFAULT_HEARTBEAT = 10.0
+
+# -- Scanning -----------------------------------------------------------------
+# INPUT_DIR is walked lazily (pipeline/scan.py); subfolders are mirrored into
+# OUTPUT_DIR and ARCHIVE_DIR.  Only QUEUE_WINDOW images are queued (or, in
+# shard mode, leased) at a time; more are read as slots free up.
+SCAN_DEFAULT_RECURSIVE = True
+QUEUE_DEFAULT_WINDOW = 0         # 0 = 2 x slots x BATCH_MAX
+
+# -- Hedging ------------------------------------------------------------------
+# HEDGE=1 starts a second attempt for a conversion that runs longer than the
+# HEDGE_PERCENTILE of this run's finished ones; the first valid SVG wins and
+# the other attempt is cancelled (pipeline/hedging.py).
+HEDGE_DEFAULT_ENABLED = False
+HEDGE_DEFAULT_PERCENTILE = 0.9
+HEDGE_DEFAULT_MAX_SHARE = 0.1    # of the total concurrency; at least one hedge
+
+# -- Salvage ------------------------------------------------------------------
+# An SVG cut off by a timeout or the turn limit (or left without </svg>) is
+# closed locally if only closing tags are missing; otherwise the CLI finishes
+# it with the short continuation prompt, at most SALVAGE_ATTEMPTS times per
+# image (pipeline/salvage.py).
+SALVAGE_DEFAULT_ENABLED = True
+SALVAGE_DEFAULT_ATTEMPTS = 1
+
+# -- Tiling -------------------------------------------------------------------
+# TILE=1 converts a screenshot taller than TILE_MIN_HEIGHT as horizontal bands
+# of about TILE_BAND_HEIGHT pixels, cut at quiet rows and overlapping by
+# TILE_OVERLAP; the bands run as parallel CLI calls and their SVGs are
+# stitched into one (pipeline/tiling.py).
+TILE_DEFAULT_ENABLED = False
+TILE_DEFAULT_MIN_HEIGHT = 3000
+TILE_DEFAULT_BAND_HEIGHT = 1400  # below Claude's 1568px edge, so bands are not downscaled
+TILE_DEFAULT_OVERLAP = 48
@@ -0,0 +1,20 @@
+"""
+Conversion pipeline helpers for figma-converter.
+
+Usage:
+    from pipeline import ConversionCache
+"""
+
+from .cache import ConversionCache, cache_key, hash_file
+from .journal import RunJournal, new_journal_path, latest_journal
+from .journal import replay as replay_journal
+from .failures import classify_error
+from .concurrency import AdaptiveConcurrency
+from .retry import RetryEngine, RetryBudget, RetryPolicy
+
+__all__ = [
+    "ConversionCache", "cache_key", "hash_file",
+    "RunJournal", "new_journal_path", "latest_journal", "replay_journal",
+    "classify_error", "AdaptiveConcurrency",
+    "RetryEngine", "RetryBudget", "RetryPolicy",
+]
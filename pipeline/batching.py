@@ -0,0 +1,97 @@
+"""
+Batched invocation: several images per CLI call.
+
+Every call pays for a CLI process start and for the whole prompt template.
+With BATCH_MAX > 1 the orchestrator packs up to that many first-attempt
+images into one call; pipeline.prompts.batch_layout() sends the template
+once and lists a Read / Write pair per image after it.  A batch is closed
+early when the next image would push its estimated image tokens, plus
+BATCH_OUTPUT_TOKENS per SVG, past BATCH_CONTEXT_SHARE of the model's
+context window, so a few large screenshots go alone while many small ones
+share a call.
+
+Each output is checked on its own; whatever is missing or invalid goes back
+to the queue as a single-image attempt, outside the retry policy, since a
+batch-mate may have broken the call.  The call's tokens, cost and time are
+split across its images in proportion to their estimated image tokens
+(their size as the model sees it); the parts add up to the call's totals.
+The call's timeout is TIMEOUT plus BATCH_TIMEOUT_STEP of it per extra image,
+so one stuck batch cannot hold a slot for N x TIMEOUT.
+"""
+
+from config.constants import (
+    MODEL_CONTEXT_WINDOWS, DEFAULT_CONTEXT_WINDOW, BATCH_OUTPUT_TOKENS,
+)
+from .imaging import estimate_image_tokens
+
+UNKNOWN_IMAGE_TOKENS = 1600  # unreadable header: assume a mid-size screenshot
+
+
+def context_window(model):
+    """Context window of `model` in tokens, by substring match."""
+    name = (model or "").lower()
+    for key, tokens in MODEL_CONTEXT_WINDOWS.items():
+        if key in name:
+            return tokens
+    return DEFAULT_CONTEXT_WINDOW
+
+
+def batch_budget(model, share):
+    """Tokens one batch may spend on images and their SVGs."""
+    return int(context_window(model) * share)
+
+
+def image_tokens(size, provider):
+    """Estimated vision tokens for an image of `size` ((w, h) or None)."""
+    if not size:
+        return UNKNOWN_IMAGE_TOKENS
+    return estimate_image_tokens(size[0], size[1], provider) or UNKNOWN_IMAGE_TOKENS
+
+
+def batch_cost(size, provider):
+    """Budget one image takes up in a batch: its pixels plus the SVG it produces."""
+    return image_tokens(size, provider) + BATCH_OUTPUT_TOKENS
+
+
+def batch_timeout(timeout, count, step):
+    """Timeout of one call over `count` images: `timeout` plus `step` of it per extra image."""
+    return int(timeout * (1 + step * max(0, count - 1)))
+
+
+def apportion(value, shares):
+    """
+    Split the integer `value` in proportion to `shares` (largest remainder):
+    every part is the floor or ceiling of its exact share, and they add up
+    to `value`.
+    """
+    exact = [value * share for share in shares]
+    parts = [int(x // 1) for x in exact]
+    by_remainder = sorted(range(len(shares)), key=lambda i: exact[i] - parts[i], reverse=True)
+    for i in by_remainder[:value - sum(parts)]:
+        parts[i] += 1
+    return parts
+
+
+def split_usage(tokens, weights):
+    """
+    Split one call's tokens dict across images in proportion to `weights`.
+    Returns (shares, parts): the fractions (summing to 1) and one tokens
+    dict per image.  Token counts are split by largest remainder and the
+    cost's rounding error goes to the last part, so the parts add up to
+    the call's totals.
+    """
+    total = sum(weights)
+    if total <= 0:
+        shares = [1.0 / len(weights)] * len(weights)
+    else:
+        shares = [w / total for w in weights]
+    parts = [{} for _ in shares]
+    for key, value in tokens.items():
+        if isinstance(value, float):
+            split = [value * share for share in shares]
+            split[-1] = value - sum(split[:-1])
+        else:
+            split = apportion(value, shares)
+        for part, amount in zip(parts, split):
+            part[key] = amount
+    return shares, parts
@@ -0,0 +1,119 @@
+"""
+Pre-flight cost estimate and hard spending limits.
+
+estimate_call() predicts the tokens of one conversion before it runs: the
+CLI's own system prompt and tools plus the prompt template, sent again on
+each of ESTIMATE_TURNS turns (cached after the first), the image from the
+second turn on, and ESTIMATE_OUTPUT_TOKENS for the SVG.  Its cost comes
+from the list prices in pipeline.pricing, so Codex runs (which report no
+cost) get a meaningful number too.
+
+Budget enforces BUDGET_USD / BUDGET_TOKENS.  Before each submission the
+orchestrator asks allows(): what the run has spent, plus the projections of
+the calls still in flight, plus this call's projection must stay within
+both limits.  If only the in-flight calls are in the way, the submission
+waits for them to finish; if what was spent already leaves no room, the
+budget is `exceeded` and no new work is started.  Projections are the
+estimates scaled by how far off they were for this run's finished calls,
+so a template that costs twice the estimate is budgeted at twice.
+"""
+
+from config.constants import (
+    CHARS_PER_TOKEN, CLI_OVERHEAD_TOKENS, ESTIMATE_TURNS, ESTIMATE_OUTPUT_TOKENS,
+)
+from .batching import image_tokens
+from .pricing import list_cost
+
+CALIBRATION_MIN = 2              # finished calls before estimates are rescaled
+CALIBRATION_RANGE = (0.25, 4.0)
+
+
+def template_tokens(template):
+    return len(template) // CHARS_PER_TOKEN
+
+
+def estimate_call(size, prompt_tokens, model, provider):
+    """Tokens dict (NO_TOKENS keys) expected for one image of `size` ((w, h) or None)."""
+    context = CLI_OVERHEAD_TOKENS.get(provider, 0) + prompt_tokens
+    image = image_tokens(size, provider)
+    cache_read = context * (ESTIMATE_TURNS - 1)
+    tokens = {
+        "input": context * ESTIMATE_TURNS + image * (ESTIMATE_TURNS - 1),
+        "output": ESTIMATE_OUTPUT_TOKENS,
+        "cache_read": cache_read,
+        "cache_write": 0,
+    }
+    tokens["total"] = tokens["input"] + tokens["output"]
+    tokens["cost_usd"] = list_cost(tokens, model, provider)
+    return tokens
+
+
+def combine(estimates):
+    """One estimate for several images sent together (a batched call)."""
+    return {key: sum(e[key] for e in estimates) for key in estimates[0]}
+
+
+class Budget:
+    """Hard limits on a run's cost and tokens; 0 / None = no limit."""
+
+    def __init__(self, max_usd=0.0, max_tokens=0):
+        self.max_usd = max_usd or None
+        self.max_tokens = max_tokens or None
+        self.reserved = {}          # key -> (tokens, usd) projected for a call in flight
+        self.estimated = [0, 0.0]   # finished calls: estimated tokens, usd
+        self.actual = [0, 0.0]      # ... and what they really used
+        self.calls = 0
+        self.exceeded = None        # why submissions stopped
+
+    @property
+    def enabled(self):
+        return self.max_usd is not None or self.max_tokens is not None
+
+    def scale(self):
+        """(tokens, usd) ratio of actual to estimated usage over finished calls."""
+        if self.calls < CALIBRATION_MIN:
+            return 1.0, 1.0
+        low, high = CALIBRATION_RANGE
+        return tuple(min(high, max(low, a / e)) if e else 1.0
+                     for a, e in zip(self.actual, self.estimated))
+
+    def project(self, estimate):
+        """(tokens, usd) this run expects a call with `estimate` to use."""
+        token_scale, usd_scale = self.scale()
+        return estimate["total"] * token_scale, estimate["cost_usd"] * usd_scale
+
+    def in_flight(self):
+        return (sum(r[0] for r in self.reserved.values()),
+                sum(r[1] for r in self.reserved.values()))
+
+    def allows(self, spent_tokens, spent_usd, estimate):
+        """
+        True if a call with `estimate` fits next to what was spent and what
+        is in flight.  False if it has to wait for the calls in flight; when
+        it would not fit even without them, also records why in `exceeded`.
+        """
+        tokens, usd = self.project(estimate)
+        flight_tokens, flight_usd = self.in_flight()
+        if self.max_usd is not None and spent_usd + usd > self.max_usd:
+            self.exceeded = f"${spent_usd:.2f} spent + ~${usd:.2f} for the next image > ${self.max_usd:.2f}"
+        elif self.max_tokens is not None and spent_tokens + tokens > self.max_tokens:
+            self.exceeded = (f"{spent_tokens:,} tok spent + ~{tokens:,.0f} for the next image"
+                             f" > {self.max_tokens:,} tok")
+        if self.exceeded is not None:
+            return False
+        if self.max_usd is not None and spent_usd + flight_usd + usd > self.max_usd:
+            return False
+        return self.max_tokens is None or spent_tokens + flight_tokens + tokens <= self.max_tokens
+
+    def reserve(self, key, estimate):
+        self.reserved[key] = self.project(estimate)
+
+    def release(self, key, estimate=None, used=None):
+        """Drop `key`'s reservation; a finished call's `used` tokens calibrate later projections."""
+        self.reserved.pop(key, None)
+        if estimate is not None and used is not None and used.get("total"):
+            self.calls += 1
+            self.estimated[0] += estimate["total"]
+            self.estimated[1] += estimate["cost_usd"]
+            self.actual[0] += used["total"]
+            self.actual[1] += used.get("cost_usd", 0.0)
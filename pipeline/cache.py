@@ -0,0 +1,205 @@
+"""
+Content-addressed conversion cache.
+
+Every successful conversion is stored under a SHA-256 key built from the
+image bytes, the rendered prompt, the provider, the model/turn settings and
+the post-processing applied to the stored SVG.  Re-running a batch
+restores unchanged images straight from the cache instead of paying for
+another CLI call.
+
+Layout on disk:
+    <cache_dir>/<key[:2]>/<key>.svg    cached SVG output
+    <cache_dir>/<key[:2]>/<key>.json   metadata (tokens, sizes, timestamps)
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+from pathlib import Path
+
+HASH_CHUNK_SIZE = 1024 * 1024  # 1 MiB
+
+
+def hash_file(path):
+    """Return the SHA-256 hex digest of a file's contents."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def cache_key(image_digest, prompt, cfg, variant=""):
+    """
+    Build the cache key for one conversion.
+
+    `prompt` must be rendered with stable placeholder paths (not the real
+    input/output paths) so renaming or re-dropping a file still hits.
+    `variant` folds in anything else that changes the output (e.g. the
+    preprocessing settings).  The stored file is the checked, optimized
+    SVG, so the validation, optimization and salvage settings are part of
+    the key as well.
+    """
+    h = hashlib.sha256()
+    parts = (
+        image_digest,
+        prompt,
+        cfg["provider"],
+        cfg["model"] or "",
+        str(cfg["max_turns"] or ""),
+        str(cfg["sandbox"] or ""),
+        variant,
+        postprocess_signature(cfg),
+    )
+    for part in parts:
+        data = part.encode("utf-8")
+        # Length-prefix each field so ("ab", "c") != ("a", "bc")
+        h.update(len(data).to_bytes(8, "big"))
+        h.update(data)
+    return h.hexdigest()
+
+
+def postprocess_signature(cfg):
+    """Short string for the settings that rewrite an SVG after the CLI wrote it."""
+    parts = []
+    if cfg["svg_validate"]:
+        parts.append("validate")
+    if cfg["svg_optimize"]:
+        parts.append(f"optimize{cfg['svg_precision']}")
+    if cfg["salvage"]:
+        parts.append("salvage")
+    return ",".join(parts)
+
+
+def _atomic_write(path, data):
+    """Write bytes to `path` via a temp file + rename so readers never see partial data."""
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class ConversionCache:
+    """
+    Persistent SVG cache with size- and age-based eviction.
+
+    Entries are only read and written from the orchestrating thread, so no
+    locking is needed.
+    """
+
+    def __init__(self, cache_dir, max_bytes, max_age_seconds):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _paths(self, key):
+        shard = self.cache_dir / key[:2]
+        return shard / f"{key}.svg", shard / f"{key}.json"
+
+    def get(self, key):
+        """Return the metadata dict for `key`, or None on a miss or expired entry."""
+        svg_path, meta_path = self._paths(key)
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return None
+        if not svg_path.exists():
+            return None
+        if time.time() - meta.get("created", 0) > self.max_age_seconds:
+            self._remove(key)
+            return None
+        return meta
+
+    def restore(self, key, output_svg):
+        """
+        Copy a cached SVG to `output_svg`.
+
+        Returns the entry metadata on success, None on a miss.  The entry's
+        access time is bumped so eviction is least-recently-used.
+        """
+        meta = self.get(key)
+        if meta is None:
+            return None
+        svg_path, meta_path = self._paths(key)
+        output_svg.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            shutil.copyfile(svg_path, output_svg)
+        except OSError:
+            return None
+        now = time.time()
+        try:
+            os.utime(meta_path, (now, now))
+        except OSError:
+            pass
+        return meta
+
+    def store(self, key, svg_file, source_name, tokens, elapsed):
+        """Store a freshly converted SVG under `key`."""
+        svg_path, meta_path = self._paths(key)
+        svg_path.parent.mkdir(parents=True, exist_ok=True)
+        data = Path(svg_file).read_bytes()
+        meta = {
+            "source": source_name,
+            "created": time.time(),
+            "size": len(data),
+            "elapsed": elapsed,
+            "tokens": tokens,
+        }
+        _atomic_write(svg_path, data)
+        _atomic_write(meta_path, json.dumps(meta).encode("utf-8"))
+
+    def _remove(self, key):
+        for path in self._paths(key):
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+    def evict(self):
+        """
+        Drop expired entries, then least-recently-used entries until the
+        cache fits in `max_bytes`.  Returns the number of entries removed.
+        """
+        now = time.time()
+        entries = []  # (last_access, size, key)
+        removed = 0
+
+        for meta_path in self.cache_dir.glob("*/*.json"):
+            key = meta_path.stem
+            svg_path = meta_path.with_suffix(".svg")
+            try:
+                meta = json.loads(meta_path.read_text(encoding="utf-8"))
+                last_access = meta_path.stat().st_mtime
+                size = svg_path.stat().st_size
+            except (OSError, json.JSONDecodeError):
+                self._remove(key)
+                removed += 1
+                continue
+            if now - meta.get("created", 0) > self.max_age_seconds:
+                self._remove(key)
+                removed += 1
+                continue
+            entries.append((last_access, size, key))
+
+        total = sum(size for _, size, _ in entries)
+        if total > self.max_bytes:
+            entries.sort()  # oldest access first
+            for _, size, key in entries:
+                if total <= self.max_bytes:
+                    break
+                self._remove(key)
+                total -= size
+                removed += 1
+
+        return removed
@@ -0,0 +1,94 @@
+"""
+Adaptive concurrency controller.
+
+AIMD (additive increase, multiplicative decrease) on the number of in-flight
+conversions:
+
+  - every successful conversion adds 1/limit, so the limit grows by about
+    one per "window" of `limit` completions;
+  - a rate-limit / overloaded failure, or a sustained latency rise above the
+    observed baseline, multiplies the limit by `decrease_factor`.
+
+Decreases are rate-limited by a cooldown so one burst of 429s from requests
+already in flight only counts once.  The controller is driven from the
+orchestrating thread only.
+"""
+
+import time
+
+from .failures import BACKPRESSURE_ERRORS, ERR_TIMEOUT
+
+LATENCY_FAST_ALPHA = 0.3    # EWMA weight for recent latency
+LATENCY_BASE_ALPHA = 0.05   # EWMA weight for the slow-moving baseline
+LATENCY_WARMUP = 5          # completions before latency can trigger a decrease
+
+
+class AdaptiveConcurrency:
+    """Tracks the current in-flight limit between `min_limit` and `max_limit`."""
+
+    def __init__(self, initial, min_limit, max_limit, decrease_factor=0.5,
+                 latency_factor=2.0, cooldown=30.0, enabled=True, on_change=None):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.decrease_factor = decrease_factor
+        self.latency_factor = latency_factor
+        self.cooldown = cooldown
+        self.enabled = enabled
+        self.on_change = on_change
+        self._limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self._last_decrease = 0.0
+        self._fast_latency = None
+        self._base_latency = None
+        self._samples = 0
+
+    @property
+    def limit(self):
+        return int(self._limit)
+
+    def _set(self, value, reason):
+        old = self.limit
+        self._limit = min(max(value, self.min_limit), self.max_limit)
+        if self.limit != old and self.on_change is not None:
+            self.on_change(old, self.limit, reason)
+
+    def _decrease(self, reason):
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self._set(self._limit * self.decrease_factor, reason)
+
+    def _observe_latency(self, elapsed):
+        self._samples += 1
+        if self._fast_latency is None:
+            self._fast_latency = self._base_latency = elapsed
+            return False
+        self._fast_latency += LATENCY_FAST_ALPHA * (elapsed - self._fast_latency)
+        # The baseline only follows latency slowly upward but drops quickly,
+        # so it tracks "uncongested" latency.
+        if elapsed < self._base_latency:
+            self._base_latency = elapsed
+        else:
+            self._base_latency += LATENCY_BASE_ALPHA * (elapsed - self._base_latency)
+        return (self._samples > LATENCY_WARMUP
+                and self._fast_latency > self._base_latency * self.latency_factor)
+
+    def record(self, err_class, elapsed):
+        """
+        Feed one completed conversion.
+
+        `err_class` is None for success, otherwise an ERR_* value from
+        pipeline.failures.
+        """
+        if not self.enabled:
+            return
+        if err_class in BACKPRESSURE_ERRORS:
+            self._decrease(err_class)
+            return
+        if err_class not in (None, ERR_TIMEOUT):
+            return  # auth/quota/other failures say nothing about capacity
+        if self._observe_latency(elapsed):
+            self._decrease(f"latency {self._fast_latency:.0f}s vs baseline {self._base_latency:.0f}s")
+            return
+        if err_class is None:
+            self._set(self._limit + 1.0 / max(self._limit, 1.0), "steady successes")
@@ -0,0 +1,85 @@
+"""
+Console output for convert.py: ANSI colors, progress bars and the short
+number formats used in progress lines and the summary.
+"""
+
+import sys
+
+
+# -- Colors (ANSI) ------------------------------------------------------------
+
+class C:
+    MAGENTA = "\033[35m"
+    CYAN = "\033[36m"
+    GREEN = "\033[32m"
+    YELLOW = "\033[93m"
+    RED = "\033[31m"
+    BOLD = "\033[1m"
+    DIM = "\033[2m"
+    RESET = "\033[0m"
+
+
+def colorize(text, color):
+    return f"{color}{text}{C.RESET}"
+
+
+# -- Progress bar --------------------------------------------------------------
+
+def progress_bar(current, total, width=40):
+    pct = int(current * 100 / total)
+    filled = int(pct / 100 * width)
+    empty = width - filled
+    bar = "=" * filled + "-" * empty
+    return f"[{bar}] {pct}%"
+
+
+def progress_label(current, total, growing=False):
+    """Progress bar, or a plain count while `total` can still grow (a percentage would jump back)."""
+    if growing:
+        return f"{current} done / {total} found so far"
+    return progress_bar(current, total)
+
+
+def format_time(seconds):
+    if seconds < 60:
+        return f"{seconds:.0f}s"
+    m, s = divmod(int(seconds), 60)
+    return f"{m}m {s}s"
+
+
+def format_tokens(n):
+    if n >= 1_000_000:
+        return f"{n / 1_000_000:.1f}M"
+    if n >= 1_000:
+        return f"{n / 1_000:.1f}K"
+    return str(n)
+
+
+def format_duration(seconds):
+    """Short duration for timing tables: 3ms, 850ms, 12.40s."""
+    if seconds < 1:
+        return f"{seconds * 1000:.0f}ms"
+    return f"{seconds:.2f}s"
+
+
+def format_size(n):
+    if n < 1024:
+        return f"{n}B"
+    if n >= 1024 * 1024:
+        return f"{n / (1024 * 1024):.1f}MB"
+    return f"{n // 1024}KB"
+
+
+def status(msg):
+    print(f"    {colorize('→', C.CYAN)} {msg}")
+
+
+def pause(cfg, exit_code=None):
+    """Keep a double-clicked console window open; skipped when non-interactive."""
+    if not cfg["non_interactive"]:
+        try:
+            input("\n  Press Enter to exit...")
+        except EOFError:
+            pass
+    if exit_code is not None:
+        sys.exit(exit_code)
@@ -0,0 +1,631 @@
+"""
+One conversion attempt: build the provider's CLI command, run it and turn
+its output into a result tuple
+
+    (filename, success, elapsed, size_kb, error, tokens)
+
+for a single image (run_conversion), a batched call (run_batch) or a tall
+image's bands (run_tiled).  ConversionRun (pipeline/run.py) decides what to
+start and what to do with each result.
+"""
+
+import os
+import time
+import asyncio
+import subprocess
+import tempfile
+import json
+import shutil
+from pathlib import Path
+
+from config.constants import (
+    PROVIDER_CLAUDE, PROVIDER_CODEX, PLACEHOLDER_IMAGE, PLACEHOLDER_OUTPUT, TIME_ESTIMATES,
+    DEFAULT_TIME_ESTIMATE,
+)
+from .console import C
+from .journal import STATE_RUNNING
+from .failures import classify_error
+from .failures import ERR_INVALID_SVG, ERR_MAX_TURNS, ERR_TRUNCATED, ERR_TIMEOUT
+from .failures import ERR_AUTH, ERR_QUOTA, ERR_CLI_NOT_FOUND, BACKPRESSURE_ERRORS
+from .imaging import image_size
+from .preprocess import scale_note
+from .prompts import cache_layout, batch_layout
+from .streaming import CodexTokenAccumulator, ClaudeTokenAccumulator, run_streaming, run_captured
+from .metrics import Span, SpanGroup
+from .pricing import priced
+from .leases import LEASE_DIR_NAME, commit_file
+from .salvage import SALVAGE_COMPLETE, SALVAGE_REPAIRED, salvage_svg, svg_closed
+from .tiling import tile_note
+from .batching import batch_timeout, image_tokens, split_usage
+
+
+# -- Provider: command building ------------------------------------------------
+
+def build_claude_command(prompt, images, cfg):
+    """Build the subprocess command list for Claude CLI (it reads `images` itself)."""
+    cmd = [
+        cfg["cli_path"], "-p", prompt,
+        "--allowedTools", "Read,Write,Edit",
+        "--max-turns", cfg["max_turns"],
+        "--model", cfg["model"],
+    ]
+    if cfg["stream"]:
+        # One JSON event per line; stream-json requires --verbose in -p mode
+        cmd.extend(["--output-format", "stream-json", "--verbose"])
+    else:
+        cmd.extend(["--output-format", "json"])
+    return cmd
+
+
+def build_codex_command(prompt, images, cfg):
+    """Build the subprocess command list for Codex CLI.
+
+    Returns (cmd_list, stdin_text).  The prompt is passed via stdin
+    (using '-') because it can exceed the OS command-line length limit.
+    Every path in `images` is attached with its own --image flag.
+    """
+    cmd = [
+        cfg["cli_path"], "exec",
+        "--full-auto",
+        "--sandbox", cfg["sandbox"],
+        "--json",
+    ]
+    for img in images:
+        cmd.extend(["--image", str(img)])
+    if cfg["model"]:
+        cmd.extend(["--model", cfg["model"]])
+    cmd.append("-")  # read prompt from stdin
+    return cmd
+
+
+def build_command(prompt, images, cfg):
+    """Dispatch to the correct provider's command builder."""
+    if cfg["provider"] == PROVIDER_CODEX:
+        return build_codex_command(prompt, images, cfg)
+    return build_claude_command(prompt, images, cfg)
+
+
+# -- Provider: prompt adaptation -----------------------------------------------
+
+def adapt_prompt(prompt_template, img, output_svg, cfg):
+    """
+    Adapt the prompt template for the current provider.
+
+    The per-image lines are moved to the end first (see cache_layout), so
+    everything before them is identical for every image in the batch.
+    Claude: Replace __IMAGE_PATH__ (Claude reads the file via its Read tool).
+    Codex:  Remove "Read: __IMAGE_PATH__" since Codex gets the image via --image flag.
+    """
+    prompt = cache_layout(prompt_template).replace(PLACEHOLDER_OUTPUT, str(output_svg))
+
+    if cfg["provider"] == PROVIDER_CODEX:
+        # Codex receives the image via --image flag
+        prompt = prompt.replace(
+            f"Read: {PLACEHOLDER_IMAGE}",
+            "The image is attached to this message (via --image flag)."
+        )
+        prompt = prompt.replace(PLACEHOLDER_IMAGE, str(img))
+    else:
+        prompt = prompt.replace(PLACEHOLDER_IMAGE, str(img))
+
+    return prompt
+
+
+def adapt_batch_prompt(prompt_template, jobs, cfg):
+    """
+    Prompt for one call over several images (see pipeline.prompts.batch_layout).
+
+    `jobs` is a list of (image, output_svg, note).  Codex gets the images as
+    --image attachments in the same order, so each is referred to by number.
+    """
+    if cfg["provider"] == PROVIDER_CODEX:
+        prompt_template = prompt_template.replace(
+            f"Read: {PLACEHOLDER_IMAGE}",
+            f"The image is {PLACEHOLDER_IMAGE} of this message (via --image flag)."
+        )
+        jobs = [(f"attachment #{number}", output, note)
+                for number, (_, output, note) in enumerate(jobs, 1)]
+    return batch_layout(prompt_template, jobs)
+
+
+# -- Provider: token/cost parsing ----------------------------------------------
+
+# `input` includes the cached part; cache_read / cache_write break it down
+NO_TOKENS = {"input": 0, "output": 0, "total": 0, "cache_read": 0, "cache_write": 0, "cost_usd": 0.0}
+
+
+def parse_claude_tokens(stdout):
+    """Parse Claude CLI JSON output for token usage and cost."""
+    try:
+        data = json.loads(stdout)
+        usage = data.get("usage", {})
+        input_tok = usage.get("input_tokens", 0)
+        cache_create = usage.get("cache_creation_input_tokens", 0)
+        cache_read = usage.get("cache_read_input_tokens", 0)
+        output_tok = usage.get("output_tokens", 0)
+        cost_usd = data.get("total_cost_usd", 0.0)
+        return {
+            "input": input_tok + cache_create + cache_read,
+            "output": output_tok,
+            "total": input_tok + cache_create + cache_read + output_tok,
+            "cache_read": cache_read,
+            "cache_write": cache_create,
+            "cost_usd": cost_usd,
+        }
+    except (json.JSONDecodeError, TypeError, AttributeError):
+        return dict(NO_TOKENS)
+
+
+def claude_result_subtype(stdout):
+    """The `subtype` of Claude's JSON result ("success", "error_max_turns", ...), None if unknown."""
+    try:
+        return json.loads(stdout).get("subtype")
+    except (json.JSONDecodeError, TypeError, AttributeError):
+        return None
+
+
+def parse_codex_tokens(stdout):
+    """
+    Parse Codex CLI JSONL output for token usage.
+
+    Codex streams newline-delimited JSON events. We sum usage from
+    events that contain token data. Codex does not report cost_usd.
+    """
+    accumulator = CodexTokenAccumulator()
+    for line in stdout.splitlines():
+        accumulator.feed(line)
+    return accumulator.totals()
+
+
+def parse_token_usage(stdout, provider):
+    """Dispatch to the correct provider's token parser."""
+    if provider == PROVIDER_CODEX:
+        return parse_codex_tokens(stdout)
+    return parse_claude_tokens(stdout)
+
+
+def token_accumulator(provider):
+    """Return an incremental token accumulator for streaming mode."""
+    if provider == PROVIDER_CODEX:
+        return CodexTokenAccumulator()
+    return ClaudeTokenAccumulator()
+
+
+# -- Time estimation -----------------------------------------------------------
+
+def estimate_time_per_image(model_name):
+    """Return estimated minutes per image based on model name substring."""
+    model_lower = model_name.lower()
+    for key, minutes in TIME_ESTIMATES.items():
+        if key in model_lower:
+            return minutes
+    return DEFAULT_TIME_ESTIMATE
+
+
+# -- Output paths --------------------------------------------------------------
+
+def source_path(img, cfg):
+    """`img`'s path below the input folder; a leased image keeps the one it had there."""
+    try:
+        rel = img.relative_to(cfg["input_dir"])
+    except ValueError:
+        return Path(img.name)
+    if rel.parts[0] == LEASE_DIR_NAME:
+        rel = Path(*rel.parts[2:])  # .leases/<worker>/...
+    return rel
+
+
+def source_name(img, cfg):
+    """Name used in the journal and output: "home.png", or "flows/login/home.png" in a subfolder."""
+    return source_path(img, cfg).as_posix()
+
+
+def output_path_for(img, cfg):
+    """Return the SVG output path for a source image (subfolders mirrored)."""
+    return cfg["output_dir"] / source_path(img, cfg).with_suffix(".svg")
+
+
+def archive_image(img, cfg):
+    """
+    Move a converted source image into the archive folder (subfolders
+    mirrored).  Idempotent (see pipeline.leases.commit_file); an archived
+    image of the same name is kept and this one stored beside it.  False if
+    the image is gone unarchived.
+    """
+    target = cfg["archive_dir"] / source_path(img, cfg)
+    try:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        return commit_file(img, target) is not None
+    except OSError:
+        return False  # non-critical; image stays in input
+
+
+def modified_before(path, cutoff):
+    """True if `path` was last written before `cutoff` (False if it is gone)."""
+    try:
+        return path.stat().st_mtime <= cutoff
+    except OSError:
+        return False
+
+
+# -- Conversion (thread-safe) --------------------------------------------------
+
+def record_cli_phases(span, seconds, result=None):
+    """Split one streamed CLI call into spawn / startup / model time."""
+    if result is None:
+        span.add("model", seconds)  # timed out or failed to start
+        return
+    startup = result.first_output_seconds or 0.0
+    span.add("spawn", result.spawn_seconds)
+    span.add("startup", startup)
+    span.add("model", max(0.0, seconds - result.spawn_seconds - startup))
+
+
+async def call_cli(prompt, images, cfg, label, on_tokens=None, span=None):
+    """Run the provider CLI once. Returns (error, tokens); error is None if it exited cleanly.
+
+    `images` are the files the model looks at (attached for Codex) and
+    `label` names the call in debug output.  Cancelling the calling task
+    kills the CLI's process tree (see pipeline.streaming).
+    """
+    tokens = dict(NO_TOKENS)
+    provider = cfg["provider"]
+    if on_tokens is not None:
+        # In-flight totals at list price until the CLI reports the real cost
+        report = on_tokens
+        on_tokens = lambda t: report(priced(t, cfg["model"], provider))
+
+    # Write prompt to temp file (for debugging reference)
+    with span.phase("tempfile"):
+        with tempfile.NamedTemporaryFile(mode="w", suffix=".txt", delete=False, encoding="utf-8") as f:
+            f.write(prompt)
+            prompt_file = f.name
+
+    try:
+        cmd = build_command(prompt, images, cfg)
+
+        if cfg["debug"]:
+            display_cmd = " ".join(c if c != prompt else "[prompt]" for c in cmd)
+            print(f"    {C.DIM}CMD: {display_cmd}{C.RESET}")
+
+        # Codex receives the prompt via stdin; Claude via -p flag
+        stdin_text = prompt if provider == PROVIDER_CODEX else None
+
+        if cfg["stream"]:
+            accumulator = token_accumulator(provider)
+            result = None
+            cli_start = time.perf_counter()
+            try:
+                result = await run_streaming(cmd, stdin_text, cfg["timeout"], accumulator, on_tokens)
+            finally:
+                record_cli_phases(span, time.perf_counter() - cli_start, result)
+            stdout, stderr, returncode = result.stdout_head, result.stderr, result.returncode
+            tokens = priced(accumulator.totals(), cfg["model"], provider)
+            event_error = accumulator.error
+            subtype = getattr(accumulator, "subtype", None)
+        else:
+            with span.phase("model"):
+                returncode, stdout, stderr = await run_captured(cmd, stdin_text, cfg["timeout"])
+            with span.phase("validate"):
+                tokens = priced(parse_token_usage(stdout, provider), cfg["model"], provider)
+            event_error = None
+            subtype = claude_result_subtype(stdout) if provider == PROVIDER_CLAUDE else None
+
+        if cfg["debug"] and stdout:
+            print(f"    {C.DIM}{provider} output ({label}, first 500 chars): {stdout[:500]}{C.RESET}")
+        if cfg["debug"] and stderr:
+            print(f"    {C.DIM}{provider} stderr ({label}): {stderr[:300]}{C.RESET}")
+
+        # Streaming mode kills the CLI as soon as it reports an error event
+        if event_error:
+            return event_error[:200], tokens
+
+        # Out of turns: the SVG may be half-written (see pipeline/salvage.py)
+        if subtype == "error_max_turns":
+            return ERR_MAX_TURNS, tokens
+
+        # Surface errors from the CLI (e.g. model not supported)
+        if returncode != 0:
+            error_msg = ""
+            if stderr:
+                error_msg = stderr.strip()[:200]
+            # Codex streams errors as JSONL on stdout
+            if not error_msg and stdout:
+                for line in stdout.splitlines():
+                    try:
+                        ev = json.loads(line)
+                        if ev.get("type") == "error":
+                            error_msg = ev.get("message", "")[:200]
+                            break
+                    except (json.JSONDecodeError, AttributeError):
+                        pass
+            if error_msg:
+                return error_msg, tokens
+
+    except subprocess.TimeoutExpired:
+        return "timeout", tokens
+    except FileNotFoundError:
+        return "cli_not_found", tokens
+    except Exception as exc:
+        return str(exc)[:200], tokens
+    finally:
+        with span.phase("tempfile"):
+            try:
+                os.unlink(prompt_file)
+            except OSError:
+                pass
+    return None, tokens
+
+
+def output_size(output_svg, span):
+    """Size of the SVG the CLI wrote, 0 if there is none."""
+    with span.phase("validate"):
+        try:
+            return output_svg.stat().st_size
+        except OSError:
+            return 0
+
+
+def output_result(filename, output_svg, elapsed, tokens, span):
+    """Result tuple for a CLI call that exited cleanly: converted, truncated or no SVG."""
+    size = output_size(output_svg, span)
+    if size == 0:
+        return (filename, False, elapsed, 0, None, tokens)
+    with span.phase("validate"):
+        closed = svg_closed(output_svg)
+    if not closed:
+        return (filename, False, elapsed, 0, ERR_TRUNCATED, tokens)
+    return (filename, True, elapsed, size // 1024, None, tokens)
+
+
+async def convert_image(img, prompt_template, cfg, on_tokens=None, prepared=None, span=None):
+    """Convert a single image. Returns (filename, success, elapsed, size_kb, error, tokens).
+
+    In streaming mode `on_tokens(tokens)` is called with running totals
+    while the CLI is still working.  `prepared` is a preprocess_image()
+    result: the model then sees the smaller copy and is told its scale.
+    Phase timings are added to `span` (a pipeline.metrics.Span).
+    """
+    filename = source_name(img, cfg)
+    output_svg = output_path_for(img, cfg)
+    if span is None:
+        span = Span(filename)
+
+    img_start = time.time()
+
+    # Build prompt (provider-specific adaptation)
+    with span.phase("prompt"):
+        model_img = Path(prepared["path"]) if prepared else img
+        prompt = adapt_prompt(prompt_template, model_img, output_svg, cfg) + scale_note(prepared)
+
+    error, tokens = await call_cli(prompt, [model_img], cfg, filename, on_tokens, span)
+    if error:
+        return (filename, False, time.time() - img_start, 0, error, tokens)
+
+    return output_result(filename, output_svg, time.time() - img_start, tokens, span)
+
+
+async def convert_batch(imgs, prompt_template, cfg, on_tokens=None, prepared=None, span=None):
+    """Convert several images with one CLI call. Returns one convert_image() tuple per image.
+
+    The template goes out once (see adapt_batch_prompt); the turn limit
+    grows with the number of images, the timeout by BATCH_TIMEOUT_STEP of
+    it per extra image (see pipeline.batching.batch_timeout).  Each output
+    is checked on its own, and the call's tokens, cost and time are split
+    by each image's estimated image tokens.  `prepared` maps images to
+    preprocess_image() results; `span` is a SpanGroup over the images'
+    spans.
+    """
+    prepared = prepared or {}
+    if span is None:
+        span = SpanGroup([Span(source_name(img, cfg)) for img in imgs])
+    label = f"batch of {len(imgs)}: {source_name(imgs[0], cfg)}, ..."
+
+    start = time.time()
+    with span.phase("prompt"):
+        jobs, sizes = [], []
+        for img in imgs:
+            prep = prepared.get(img)
+            if prep:
+                jobs.append((Path(prep["path"]), output_path_for(img, cfg), scale_note(prep)))
+                sizes.append((prep["width"], prep["height"]))
+            else:
+                jobs.append((img, output_path_for(img, cfg), ""))
+                sizes.append(image_size(img))
+        prompt = adapt_batch_prompt(prompt_template, jobs, cfg)
+
+    batch_cfg = dict(cfg, timeout=batch_timeout(cfg["timeout"], len(imgs), cfg["batch_timeout_step"]))
+    if cfg["max_turns"] is not None:
+        batch_cfg["max_turns"] = str(int(cfg["max_turns"]) * len(imgs))
+    error, tokens = await call_cli(prompt, [job[0] for job in jobs], batch_cfg, label, on_tokens, span)
+    elapsed = time.time() - start
+
+    shares, parts = split_usage(tokens, [image_tokens(size, cfg["provider"]) for size in sizes])
+    results = []
+    for img, share, part in zip(imgs, shares, parts):
+        if error:
+            results.append((source_name(img, cfg), False, elapsed * share, 0, error, part))
+            continue
+        results.append(output_result(source_name(img, cfg), output_path_for(img, cfg), elapsed * share,
+                                     part, span))
+    return results
+
+
+def copy_svg(img, svg, cfg, span=None):
+    """Reuse an existing SVG for a near-duplicate image (same result tuple as convert_image)."""
+    if span is not None:
+        span.start()
+    start = time.time()
+    output_svg = output_path_for(img, cfg)
+    tokens = dict(NO_TOKENS)
+    try:
+        if Path(svg).resolve() != output_svg.resolve():
+            shutil.copyfile(svg, output_svg)
+        size_kb = output_svg.stat().st_size // 1024
+    except OSError as exc:
+        return (source_name(img, cfg), False, time.time() - start, 0, str(exc)[:200], tokens)
+    finally:
+        if span is not None:
+            span.add("copy", time.time() - start)
+    return (source_name(img, cfg), True, time.time() - start, size_kb, None, tokens)
+
+
+async def run_conversion(img, prompt_template, cfg, journal=None, live=None, prepared=None, span=None,
+                         check=None, optimize=None, live_key=None, salvage=None):
+    """Engine entry point: mark the image as running, convert it, then check and optimize the SVG.
+
+    `check(svg_path)` returns a validate_svg() report; remaining issues turn
+    the result into an "invalid_svg: ..." failure.  `optimize(svg_path)`
+    returns optimize_svg() stats; the reported size is the optimized one.
+    `salvage(svg_path)` returns a salvage_svg() report for an SVG that was
+    cut off; one that is complete or closed locally counts as converted.
+    All three block on a process pool, so they run off the event loop.
+    `live_key` names the in-flight totals in `live` (default: the image name).
+    """
+    if span is None:
+        span = Span(source_name(img, cfg))
+    span.start()
+    if journal is not None:
+        journal.record(source_name(img, cfg), STATE_RUNNING, model=cfg["model"] or None)
+    on_tokens = None
+    if live is not None:
+        key = live_key or source_name(img, cfg)
+        on_tokens = lambda tokens: live.update(key, tokens)
+    result = await convert_image(img, prompt_template, cfg, on_tokens, prepared, span)
+    return await finish_output(img, result, cfg, span, check, optimize, salvage)
+
+
+async def run_batch(imgs, prompt_template, cfg, journal=None, live=None, prepared=None, spans=None,
+                    check=None, optimize=None, salvage=None):
+    """Engine entry point for a batch: like run_conversion, with one CLI call for all of `imgs`.
+
+    Returns a list of result tuples in the order of `imgs`; every SVG is
+    checked and optimized on its own.
+    """
+    spans = spans or [Span(source_name(img, cfg)) for img in imgs]
+    group = SpanGroup(spans)
+    group.start()
+    if journal is not None:
+        for img in imgs:
+            journal.record(source_name(img, cfg), STATE_RUNNING, model=cfg["model"] or None)
+    on_tokens = None
+    if live is not None:
+        on_tokens = lambda tokens: live.update(source_name(imgs[0], cfg), tokens)
+    results = await convert_batch(imgs, prompt_template, cfg, on_tokens, prepared, group)
+    return [await finish_output(img, result, cfg, span, check, optimize, salvage)
+            for img, result, span in zip(imgs, results, spans)]
+
+
+async def run_tiled(img, prompt_template, cfg, journal=None, live=None, span=None,
+                    check=None, optimize=None, split=None, stitch=None, calls=1, salvage=None):
+    """Engine entry point for a tall screenshot: convert it as bands, stitch them, then check and optimize.
+
+    `split(img)` returns a split_image() plan; each band is its own CLI call,
+    at most `calls` at a time, writing below OUTPUT_DIR/.tiles/.  A band SVG
+    left by an earlier attempt of this run is reused.  `stitch(parts, svg_path,
+    width, height)` joins the band SVGs into the image's SVG.  Returns one
+    result tuple with the tokens of all band calls; if a band fails, its error.
+    An image the plan leaves whole is converted in one call, with `salvage`
+    as in run_conversion.
+    """
+    filename = source_name(img, cfg)
+    if span is None:
+        span = Span(filename)
+    span.start()
+    if journal is not None:
+        journal.record(filename, STATE_RUNNING, model=cfg["model"] or None)
+    start = time.time()
+    with span.phase("tile"):
+        plan = await asyncio.to_thread(split, img)
+    bands = plan["bands"]
+    band_totals = [dict(NO_TOKENS) for _ in bands]
+
+    def on_tokens(number):
+        if live is None:
+            return None
+
+        def update(tokens):
+            band_totals[number] = tokens
+            live.update(filename, {key: sum(t[key] for t in band_totals) for key in NO_TOKENS})
+        return update
+
+    if not bands:
+        # No quiet row to cut at (or short after all): one call as usual
+        update = (lambda tokens: live.update(filename, tokens)) if live is not None else None
+        result = await convert_image(img, prompt_template, cfg, update, None, span)
+        return await finish_output(img, result, cfg, span, check, optimize, salvage)
+
+    band_cfg = dict(cfg, output_dir=Path(plan["dir"]))
+    gate = asyncio.Semaphore(calls)
+
+    async def convert_band(number, band):
+        band_img = Path(band["path"])
+        band_svg = output_path_for(band_img, band_cfg)
+        if svg_closed(band_svg):
+            return (band_img.name, True, 0.0, 0, None, dict(NO_TOKENS))
+        async with gate:
+            band_start = time.time()
+            with span.phase("prompt"):
+                prompt = (adapt_prompt(prompt_template, band_img, band_svg, band_cfg)
+                          + tile_note(band, number + 1, len(bands), plan["width"], plan["height"]))
+            error, tokens = await call_cli(prompt, [band_img], band_cfg,
+                                           f"{filename} band {number + 1}/{len(bands)}",
+                                           on_tokens(number), span)
+        elapsed = time.time() - band_start
+        result = (band_img.name, False, elapsed, 0, error, tokens)
+        if not error:
+            result = output_result(band_img.name, band_svg, elapsed, tokens, span)
+        if (not result[1] and cfg["salvage"] and classify_error(result[4]) in SALVAGE_ERRORS
+                and band_svg.exists()):
+            # A band closed locally is as good as a finished one: the panel is stitched from all bands
+            with span.phase("salvage"):
+                report = await asyncio.to_thread(salvage_svg, band_svg)
+            if report["state"] in (SALVAGE_COMPLETE, SALVAGE_REPAIRED):
+                result = (result[0], True, elapsed, report["size"] // 1024, None, tokens)
+        return result
+
+    results = await asyncio.gather(*(convert_band(n, band) for n, band in enumerate(bands)))
+    tokens = {key: sum(r[5][key] for r in results) for key in NO_TOKENS}
+    elapsed = time.time() - start
+    failed = next((r for r in results if not r[1]), None)
+    if failed is not None:
+        return (filename, False, elapsed, 0, failed[4], tokens)
+    output_svg = output_path_for(img, cfg)
+    parts = [(str(output_path_for(Path(band["path"]), band_cfg)), band["crop_top"]) for band in bands]
+    with span.phase("stitch"):
+        try:
+            stats = await asyncio.to_thread(stitch, parts, output_svg, plan["width"], plan["height"])
+        except ValueError as exc:
+            return (filename, False, elapsed, 0, str(exc), tokens)
+    shutil.rmtree(plan["dir"], ignore_errors=True)
+    result = (filename, True, time.time() - start, stats["size"] // 1024, None, tokens)
+    return await finish_output(img, result, cfg, span, check, optimize)
+
+
+# Failures after which the output file may hold a cut-off SVG
+SALVAGE_ERRORS = (ERR_TIMEOUT, ERR_MAX_TURNS, ERR_TRUNCATED)
+
+# Failures of the provider rather than of a batch-mate: a failed batch
+# member with one of these takes the usual retry path, not a single try
+PROVIDER_ERRORS = (ERR_AUTH, ERR_QUOTA, ERR_CLI_NOT_FOUND) + BACKPRESSURE_ERRORS
+
+
+async def finish_output(img, result, cfg, span, check=None, optimize=None, salvage=None):
+    """Salvage a cut-off SVG, then check and optimize the SVG of a successful result (see run_conversion)."""
+    if (salvage is not None and not result[1] and result[4] is not None
+            and classify_error(result[4]) in SALVAGE_ERRORS and output_path_for(img, cfg).exists()):
+        with span.phase("salvage"):
+            report = await asyncio.to_thread(salvage, output_path_for(img, cfg))
+        if report["state"] in (SALVAGE_COMPLETE, SALVAGE_REPAIRED):
+            result = (result[0], True, result[2], report["size"] // 1024, None, result[5])
+    if check is not None and result[1]:
+        with span.phase("validate"):
+            report = await asyncio.to_thread(check, output_path_for(img, cfg))
+        if report["issues"]:
+            error = f"{ERR_INVALID_SVG}: " + "; ".join(report["issues"])
+            return (result[0], False, result[2], 0, error, result[5])
+    if optimize is not None and result[1]:
+        with span.phase("optimize"):
+            stats = await asyncio.to_thread(optimize, output_path_for(img, cfg))
+        result = result[:3] + (stats["after"] // 1024,) + result[4:]
+    return result
@@ -0,0 +1,229 @@
+"""
+Perceptual-hash near-duplicate detection.
+
+Designers often export many screenshots of one screen that differ only in a
+hover state or a line of text.  Each image gets a 64-bit perceptual hash
+(dHash or pHash); images within `threshold` bits (Hamming distance) of each
+other form a cluster.  Only one representative per cluster is converted from
+scratch; the others either copy its SVG (byte-identical files, or copy mode)
+or get a short "diff against this SVG" prompt (see pipeline.prompts.DIFF_PROMPT).
+A distance of 0 does not mean identical pixels: a changed label rarely moves
+a 64-bit hash, which is why near-duplicates default to the diff prompt.
+
+PHashIndex persists the hashes of converted images together with their SVG
+paths, so screenshots also match screens converted in earlier runs.
+
+Requires Pillow (optional dependency; see pipeline.imaging.HAVE_PIL).
+"""
+
+import os
+import json
+import math
+import time
+import concurrent.futures
+from pathlib import Path
+
+from .imaging import Image
+
+HASH_DHASH = "dhash"
+HASH_PHASH = "phash"
+
+PHASH_SIZE = 32   # image is reduced to 32x32 before the DCT
+PHASH_LOW = 8     # top-left 8x8 DCT coefficients form the hash
+
+
+# -- Hash functions (run in worker processes) ------------------------------------
+
+def dhash(path):
+    """Difference hash: compare horizontally adjacent pixels of a 9x8 thumbnail."""
+    with Image.open(path) as im:
+        small = im.convert("L").resize((9, 8), Image.LANCZOS)
+        px = list(small.tobytes())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | (px[row * 9 + col] > px[row * 9 + col + 1])
+    return value
+
+
+def _dct_1d(values):
+    n = len(values)
+    return [
+        sum(v * math.cos(math.pi * (2 * i + 1) * k / (2 * n)) for i, v in enumerate(values))
+        for k in range(n)
+    ]
+
+
+def phash(path):
+    """DCT hash: low-frequency 8x8 DCT coefficients compared with their median."""
+    with Image.open(path) as im:
+        small = im.convert("L").resize((PHASH_SIZE, PHASH_SIZE), Image.LANCZOS)
+        px = list(small.tobytes())
+    rows = [_dct_1d(px[r * PHASH_SIZE:(r + 1) * PHASH_SIZE]) for r in range(PHASH_SIZE)]
+    # Only the first PHASH_LOW columns are needed from the column pass
+    cols = [_dct_1d([rows[r][c] for r in range(PHASH_SIZE)])[:PHASH_LOW] for c in range(PHASH_LOW)]
+    coeffs = [cols[c][r] for r in range(PHASH_LOW) for c in range(PHASH_LOW)]
+    median = sorted(coeffs[1:])[len(coeffs[1:]) // 2]  # skip the DC term
+    value = 0
+    for c in coeffs:
+        value = (value << 1) | (c > median)
+    return value
+
+
+def compute_hash(path, method):
+    """Return the perceptual hash of `path`, or None if the image cannot be read."""
+    try:
+        return phash(path) if method == HASH_PHASH else dhash(path)
+    except (OSError, ValueError):
+        return None
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+# -- BK-tree (metric tree for Hamming distance queries) ---------------------------
+
+class BKTree:
+    """Finds all stored hashes within a Hamming distance without a full scan."""
+
+    def __init__(self):
+        self._root = None  # [hash, item, {distance: child}]
+
+    def add(self, h, item):
+        if self._root is None:
+            self._root = [h, item, {}]
+            return
+        node = self._root
+        while True:
+            d = hamming(h, node[0])
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [h, item, {}]
+                return
+            node = child
+
+    def query(self, h, max_dist):
+        """Return [(distance, item)] sorted by distance."""
+        found = []
+        stack = [self._root] if self._root else []
+        while stack:
+            node = stack.pop()
+            d = hamming(h, node[0])
+            if d <= max_dist:
+                found.append((d, node[1]))
+            for edge, child in node[2].items():
+                if d - max_dist <= edge <= d + max_dist:
+                    stack.append(child)
+        found.sort(key=lambda pair: pair[0])
+        return found
+
+
+def cluster(hashed, threshold):
+    """
+    Greedy leader clustering of [(item, hash)] in input order.
+
+    Returns [(representative, [(member, distance), ...])].  Each item joins
+    the closest earlier representative within `threshold`, else founds a
+    new cluster.
+    """
+    tree = BKTree()
+    clusters = {}
+    order = []
+    for item, h in hashed:
+        matches = tree.query(h, threshold)
+        if matches:
+            dist, rep = matches[0]
+            clusters[rep].append((item, dist))
+        else:
+            tree.add(h, item)
+            clusters[item] = []
+            order.append(item)
+    return [(rep, clusters[rep]) for rep in order]
+
+
+# -- Persistent index ---------------------------------------------------------------
+
+class PHashIndex:
+    """
+    JSON-backed index of converted images: perceptual hash -> SVG path.
+
+    Also caches hashes by (path, size, mtime) so unchanged inputs are not
+    decoded again on the next run.
+    """
+
+    def __init__(self, path, method):
+        self.path = Path(path)
+        self.method = method
+        self.entries = []      # [{"hash", "image", "digest", "svg", "ts"}]
+        self._hash_cache = {}  # "path|size|mtime_ns" -> hex hash
+        self._seen = set()
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            if data.get("method") == method:
+                self.entries = data.get("entries", [])
+                self._hash_cache = data.get("hashes", {})
+        except (OSError, ValueError):
+            pass
+        self._tree = BKTree()
+        for entry in self.entries:
+            self._tree.add(int(entry["hash"], 16), entry)
+
+    @staticmethod
+    def _stat_key(img):
+        st = os.stat(img)
+        return f"{img}|{st.st_size}|{st.st_mtime_ns}"
+
+    def hash_images(self, images):
+        """Return {img: hash} for `images`, hashing cache misses in a process pool."""
+        result = {}
+        misses = []
+        for img in images:
+            try:
+                key = self._stat_key(img)
+            except OSError:
+                continue
+            self._seen.add(key)
+            if key in self._hash_cache:
+                result[img] = int(self._hash_cache[key], 16)
+            else:
+                misses.append((img, key))
+        if len(misses) == 1:  # watch mode: not worth starting a pool
+            img, key = misses[0]
+            h = compute_hash(str(img), self.method)
+            if h is not None:
+                result[img] = h
+                self._hash_cache[key] = f"{h:016x}"
+        elif misses:
+            with concurrent.futures.ProcessPoolExecutor() as pool:
+                hashes = pool.map(compute_hash, [str(img) for img, _ in misses],
+                                  [self.method] * len(misses), chunksize=8)
+                for (img, key), h in zip(misses, hashes):
+                    if h is not None:
+                        result[img] = h
+                        self._hash_cache[key] = f"{h:016x}"
+        return result
+
+    def nearest(self, h, threshold):
+        """Return (distance, entry) for the closest earlier conversion whose SVG still exists."""
+        for dist, entry in self._tree.query(h, threshold):
+            if Path(entry["svg"]).exists():
+                return dist, entry
+        return None
+
+    def add(self, h, image, digest, svg):
+        """Record a finished conversion; `digest` is the SHA-256 of the source image."""
+        entry = {"hash": f"{h:016x}", "image": image, "digest": digest, "svg": str(svg),
+                 "ts": time.time()}
+        self.entries.append(entry)
+        self._tree.add(h, entry)
+
+    def save(self):
+        """Write the index, dropping entries whose SVG is gone and stale hash-cache keys."""
+        self.entries = [e for e in self.entries if Path(e["svg"]).exists()]
+        hashes = {k: v for k, v in self._hash_cache.items() if k in self._seen}
+        data = {"method": self.method, "entries": self.entries, "hashes": hashes}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(f".{os.getpid()}.tmp")  # shard workers share the index
+        tmp.write_text(json.dumps(data), encoding="utf-8")
+        os.replace(tmp, self.path)
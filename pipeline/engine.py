@@ -0,0 +1,69 @@
+"""
+Asyncio conversion engine.
+
+AsyncEngine runs an event loop in a background thread.  The orchestrator
+(ConversionRun in pipeline/run.py, a plain synchronous loop) submits one coroutine per CLI call
+and gets back a concurrent.futures.Future, so it keeps waiting on
+completions with concurrent.futures.wait().  An in-flight conversion is a
+task on the loop, not a pinned worker thread: thousands of queued images
+cost nothing until they are submitted, and a running one costs a task and
+its child process.
+
+Cancelling a future (cancel(), or cancel_all() for a whole run) cancels its
+task; pipeline.streaming then kills the CLI's process tree before the task
+ends.  close() cancels whatever is left and waits until every child is gone.
+"""
+
+import asyncio
+import threading
+
+CLOSE_TIMEOUT = 10.0  # seconds close() waits for cancelled tasks to reap their children
+
+
+class AsyncEngine:
+    """An event loop in a daemon thread that runs conversion coroutines."""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name="conversion-engine", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        """Schedule `coro` on the loop; returns a concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run_sync(self, func, *args):
+        """Run a blocking `func` off the loop (default executor); returns a Future."""
+        return self.submit(asyncio.to_thread(func, *args))
+
+    def cancel(self, future):
+        """Cancel one submitted conversion; its CLI process tree is killed."""
+        return future.cancel()
+
+    def cancel_all(self, futures):
+        """Cancel every future in `futures`.  Returns how many were still running."""
+        return sum(self.cancel(f) for f in list(futures))
+
+    async def _drain(self):
+        tasks = [t for t in asyncio.all_tasks(self.loop) if t is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.loop.shutdown_default_executor()
+
+    def close(self):
+        """Cancel anything still running, wait for the children to die, stop the loop."""
+        if self.loop.is_closed():
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._drain(), self.loop).result(CLOSE_TIMEOUT)
+        except Exception:
+            pass  # best effort; the thread is a daemon
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(CLOSE_TIMEOUT)
+        if not self._thread.is_alive():
+            self.loop.close()
@@ -0,0 +1,61 @@
+"""
+Classification of CLI failures.
+
+convert_image() reports failures as short free-text strings (stderr excerpts,
+Codex JSONL error messages, or the sentinels "timeout" / "max_turns" /
+"truncated_svg" / "cli_not_found" / "cancelled");
+run_conversion() adds "invalid_svg: <issues>" for outputs that fail validation.
+classify_error() maps them onto a small set of classes that the scheduler
+and retry logic can act on.
+"""
+
+ERR_RATE_LIMIT = "rate_limit"      # 429 / too many requests
+ERR_OVERLOADED = "overloaded"      # 529 / 503 / server overloaded
+ERR_AUTH = "auth"                  # 401 / 403 / not logged in
+ERR_QUOTA = "quota"                # billing / credit / usage cap reached
+ERR_TIMEOUT = "timeout"            # subprocess exceeded cfg["timeout"]
+ERR_MAX_TURNS = "max_turns"        # Claude stopped at --max-turns before it was done
+ERR_TRUNCATED = "truncated_svg"    # SVG written without its closing </svg> (pipeline/salvage.py)
+ERR_CLI_NOT_FOUND = "cli_not_found"
+ERR_EMPTY_OUTPUT = "empty_output"  # CLI exited but no SVG was written
+ERR_INVALID_SVG = "invalid_svg"    # SVG written but fails validation (pipeline/svgcheck.py)
+ERR_CANCELLED = "cancelled"        # stopped by the engine (shutdown), not a failure
+ERR_OTHER = "other"
+
+# Lower-cased substrings checked in order; first match wins.
+_PATTERNS = (
+    (ERR_QUOTA, ("insufficient_quota", "quota exceeded", "exceeded your current quota",
+                 "credit balance", "billing", "usage limit")),
+    (ERR_RATE_LIMIT, ("429", "rate limit", "rate_limit", "ratelimit", "too many requests")),
+    (ERR_OVERLOADED, ("529", "503", "overloaded", "server is busy", "capacity",
+                      "service unavailable")),
+    (ERR_AUTH, ("401", "403", "unauthorized", "forbidden", "authentication",
+                "invalid api key", "invalid_api_key", "not logged in", "please log in",
+                "/login")),
+)
+
+# Failures that mean "the provider wants us to slow down"
+BACKPRESSURE_ERRORS = (ERR_RATE_LIMIT, ERR_OVERLOADED)
+
+
+def classify_error(error):
+    """Return the ERR_* class for a convert_image() error value (None = no SVG written)."""
+    if error is None:
+        return ERR_EMPTY_OUTPUT
+    if error == "timeout":
+        return ERR_TIMEOUT
+    if error == ERR_MAX_TURNS:
+        return ERR_MAX_TURNS
+    if error.startswith(ERR_TRUNCATED):
+        return ERR_TRUNCATED
+    if error == "cli_not_found":
+        return ERR_CLI_NOT_FOUND
+    if error == ERR_CANCELLED:
+        return ERR_CANCELLED
+    if error.startswith(ERR_INVALID_SVG):
+        return ERR_INVALID_SVG
+    text = error.lower()
+    for err_class, needles in _PATTERNS:
+        if any(n in text for n in needles):
+            return err_class
+    return ERR_OTHER
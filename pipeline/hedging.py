@@ -0,0 +1,73 @@
+"""
+Hedged attempts for straggling conversions.
+
+With HEDGE=1 a conversion that has been running longer than the
+HEDGE_PERCENTILE of this run's finished conversion times gets a second
+attempt on the next free slot.  Every attempt that may be hedged writes
+its SVG to a directory of its own below OUTPUT_DIR/.hedge/, so the two
+attempts never write the same file.  Whichever finishes first with a valid
+SVG wins: its SVG is moved into OUTPUT_DIR, and the other attempt is
+cancelled (its CLI process tree is killed).  A loser still being killed, or
+its post-processing job, can only touch its own file.  If one attempt fails
+while the other is still running, the other one carries on alone.
+
+Hedges take provider slots like any attempt, and at most HEDGE_MAX_SHARE
+of the run's total concurrency (at least one) are in flight at a time.
+Only single-image attempts are hedged: no batches, copies or fix prompts
+(those edit the SVG in OUTPUT_DIR in place).  Nothing is hedged until
+MIN_SAMPLES conversions have finished, so the threshold reflects this run.
+
+The tokens of the losing attempts are reported as the extra cost; in
+streaming mode that includes what a cancelled attempt used before it was
+killed.
+"""
+
+import bisect
+import shutil
+
+from .metrics import percentile
+
+HEDGE_DIR_NAME = ".hedge"
+HEDGE_LIVE_SUFFIX = " (hedge)"   # in-flight token key of a hedge, next to its primary's
+MIN_SAMPLES = 5
+
+
+class HedgePolicy:
+    """When to hedge, how many hedges may run, and what they cost."""
+
+    def __init__(self, quantile=0.9, max_share=0.1, min_samples=MIN_SAMPLES):
+        self.quantile = quantile
+        self.max_share = max_share
+        self.min_samples = min_samples
+        self.latencies = []      # finished single-image conversion times, sorted
+        self.started = 0
+        self.won = 0
+        self.extra_tokens = 0
+        self.extra_cost = 0.0
+
+    @property
+    def label(self):
+        return f"p{self.quantile * 100:g}"
+
+    def observe(self, elapsed):
+        bisect.insort(self.latencies, elapsed)
+
+    def threshold(self):
+        """Seconds after which a running conversion is hedged; None until enough have finished."""
+        if len(self.latencies) < self.min_samples:
+            return None
+        return percentile(self.latencies, self.quantile)
+
+    def limit(self, capacity):
+        """Hedges allowed in flight with `capacity` concurrent slots in total."""
+        return max(1, int(capacity * self.max_share))
+
+    def wasted(self, tokens):
+        """Count the tokens of an attempt that lost (or failed next to the one that stood in)."""
+        self.extra_tokens += tokens.get("total", 0)
+        self.extra_cost += tokens.get("cost_usd", 0.0)
+
+
+def clear_hedge_dir(output_dir):
+    """Remove the hedges' temporary SVGs (losers killed mid-write may have left some)."""
+    shutil.rmtree(output_dir / HEDGE_DIR_NAME, ignore_errors=True)
@@ -0,0 +1,239 @@
+"""
+Persistent run history (SQLite).
+
+Every finished conversion attempt is stored with its provider, model, image
+size, elapsed time, tokens, cost, outcome and attempt number, plus one row
+per run.  The history feeds:
+
+  - the pre-run estimate: per-model p50/p90 of past conversion times, scaled
+    by each image's size relative to the sizes seen before,
+  - EtaEstimator: a live ETA and projected cost that start from that prior
+    and move towards this run's own completions,
+  - `convert.py stats`: per-model performance and per-run throughput/cost,
+  - the queue order: pipeline.scheduling.CostModel predicts each image's
+    time from past conversions of similar size.
+
+Tables:
+    runs         id, started, ended, providers, models, images, converted,
+                 failed, tokens, cost_usd
+    conversions  id, run_id, ts, image, provider, model, width, height,
+                 elapsed, tokens, cost_usd, success, error_class, attempt
+
+Written from the orchestrating thread only; rows are committed in batches.
+"""
+
+import time
+import sqlite3
+from pathlib import Path
+
+from .metrics import percentile
+
+SCHEMA_VERSION = 1
+PROFILE_SAMPLES = 500     # most recent successes per model used for estimates
+MIN_SAMPLES = 5           # fewer than this: fall back to the static table
+SIZE_EXPONENT = 0.5       # conversion time grows ~ sqrt(pixels) (tokens are capped)
+SIZE_FACTOR_RANGE = (0.5, 2.0)
+ETA_PRIOR_WEIGHT = 5      # the prior counts as this many completions
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id          INTEGER PRIMARY KEY,
+    started     REAL NOT NULL,
+    ended       REAL,
+    providers   TEXT,
+    models      TEXT,
+    images      INTEGER,
+    converted   INTEGER,
+    failed      INTEGER,
+    tokens      INTEGER,
+    cost_usd    REAL
+);
+CREATE TABLE IF NOT EXISTS conversions (
+    id          INTEGER PRIMARY KEY,
+    run_id      INTEGER REFERENCES runs(id),
+    ts          REAL NOT NULL,
+    image       TEXT,
+    provider    TEXT,
+    model       TEXT,
+    width       INTEGER,
+    height      INTEGER,
+    elapsed     REAL,
+    tokens      INTEGER,
+    cost_usd    REAL,
+    success     INTEGER,
+    error_class TEXT,
+    attempt     INTEGER
+);
+CREATE INDEX IF NOT EXISTS conversions_model ON conversions(provider, model, success, ts);
+"""
+
+
+def megapixels(width, height):
+    return (width or 0) * (height or 0) / 1e6
+
+
+class RunHistory:
+    """SQLite-backed store of runs and conversion attempts."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path))
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._db.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        self._pending = []
+
+    # -- Writing ---------------------------------------------------------------
+
+    def start_run(self, providers, models, images):
+        cur = self._db.execute(
+            "INSERT INTO runs (started, providers, models, images) VALUES (?, ?, ?, ?)",
+            (time.time(), ",".join(providers), ",".join(m for m in models if m), images))
+        self._db.commit()
+        return cur.lastrowid
+
+    def record(self, run_id, image, provider, model, size, elapsed, tokens, success,
+               error_class=None, attempt=1):
+        """Queue one finished attempt; written on the next flush()."""
+        width, height = size or (None, None)
+        self._pending.append((
+            run_id, time.time(), image, provider, model or "", width, height, elapsed,
+            tokens.get("total", 0), tokens.get("cost_usd", 0.0), int(bool(success)),
+            error_class, attempt))
+
+    def flush(self):
+        if not self._pending:
+            return
+        self._db.executemany(
+            "INSERT INTO conversions (run_id, ts, image, provider, model, width, height, elapsed,"
+            " tokens, cost_usd, success, error_class, attempt)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", self._pending)
+        self._db.commit()
+        self._pending.clear()
+
+    def end_run(self, run_id, images, converted, failed, tokens, cost_usd):
+        self.flush()
+        self._db.execute(
+            "UPDATE runs SET ended = ?, images = ?, converted = ?, failed = ?, tokens = ?,"
+            " cost_usd = ? WHERE id = ?",
+            (time.time(), images, converted, failed, tokens, cost_usd, run_id))
+        self._db.commit()
+
+    def close(self):
+        self.flush()
+        self._db.close()
+
+    # -- Estimates -------------------------------------------------------------
+
+    def profile(self, provider, model):
+        """
+        Performance profile of `model` from its recent successes, or None
+        with fewer than MIN_SAMPLES.  Keys: count, p50, p90 (seconds),
+        megapixels (median image size), cost_usd and tokens (mean per image).
+        """
+        rows = self._db.execute(
+            "SELECT elapsed, width, height, cost_usd, tokens FROM conversions"
+            " WHERE provider = ? AND model = ? AND success = 1 ORDER BY ts DESC LIMIT ?",
+            (provider, model or "", PROFILE_SAMPLES)).fetchall()
+        if len(rows) < MIN_SAMPLES:
+            return None
+        elapsed = sorted(r[0] for r in rows)
+        sizes = sorted(megapixels(r[1], r[2]) for r in rows)
+        return {
+            "count": len(rows),
+            "p50": percentile(elapsed, 0.5),
+            "p90": percentile(elapsed, 0.9),
+            "megapixels": percentile(sizes, 0.5),
+            "cost_usd": sum(r[3] for r in rows) / len(rows),
+            "tokens": sum(r[4] for r in rows) / len(rows),
+        }
+
+    def samples(self, provider, model):
+        """(width, height, elapsed) of `model`'s most recent successes, for per-size estimates."""
+        return self._db.execute(
+            "SELECT width, height, elapsed FROM conversions"
+            " WHERE provider = ? AND model = ? AND success = 1 ORDER BY ts DESC LIMIT ?",
+            (provider, model or "", PROFILE_SAMPLES)).fetchall()
+
+    # -- Reports (`convert.py stats`) ------------------------------------------
+
+    def model_stats(self, since):
+        """Per (provider, model) totals and percentiles for attempts after `since`."""
+        rows = self._db.execute(
+            "SELECT provider, model, elapsed, tokens, cost_usd, success FROM conversions"
+            " WHERE ts >= ? ORDER BY provider, model", (since,)).fetchall()
+        groups = {}
+        for provider, model, elapsed, tokens, cost, success in rows:
+            groups.setdefault((provider, model), []).append((elapsed, tokens, cost, success))
+        stats = []
+        for (provider, model), attempts in groups.items():
+            ok = [a for a in attempts if a[3]]
+            times = sorted(a[0] for a in ok)
+            stats.append({
+                "provider": provider,
+                "model": model,
+                "attempts": len(attempts),
+                "converted": len(ok),
+                "p50": percentile(times, 0.5),
+                "p90": percentile(times, 0.9),
+                "tokens": sum(a[1] for a in attempts) / max(len(ok), 1),
+                "cost_usd": sum(a[2] for a in attempts) / max(len(ok), 1),
+            })
+        return stats
+
+    def recent_runs(self, limit):
+        """The last `limit` finished runs, newest first."""
+        rows = self._db.execute(
+            "SELECT id, started, ended, providers, models, images, converted, failed, tokens, cost_usd"
+            " FROM runs WHERE ended IS NOT NULL ORDER BY started DESC LIMIT ?", (limit,)).fetchall()
+        keys = ("id", "started", "ended", "providers", "models", "images", "converted",
+                "failed", "tokens", "cost_usd")
+        return [dict(zip(keys, row)) for row in rows]
+
+
+def size_factor(profile, size):
+    """How much longer than the profile's median an image of `size` should take."""
+    if not size or not profile["megapixels"]:
+        return 1.0
+    ratio = (megapixels(*size) / profile["megapixels"]) ** SIZE_EXPONENT
+    low, high = SIZE_FACTOR_RANGE
+    return min(high, max(low, ratio))
+
+
+class EtaEstimator:
+    """
+    Live ETA and projected cost.
+
+    The per-image time and cost start at the prior (history p50, or the
+    static estimate) and are blended with this run's completions, the prior
+    counting as ETA_PRIOR_WEIGHT of them.
+    """
+
+    def __init__(self, prior_seconds, prior_cost=None):
+        self.prior_seconds = prior_seconds
+        self.prior_cost = prior_cost
+        self.count = 0
+        self.seconds = 0.0
+        self.cost_usd = 0.0
+
+    def add(self, elapsed, cost_usd):
+        self.count += 1
+        self.seconds += elapsed
+        self.cost_usd += cost_usd
+
+    def per_image(self):
+        seconds = (self.prior_seconds * ETA_PRIOR_WEIGHT + self.seconds) / (ETA_PRIOR_WEIGHT + self.count)
+        if self.prior_cost is None:
+            cost = self.cost_usd / self.count if self.count else None
+        else:
+            cost = (self.prior_cost * ETA_PRIOR_WEIGHT + self.cost_usd) / (ETA_PRIOR_WEIGHT + self.count)
+        return seconds, cost
+
+    def eta(self, remaining, parallel):
+        """Seconds until `remaining` images are done with `parallel` in flight."""
+        if remaining <= 0:
+            return 0.0
+        seconds, _ = self.per_image()
+        return seconds * remaining / max(1, min(parallel, remaining))
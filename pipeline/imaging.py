@@ -0,0 +1,125 @@
+"""
+Image helpers.
+
+image_size() reads pixel dimensions straight from file headers (PNG, JPEG,
+GIF, BMP, WEBP) with the standard library only.  Anything that needs decoded
+pixels uses Pillow, which is optional: check HAVE_PIL before calling those
+code paths.
+"""
+
+import math
+import struct
+
+from config.constants import PROVIDER_CLAUDE, PROVIDER_CODEX
+
+try:
+    from PIL import Image  # noqa: F401  (optional dependency)
+    HAVE_PIL = True
+except ImportError:  # pragma: no cover - depends on the environment
+    Image = None
+    HAVE_PIL = False
+
+
+# -- Header parsing ------------------------------------------------------------
+
+def _png_size(head):
+    if head[:8] == b"\x89PNG\r\n\x1a\n" and head[12:16] == b"IHDR":
+        return struct.unpack(">II", head[16:24])
+    return None
+
+
+def _gif_size(head):
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return struct.unpack("<HH", head[6:10])
+    return None
+
+
+def _bmp_size(head):
+    if head[:2] == b"BM" and len(head) >= 26:
+        w, h = struct.unpack("<ii", head[18:26])
+        return w, abs(h)
+    return None
+
+
+def _webp_size(head):
+    if head[:4] != b"RIFF" or head[8:12] != b"WEBP":
+        return None
+    chunk = head[12:16]
+    if chunk == b"VP8X":
+        w = int.from_bytes(head[24:27], "little") + 1
+        h = int.from_bytes(head[27:30], "little") + 1
+        return w, h
+    if chunk == b"VP8L":
+        bits = int.from_bytes(head[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8 ":
+        w, h = struct.unpack("<HH", head[26:30])
+        return w & 0x3FFF, h & 0x3FFF
+    return None
+
+
+def _jpeg_size(f):
+    f.seek(2)
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        code = marker[1]
+        if code in (0xD8, 0x01) or 0xD0 <= code <= 0xD7:
+            continue  # markers without a length field
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            return None
+        length = struct.unpack(">H", length_bytes)[0]
+        # SOF0..SOF15 except DHT (C4), JPG (C8), DAC (CC)
+        if 0xC0 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):
+            data = f.read(5)
+            h, w = struct.unpack(">HH", data[1:5])
+            return w, h
+        f.seek(length - 2, 1)
+
+
+def image_size(path):
+    """Return (width, height) from the file header, or None if unknown."""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(32)
+            for parse in (_png_size, _gif_size, _bmp_size, _webp_size):
+                size = parse(head)
+                if size:
+                    return size
+            if head[:2] == b"\xff\xd8":
+                return _jpeg_size(f)
+    except (OSError, struct.error):
+        pass
+    return None
+
+
+# -- Token estimates -------------------------------------------------------------
+
+CLAUDE_MAX_EDGE = 1568         # Claude downsizes larger images before encoding
+CLAUDE_PIXELS_PER_TOKEN = 750
+OPENAI_TILE = 512
+OPENAI_BASE_TOKENS = 85
+OPENAI_TILE_TOKENS = 170
+
+
+def estimate_image_tokens(width, height, provider=PROVIDER_CLAUDE):
+    """
+    Rough input-token cost of one image for a provider's vision encoder.
+
+    Claude: ~(w * h) / 750 after scaling the long edge down to 1568px.
+    Codex/OpenAI: 85 + 170 per 512px tile after fitting 2048x2048 and
+    scaling the short side to 768px.
+    """
+    if not width or not height:
+        return 0
+    if provider == PROVIDER_CODEX:
+        scale = min(1.0, 2048 / max(width, height))
+        w, h = width * scale, height * scale
+        scale = min(1.0, 768 / min(w, h))
+        w, h = w * scale, h * scale
+        tiles = math.ceil(w / OPENAI_TILE) * math.ceil(h / OPENAI_TILE)
+        return OPENAI_BASE_TOKENS + OPENAI_TILE_TOKENS * tiles
+    scale = min(1.0, CLAUDE_MAX_EDGE / max(width, height))
+    return int(width * scale * height * scale / CLAUDE_PIXELS_PER_TOKEN)
@@ -0,0 +1,112 @@
+"""
+Crash-safe run journal.
+
+Each run appends one JSON object per line to `<journal_dir>/run-<stamp>.jsonl`
+(`run-<stamp>@<worker>.jsonl` for a shard worker) and fsyncs after every
+write, so a killed process still leaves an accurate record of which images
+were queued, running, done or failed.  `replay()`
+folds the log back into the last known state per image for `--resume`.
+
+States:
+    queued    image was accepted into the run
+    running   a worker picked the image up (output may be partial)
+    done      SVG written and validated; carries the result tuple + tokens
+    failed    conversion finished unsuccessfully; carries the result tuple
+"""
+
+import os
+import json
+import time
+import threading
+from pathlib import Path
+
+STATE_QUEUED = "queued"
+STATE_RUNNING = "running"
+STATE_DONE = "done"
+STATE_FAILED = "failed"
+
+
+def new_journal_path(journal_dir, worker=None):
+    """Return a fresh journal path for a run starting now (`worker`: a shard's own name)."""
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    owner = f"@{worker}" if worker else ""
+    path = Path(journal_dir) / f"run-{stamp}{owner}.jsonl"
+    n = 1
+    while path.exists():
+        n += 1  # before the worker name, which must stay the end of the file name
+        path = Path(journal_dir) / f"run-{stamp}-{n}{owner}.jsonl"
+    return path
+
+
+def latest_journal(journal_dir, worker=None):
+    """Return the most recently modified journal in `journal_dir` (of `worker`), or None."""
+    journals = Path(journal_dir).glob("run-*.jsonl")
+    if worker:
+        # Exact match: worker "host-1" must not pick up "host-12"'s journal
+        journals = (p for p in journals if p.name.rpartition("@")[2] == f"{worker}.jsonl")
+    journals = sorted(journals, key=lambda p: p.stat().st_mtime)
+    return journals[-1] if journals else None
+
+
+def replay(path):
+    """
+    Read a journal and return {image: last entry}.
+
+    A truncated final line (the process died mid-write) is ignored.
+    """
+    states = {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                image = entry.get("image")
+                if image:
+                    states[image] = entry
+    except OSError:
+        pass
+    return states
+
+
+class RunJournal:
+    """Append-only, fsync'd JSONL journal.  Safe to call from worker threads."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+
+    def _append(self, entry):
+        line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            if self._fd is None:
+                return
+            os.write(self._fd, line)
+            os.fsync(self._fd)
+
+    def event(self, kind, **fields):
+        """Record a run-level event (start, resume, end)."""
+        self._append({"ts": time.time(), "event": kind, **fields})
+
+    def record(self, image, state, result=None, **fields):
+        """
+        Record a state transition for one image.
+
+        `result` is the convert_image() tuple; its tokens dict is also
+        stored at the top level for easy querying.
+        """
+        entry = {"ts": time.time(), "image": image, "state": state}
+        if result is not None:
+            entry["result"] = list(result)
+            entry["tokens"] = result[5]
+        entry.update(fields)
+        self._append(entry)
+
+    def close(self):
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
@@ -0,0 +1,294 @@
+"""
+Sharing one input folder between several converter processes.
+
+With SHARD=1 any number of `convert.py` instances (on other hosts over a
+shared filesystem, or under other accounts) can work through the same
+INPUT_DIR.  A worker claims an image by renaming it into its own lease
+directory, `INPUT_DIR/.leases/<worker>/` (an image in a subfolder keeps
+its relative path there); rename is atomic, so exactly one worker wins each
+image and the others see it vanish.  Claims are made a few at a time as
+slots free up, so fast workers take more of the folder.
+
+A background thread rewrites `<worker>/heartbeat.json` every
+LEASE_HEARTBEAT seconds.  A worker whose heartbeat is older than LEASE_TTL
+is presumed dead: whoever notices first renames its whole lease directory
+aside (again atomic, so only one worker reclaims it) and moves its images
+back into INPUT_DIR for anyone to claim.
+
+Archiving a converted image is an idempotent commit (commit_file()): the
+archive copy is created exclusively (a hard link, so it never overwrites
+another image of the same name) and only then is the source removed; "already
+there, source gone" counts as done, so a crash between the two steps never
+loses or double-archives an image.  At the end of a run, images the worker
+still holds (not started, or failed) go back to INPUT_DIR under their own
+names; one whose name a newer drop has taken waits in a `.parked-*`
+directory until the next reclaim.
+
+A worker only loses a lease if its heartbeat stalls for longer than
+LEASE_TTL; it then finds the lease file gone and drops the image instead
+of converting it again.
+"""
+
+import os
+import json
+import time
+import errno
+import shutil
+import filecmp
+import socket
+import tempfile
+import threading
+from pathlib import Path
+
+from .scan import walk_files
+
+LEASE_DIR_NAME = ".leases"
+HEARTBEAT_FILE = "heartbeat.json"
+RECLAIM_PREFIX = ".reclaim-"   # a dead worker's directory while it is being emptied
+PARKED_PREFIX = ".parked-"     # returned images whose name a newer drop has taken
+NO_LINK_ERRNOS = {errno.EXDEV, errno.EPERM, errno.ENOTSUP, errno.EOPNOTSUPP, errno.ENOSYS}
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def _same_file(a, b):
+    """True if `a` and `b` are the same file, or hold the same bytes."""
+    try:
+        if os.path.samefile(a, b):
+            return True
+        return os.path.getsize(a) == os.path.getsize(b) and filecmp.cmp(a, b, shallow=False)
+    except OSError:
+        return False
+
+
+def _link(src, dst):
+    """
+    Create `dst` as a copy of `src` that is complete the moment it appears;
+    raises FileExistsError instead of touching an existing `dst`.
+    """
+    try:
+        os.link(src, dst)
+        return
+    except OSError as exc:
+        if exc.errno not in NO_LINK_ERRNOS:
+            raise
+        cross_device = exc.errno == errno.EXDEV
+    if cross_device:
+        # Other filesystem: copy under a temporary name next to `dst`, then link that
+        tmp = dst.with_name(f".{dst.name}.{os.getpid()}.tmp")
+        shutil.copy2(src, tmp)
+        try:
+            os.link(tmp, dst)
+        finally:
+            os.unlink(tmp)
+        return
+    # No hard links on this filesystem: rename, with only a check against overwriting
+    if dst.exists():
+        raise FileExistsError(errno.EEXIST, "target exists", str(dst))
+    os.rename(src, dst)
+
+
+def commit_file(src, dst, replace=False):
+    """
+    Move `src` to `dst`, idempotently.  An existing `dst` is never
+    overwritten (unless `replace`): if it holds another file, `src` goes to
+    the first free `<stem>-N<suffix>` beside it.  Returns the path that holds
+    the file afterwards (moved now, or by an earlier attempt), None if `src`
+    is gone and was never committed.
+    """
+    src, dst = Path(src), Path(dst)
+    if replace:
+        try:
+            os.replace(src, dst)
+            return dst
+        except FileNotFoundError:
+            return dst if dst.exists() else None
+        except OSError as exc:
+            if exc.errno != errno.EXDEV:
+                raise
+        tmp = dst.with_name(f".{dst.name}.{os.getpid()}.tmp")
+        try:
+            shutil.copy2(src, tmp)
+        except FileNotFoundError:
+            return dst if dst.exists() else None
+        os.replace(tmp, dst)
+    else:
+        target, n = dst, 1
+        while True:
+            try:
+                _link(src, target)
+                break
+            except FileNotFoundError:
+                return dst if dst.exists() else None
+            except FileExistsError:
+                if _same_file(src, target):
+                    break  # committed by an attempt that crashed before removing `src`
+                n += 1
+                target = dst.with_name(f"{dst.stem}-{n}{dst.suffix}")
+        dst = target
+    try:
+        os.unlink(src)
+    except FileNotFoundError:
+        pass
+    return dst
+
+
+def _leased_files(directory):
+    """Images in a lease directory (its heartbeat and temporary files excluded)."""
+    heartbeat = directory / HEARTBEAT_FILE
+    return [p for p in walk_files(directory) if p != heartbeat]
+
+
+def _return_to(folder, path, base, root):
+    """
+    Move leased `path` (below `base`) back into `folder` under its own name.
+    If a newer drop already took that name, park the image in a fresh
+    directory under `root` instead: it has no heartbeat, so it is reclaimed
+    (and returned again) after LEASE_TTL.  True if it went back to `folder`.
+    """
+    rel = path.relative_to(base)
+    target = folder / rel
+    try:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        _link(path, target)
+    except FileExistsError:
+        pass
+    except OSError:
+        return False
+    else:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass  # renamed rather than linked
+        return True
+    try:
+        parked = Path(tempfile.mkdtemp(prefix=PARKED_PREFIX, dir=root)) / rel
+        parked.parent.mkdir(parents=True, exist_ok=True)
+        os.rename(path, parked)
+    except OSError:
+        pass
+    return False
+
+
+class LeaseManager:
+    """One worker's leases in a shared input folder."""
+
+    def __init__(self, input_dir, worker_id=None, ttl=120.0, heartbeat=10.0):
+        self.input_dir = Path(input_dir)
+        self.root = self.input_dir / LEASE_DIR_NAME
+        self.worker_id = worker_id or default_worker_id()
+        self.dir = self.root / self.worker_id
+        self.ttl = ttl
+        self.interval = heartbeat
+        self.claimed = 0
+        self.reclaimed = 0
+        self.released = 0
+        self.lost = 0
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self._beat()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="lease-heartbeat", daemon=True)
+        self._thread.start()
+
+    # -- Heartbeat -------------------------------------------------------------
+
+    def _beat(self):
+        data = {"worker": self.worker_id, "host": socket.gethostname(), "pid": os.getpid(),
+                "ts": time.time()}
+        self.dir.mkdir(parents=True, exist_ok=True)  # recreated if it was reclaimed
+        tmp = self.dir / f".{HEARTBEAT_FILE}.tmp"
+        tmp.write_text(json.dumps(data), encoding="utf-8")
+        os.replace(tmp, self.dir / HEARTBEAT_FILE)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self._beat()
+            except OSError:
+                pass  # shared folder briefly unavailable; the next beat retries
+
+    @staticmethod
+    def last_beat(directory):
+        """Time of a lease directory's last heartbeat (its mtime if it never wrote one)."""
+        try:
+            data = json.loads((directory / HEARTBEAT_FILE).read_text(encoding="utf-8"))
+            return float(data["ts"])
+        except (OSError, ValueError, KeyError, TypeError):
+            try:
+                return directory.stat().st_mtime
+            except OSError:
+                return time.time()
+
+    # -- Claiming --------------------------------------------------------------
+
+    def held(self):
+        """Images already in this worker's lease directory (left by a crash of the same worker id)."""
+        return _leased_files(self.dir)
+
+    def claim(self, candidates, limit):
+        """
+        Rename up to `limit` of `candidates` (paths below INPUT_DIR, read
+        lazily) into the lease directory.  Fewer than `limit` means the
+        candidates ran out.
+        """
+        leased = []
+        if limit <= 0:
+            return leased
+        for path in candidates:
+            lease = self.dir / path.relative_to(self.input_dir)
+            try:
+                if lease.parent != self.dir:
+                    lease.parent.mkdir(parents=True, exist_ok=True)
+                os.rename(path, lease)
+            except OSError:
+                continue  # another worker got there first
+            leased.append(lease)
+            if len(leased) >= limit:
+                break
+        self.claimed += len(leased)
+        return leased
+
+    def holds(self, lease):
+        return lease.exists()
+
+    def release(self, leases):
+        """Put leased images back into INPUT_DIR for the next run or another worker."""
+        count = sum(_return_to(self.input_dir, lease, self.dir, self.root) for lease in leases)
+        self.released += count
+        return count
+
+    # -- Dead workers -------------------------------------------------------------
+
+    def reclaim(self):
+        """
+        Return the images of workers without a heartbeat for `ttl` seconds to
+        INPUT_DIR.  Returns {worker: images returned}.
+        """
+        returned = {}
+        try:
+            entries = [Path(e.path) for e in os.scandir(self.root) if e.is_dir()]
+        except OSError:
+            return returned
+        now = time.time()
+        for directory in entries:
+            if directory.name == self.worker_id or now - self.last_beat(directory) < self.ttl:
+                continue
+            grave = self.root / f"{RECLAIM_PREFIX}{self.worker_id}-{directory.name.removeprefix(RECLAIM_PREFIX)}"
+            try:
+                os.rename(directory, grave)  # only one reclaimer wins
+            except OSError:
+                continue
+            count = sum(_return_to(self.input_dir, p, grave, self.root) for p in _leased_files(grave))
+            shutil.rmtree(grave, ignore_errors=True)
+            returned[directory.name] = count
+            self.reclaimed += count
+        return returned
+
+    def close(self):
+        """Stop the heartbeat, hand back every image still held, remove the lease directory."""
+        self._stop.set()
+        self._thread.join(self.interval + 1)
+        self.release(self.held())
+        shutil.rmtree(self.dir, ignore_errors=True)
@@ -0,0 +1,201 @@
+"""
+Per-phase timing spans and metrics export.
+
+Each conversion attempt gets a Span.  The worker and the orchestrator add
+the seconds spent in each phase (see PHASES); MetricsRecorder appends one
+JSONL line per attempt to the trace file, keeps the samples for the
+end-of-run p50/p95/max table and writes a Prometheus textfile (for
+node_exporter's textfile collector).
+"""
+
+import os
+import json
+import math
+import time
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+# Display order; unknown phases are listed after these
+PHASES = (
+    "queue_wait",   # ready in the queue -> picked up by a worker
+    "prep_wait",    # orchestrator waiting for the preprocessed copy
+    "route",        # orchestrator waiting for the complexity score
+    "prompt",       # prompt rendering
+    "tempfile",     # prompt temp file write + cleanup
+    "spawn",        # Popen() until the child process exists
+    "startup",      # child exists -> first line of CLI output
+    "model",        # rest of the CLI run (whole run when not streaming)
+    "validate",     # output file checks + token parsing
+    "optimize",     # SVG post-processing (process pool)
+    "copy",         # near-duplicate SVG copy
+    "cache_store",  # writing the result to the conversion cache
+    "archive",      # moving the source image to the archive folder
+)
+
+PROM_PREFIX = "figma_converter"
+
+
+class Span:
+    """Phase timings for one conversion attempt (seconds, summed per phase)."""
+
+    def __init__(self, image, attempt=1, queued_at=None, provider=None):
+        self.image = image
+        self.attempt = attempt
+        self.provider = provider
+        self.route = None   # {"score", "tier", "model", "features"} when routed
+        self.predicted = None  # seconds pipeline.scheduling expected this image to take
+        self.queued_at = time.monotonic() if queued_at is None else queued_at
+        self.phases = {}
+        self._lock = threading.Lock()
+
+    def add(self, phase, seconds):
+        with self._lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + max(0.0, seconds)
+
+    def start(self):
+        """Called by the worker when it picks the attempt up."""
+        self.add("queue_wait", time.monotonic() - self.queued_at)
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+
+class SpanGroup:
+    """The images of one batched CLI call: shared phases go to every Span."""
+
+    def __init__(self, spans):
+        self.spans = list(spans)
+
+    def add(self, phase, seconds):
+        for span in self.spans:
+            span.add(phase, seconds)
+
+    def start(self):
+        for span in self.spans:
+            span.start()
+
+    phase = Span.phase
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def _atomic_write_text(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+class MetricsRecorder:
+    """
+    Collects finished spans.  Called from the orchestrating thread only.
+
+    `trace_path` / `prom_path` may be None to skip that output; samples are
+    always kept for phase_stats().
+    """
+
+    def __init__(self, trace_path=None, prom_path=None):
+        self.trace_path = Path(trace_path) if trace_path else None
+        self.prom_path = Path(prom_path) if prom_path else None
+        self.samples = {}   # phase -> [seconds]
+        self.results = {"success": 0, "failure": 0}
+        self.tokens = 0
+        self.cache_read = 0
+        self.cache_write = 0
+        self.cost_usd = 0.0
+        self._trace = None
+        if self.trace_path is not None:
+            self.trace_path.parent.mkdir(parents=True, exist_ok=True)
+            self._trace = open(self.trace_path, "a", encoding="utf-8", buffering=1)
+
+    def record(self, span, success, elapsed, tokens, error_class=None):
+        for phase, seconds in span.phases.items():
+            self.samples.setdefault(phase, []).append(seconds)
+        self.results["success" if success else "failure"] += 1
+        self.tokens += tokens.get("total", 0)
+        self.cache_read += tokens.get("cache_read", 0)
+        self.cache_write += tokens.get("cache_write", 0)
+        self.cost_usd += tokens.get("cost_usd", 0.0)
+        if self._trace is not None:
+            entry = {
+                "ts": time.time(),
+                "image": span.image,
+                "attempt": span.attempt,
+                "success": success,
+                "error_class": error_class,
+                "elapsed": round(elapsed, 4),
+                "phases": {k: round(v, 4) for k, v in span.phases.items()},
+                "tokens": tokens,
+            }
+            if span.provider is not None:
+                entry["provider"] = span.provider
+            if span.route is not None:
+                entry["route"] = span.route
+            if span.predicted is not None:
+                entry["predicted"] = round(span.predicted, 2)
+            self._trace.write(json.dumps(entry) + "\n")
+
+    def phase_stats(self):
+        """Return [(phase, count, p50, p95, max)] in PHASES order."""
+        order = list(PHASES) + sorted(p for p in self.samples if p not in PHASES)
+        stats = []
+        for phase in order:
+            values = sorted(self.samples.get(phase, ()))
+            if values:
+                stats.append((phase, len(values), percentile(values, 0.5),
+                              percentile(values, 0.95), values[-1]))
+        return stats
+
+    def write_prometheus(self):
+        if self.prom_path is None:
+            return
+        p = PROM_PREFIX
+        lines = [
+            f"# HELP {p}_phase_seconds Time spent per conversion phase.",
+            f"# TYPE {p}_phase_seconds summary",
+        ]
+        for phase, count, p50, p95, _ in self.phase_stats():
+            total = sum(self.samples[phase])
+            lines.append(f'{p}_phase_seconds{{phase="{phase}",quantile="0.5"}} {p50:.6f}')
+            lines.append(f'{p}_phase_seconds{{phase="{phase}",quantile="0.95"}} {p95:.6f}')
+            lines.append(f'{p}_phase_seconds_sum{{phase="{phase}"}} {total:.6f}')
+            lines.append(f'{p}_phase_seconds_count{{phase="{phase}"}} {count}')
+        lines += [
+            f"# HELP {p}_attempts_total Conversion attempts by result.",
+            f"# TYPE {p}_attempts_total counter",
+        ]
+        for result, count in self.results.items():
+            lines.append(f'{p}_attempts_total{{result="{result}"}} {count}')
+        lines += [
+            f"# HELP {p}_tokens_total Tokens used by conversions.",
+            f"# TYPE {p}_tokens_total counter",
+            f"{p}_tokens_total {self.tokens}",
+            f"# HELP {p}_prompt_cache_tokens_total Input tokens read from / written to the provider prompt cache.",
+            f"# TYPE {p}_prompt_cache_tokens_total counter",
+            f'{p}_prompt_cache_tokens_total{{op="read"}} {self.cache_read}',
+            f'{p}_prompt_cache_tokens_total{{op="write"}} {self.cache_write}',
+            f"# HELP {p}_cost_usd_total Reported cost of conversions in USD.",
+            f"# TYPE {p}_cost_usd_total counter",
+            f"{p}_cost_usd_total {self.cost_usd:.6f}",
+            f"# HELP {p}_last_update_timestamp_seconds Unix time of this snapshot.",
+            f"# TYPE {p}_last_update_timestamp_seconds gauge",
+            f"{p}_last_update_timestamp_seconds {time.time():.3f}",
+        ]
+        _atomic_write_text(self.prom_path, "\n".join(lines) + "\n")
+
+    def close(self):
+        if self._trace is not None:
+            self._trace.close()
+            self._trace = None
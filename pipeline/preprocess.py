@@ -0,0 +1,184 @@
+"""
+Image preprocessing ahead of conversion.
+
+Large retina screenshots cost far more vision tokens than the model needs to
+reproduce a layout.  preprocess_image() (run in a process pool) makes a
+smaller copy for the model:
+
+  1. trim uniform borders (same colour as the top-left pixel),
+  2. cap the longest edge at `max_edge` pixels,
+  3. re-encode as WEBP (lossless), PNG or JPEG.
+
+The original file is left untouched for archiving.  Results are cached by
+content hash + settings in `<dest_dir>/<key>.<ext>` with a JSON sidecar, so
+re-runs only hash the file.  scale_note() tells the model how to map
+coordinates measured on the smaller image back to the original size.
+
+Requires Pillow (optional dependency; see pipeline.imaging.HAVE_PIL).
+"""
+
+import os
+import json
+import time
+import hashlib
+from pathlib import Path
+
+from .cache import hash_file
+from .imaging import Image
+
+PREPROCESS_VERSION = 1      # bump when the transform changes
+TRIM_TOLERANCE = 8          # per-channel difference still counted as "border"
+TRIM_PADDING = 2            # pixels kept around trimmed content
+
+FORMAT_EXTENSIONS = {"webp": "webp", "png": "png", "jpeg": "jpg", "jpg": "jpg"}
+
+
+def settings_signature(max_edge, trim, fmt):
+    """Stable string describing the preprocessing settings (part of cache keys)."""
+    return f"pre-v{PREPROCESS_VERSION}:{max_edge}:{int(bool(trim))}:{fmt}"
+
+
+def _content_bbox(im):
+    """Bounding box of pixels that differ from the top-left colour, or None."""
+    from PIL import ImageChops
+
+    rgb = im.convert("RGB")
+    bg = Image.new("RGB", rgb.size, rgb.getpixel((0, 0)))
+    diff = ImageChops.difference(rgb, bg).convert("L")
+    mask = diff.point(lambda v: 255 if v > TRIM_TOLERANCE else 0)
+    bbox = mask.getbbox()
+    if bbox is None:
+        return None
+    left, top, right, bottom = bbox
+    return (max(0, left - TRIM_PADDING), max(0, top - TRIM_PADDING),
+            min(im.width, right + TRIM_PADDING), min(im.height, bottom + TRIM_PADDING))
+
+
+def _save(im, dest, fmt):
+    if fmt == "webp":
+        im.save(dest, "WEBP", lossless=True, method=4)
+    elif fmt in ("jpeg", "jpg"):
+        im.convert("RGB").save(dest, "JPEG", quality=90, optimize=True)
+    else:
+        im.save(dest, "PNG", optimize=True)
+
+
+def preprocess_image(src, dest_dir, max_edge, trim, fmt):
+    """
+    Produce the model-facing copy of `src`.  Safe to run in a worker process.
+
+    Returns a dict with the path to hand to the CLI, the scale factor, the
+    crop offset and before/after dimensions and byte sizes.  When nothing
+    would be gained, `path` is the original file.
+    """
+    src = Path(src)
+    dest_dir = Path(dest_dir)
+    dest_dir.mkdir(parents=True, exist_ok=True)
+
+    digest = hash_file(src)
+    key = hashlib.sha256(
+        f"{digest}:{settings_signature(max_edge, trim, fmt)}".encode("utf-8")).hexdigest()
+    meta_path = dest_dir / f"{key}.json"
+    try:
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        if meta["passthrough"]:
+            meta["path"] = str(src)
+        if Path(meta["path"]).exists():
+            meta["source"] = str(src)
+            meta["cached"] = True
+            os.utime(meta_path)
+            return meta
+    except (OSError, ValueError, KeyError):
+        pass
+
+    orig_bytes = src.stat().st_size
+    with Image.open(src) as im:
+        im.load()
+        orig_w, orig_h = im.size
+        if im.mode not in ("RGB", "RGBA"):
+            im = im.convert("RGBA" if "transparency" in im.info or im.mode in ("LA", "PA") else "RGB")
+
+        crop_left = crop_top = 0
+        if trim:
+            bbox = _content_bbox(im)
+            if bbox and bbox != (0, 0, im.width, im.height):
+                im = im.crop(bbox)
+                crop_left, crop_top = bbox[0], bbox[1]
+
+        scale = 1.0
+        if max(im.size) > max_edge:
+            scale = max_edge / max(im.size)
+            new_size = (max(1, round(im.width * scale)), max(1, round(im.height * scale)))
+            im = im.resize(new_size, Image.LANCZOS)
+
+        width, height = im.size
+        dest = dest_dir / f"{key}.{FORMAT_EXTENSIONS.get(fmt, 'png')}"
+        try:
+            _save(im, dest, fmt)
+        except (OSError, KeyError, ValueError):
+            dest = dest_dir / f"{key}.png"  # e.g. Pillow built without WEBP
+            _save(im, dest, "png")
+
+    new_bytes = dest.stat().st_size
+    untouched = scale == 1.0 and (crop_left, crop_top) == (0, 0) and (width, height) == (orig_w, orig_h)
+    if untouched and new_bytes >= orig_bytes:
+        dest.unlink()
+        dest, new_bytes = src, orig_bytes
+
+    meta = {
+        "source": str(src),
+        "path": str(dest),
+        "scale": scale,
+        "crop_left": crop_left,
+        "crop_top": crop_top,
+        "orig_width": orig_w,
+        "orig_height": orig_h,
+        "width": width,
+        "height": height,
+        "orig_bytes": orig_bytes,
+        "bytes": new_bytes,
+        "passthrough": dest == src,
+        "cached": False,
+    }
+    tmp = meta_path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(meta), encoding="utf-8")
+    os.replace(tmp, meta_path)
+    return meta
+
+
+def scale_note(prep):
+    """Prompt text explaining how to map the preprocessed image back, or ""."""
+    if prep is None:
+        return ""
+    scale = prep["scale"]
+    dx, dy = prep["crop_left"], prep["crop_top"]
+    if scale == 1.0 and dx == 0 and dy == 0:
+        return ""
+    lines = [
+        "",
+        "## IMAGE SCALE",
+        f"The attached image is a preprocessed copy ({prep['width']}x{prep['height']}) of the "
+        f"original {prep['orig_width']}x{prep['orig_height']} screenshot.",
+    ]
+    if scale != 1.0:
+        lines.append(f"Multiply every coordinate and size you measure by {1 / scale:.4f} "
+                     f"(it was downscaled by {scale:.4f}).")
+    if dx or dy:
+        lines.append(f"Then add the trimmed border offset: x + {dx}, y + {dy}.")
+    lines.append(f"The LEFT panel must match the ORIGINAL {prep['orig_width']}x{prep['orig_height']} size.")
+    return "\n".join(lines) + "\n"
+
+
+def prune(dest_dir, max_age_seconds):
+    """Delete preprocessed files not used within `max_age_seconds`."""
+    cutoff = time.time() - max_age_seconds
+    for meta_path in Path(dest_dir).glob("*.json"):
+        try:
+            if meta_path.stat().st_mtime >= cutoff:
+                continue
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            if not meta.get("passthrough"):
+                Path(meta["path"]).unlink(missing_ok=True)
+            meta_path.unlink()
+        except (OSError, ValueError):
+            pass
@@ -0,0 +1,53 @@
+"""
+List-price helpers.
+
+Claude reports the real cost of each call (`total_cost_usd`); Codex reports
+none.  The table in config.constants.MODEL_PRICES is used for numbers the
+CLIs do not give: the cost of a Codex call (and of a Claude call still in
+flight), pre-flight estimates, and what prompt caching saved compared with
+sending the same input uncached.
+"""
+
+from config.constants import (
+    MODEL_PRICES, DEFAULT_MODEL_PRICE, CODEX_PRICE_MODEL, CACHE_PRICE_FACTORS,
+    PROVIDER_CODEX,
+)
+
+
+def model_price(model, provider):
+    """(input, output) USD per million tokens for `model`, by substring match."""
+    name = (model or (CODEX_PRICE_MODEL if provider == PROVIDER_CODEX else "")).lower()
+    for key, price in MODEL_PRICES.items():
+        if key in name:
+            return price
+    return DEFAULT_MODEL_PRICE
+
+
+def list_cost(tokens, model, provider):
+    """USD for a tokens dict at list prices, cache reads/writes at their rates."""
+    input_price, output_price = model_price(model, provider)
+    read_factor, write_factor = CACHE_PRICE_FACTORS.get(provider, (1.0, 1.0))
+    cache_read, cache_write = tokens.get("cache_read", 0), tokens.get("cache_write", 0)
+    uncached = max(0, tokens.get("input", 0) - cache_read - cache_write)
+    billed = uncached + cache_read * read_factor + cache_write * write_factor
+    return (billed * input_price + tokens.get("output", 0) * output_price) / 1e6
+
+
+def priced(tokens, model, provider):
+    """`tokens` with cost_usd filled in from list prices when the CLI reported none."""
+    if tokens.get("cost_usd") or not tokens.get("total"):
+        return tokens
+    return dict(tokens, cost_usd=list_cost(tokens, model, provider))
+
+
+def cache_savings(tokens, model, provider):
+    """
+    USD saved by prompt caching on one call: cache reads billed below the
+    input price, minus the premium on cache writes.  Can be negative for a
+    call that only wrote the cache.
+    """
+    input_price = model_price(model, provider)[0] / 1e6
+    read_factor, write_factor = CACHE_PRICE_FACTORS.get(provider, (1.0, 1.0))
+    saved = tokens.get("cache_read", 0) * input_price * (1.0 - read_factor)
+    saved -= tokens.get("cache_write", 0) * input_price * (write_factor - 1.0)
+    return saved
@@ -0,0 +1,148 @@
+"""
+Prompt layout and short follow-up prompts.
+
+cache_layout() moves the per-image lines of a template (the ones holding
+__IMAGE_PATH__ / __OUTPUT_PATH__) into a short section at the end, so the
+long static part is a byte-identical prefix for every image and the
+provider's prompt cache can serve it to all parallel workers.
+batch_layout() keeps the same prefix and lists the per-image lines once per
+image, for one CLI call that converts several screenshots.
+
+DIFF_PROMPT, FIX_PROMPT and CONTINUE_PROMPT replace the full
+prompt-template.txt when the model only has to adjust or finish an existing
+SVG.  They use the same placeholders as
+the main template, so adapt_prompt() handles them unchanged, plus
+__BASE_SVG__ for the SVG to start from and __ISSUES__ for the validation
+problems to fix.
+"""
+
+import functools
+
+from config.constants import (
+    PLACEHOLDER_IMAGE, PLACEHOLDER_OUTPUT, PLACEHOLDER_BASE_SVG, PLACEHOLDER_ISSUES,
+)
+
+TASK_HEADING = "## THIS IMAGE"
+BATCH_HEADING = "## THESE IMAGES"
+IMAGE_POINTER = "The screenshot is named at the end of this prompt."
+OUTPUT_POINTER = "The SVG file to write is named at the end of this prompt."
+BATCH_NOTE = ("Convert each screenshot below separately, following every step above for each "
+              "one, and write each SVG to its own file. Do not merge screens or share elements "
+              "between files.")
+
+
+@functools.lru_cache(maxsize=16)
+def split_template(template):
+    """Split `template` into its static text (with pointers) and its per-image lines."""
+    static, task = [], []
+    for line in template.splitlines():
+        if PLACEHOLDER_IMAGE in line:
+            static.append(IMAGE_POINTER)
+            task.append(line)
+        elif PLACEHOLDER_OUTPUT in line:
+            static.append(OUTPUT_POINTER)
+            task.append(line)
+        else:
+            static.append(line)
+    return "\n".join(static).rstrip(), tuple(task)
+
+
+@functools.lru_cache(maxsize=16)
+def cache_layout(template):
+    """Return `template` with its per-image lines moved to a trailing THIS IMAGE section."""
+    static, task = split_template(template)
+    if not task:
+        return template
+    return static + f"\n\n{TASK_HEADING}\n" + "\n".join(task) + "\n"
+
+
+def batch_layout(template, jobs):
+    """
+    One prompt for several images: the static text once, then a numbered
+    copy of the per-image lines for each (image, output, note) in `jobs`.
+    `note` (e.g. preprocess.scale_note) is appended under its image.
+    """
+    static, task = split_template(template)
+    parts = [static, "", BATCH_HEADING, BATCH_NOTE]
+    for number, (image, output, note) in enumerate(jobs, 1):
+        parts += ["", f"### Image {number}"]
+        parts += [line.replace(PLACEHOLDER_IMAGE, str(image)).replace(PLACEHOLDER_OUTPUT, str(output))
+                  for line in task]
+        if note.strip():
+            parts.append(note.strip())
+    return "\n".join(parts) + "\n"
+
+DIFF_PROMPT = """You are a Senior UI/UX Designer updating a Figma-ready SVG.
+
+## STEP 1: Read image
+Read: __IMAGE_PATH__
+
+## STEP 2: Read the existing SVG
+Read: __BASE_SVG__
+It was generated from a near-identical screenshot of the same screen (same layout; the
+difference is usually a hover/active state, a selection or some text).
+
+## STEP 3: Write SVG
+Write to: __OUTPUT_PATH__
+
+Start from the existing SVG and change ONLY what differs in this screenshot: text, colours,
+states, added or removed elements. Keep every `id`, the `Frame/*` and `Variant/*` groups,
+`<defs>`, the viewBox and all `data-*` attributes unless the screenshot requires a change.
+Do not add `<filter>` elements.
+
+## OUTPUT
+After writing the file, respond ONLY: CONVERSION_COMPLETE
+"""
+
+
+FIX_PROMPT = """You are a Senior UI/UX Designer fixing a Figma-ready SVG.
+
+## STEP 1: Read image
+Read: __IMAGE_PATH__
+
+## STEP 2: Read the SVG
+Read: __BASE_SVG__
+It was generated from this screenshot but fails these checks:
+__ISSUES__
+
+## STEP 3: Write SVG
+Write to: __OUTPUT_PATH__
+
+Fix ONLY the issues above and keep everything else as it is: every `id`, the `Frame/*` and
+`Variant/*` groups, `<defs>` and all `data-*` attributes. The file must be complete,
+well-formed XML ending with `</svg>`, with a `<g id="Frame/ComponentVariants">` panel on the
+right. Do not add `<filter>` elements.
+
+## OUTPUT
+After writing the file, respond ONLY: CONVERSION_COMPLETE
+"""
+
+
+CONTINUE_PROMPT = """You are a Senior UI/UX Designer finishing a Figma-ready SVG.
+
+## STEP 1: Read image
+Read: __IMAGE_PATH__
+
+## STEP 2: Read the unfinished SVG
+Read: __BASE_SVG__
+It was generated from this screenshot, but writing it stopped before the end:
+__ISSUES__
+
+## STEP 3: Write SVG
+Write to: __OUTPUT_PATH__
+
+Keep everything already in the file exactly as it is. Continue from where it stops: finish the
+cut-off element, add the parts of the screen that are still missing, then the
+`<g id="Frame/ComponentVariants">` panel on the right if it is not there yet, and close every
+open element so the file ends with `</svg>`. Append to the file instead of rewriting it where
+you can. Do not add `<filter>` elements.
+
+## OUTPUT
+After writing the file, respond ONLY: CONVERSION_COMPLETE
+"""
+
+
+def render(template, base_svg, issues=()):
+    """Fill in __BASE_SVG__ / __ISSUES__; the image/output placeholders are left for adapt_prompt()."""
+    listed = "\n".join(f"- {issue}" for issue in issues)
+    return template.replace(PLACEHOLDER_BASE_SVG, str(base_svg)).replace(PLACEHOLDER_ISSUES, listed)
@@ -0,0 +1,120 @@
+"""
+Provider pool: run Claude and Codex side by side.
+
+Every provider (cfg["providers"], see config.provider_settings) gets a
+ProviderSlot with its own merged config, AdaptiveConcurrency limit and a
+latency EWMA.  ProviderPool.pick() routes the next image to a provider with
+a free slot, preferring the lowest recent latency (untried providers first,
+so each gets sampled).
+
+Auth / quota / missing-CLI failures take a provider out of rotation so new
+work fails over to the others: quota for `quota_cooldown` seconds, the rest
+for the remainder of the run.  The last available provider is never
+disabled, so a single-provider run behaves exactly as before.  Driven from
+the orchestrating thread only.
+"""
+
+import time
+
+from .failures import ERR_AUTH, ERR_QUOTA, ERR_CLI_NOT_FOUND
+
+LATENCY_ALPHA = 0.3  # EWMA weight of the latest conversion time
+
+# Failure class -> True if the provider comes back after the cooldown
+FAILOVER_ERRORS = {ERR_QUOTA: True, ERR_AUTH: False, ERR_CLI_NOT_FOUND: False}
+
+
+class ProviderSlot:
+    """One provider's config, concurrency limit and running totals."""
+
+    def __init__(self, cfg, concurrency):
+        self.name = cfg["provider"]
+        self.cfg = cfg
+        self.concurrency = concurrency
+        self.in_flight = 0
+        self.latency = None          # EWMA of successful conversion time
+        self.disabled_until = 0.0
+        self.disabled_reason = None
+        self.attempts = 0
+        self.converted = 0
+        self.failed = 0
+        self.tokens = 0
+        self.cost_usd = 0.0
+        self.busy_seconds = 0.0
+
+    @property
+    def available(self):
+        return time.monotonic() >= self.disabled_until
+
+    def has_capacity(self):
+        return self.available and self.in_flight < self.concurrency.limit
+
+
+class ProviderPool:
+    """Routes work across providers with free capacity."""
+
+    def __init__(self, slots, quota_cooldown=900.0, on_failover=None):
+        self.slots = list(slots)
+        self.quota_cooldown = quota_cooldown
+        self.on_failover = on_failover
+
+    @property
+    def mixed(self):
+        return len(self.slots) > 1
+
+    @property
+    def limit(self):
+        """Total in-flight limit across available providers."""
+        return sum(s.concurrency.limit for s in self.slots if s.available)
+
+    def pick(self):
+        """The provider for the next conversion, or None if all are busy."""
+        free = [s for s in self.slots if s.has_capacity()]
+        if not free:
+            return None
+        return min(free, key=lambda s: (s.latency or 0.0, s.in_flight / max(s.concurrency.limit, 1)))
+
+    def start(self, slot, images=1, calls=1):
+        """Count an attempt; a tiled image takes one slot per band call it may run at once."""
+        slot.in_flight += calls
+        slot.attempts += images
+
+    def cancel(self, slot, calls=1):
+        """A call cancelled by the engine: free its slot without recording an outcome."""
+        slot.in_flight -= calls
+
+    def finish(self, slot, err_class, elapsed, tokens, converted=None, images=1, calls=1):
+        """
+        Record a finished CLI call.  Returns True if the provider was taken
+        out of rotation, i.e. the image(s) should be re-queued elsewhere.
+
+        A batched call passes its number of `images` and how many of them
+        `converted`; latency is tracked per image.  A tiled image frees the
+        `calls` slots it was started with.
+        """
+        if converted is None:
+            converted = images if err_class is None else 0
+        slot.in_flight -= calls
+        slot.busy_seconds += elapsed
+        slot.tokens += tokens.get("total", 0)
+        slot.cost_usd += tokens.get("cost_usd", 0.0)
+        slot.converted += converted
+        slot.failed += images - converted
+        per_image = elapsed / images
+        slot.concurrency.record(err_class, per_image)
+        if err_class is None:
+            slot.latency = per_image if slot.latency is None else (
+                slot.latency + LATENCY_ALPHA * (per_image - slot.latency))
+            return False
+        if err_class not in FAILOVER_ERRORS:
+            return False
+        if not slot.available:
+            return True  # already out of rotation (another in-flight attempt)
+        if not any(s.available for s in self.slots if s is not slot):
+            return False  # nowhere to fail over to
+        cooldown = self.quota_cooldown if FAILOVER_ERRORS[err_class] else float("inf")
+        slot.disabled_until = time.monotonic() + cooldown
+        slot.disabled_reason = err_class
+        if self.on_failover is not None:
+            self.on_failover(slot, err_class, cooldown)
+        return True
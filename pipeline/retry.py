@@ -0,0 +1,97 @@
+"""
+Retry policies for failed conversions.
+
+Each failure class (see pipeline.failures) has its own policy: how many
+attempts are allowed, the exponential backoff base/cap, and how much longer
+the next attempt's timeout should be.  Delays use "equal jitter" (half fixed,
+half random) so retries spread out without collapsing to zero.
+
+A RetryBudget caps retries globally at `minimum + ratio * first_attempts`, so
+a provider outage cannot multiply the load on it.
+
+The scheduler never sleeps in a worker thread: it asks `next_retry()` for a
+delay and re-submits the image to the executor once that delay has elapsed.
+"""
+
+import random
+from dataclasses import dataclass
+
+from .failures import (
+    ERR_RATE_LIMIT, ERR_OVERLOADED, ERR_TIMEOUT, ERR_MAX_TURNS, ERR_TRUNCATED, ERR_EMPTY_OUTPUT,
+    ERR_OTHER,
+)
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_attempts: int          # total attempts including the first one
+    base_delay: float          # seconds before the first retry (before jitter)
+    max_delay: float           # cap on the backoff delay
+    timeout_factor: float = 1.0  # multiply the per-attempt timeout on each retry
+
+
+# Classes not listed here (auth, quota, cli_not_found) are never retried;
+# invalid_svg goes back to the CLI with the fix prompt instead, and a cut-off
+# SVG is continued with the continuation prompt first (pipeline/run.py).
+DEFAULT_POLICIES = {
+    ERR_RATE_LIMIT: RetryPolicy(max_attempts=4, base_delay=15.0, max_delay=300.0),
+    ERR_OVERLOADED: RetryPolicy(max_attempts=4, base_delay=30.0, max_delay=300.0),
+    ERR_TIMEOUT: RetryPolicy(max_attempts=2, base_delay=5.0, max_delay=60.0, timeout_factor=1.5),
+    ERR_MAX_TURNS: RetryPolicy(max_attempts=2, base_delay=2.0, max_delay=30.0),
+    ERR_TRUNCATED: RetryPolicy(max_attempts=2, base_delay=2.0, max_delay=30.0),
+    ERR_EMPTY_OUTPUT: RetryPolicy(max_attempts=2, base_delay=2.0, max_delay=30.0),
+    ERR_OTHER: RetryPolicy(max_attempts=2, base_delay=5.0, max_delay=60.0),
+}
+
+
+def backoff_delay(policy, attempt, rng=random):
+    """Jittered exponential delay before attempt number `attempt + 1`."""
+    delay = min(policy.max_delay, policy.base_delay * (2 ** (attempt - 1)))
+    return delay / 2 + rng.uniform(0, delay / 2)
+
+
+class RetryBudget:
+    """Global allowance of retries, proportional to the number of first attempts."""
+
+    def __init__(self, ratio, minimum):
+        self.ratio = ratio
+        self.minimum = minimum
+        self.first_attempts = 0
+        self.retries = 0
+
+    def record_attempt(self):
+        self.first_attempts += 1
+
+    def allowed(self):
+        return self.minimum + self.ratio * self.first_attempts
+
+    def try_spend(self):
+        if self.retries + 1 > self.allowed():
+            return False
+        self.retries += 1
+        return True
+
+
+class RetryEngine:
+    """Decides whether and when a failed image is attempted again."""
+
+    def __init__(self, budget, policies=None, rng=random):
+        self.budget = budget
+        self.policies = DEFAULT_POLICIES if policies is None else policies
+        self.rng = rng
+        self.exhausted = 0  # retries refused because the budget ran out
+
+    def next_retry(self, err_class, attempt, timeout):
+        """
+        Return (delay_seconds, next_timeout) for another attempt, or None.
+
+        `attempt` is the number of attempts already made (1 after the first).
+        """
+        policy = self.policies.get(err_class)
+        if policy is None or attempt >= policy.max_attempts:
+            return None
+        if not self.budget.try_spend():
+            self.exhausted += 1
+            return None
+        delay = backoff_delay(policy, attempt, self.rng)
+        return delay, int(timeout * policy.timeout_factor)
@@ -0,0 +1,153 @@
+"""
+Complexity-aware model routing.
+
+score_image() (run in a process pool) rates a screenshot from 0 (a bare
+dialog) to 1 (a dense dashboard) using cheap local measurements on a small
+thumbnail:
+
+  - size          megapixels of the original, capped at SIZE_FULL_MP,
+  - edges         share of pixels on an edge (FIND_EDGES above EDGE_LEVEL),
+  - colours       distinct colours after 4-bit quantization (log scale),
+  - text          share of BLOCK x BLOCK cells busy enough to be text.
+
+ModelRouter maps the score onto an ordered list of model tiers (cheapest
+first) through ascending thresholds, and escalates an image to the next tier
+when the cheaper model fails in a way a stronger one might not (invalid or
+missing SVG, timeout, unknown error).  It also keeps per-tier totals for the
+run summary; every attempt's score, tier and model go to the metrics trace
+so thresholds can be tuned from real cost and latency.
+
+Requires Pillow (optional dependency; see pipeline.imaging.HAVE_PIL).
+"""
+
+import math
+
+from .imaging import Image
+from .failures import ERR_INVALID_SVG, ERR_EMPTY_OUTPUT, ERR_TIMEOUT, ERR_OTHER
+
+SAMPLE_EDGE = 256      # longest edge of the thumbnail that gets measured
+EDGE_LEVEL = 40        # FIND_EDGES response that counts as an edge
+EDGE_FULL = 0.25       # edge share that scores 1.0
+COLOR_BITS = 4         # bits kept per channel before counting colours
+COLOR_FULL = 4096      # distinct colours that score 1.0
+SIZE_FULL_MP = 4.0     # megapixels that score 1.0
+BLOCK = 8              # text cells are BLOCK x BLOCK thumbnail pixels
+TEXT_BLOCK_MIN = 0.12  # edge share of a cell that looks like text ...
+TEXT_BLOCK_MAX = 0.60  # ... without being texture or a photo
+TEXT_FULL = 0.35       # text-cell share that scores 1.0
+
+WEIGHTS = {"size": 0.15, "edges": 0.35, "colors": 0.20, "text": 0.30}
+
+# Failure classes worth retrying on a stronger model
+ESCALATE_ERRORS = (ERR_INVALID_SVG, ERR_EMPTY_OUTPUT, ERR_TIMEOUT, ERR_OTHER)
+
+
+def _text_share(edges):
+    """Share of BLOCK x BLOCK cells whose edge density looks like glyphs."""
+    cols, rows = edges.width // BLOCK, edges.height // BLOCK
+    if not cols or not rows:
+        return 0.0
+    # BOX-downscaling the 0/255 edge mask gives each cell's edge share
+    cells = edges.crop((0, 0, cols * BLOCK, rows * BLOCK)).resize((cols, rows), Image.BOX)
+    hist = cells.histogram()
+    busy = sum(hist[round(TEXT_BLOCK_MIN * 255):round(TEXT_BLOCK_MAX * 255) + 1])
+    return busy / (cols * rows)
+
+
+def complexity_features(path):
+    """Raw measurements for `path`, each normalized to 0..1."""
+    from PIL import ImageFilter
+
+    with Image.open(path) as im:
+        width, height = im.size
+        im.draft("RGB", (SAMPLE_EDGE, SAMPLE_EDGE))  # fast JPEG downscale on decode
+        small = im.convert("RGB")
+        small.thumbnail((SAMPLE_EDGE, SAMPLE_EDGE))
+
+    shift = 8 - COLOR_BITS
+    quantized = small.point(lambda v: v >> shift << shift)
+    colors = quantized.getcolors(maxcolors=1 << (3 * COLOR_BITS)) or ()
+
+    edges = small.convert("L").filter(ImageFilter.FIND_EDGES)
+    edges = edges.point(lambda v: 255 if v > EDGE_LEVEL else 0)
+    edge_share = edges.histogram()[255] / (small.width * small.height)
+
+    return {
+        "size": min(1.0, width * height / 1e6 / SIZE_FULL_MP),
+        "edges": min(1.0, edge_share / EDGE_FULL),
+        "colors": min(1.0, math.log2(max(len(colors), 1)) / math.log2(COLOR_FULL)),
+        "text": min(1.0, _text_share(edges) / TEXT_FULL),
+    }
+
+
+def complexity_score(features):
+    return round(sum(WEIGHTS[k] * features[k] for k in WEIGHTS), 3)
+
+
+def score_image(path):
+    """
+    Score one image.  Safe to run in a worker process.
+
+    Returns {"path", "score", "features", "error"}; an unreadable image gets
+    score None and is routed to the default tier.
+    """
+    try:
+        features = complexity_features(path)
+    except (OSError, ValueError) as exc:
+        return {"path": str(path), "score": None, "features": {}, "error": str(exc)[:200]}
+    features = {k: round(v, 3) for k, v in features.items()}
+    return {"path": str(path), "score": complexity_score(features), "features": features,
+            "error": None}
+
+
+class ModelRouter:
+    """
+    Score -> model tier for one provider.
+
+    `models` are ordered cheapest first; `thresholds` are the ascending
+    scores at which the next tier starts (one fewer than `models`; evenly
+    spaced ones are used when the counts do not match).
+    """
+
+    def __init__(self, models, thresholds, default_tier=None):
+        self.models = list(models)
+        if len(thresholds) != len(self.models) - 1:
+            thresholds = [(i + 1) / len(self.models) for i in range(len(self.models) - 1)]
+        self.thresholds = sorted(thresholds)
+        self.default_tier = len(self.models) // 2 if default_tier is None else default_tier
+        # model -> {"routed", "attempts", "converted", "escalated", "seconds", "cost_usd", "tokens"}
+        self.stats = {}
+
+    @property
+    def enabled(self):
+        return len(self.models) > 1
+
+    def tier_for(self, score, escalations=0):
+        """Tier for an image with `score` (None = unscored) after `escalations` bumps."""
+        if score is None:
+            tier = self.default_tier
+        else:
+            tier = sum(score >= t for t in self.thresholds)
+        return min(tier + escalations, len(self.models) - 1)
+
+    def can_escalate(self, tier, err_class):
+        return err_class in ESCALATE_ERRORS and tier + 1 < len(self.models)
+
+    def record(self, model, first, success, escalated, elapsed, tokens):
+        """Add one finished attempt to the per-tier totals."""
+        s = self.stats.setdefault(model, {"routed": 0, "attempts": 0, "converted": 0, "escalated": 0,
+                                          "seconds": 0.0, "cost_usd": 0.0, "tokens": 0})
+        s["routed"] += first
+        s["attempts"] += 1
+        s["converted"] += success
+        s["escalated"] += escalated
+        s["seconds"] += elapsed
+        s["cost_usd"] += tokens.get("cost_usd", 0.0)
+        s["tokens"] += tokens.get("total", 0)
+
+    def describe(self):
+        """'haiku < 0.35 <= sonnet < 0.7 <= opus' style summary."""
+        parts = [self.models[0]]
+        for threshold, model in zip(self.thresholds, self.models[1:]):
+            parts.append(f"< {threshold:g} <= {model}")
+        return " ".join(parts)
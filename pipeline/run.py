@@ -0,0 +1,1761 @@
+"""
+One convert.py run: collect the input images, convert them in parallel and
+print the summary.
+
+ConversionRun holds the run's state as attributes and goes through it in
+the order of run(): set-up steps, then convert_all(), the loop that starts
+CLI calls while provider slots are free and records each one as it
+finishes.  Every call in flight is a Call in `calls`, keyed by its future.
+The per-image work itself (command lines, subprocess, output checks) is in
+pipeline/conversion.py.
+"""
+
+import time
+import contextlib
+import math
+import heapq
+import sqlite3
+import itertools
+import concurrent.futures
+from pathlib import Path
+
+from config.constants import (
+    PROVIDER_CLAUDE, PLACEHOLDER_IMAGE, PLACEHOLDER_OUTPUT, ADAPTIVE_DECREASE_FACTOR,
+    ADAPTIVE_LATENCY_FACTOR, ADAPTIVE_COOLDOWN, LIVE_REFRESH_SECONDS, WATCH_TICK_SECONDS,
+    CACHE_EVICT_INTERVAL, FAILOVER_QUOTA_COOLDOWN, SCHEDULE_DEFAULT_POLICY,
+)
+from .cache import ConversionCache, cache_key, hash_file
+from .journal import RunJournal, new_journal_path, latest_journal, replay as replay_journal
+from .journal import STATE_QUEUED, STATE_RUNNING, STATE_DONE, STATE_FAILED
+from .concurrency import AdaptiveConcurrency
+from .failures import classify_error
+from .failures import ERR_INVALID_SVG, ERR_CANCELLED
+from .retry import RetryEngine, RetryBudget
+from .imaging import HAVE_PIL, estimate_image_tokens, image_size
+from .preprocess import preprocess_image, settings_signature
+from .preprocess import prune as prune_preprocessed
+from .dedupe import PHashIndex, cluster, hamming
+from .prompts import (
+    DIFF_PROMPT, FIX_PROMPT, CONTINUE_PROMPT, split_template, render as render_prompt,
+)
+from .streaming import LiveTokens
+from .watch import FolderWatcher, GracefulShutdown, StatusFile
+from .metrics import MetricsRecorder, Span
+from .svgopt import optimize_svg
+from .svgcheck import validate_svg
+from .providers import ProviderPool, ProviderSlot
+from .routing import ModelRouter, score_image
+from .history import RunHistory, EtaEstimator, size_factor
+from .pricing import cache_savings
+from .budget import Budget, combine, estimate_call, template_tokens
+from .leases import LeaseManager, commit_file
+from .scan import iter_images
+from .engine import AsyncEngine
+from .hedging import HEDGE_DIR_NAME, HEDGE_LIVE_SUFFIX, HedgePolicy, clear_hedge_dir
+from .salvage import SALVAGE_COMPLETE, SALVAGE_REPAIRED, SALVAGE_PARTIAL, SALVAGE_NONE, salvage_svg
+from .tiling import band_count, clear_tile_dir, split_image, stitch_svgs, tile_dir
+from .scheduling import POLICIES, CostModel, JobQueue, predict_makespan
+from .batching import batch_budget, batch_cost
+from .console import (
+    C, colorize, progress_label, format_time, format_tokens, format_duration, format_size,
+    status, pause,
+)
+from .conversion import (
+    adapt_prompt, NO_TOKENS, estimate_time_per_image, source_path, source_name, output_path_for,
+    archive_image, modified_before, copy_svg, run_conversion, run_batch, run_tiled,
+    PROVIDER_ERRORS,
+)
+
+
+class Call:
+    """A CLI call (or SVG copy) in flight and what it holds until it finishes."""
+
+    def __init__(self, imgs, spans, slot=None, route=None):
+        self.imgs = imgs            # images it converts (several for a batched call)
+        self.spans = spans          # their Spans
+        self.slot = slot            # ProviderSlot running it (None for copies)
+        self.route = route          # routing decision, for routed attempts
+        self.estimate = None        # pre-flight tokens/cost, for the budget
+        self.held = 1               # slots taken; a tiled image holds one per band call
+        self.private = None         # attempt cfg writing to its own directory
+        self.hedgeable = None       # (template, started) while it may still be hedged
+        self.hedge = False          # the second attempt of a hedged pair
+        self.partner = None         # future of the other attempt of its pair
+        self.superseded = False     # the pair's other attempt settled the image
+
+
+class ConversionRun:
+    """
+    A run over one configuration.  `resume` is the --resume argument: None,
+    "latest" or a journal path.
+    """
+
+    def __init__(self, cfg, prompt_template, resume=None):
+        self.cfg = cfg
+        self.prompt_template = prompt_template
+        self.resume = resume
+        self.calls = {}  # future -> Call
+
+    def run(self):
+        """Convert everything and print the summary; returns the number of failed images."""
+        self.collect()
+        self.show_config()
+        self.start_run()
+        self.restore_finished()
+        self.plan_dedupe()
+        self.start_preprocessing()
+        self.start_routing()
+        self.start_svg_pool()
+        self.build_pool()
+        self.preflight()
+        self.prepare_attempts()
+        self.prepare_hedging()
+        self.prepare_loop()
+        self.convert_all()
+        self.finish()
+        self.summary()
+        return self.fail_count
+
+    def collect(self):
+        """Open the run history and read the first window of input images."""
+        # Estimate time from past conversions of this model (static table if too few)
+        self.history = None
+        if self.cfg["history"]:
+            try:
+                self.history = RunHistory(self.cfg["history_db"])
+            except (sqlite3.Error, OSError) as exc:
+                print(colorize(f"  [WARN] Run history unavailable ({exc}); using static estimates", C.YELLOW))
+        self.image_sizes = {}
+
+        # Predicted time per image, for the queue order (pipeline/scheduling.py)
+        if self.cfg["schedule"] not in POLICIES:
+            print(colorize(f"  [WARN] Unknown SCHEDULE={self.cfg['schedule']}; using {SCHEDULE_DEFAULT_POLICY}"
+                           f" (choices: {', '.join(POLICIES)})", C.YELLOW))
+            self.cfg["schedule"] = SCHEDULE_DEFAULT_POLICY
+        self.policy = POLICIES[self.cfg["schedule"]]
+        samples = self.history.samples(self.cfg["provider"], self.cfg["model"]) if self.history is not None else ()
+        self.cost_model = CostModel(estimate_time_per_image(self.cfg["model"]) * 60, samples)
+        self.predictions = {}
+
+        # Collect images: the input folder is read lazily (pipeline/scan.py) and
+        # only `window` images are admitted (cache, journal, dedupe, prep) at a
+        # time, so the first conversion starts at once however large the folder
+        # is.  The policy (lpt/spt) orders what has been admitted, not the whole
+        # folder.  In shard mode images are claimed from the shared folder
+        # instead (pipeline/leases.py).
+        self.window = self.cfg["queue_window"] or 2 * sum(p["parallel"] for p in self.cfg["providers"]) * self.cfg["batch_max"]
+
+        self.shard = None
+        self.feed = self.scan_input()
+        if self.cfg["shard"]:
+            self.shard = LeaseManager(self.cfg["input_dir"], self.cfg["shard_worker_id"] or None,
+                                      ttl=self.cfg["lease_ttl"], heartbeat=self.cfg["lease_heartbeat"])
+            self.shard.reclaim()  # images of dead workers go back to the folder first
+            self.images = self.shard.held()
+            self.images += self.shard.claim(self.feed, self.window - len(self.images))
+            self.feed = None  # each refill walks the shared folder again
+            self.scanning = len(self.images) >= self.window  # the folder may hold more
+        else:
+            self.images = list(itertools.islice(self.feed, self.window))
+            self.scanning = len(self.images) >= self.window  # the folder may hold more
+        if not self.scanning:
+            self.feed = None
+
+        self.total = len(self.images)
+
+        if self.total == 0 and self.shard is not None and not self.cfg["watch"]:
+            status(f"Nothing to claim in {self.cfg['input_dir']}; other workers have the rest")
+            self.shard.close()
+            pause(self.cfg, 0)
+
+        if self.total == 0 and not self.cfg["watch"]:
+            print(colorize("  [ERROR] No images found in:", C.RED))
+            print(f"    {colorize(str(self.cfg['input_dir']), C.DIM)}")
+            print()
+            print(f"  {colorize('Supported: PNG, JPG, JPEG, WEBP, GIF, BMP', C.DIM)}")
+            pause(self.cfg, 1)
+
+    def size_of(self, img):
+        if img not in self.image_sizes:
+            self.image_sizes[img] = image_size(img)
+        return self.image_sizes[img]
+
+    def tall(self, img):
+        """True if a full conversion of `img` is split into bands (pipeline/tiling.py)."""
+        size = self.size_of(img)
+        return self.cfg["tile"] and size is not None and size[1] > self.cfg["tile_min_height"]
+
+    def predicted(self, img):
+        if img not in self.predictions:
+            try:
+                nbytes = img.stat().st_size
+            except OSError:
+                nbytes = None
+            self.predictions[img] = self.cost_model.estimate(self.size_of(img), nbytes)
+        return self.predictions[img]
+
+    def scan_input(self):
+        return iter_images(self.cfg["input_dir"], self.cfg["image_extensions"], self.cfg["scan_recursive"],
+                           exclude=(self.cfg["output_dir"], self.cfg["archive_dir"]))
+
+    def policy_order(self, images):
+        return [img for img, _ in self.policy.order([(img, self.predicted(img)) for img in images])]
+
+    def show_config(self):
+        """Print the settings; features whose dependencies are missing are switched off here."""
+        self.providers = self.cfg["providers"]
+        self.mixed = len(self.providers) > 1
+        provider_label = " + ".join(p["provider"].upper() for p in self.providers) + (" (pool)" if self.mixed else "")
+        print(f"  {colorize('Provider:', C.CYAN)} {colorize(provider_label, C.BOLD)}")
+        print(f"  {colorize('Source:', C.CYAN)}   {self.cfg['input_dir']}")
+        print(f"  {colorize('Output:', C.CYAN)}   {self.cfg['output_dir']}")
+        print(f"  {colorize('Archive:', C.CYAN)}  {self.cfg['archive_dir']}")
+        if self.mixed:
+            model_label = ", ".join(f"{p['provider']}: {p['model'] or '(default)'}" for p in self.providers)
+        else:
+            model_label = self.cfg["model"] or "(default)"
+        print(f"  {colorize('Model:', C.CYAN)}    {colorize(model_label, C.BOLD)}")
+        max_turns = next((p["max_turns"] for p in self.providers if p["max_turns"] is not None), None)
+        if max_turns is not None:
+            print(f"  {colorize('Turns:', C.CYAN)}    {max_turns}")
+        if self.shard is not None:
+            print(f"  {colorize('Images:', C.CYAN)}   {colorize(str(self.total), C.BOLD)} claimed from the shared folder")
+            print(f"  {colorize('Shard:', C.CYAN)}    worker {self.shard.worker_id}, up to {self.window} held, "
+                  f"lease ttl {format_time(self.shard.ttl)}")
+        elif self.scanning:
+            print(f"  {colorize('Images:', C.CYAN)}   first {colorize(str(self.total), C.BOLD)} queued, "
+                  f"the rest are read as slots free up")
+        else:
+            print(f"  {colorize('Images:', C.CYAN)}   {colorize(str(self.total), C.BOLD)} file(s) found")
+        self.watcher = None
+        if self.cfg["watch"]:
+            self.watcher = FolderWatcher(self.cfg["input_dir"], self.cfg["image_extensions"],
+                                         settle=self.cfg["watch_settle"], poll_interval=self.cfg["watch_poll"],
+                                         recursive=self.cfg["scan_recursive"],
+                                         exclude=(self.cfg["output_dir"], self.cfg["archive_dir"]))
+            self.watcher.mark_seen(self.images)
+            print(f"  {colorize('Watch:', C.CYAN)}    {self.watcher.backend}, settle {self.cfg['watch_settle']:g}s, status -> {self.cfg['status_file']}")
+        self.total_parallel = sum(p["parallel"] for p in self.providers)
+        if self.mixed:
+            parallel_label = " + ".join(f"{p['parallel']} {p['provider']}" for p in self.providers)
+        else:
+            parallel_label = str(self.cfg["parallel"])
+        print(f"  {colorize('Parallel:', C.CYAN)} {colorize(parallel_label, C.BOLD)} concurrent")
+        if self.cfg["batch_max"] > 1 and not split_template(self.prompt_template)[1]:
+            print(colorize("  [WARN] BATCH_MAX needs __IMAGE_PATH__ / __OUTPUT_PATH__ in the template; one image per call", C.YELLOW))
+            self.cfg["batch_max"] = 1
+        if self.cfg["batch_max"] > 1:
+            print(f"  {colorize('Batch:', C.CYAN)}    up to {self.cfg['batch_max']} images per call, "
+                  f"{self.cfg['batch_context_share']:.0%} of the context window")
+        self.budget = Budget(self.cfg["budget_usd"], self.cfg["budget_tokens"])
+        if self.budget.enabled:
+            limits = [f"${self.budget.max_usd:.2f}"] if self.budget.max_usd is not None else []
+            if self.budget.max_tokens is not None:
+                limits.append(f"{format_tokens(self.budget.max_tokens)} tok")
+            print(f"  {colorize('Budget:', C.CYAN)}   {' / '.join(limits)} "
+                  f"{colorize('(no new conversions once the next one could pass it)', C.DIM)}")
+        if self.cfg["preprocess"] and not HAVE_PIL:
+            print(colorize("  [WARN] PREPROCESS=1 needs Pillow (pip install pillow); sending original images", C.YELLOW))
+            self.cfg["preprocess"] = False
+        if self.cfg["preprocess"]:
+            trim_str = ", trim borders" if self.cfg["preprocess_trim"] else ""
+            print(f"  {colorize('Prepare:', C.CYAN)}  max {self.cfg['preprocess_max_edge']}px{trim_str}, {self.cfg['preprocess_format']}")
+        if self.cfg["dedupe"] and not HAVE_PIL:
+            print(colorize("  [WARN] DEDUPE=1 needs Pillow (pip install pillow); converting every image", C.YELLOW))
+            self.cfg["dedupe"] = False
+        if self.cfg["dedupe"]:
+            print(f"  {colorize('Dedupe:', C.CYAN)}   {self.cfg['dedupe_hash']} <= {self.cfg['dedupe_threshold']} bits, {self.cfg['dedupe_mode']}")
+        if self.cfg["routing"] and not HAVE_PIL:
+            print(colorize("  [WARN] ROUTING=1 needs Pillow (pip install pillow); using the configured model", C.YELLOW))
+            self.cfg["routing"] = False
+        self.routers = {}  # provider -> ModelRouter (only providers with 2+ tiers)
+        if self.cfg["routing"]:
+            for p in self.providers:
+                if len(p["route_models"]) > 1:
+                    self.routers[p["provider"]] = ModelRouter(p["route_models"], self.cfg["route_thresholds"])
+            for name, router in self.routers.items():
+                prefix = f"{name}: " if self.mixed else ""
+                print(f"  {colorize('Route:', C.CYAN)}    {prefix}{router.describe()}, escalate on failure")
+        if self.cfg["svg_validate"]:
+            fix_str = f"fix prompt x{self.cfg['svg_fix_attempts']}" if self.cfg["svg_fix_attempts"] else "no fix prompt"
+            print(f"  {colorize('Validate:', C.CYAN)} template rules + viewBox, local repair, {fix_str}")
+        if self.cfg["salvage"]:
+            more_str = f"continuation prompt x{self.cfg['salvage_attempts']}" if self.cfg["salvage_attempts"] else "no continuation prompt"
+            print(f"  {colorize('Salvage:', C.CYAN)}  cut-off SVGs closed locally, {more_str}")
+        if self.cfg["svg_optimize"]:
+            print(f"  {colorize('Optimize:', C.CYAN)} SVG output, {self.cfg['svg_precision']} decimals")
+        if self.cfg["adaptive_parallel"]:
+            ranges = ", ".join(f"{self.cfg['parallel_min']}-{p['parallel_max']}" + (f" {p['provider']}" if self.mixed else "")
+                               for p in self.providers)
+            print(f"  {colorize('Adaptive:', C.CYAN)} {ranges} in flight (backs off on rate limits)")
+        if self.cfg["tile"] and not HAVE_PIL:
+            print(colorize("  [WARN] TILE=1 needs Pillow (pip install pillow); converting tall images in one call", C.YELLOW))
+            self.cfg["tile"] = False
+        if self.cfg["tile"]:
+            print(f"  {colorize('Tile:', C.CYAN)}     images over {self.cfg['tile_min_height']}px tall as parallel bands of "
+                  f"~{self.cfg['tile_band_height']}px ({self.cfg['tile_overlap']}px overlap), stitched into one SVG")
+        self.hedging = None
+        if self.cfg["hedge"]:
+            self.hedging = HedgePolicy(self.cfg["hedge_percentile"], self.cfg["hedge_max_share"])
+            print(f"  {colorize('Hedge:', C.CYAN)}    second attempt past the {self.hedging.label} of this run's times, "
+                  f"up to {self.cfg['hedge_max_share']:.0%} of slots {colorize('(first valid SVG wins)', C.DIM)}")
+
+        profile = self.history.profile(self.cfg["provider"], self.cfg["model"]) if self.history is not None else None
+        if profile is not None:
+            per_image = [profile["p50"] * size_factor(profile, self.size_of(img))
+                         for img in self.images]
+            prior_seconds = sum(per_image) / self.total if self.total else profile["p50"]
+            self.eta = EtaEstimator(prior_seconds, profile["cost_usd"])
+            est_total = sum(per_image) / max(1, min(self.total_parallel, self.total))
+            est_p90 = est_total * profile["p90"] / profile["p50"] if profile["p50"] else est_total
+            source = f"from {profile['count']} past conversions"
+            if self.scanning:  # folder size unknown until it has been read
+                print(f"  {colorize('Est:', C.CYAN)}      ~{format_time(prior_seconds)}, "
+                      f"~${profile['cost_usd']:.2f} per image {colorize(source, C.DIM)}")
+            elif self.total:
+                print(f"  {colorize('Est:', C.CYAN)}      ~{format_time(est_total)} (p90 ~{format_time(est_p90)}), "
+                      f"~${profile['cost_usd'] * self.total:.2f} {colorize(source, C.DIM)}")
+        else:
+            est_per_image = estimate_time_per_image(self.cfg["model"])
+            self.eta = EtaEstimator(est_per_image * 60)
+            est_batches = math.ceil(self.total / self.total_parallel)
+            est_total = est_batches * est_per_image
+            if self.scanning:
+                print(f"  {colorize('Est:', C.CYAN)}      ~{format_time(est_per_image * 60)} per image")
+            elif self.total:
+                print(f"  {colorize('Est:', C.CYAN)}      ~{format_time(est_total * 60)}")
+        basis = "history of similar sizes" if self.cost_model.learned else "image size"
+        print(f"  {colorize('Schedule:', C.CYAN)} {self.policy.name} ({self.policy.description}, by {basis})")
+        print(f"  {colorize('Token:', C.CYAN)}    {colorize('live token tracking enabled', C.DIM)}")
+        if self.cfg["cache_enabled"]:
+            print(f"  {colorize('Cache:', C.CYAN)}    {self.cfg['cache_dir']}")
+
+        print()
+        print(f"  {colorize('----------------------------------------------------', C.DIM)}")
+        print()
+
+    def start_run(self):
+        """Reset the counters, list the queued images and open the journal and run history."""
+        self.success_count = 0
+        self.fail_count = 0
+        self.failed_files = []
+        self.total_tokens = 0
+        self.total_cost = 0.0
+        self.retry_count = 0
+        self.prompt_cache = {"input": 0, "read": 0, "write": 0, "saved": 0.0}  # provider prompt cache
+        self.cache_hits = 0
+        self.saved_tokens = 0
+        self.saved_cost = 0.0
+        self.start_time = time.time()
+
+        # -- Show queued images (at most one window) -------------------------------
+        for i, img in enumerate(self.images):
+            print(f"  {colorize(f'  [{i+1}]', C.DIM)} {source_name(img, self.cfg)}")
+        print()
+
+        # -- Run journal -----------------------------------------------------------
+        self.journal = None
+        self.resumed = {}
+        if self.resume:
+            if self.resume == "latest":
+                journal_path = None
+                if self.cfg["journal_dir"].exists():
+                    journal_path = latest_journal(self.cfg["journal_dir"], self.shard.worker_id if self.shard is not None else None)
+            else:
+                journal_path = Path(self.resume)
+            if journal_path is None or not journal_path.exists():
+                print(colorize("  [WARN] No journal to resume; starting a fresh run", C.YELLOW))
+                print()
+            else:
+                self.resumed = replay_journal(journal_path)
+                self.journal = RunJournal(journal_path)
+                self.journal.event("resume")
+                status(f"Resuming {journal_path.name} ({len(self.resumed)} image(s) journaled)")
+                print()
+        if self.journal is None and self.cfg["journal_enabled"]:
+            self.journal = RunJournal(new_journal_path(self.cfg["journal_dir"], self.shard.worker_id if self.shard is not None else None))
+            self.journal.event("start", provider=",".join(p["provider"] for p in self.providers),
+                               model=",".join(p["model"] or "" for p in self.providers), images=self.total)
+        self.run_id = None
+        if self.history is not None:
+            models = [m for p in self.providers for m in (p["route_models"] if p["provider"] in self.routers else [p["model"]])]
+            self.run_id = self.history.start_run([p["provider"] for p in self.providers], models, self.total)
+
+    def restore_finished(self):
+        """
+        Skip images a previous attempt finished or the cache has; discard
+        half-written output from images that were in flight when the process
+        died.  What is left is `pending`.
+        """
+        self.completed = 0
+        self.output_dirs = {self.cfg["output_dir"]}  # created so far (subfolders are mirrored)
+
+        to_convert = self.triage(self.images)
+
+        # Full config per provider (shared settings + that provider's block)
+        self.provider_cfgs = {p["provider"]: dict(self.cfg, **p) for p in self.providers}
+
+        # -- Cache lookup ----------------------------------------------------------
+        # The key prompt is rendered with placeholder paths so a renamed or
+        # re-dropped screenshot still maps to the same entry.  Keys include the
+        # provider and model; in a provider pool any provider's entry is a hit.
+        self.cache = None
+        self.cache_digests = {}  # img -> content hash, for storing its result
+        if self.cfg["cache_enabled"]:
+            self.cache = ConversionCache(
+                self.cfg["cache_dir"],
+                max_bytes=self.cfg["cache_max_mb"] * 1024 * 1024,
+                max_age_seconds=self.cfg["cache_max_age_days"] * 86400,
+            )
+            self.key_prompts = {name: adapt_prompt(self.prompt_template, PLACEHOLDER_IMAGE, PLACEHOLDER_OUTPUT, pcfg)
+                                for name, pcfg in self.provider_cfgs.items()}
+            self.variant = ""
+            if self.cfg["preprocess"]:
+                self.variant = settings_signature(self.cfg["preprocess_max_edge"], self.cfg["preprocess_trim"],
+                                                  self.cfg["preprocess_format"])
+
+        self.pending = [img for img in to_convert if not self.restore_cached(img)]
+        self.more_later = self.watcher is not None or self.shard is not None or self.scanning  # admitted during the run
+        self.scheduled = list(self.pending)  # images queued for conversion, for the makespan report
+
+    def growing(self):
+        """True while more images can still join the run (`total` is a count so far)."""
+        return self.scanning or self.watcher is not None
+
+    def triage(self, images, resume=True):
+        """Journal `images` as queued and return the ones still to convert."""
+        to_convert = []
+        for img in images:
+            prev = self.resumed.get(source_name(img, self.cfg), {}).get("state") if resume else None
+            if prev == STATE_DONE:
+                self.completed += 1
+                self.success_count += 1
+                archive_image(img, self.cfg)
+                bar = progress_label(self.completed, self.total, self.growing())
+                print(f"  {colorize(bar, C.CYAN)}  {colorize('[DONE]', C.GREEN)} {source_path(img, self.cfg).with_suffix('.svg').as_posix()} (finished before interruption)")
+                continue
+            output_svg = output_path_for(img, self.cfg)
+            if output_svg.parent not in self.output_dirs:
+                output_svg.parent.mkdir(parents=True, exist_ok=True)
+                self.output_dirs.add(output_svg.parent)
+            if prev == STATE_RUNNING:
+                try:
+                    output_svg.unlink()
+                except OSError:
+                    pass
+            to_convert.append(img)
+            if self.journal is not None:
+                self.journal.record(source_name(img, self.cfg), STATE_QUEUED)
+        return to_convert
+
+    def provider_cache_key(self, digest, name, model=None):
+        pcfg = self.provider_cfgs[name] if model is None else dict(self.provider_cfgs[name], model=model)
+        return cache_key(digest, self.key_prompts[name], pcfg, self.variant)
+
+    def cache_models(self, name):
+        """Models whose cached output counts as a hit, strongest tier first."""
+        return list(reversed(self.routers[name].models)) if name in self.routers else [None]
+
+    def restore_cached(self, img):
+        """Restore `img` from the cache; returns True on a hit."""
+        if self.cache is None:
+            return False
+        try:
+            digest = hash_file(img)
+        except OSError:
+            return False
+        keys = (self.provider_cache_key(digest, name, model)
+                for name in self.provider_cfgs for model in self.cache_models(name))
+        for key in keys:
+            meta = self.cache.restore(key, output_path_for(img, self.cfg))
+            if meta is not None:
+                break
+        else:
+            self.cache_digests[img] = digest
+            return False
+
+        self.completed += 1
+        self.success_count += 1
+        self.cache_hits += 1
+        self.saved_tokens += meta["tokens"].get("total", 0)
+        self.saved_cost += meta["tokens"].get("cost_usd", 0.0)
+        if self.journal is not None:
+            self.journal.record(source_name(img, self.cfg), STATE_DONE, cached=True)
+        archive_image(img, self.cfg)
+        size_kb = meta["size"] // 1024
+        bar = progress_label(self.completed, self.total, self.growing())
+        print(f"  {colorize(bar, C.CYAN)}  {colorize('[CACHED]', C.GREEN)} {source_path(img, self.cfg).with_suffix('.svg').as_posix()} ({size_kb}KB)")
+        return True
+
+    def plan_dedupe(self):
+        """
+        Near-duplicate detection: one representative per perceptual-hash
+        cluster is converted; the other members wait in `followers` and are
+        released once it succeeds, either copying its SVG or with the short
+        diff prompt.
+        """
+        self.dedupe_index = None
+        self.image_hashes = {}
+        self.followers = {}   # representative img -> [(img, distance)]
+        self.copy_from = {}   # img -> SVG to copy instead of converting
+        self.diff_bases = {}  # img -> SVG the diff prompt starts from
+        self.digests = {}
+        self.dedupe_copied = self.dedupe_diffed = 0
+
+        if self.cfg["dedupe"] and (self.pending or self.more_later):
+            self.dedupe_index = PHashIndex(self.cfg["dedupe_index"], self.cfg["dedupe_hash"])
+            queued = self.plan_duplicates(self.pending)
+            reused = len(self.pending) - len(queued) + len(self.copy_from) + len(self.diff_bases)
+            self.pending = queued
+            if reused:
+                status(f"Near-duplicates: {reused} image(s) will reuse an existing SVG")
+                print()
+
+    def file_digest(self, img):
+        if img not in self.digests:
+            try:
+                self.digests[img] = hash_file(img)
+            except OSError:
+                self.digests[img] = ""
+        return self.digests[img]
+
+    def release_follower(self, img, svg, source_digest):
+        if self.cfg["dedupe_mode"] == "copy" or (source_digest and self.file_digest(img) == source_digest):
+            self.copy_from[img] = svg
+        else:
+            self.diff_bases[img] = svg
+
+    def plan_duplicates(self, images):
+        """Return the images to queue now; cluster followers are held back."""
+        hashes = self.dedupe_index.hash_images(images)
+        self.image_hashes.update(hashes)
+        hashed = [(img, hashes[img]) for img in images if img in hashes]
+        held_back = set()
+        for rep_img, members in cluster(hashed, self.cfg["dedupe_threshold"]):
+            prior = self.dedupe_index.nearest(hashes[rep_img], self.cfg["dedupe_threshold"])
+            if prior is not None:
+                # The whole cluster matches a screen converted earlier
+                entry = prior[1]
+                for img in [rep_img] + [m for m, _ in members]:
+                    self.release_follower(img, entry["svg"], entry.get("digest", ""))
+            elif members:
+                self.followers[rep_img] = members
+                held_back.update(m for m, _ in members)
+        return [img for img in images if img not in held_back]
+
+    def start_preprocessing(self):
+        """
+        Image preprocessing runs in a process pool alongside the conversions;
+        each image's copy is awaited just before it is submitted to the CLI.
+        """
+        self.prep_pool = None
+        self.prep_futures = {}
+        self.prepared = {}
+        self.prep_orig_bytes = self.prep_bytes = 0
+        self.prep_orig_tokens = self.prep_tokens = 0
+
+        if self.cfg["preprocess"] and (self.pending or self.more_later):
+            self.prep_pool = concurrent.futures.ProcessPoolExecutor()
+            self.start_prep(self.pending)
+
+    def start_prep(self, images):
+        """Submit `images` (and their held-back cluster followers) to the prep pool."""
+        # Tall images are cut into bands instead of being scaled down
+        to_prepare = [img for img in images if img not in self.copy_from and not self.tall(img)]
+        if self.cfg["dedupe_mode"] != "copy":
+            to_prepare += [m for img in images for m, _ in self.followers.get(img, [])]
+        for img in to_prepare:
+            self.prep_futures[img] = self.prep_pool.submit(
+                preprocess_image, str(img), str(self.cfg["preprocess_dir"]),
+                self.cfg["preprocess_max_edge"], self.cfg["preprocess_trim"], self.cfg["preprocess_format"])
+
+    def start_routing(self):
+        """
+        Model routing: images are scored in a process pool up front; the score
+        picks each attempt's model tier, raised by one for every escalation.
+        """
+        self.route_pool = None
+        self.route_futures = {}  # img -> future of score_image()
+        self.route_scores = {}   # img -> score_image() result
+        self.routed = set()      # images whose first routed attempt has finished
+        self.escalations = {}    # img -> tiers climbed after failures
+        self.escalated_count = 0
+
+        if self.routers and (self.pending or self.more_later):
+            self.route_pool = concurrent.futures.ProcessPoolExecutor()
+            self.start_scoring(self.pending)
+
+    def start_scoring(self, images):
+        for img in images:
+            if img not in self.copy_from and img not in self.route_futures:
+                self.route_futures[img] = self.route_pool.submit(score_image, str(img))
+
+    def route_score(self, img):
+        if img not in self.route_scores:
+            future = self.route_futures.pop(img, None) or self.route_pool.submit(score_image, str(img))
+            try:
+                self.route_scores[img] = future.result()
+            except Exception as exc:  # broken pool: use the default tier
+                self.route_scores[img] = {"score": None, "features": {}, "error": str(exc)[:200]}
+        return self.route_scores[img]
+
+    def start_svg_pool(self):
+        """
+        SVG validation and optimization: workers hand each new SVG to a process
+        pool (parsing is CPU-bound) and wait for it, so the checked, optimized
+        file is what gets cached and archived.  Outputs with issues
+        validate_svg() cannot repair go back to the CLI with FIX_PROMPT (up to
+        SVG_FIX_ATTEMPTS times).  An SVG cut off by a timeout or the turn limit
+        is closed locally when only closing tags are missing, or finished with
+        CONTINUE_PROMPT (pipeline/salvage.py).  Tall images are split and
+        stitched in the same pool.
+        """
+        self.svg_pool = None
+        self.svg_checks = {}  # SVG path -> validate_svg() report, until reported
+        self.svg_stats = {}   # SVG path -> optimize_svg() stats, until reported
+        self.salvage_reports = {}  # SVG path -> salvage_svg() report, until reported
+        self.opt_before = self.opt_after = 0
+        self.fix_attempts = {}  # img -> fix prompts sent
+        self.fix_issues = {}    # img -> issues for its next (fix) attempt
+        self.svg_repaired = self.svg_fixed = 0
+        self.continue_attempts = {}  # img -> continuation prompts sent
+        self.continue_issues = {}    # img -> where its SVG stops, for its next (continuation) attempt
+        self.salvaged_local = self.salvaged_continued = 0
+        self.tile_reports = {}  # SVG path -> stitch_svgs() stats, until reported
+        self.tiled_count = self.tiled_bands = 0
+
+        self.check = self.optimize = self.salvage = None
+        if (self.cfg["svg_validate"] or self.cfg["svg_optimize"] or self.cfg["salvage"] or self.cfg["tile"]) and (self.pending or self.more_later):
+            self.svg_pool = concurrent.futures.ProcessPoolExecutor()
+            self.check = self.check_output if self.cfg["svg_validate"] else None
+            self.optimize = self.optimize_output if self.cfg["svg_optimize"] else None
+            self.salvage = self.salvage_output if self.cfg["salvage"] else None
+
+    def check_output(self, svg_path):
+        try:
+            report = self.svg_pool.submit(validate_svg, str(svg_path)).result()
+        except Exception as exc:  # broken pool: accept the SVG unchecked
+            report = {"path": str(svg_path), "fixed": [], "issues": [],
+                      "error": str(exc)[:200]}
+        self.svg_checks[str(svg_path)] = report
+        return report
+
+    def optimize_output(self, svg_path):
+        try:
+            stats = self.svg_pool.submit(optimize_svg, str(svg_path), self.cfg["svg_precision"]).result()
+        except Exception as exc:  # broken pool, file gone: keep the SVG as written
+            size = svg_path.stat().st_size if svg_path.exists() else 0
+            stats = {"path": str(svg_path), "before": size, "after": size, "merged": 0,
+                     "error": str(exc)[:200]}
+        self.svg_stats[str(svg_path)] = stats
+        return stats
+
+    def salvage_output(self, svg_path):
+        try:
+            report = self.svg_pool.submit(salvage_svg, str(svg_path)).result()
+        except Exception as exc:  # broken pool: the failure stands
+            report = {"path": str(svg_path), "state": SALVAGE_NONE, "size": 0, "closed": 0,
+                      "dropped": 0, "issues": [], "error": str(exc)[:200]}
+        self.salvage_reports[str(svg_path)] = report
+        return report
+
+    def split_input(self, img):
+        return self.svg_pool.submit(split_image, str(img), str(tile_dir(self.cfg["output_dir"], source_path(img, self.cfg))),
+                                    self.cfg["tile_band_height"], self.cfg["tile_overlap"]).result()
+
+    def stitch_output(self, parts, svg_path, width, height):
+        stats = self.svg_pool.submit(stitch_svgs, parts, str(svg_path), width, height).result()
+        self.tile_reports[str(svg_path)] = stats
+        return stats
+
+    def build_pool(self):
+        """
+        Each provider has its own in-flight limit; work is submitted only while
+        some provider is below it, so limits can shrink/grow between
+        completions.  With several providers the pool routes each image to the
+        free one with the lowest recent latency (see pipeline/providers.py).
+        """
+        self.pool = ProviderPool([ProviderSlot(pcfg, self.concurrency_for(name)) for name, pcfg in self.provider_cfgs.items()],
+                                 quota_cooldown=FAILOVER_QUOTA_COOLDOWN, on_failover=self.on_failover)
+        self.queue = JobQueue(self.policy, self.predicted, self.pending)
+
+    def concurrency_for(self, name):
+        def on_change(old, new, reason):
+            label = f"{name} concurrency" if self.mixed else "Concurrency"
+            status(f"{label} {old} -> {new} ({reason})")
+
+        pcfg = self.provider_cfgs[name]
+        return AdaptiveConcurrency(
+            pcfg["parallel"], self.cfg["parallel_min"], pcfg["parallel_max"],
+            decrease_factor=ADAPTIVE_DECREASE_FACTOR,
+            latency_factor=ADAPTIVE_LATENCY_FACTOR,
+            cooldown=ADAPTIVE_COOLDOWN,
+            enabled=self.cfg["adaptive_parallel"],
+            on_change=on_change,
+        )
+
+    def add_usage(self, tokens, provider, model):
+        """Add one attempt's tokens to the run totals, prompt-cache reads/writes separately."""
+        self.total_tokens += tokens["total"]
+        self.total_cost += tokens["cost_usd"]
+        self.prompt_cache["input"] += tokens.get("input", 0)
+        self.prompt_cache["read"] += tokens.get("cache_read", 0)
+        self.prompt_cache["write"] += tokens.get("cache_write", 0)
+        if provider is not None:
+            self.prompt_cache["saved"] += cache_savings(tokens, model, provider)
+
+    def on_failover(self, slot, err_class, cooldown):
+        until = "for this run" if cooldown == float("inf") else f"for {format_time(cooldown)}"
+        print(colorize(f"  [FAILOVER] {slot.name} disabled {until} ({err_class}); "
+                       f"new work goes to the other provider(s)", C.YELLOW))
+
+    def preflight(self):
+        """
+        Pre-flight: tokens and list-price cost of what is left, per candidate
+        model, and the makespan the schedule predicts.
+        """
+        self.prompt_tokens = template_tokens(self.prompt_template)
+        planned = self.pending
+        if planned:
+            candidates = [(p["provider"], model) for p in self.providers
+                          for model in (self.routers[p["provider"]].models if p["provider"] in self.routers else [p["model"]])]
+            projections = {c: combine([estimate_call(self.size_of(img), self.prompt_tokens, c[1], c[0]) for img in planned])
+                           for c in candidates}
+            first = projections[candidates[0]]
+            status(f"Pre-flight: {'first ' if self.scanning else ''}{len(planned)} image(s), ~{format_tokens(first['input'])} input + "
+                   f"~{format_tokens(first['output'])} output tok")
+            for (name, model), estimate in projections.items():
+                label = f"{name}/{model or '(default)'}" if self.mixed else (model or "(default)")
+                line = f"      {label:<40} ~${estimate['cost_usd']:.2f}"
+                if self.budget.max_usd is not None and estimate["cost_usd"] > self.budget.max_usd:
+                    share = self.budget.max_usd / estimate["cost_usd"]
+                    line += f"  (budget covers ~{int(len(planned) * share)})"
+                print(colorize(line, C.DIM))
+        # Known up front unless images keep arriving (watch, shard) or the folder
+        # holds more than one window; then it is worked out once the walk is done
+        self.predicted_makespan = None
+        if self.watcher is None and self.shard is None and not self.scanning and len(planned) > 1:
+            self.predicted_makespan = predict_makespan([self.predicted(img) for img in self.policy_order(planned)],
+                                                       self.total_parallel)
+            baseline = predict_makespan([self.predicted(img) for img in sorted(planned, key=lambda i: source_name(i, self.cfg))],
+                                        self.total_parallel)
+            line = f"Schedule: {self.policy.name}, predicted makespan ~{format_time(self.predicted_makespan)}"
+            if self.policy.name != "name":
+                line += f" (file-name order ~{format_time(baseline)})"
+            status(line)
+            print()
+        self.schedule_errors = []  # |predicted - actual| / actual per converted image
+        self.ready_at = dict.fromkeys(self.pending, time.monotonic())  # img -> joined the queue
+
+    def prepare_attempts(self):
+        """Retry, metrics, live-token and batching state of the attempts."""
+        # Failed images wait in `delayed` (a heap of (ready_at, seq, img)) until
+        # their backoff expires and are then re-submitted; no worker sleeps.
+        self.retry = None
+        if self.cfg["retry_enabled"]:
+            self.retry = RetryEngine(RetryBudget(self.cfg["retry_budget_ratio"], self.cfg["retry_budget_min"]))
+        self.attempts = {}   # img -> attempts started
+        self.timeouts = {}   # img -> timeout for its next attempt
+        self.delayed = []
+        self.seq = itertools.count()
+
+        # Per-phase timings: JSONL trace + Prometheus textfile (see pipeline/metrics.py)
+        self.metrics = MetricsRecorder()
+        if self.cfg["metrics"]:
+            self.metrics = MetricsRecorder(
+                self.cfg["metrics_dir"] / (f"trace-{time.strftime('%Y%m%d-%H%M%S')}"
+                                           f"{'@' + self.shard.worker_id if self.shard is not None else ''}.jsonl"),
+                self.cfg["prom_textfile"])
+
+        # In streaming mode workers publish running totals for in-flight images
+        self.live = LiveTokens() if self.cfg["stream"] else None
+        self.last_live = (0, 0.0)
+        self.last_live_print = time.monotonic()
+
+        # -- Attempts and batches ----------------------------------------------------
+        # With BATCH_MAX > 1 fresh images are packed into one CLI call (see
+        # pipeline/batching.py); every image still gets its own Span, journal
+        # entries and result.  A failed member is re-queued once as a single
+        # conversion, outside the retry policy: a batch-mate may have broken
+        # the call.
+        self.batch_calls = self.batched_images = 0
+        self.batch_members = set()   # images whose attempt in flight is part of a batched call
+        self.unbatched = set()       # images given their single try after a failed batch
+
+    def new_span(self, img, slot):
+        span = Span(source_name(img, self.cfg), self.attempts.get(img, 0) + 1, self.ready_at.pop(img, None),
+                    provider=slot.name if slot is not None and self.mixed else None)
+        span.predicted = self.predicted(img)
+        return span
+
+    def begin_attempt(self, img, slot, span):
+        """Wait for the image's preprocessed copy and count the attempt."""
+        if img in self.prep_futures:
+            try:
+                with span.phase("prep_wait"):
+                    prep = self.prep_futures.pop(img).result()
+            except Exception as exc:
+                prep = None
+                status(f"Preprocess failed for {source_name(img, self.cfg)} ({str(exc)[:80]}); sending original")
+            if prep is not None:
+                self.prepared[img] = prep
+                before = estimate_image_tokens(prep["orig_width"], prep["orig_height"], slot.name)
+                after = estimate_image_tokens(prep["width"], prep["height"], slot.name)
+                self.prep_orig_bytes += prep["orig_bytes"]
+                self.prep_bytes += prep["bytes"]
+                self.prep_orig_tokens += before
+                self.prep_tokens += after
+                if not prep["passthrough"]:
+                    status(f"{source_name(img, self.cfg)}: {prep['orig_width']}x{prep['orig_height']} {format_size(prep['orig_bytes'])}"
+                           f" -> {prep['width']}x{prep['height']} {format_size(prep['bytes'])}"
+                           f" (~{format_tokens(before)} -> ~{format_tokens(after)} image tok)")
+        if img not in self.attempts and self.retry is not None:
+            self.retry.budget.record_attempt()
+        self.attempts[img] = self.attempts.get(img, 0) + 1
+
+    def route_for(self, img, slot, span):
+        router = self.routers[slot.name]
+        with span.phase("route"):
+            scored = self.route_score(img)
+        tier = router.tier_for(scored["score"], self.escalations.get(img, 0))
+        span.route = {"score": scored["score"], "tier": tier, "model": router.models[tier],
+                      "features": scored["features"]}
+        return span.route
+
+    def batch_size(self, img):
+        """Size the model will see: the preprocessed copy's if it is ready."""
+        prep = self.prepared.get(img)
+        return (prep["width"], prep["height"]) if prep else self.size_of(img)
+
+    def model_for(self, img, slot):
+        """The model `img` gets on `slot`: its routed tier, or the provider's model."""
+        router = self.routers.get(slot.name)
+        if router is None:
+            return slot.cfg["model"]
+        return router.models[router.tier_for(self.route_score(img)["score"], self.escalations.get(img, 0))]
+
+    def estimate_for(self, img, slot):
+        """Pre-flight tokens and cost of one attempt (pipeline/budget.py); a tall image's bands add up."""
+        if self.tall(img) and img not in self.fix_issues and img not in self.continue_issues and img not in self.diff_bases:
+            width, height = self.size_of(img)
+            bands = band_count(height, self.cfg["tile_band_height"])
+            band = (width, math.ceil(height / bands) + 2 * self.cfg["tile_overlap"])
+            return combine([estimate_call(band, self.prompt_tokens, self.model_for(img, slot), slot.name)] * bands)
+        return estimate_call(self.batch_size(img), self.prompt_tokens, self.model_for(img, slot), slot.name)
+
+    def over_budget(self, estimate):
+        """
+        True if the next call has to wait for the calls in flight, or if the
+        budget is used up (announced once, when that happens).
+        """
+        if self.budget.allows(self.total_tokens, self.total_cost, estimate):
+            return False
+        if self.budget.exceeded is None:
+            return True  # fits once the calls in flight are done
+        left = f"{len(self.queue) + len(self.delayed) + sum(len(m) for m in self.followers.values())} image(s)"
+        if self.scanning and self.shard is None:
+            left += " and the unread rest of the folder"
+        print(colorize(f"  [BUDGET] No new conversions: {self.budget.exceeded}. "
+                       f"{left} stay in {self.cfg['input_dir']} for the next run", C.YELLOW))
+        return True
+
+    def batchable(self, img, slot, route):
+        """True for a fresh full-prompt image that would get the same model."""
+        if (img in self.copy_from or img in self.fix_issues or img in self.continue_issues or img in self.diff_bases
+                or img in self.attempts or self.tall(img)):
+            return False
+        if route is None:
+            return True
+        return self.routers[slot.name].tier_for(self.route_score(img)["score"]) == route["tier"]
+
+    def busy(self):
+        """Slots taken: one per call in flight, one per band call a tiled image may run at once."""
+        return sum(call.held for call in self.calls.values())
+
+    def in_flight(self):
+        """Images whose call is in flight."""
+        return sum(len(call.imgs) for call in self.calls.values())
+
+    def unpack(self, done):
+        """
+        Yield (img, span, slot, route, result, failed_over) for every image of
+        the finished futures.  A batched call counts once towards its
+        provider's concurrency and latency, with its per-image outcomes; a
+        tiled image frees every slot its band calls held.
+
+        Of a hedged pair only the attempt that settles the image is yielded:
+        the first success, or the second failure.  Its SVG is moved into
+        OUTPUT_DIR; the other one's stays in its own directory, and its
+        tokens are added to the run as the hedge's extra cost.
+        """
+        for future in done:
+            call = self.calls.pop(future)
+            imgs, slot, route = call.imgs, call.slot, call.route
+            streamed = None
+            if self.live is not None:
+                streamed = self.live.pop(source_name(imgs[0], self.cfg) + (HEDGE_LIVE_SUFFIX if call.hedge else ""))
+            if call.superseded or (call.hedge and future.cancelled()):
+                # The other attempt won (or the run was aborted): free the slot
+                self.budget.release(future)
+                self.pool.cancel(slot)
+                tokens = streamed or dict(NO_TOKENS)
+                if not future.cancelled():
+                    tokens = future.result()[5]
+                if tokens["total"]:
+                    self.add_usage(tokens, slot.name, route["model"] if route is not None else slot.cfg["model"])
+                    self.hedging.wasted(tokens)
+                self.drop_attempt(imgs[0], call.private)
+                continue
+            if future.cancelled():
+                self.budget.release(future)
+                if slot is not None:
+                    self.pool.cancel(slot, call.held)
+                for img, span in zip(imgs, call.spans):
+                    yield img, span, slot, route, (source_name(img, self.cfg), False, 0.0, 0, ERR_CANCELLED, dict(NO_TOKENS)), False
+                continue
+            results = future.result() if len(imgs) > 1 else [future.result()]
+            failed_over = False
+            if slot is not None:
+                errors = [None if r[1] else classify_error(r[4]) for r in results]
+                converted = errors.count(None)
+                usage = {"total": sum(r[5]["total"] for r in results),
+                         "cost_usd": sum(r[5]["cost_usd"] for r in results)}
+                failed_over = self.pool.finish(slot, None if converted else errors[0],
+                                               sum(r[2] for r in results), usage, converted, len(imgs), call.held)
+                self.budget.release(future, call.estimate, usage)
+                if self.hedging is not None and len(imgs) == 1 and call.held == 1 and results[0][1]:
+                    self.hedging.observe(results[0][2])
+            if call.partner is not None:
+                partner = self.calls[call.partner]
+                partner.partner = None
+                if not results[0][1]:
+                    # The other attempt carries on alone
+                    tokens = results[0][5]
+                    self.add_usage(tokens, slot.name, route["model"] if route is not None else slot.cfg["model"])
+                    self.hedging.wasted(tokens)
+                    self.drop_attempt(imgs[0], call.private)
+                    continue
+                # Still running, or being killed: whatever it writes from
+                # now on goes to its own directory, never to OUTPUT_DIR
+                self.engine.cancel(call.partner)
+                partner.superseded = True
+            if call.private is not None:
+                self.adopt_attempt(imgs[0], call.private, call.hedge and results[0][1])
+            for img, span, result in zip(imgs, call.spans, results):
+                yield img, span, slot, route, result, failed_over
+
+    def prepare_hedging(self):
+        """
+        A single-image attempt running past the hedge threshold gets a second
+        one.  Both write below OUTPUT_DIR/.hedge/<n>/, a directory per attempt
+        (see pipeline/hedging.py), and only the SVG of the attempt that settles
+        the image is moved into OUTPUT_DIR.  The pair is linked through
+        Call.partner.
+        """
+        self.hedge_wins = set()     # images whose SVG came from a hedge, until reported
+        self.attempt_dirs = itertools.count(1)
+
+    def private_cfg(self, img, attempt_cfg):
+        """`attempt_cfg` with an output directory no other attempt writes to."""
+        private = dict(attempt_cfg, output_dir=self.cfg["output_dir"] / HEDGE_DIR_NAME / str(next(self.attempt_dirs)))
+        output_path_for(img, private).parent.mkdir(parents=True, exist_ok=True)
+        return private
+
+    def drop_attempt(self, img, private):
+        """Forget the SVG and check/optimize/salvage results of an attempt that lost."""
+        svg = output_path_for(img, private)
+        for reports in (self.svg_checks, self.svg_stats, self.salvage_reports):
+            reports.pop(str(svg), None)
+        try:
+            svg.unlink()
+        except OSError:
+            pass
+
+    def adopt_attempt(self, img, private, won_hedge):
+        """Move a settling attempt's SVG (and its check/optimize results) into OUTPUT_DIR."""
+        attempt_svg, output_svg = output_path_for(img, private), output_path_for(img, self.cfg)
+        if won_hedge:
+            self.hedging.won += 1
+            self.hedge_wins.add(img)
+        try:
+            commit_file(attempt_svg, output_svg, replace=True)
+        except OSError:
+            pass  # nothing written, or OUTPUT_DIR unwritable
+        for reports in (self.svg_checks, self.svg_stats, self.salvage_reports):
+            if str(attempt_svg) in reports:
+                reports[str(output_svg)] = reports.pop(str(attempt_svg))
+
+    def next_hedge_in(self, now):
+        """
+        Seconds until the next attempt crosses the threshold, None if there
+        is none.  Attempts already past it wait for a slot, i.e. for a
+        completion.
+        """
+        threshold = self.hedging.threshold()
+        if threshold is None:
+            return None
+        return next((call.hedgeable[1] + threshold - now for call in self.calls.values()
+                     if call.hedgeable is not None and call.hedgeable[1] + threshold > now), None)
+
+    def start_hedges(self, now):
+        threshold = self.hedging.threshold()
+        if threshold is None:
+            return
+        hedges = sum(call.hedge for call in self.calls.values())
+        # Calls are in submission order, so the oldest come first
+        for future, call in list(self.calls.items()):
+            if call.hedgeable is None:
+                continue
+            img, (template, started) = call.imgs[0], call.hedgeable
+            if hedges >= self.hedging.limit(self.pool.limit) or now - started < threshold:
+                break
+            slot = self.pool.pick()
+            if slot is None:
+                break
+            if self.budget.enabled:
+                estimate = self.estimate_for(img, slot)
+                if self.over_budget(estimate):
+                    break
+            call.hedgeable = None
+            span = Span(source_name(img, self.cfg), self.attempts[img], provider=slot.name if self.mixed else None)
+            attempt_cfg = self.private_cfg(img, dict(slot.cfg, timeout=self.timeouts.get(img, slot.cfg["timeout"])))
+            route = None
+            if slot.name in self.routers:
+                route = self.route_for(img, slot, span)
+                attempt_cfg["model"] = route["model"]
+            hedge = self.engine.submit(run_conversion(img, template, attempt_cfg, None, self.live, self.prepared.get(img),
+                                                      span, self.check, self.optimize,
+                                                      live_key=source_name(img, self.cfg) + HEDGE_LIVE_SUFFIX,
+                                                      salvage=self.salvage))
+            self.pool.start(slot)
+            second = self.calls[hedge] = Call([img], [span], slot, route)
+            if self.budget.enabled:
+                second.estimate = estimate
+                self.budget.reserve(hedge, estimate)
+            second.private = attempt_cfg
+            second.hedge = True
+            second.partner, call.partner = future, hedge
+            hedges += 1
+            self.hedging.started += 1
+            status(f"Hedging {source_name(img, self.cfg)}: running {format_time(now - started)}, "
+                   f"{self.hedging.label} is {format_time(threshold)}")
+
+    def prepare_loop(self):
+        """
+        Bounded queue: keep about `window` images queued or in flight, reading
+        more of the input folder as slots free up (refill()).  A shard worker
+        claims them from the shared folder instead, and hands the images of
+        dead workers back to it.
+        """
+        self.next_reclaim = time.monotonic() + (self.shard.interval if self.shard is not None else 0)
+
+        self.engine = AsyncEngine()  # runs the conversions; see pipeline/engine.py
+        self.shutdown = GracefulShutdown(on_request=self.on_shutdown, on_abort=self.on_abort)
+        self.status_file = StatusFile(self.cfg["status_file"]) if self.watcher is not None else None
+        self.next_beat = 0.0
+        self.next_evict = time.monotonic() + CACHE_EVICT_INTERVAL
+        self.idle = False
+
+    def admit(self, images, announce=True, resume=False):
+        """
+        New files (watch mode) and the rest of the input folder go through the
+        same cache/dedupe/prep steps and join `queue`, so they start as soon as
+        a slot is free.  `resume` applies the --resume journal to them.
+        """
+        active = set(self.queue) | {img for call in self.calls.values() for img in call.imgs} | {entry[2] for entry in self.delayed}
+        images = [img for img in images if img not in active]
+        self.total += len(images)
+        if announce:
+            for img in images:
+                status(f"New image: {source_name(img, self.cfg)}")
+        fresh = [img for img in self.triage(images, resume) if not self.restore_cached(img)]
+        if self.dedupe_index is not None and fresh:
+            fresh = self.plan_duplicates(fresh)
+        if self.prep_pool is not None:
+            self.start_prep(fresh)
+        if self.route_pool is not None:
+            self.start_scoring(fresh)
+        self.queue.extend(fresh)
+        self.scheduled.extend(fresh)
+        self.ready_at.update(dict.fromkeys(fresh, time.monotonic()))
+
+    def refill(self, now):
+        if self.shard is not None and now >= self.next_reclaim:
+            self.next_reclaim = now + self.shard.interval
+            for worker, count in self.shard.reclaim().items():
+                status(f"Reclaimed {count} image(s) from {worker} (no heartbeat for {format_time(self.shard.ttl)})")
+        want = self.window - len(self.queue) - len(self.delayed) - self.in_flight()
+        if want <= 0:
+            return
+        if self.shard is not None:
+            candidates = self.scan_input()
+            if self.watcher is not None:
+                # Not yet settled: the file may still be being written
+                cutoff = time.time() - self.cfg["watch_settle"]
+                candidates = (p for p in candidates if modified_before(p, cutoff))
+            more = self.shard.claim(candidates, want)
+            self.scanning = len(more) >= want
+        else:
+            more = list(itertools.islice(self.feed, want))
+            self.scanning = len(more) >= want
+            if not self.scanning:
+                self.feed = None
+            if self.watcher is not None:
+                more = [p for p in more if not self.watcher.seen(p)]  # the watcher got there first
+                self.watcher.mark_seen(more)
+        if more:
+            self.idle = False
+            self.admit(more, announce=self.shard is not None and self.watcher is not None, resume=True)
+
+    # SIGTERM/SIGINT: stop starting work, let in-flight conversions finish.
+    # A second signal cancels them: the engine kills each CLI's process tree.
+    def on_shutdown(self, signum):
+        print(colorize("  [STOP] Finishing in-flight conversions; signal again to cancel them", C.YELLOW))
+
+    def on_abort(self, signum):
+        cancelled = self.engine.cancel_all(self.calls)
+        print(colorize(f"  [ABORT] Cancelled {cancelled} in-flight call(s); signal again to exit at once", C.YELLOW))
+
+    def heartbeat(self, state):
+        self.status_file.write(
+            state,
+            input_dir=str(self.cfg["input_dir"]),
+            watcher=self.watcher.backend,
+            in_flight=self.in_flight(),
+            queued=len(self.queue) + len(self.delayed),
+            settling=self.watcher.settling,
+            concurrency=self.pool.limit,
+            converted=self.success_count,
+            failed=self.fail_count,
+            cache_hits=self.cache_hits,
+            tokens=self.total_tokens,
+            cost_usd=round(self.total_cost, 4),
+        )
+
+    def convert_all(self):
+        """
+        The main loop: top up the queue, start calls while slots are free, wait
+        for the first one to finish and record it.  Ends when nothing is in
+        flight and nothing more can start.
+        """
+        self.loop_start = self.last_finish = time.monotonic()  # for the actual makespan
+        with contextlib.closing(self.engine):
+            self.finished = []   # completed attempts waiting to be recorded
+            while self.calls or (not self.shutdown.requested and not self.budget.exceeded
+                                   and (self.queue or self.delayed or self.watcher is not None or self.scanning)):
+                now = time.monotonic()
+                if ((self.shard is not None or self.feed is not None) and not self.shutdown.requested
+                        and not self.budget.exceeded):
+                    self.refill(now)
+                if self.watcher is not None and not self.shutdown.requested:
+                    arrived = self.watcher.poll()
+                    if arrived and self.shard is None:  # in shard mode refill() claims new files
+                        self.idle = False
+                        self.admit(arrived)
+                    if self.status_file is not None and now >= self.next_beat:
+                        self.heartbeat("running")
+                        self.metrics.write_prometheus()
+                        self.next_beat = now + self.cfg["heartbeat_seconds"]
+                    if self.cache is not None and now >= self.next_evict:
+                        self.cache.evict()
+                        self.next_evict = now + CACHE_EVICT_INTERVAL
+
+                while self.delayed and self.delayed[0][0] <= now and not self.shutdown.requested:
+                    img = heapq.heappop(self.delayed)[2]
+                    self.queue.appendleft(img)
+                    self.ready_at[img] = now
+
+                if self.hedging is not None and not self.shutdown.requested and not self.budget.exceeded:
+                    self.start_hedges(now)
+
+                self.start_calls(now)
+
+                wait_for = max(0.0, self.delayed[0][0] - time.monotonic()) if self.delayed else None
+                if self.watcher is not None or (self.shard is not None and self.scanning):
+                    wait_for = WATCH_TICK_SECONDS if wait_for is None else min(wait_for, WATCH_TICK_SECONDS)
+                if not self.calls:
+                    if self.shutdown.requested or wait_for is None:
+                        continue
+                    if self.watcher is not None:
+                        if not self.queue and not self.delayed and not self.idle:
+                            self.idle = True
+                            status(f"Idle, watching {self.cfg['input_dir']} for new images")
+                        self.watcher.wait(wait_for)
+                    else:
+                        time.sleep(wait_for)  # only backoff timers left
+                    continue
+                if self.live is not None:
+                    wait_for = LIVE_REFRESH_SECONDS if wait_for is None else min(wait_for, LIVE_REFRESH_SECONDS)
+                hedge_in = self.next_hedge_in(time.monotonic()) if self.hedging is not None else None
+                if hedge_in is not None:
+                    wait_for = hedge_in if wait_for is None else min(wait_for, hedge_in)
+
+                done, _ = concurrent.futures.wait(
+                    self.calls, timeout=wait_for, return_when=concurrent.futures.FIRST_COMPLETED)
+
+                # Live running total including conversions still in flight
+                if self.live is not None and time.monotonic() - self.last_live_print >= LIVE_REFRESH_SECONDS:
+                    snapshot = self.live.snapshot()
+                    if snapshot != self.last_live and snapshot[0] > 0:
+                        in_tok, in_cost = snapshot
+                        print(f"  {colorize(f'  Token: {format_tokens(self.total_tokens + in_tok)} total ({format_tokens(in_tok)} in flight) | Cost: ${self.total_cost + in_cost:.4f}', C.DIM)}")
+                        self.last_live = snapshot
+                    self.last_live_print = time.monotonic()
+
+                for src_img, span, slot, route, result, failed_over in self.unpack(done):
+                    self.record(src_img, span, slot, route, result, failed_over)
+
+                for entry in self.finished:
+                    self.metrics.record(*entry)
+                self.finished.clear()
+                if self.history is not None:
+                    try:
+                        self.history.flush()
+                    except sqlite3.Error:
+                        pass  # non-critical; rows stay queued for the next flush
+
+    def start_calls(self, now):
+        """Start calls from the head of the queue while a slot is free and the budget allows it."""
+        while self.queue and self.busy() < self.pool.limit and not self.shutdown.requested and not self.budget.exceeded:
+            if self.shard is not None and not self.shard.holds(self.queue[0]):
+                # Lease reclaimed by another worker (heartbeat stalled): it converts it
+                lost = self.queue.popleft()
+                self.shard.lost += 1
+                self.total -= 1
+                print(colorize(f"  [WARN] Lease on {lost.name} was lost; leaving it to the worker that reclaimed it", C.YELLOW))
+                continue
+            slot = None
+            if self.queue[0] not in self.copy_from:
+                slot = self.pool.pick()
+                if slot is None:
+                    break  # every provider is at its limit
+                if self.budget.enabled:
+                    estimate = self.estimate_for(self.queue[0], slot)
+                    if self.over_budget(estimate):
+                        break
+            img = self.queue.popleft()
+            span = self.new_span(img, slot)
+            if img in self.copy_from:
+                future = self.engine.run_sync(copy_svg, img, self.copy_from[img], self.cfg, span)
+                self.calls[future] = Call([img], [span])
+                continue
+            self.begin_attempt(img, slot, span)
+            attempt_cfg = slot.cfg
+            if img in self.timeouts:
+                attempt_cfg = dict(slot.cfg, timeout=self.timeouts[img])
+            route = None
+            if slot.name in self.routers:
+                route = self.route_for(img, slot, span)
+                attempt_cfg = dict(attempt_cfg, model=route["model"])
+            template = self.prompt_template
+            # The fix and continuation prompts edit the SVG in OUTPUT_DIR: not hedged
+            fixing = img in self.fix_issues or img in self.continue_issues
+            if img in self.fix_issues:
+                template = render_prompt(FIX_PROMPT, output_path_for(img, self.cfg), self.fix_issues.pop(img))
+            elif img in self.continue_issues:
+                template = render_prompt(CONTINUE_PROMPT, output_path_for(img, self.cfg), self.continue_issues.pop(img))
+            elif img in self.diff_bases:
+                template = render_prompt(DIFF_PROMPT, self.diff_bases[img])
+            # A tall image's bands run as separate calls, on as many free slots as it has bands
+            tiles = self.tall(img) and template is self.prompt_template
+            calls = 1
+            if tiles:
+                calls = max(1, min(band_count(self.size_of(img)[1], self.cfg["tile_band_height"]),
+                                   slot.concurrency.limit - slot.in_flight, self.pool.limit - self.busy()))
+            batch, batch_spans = [img], [span]
+            batch_estimates = [estimate] if self.budget.enabled else []
+            if self.cfg["batch_max"] > 1 and template is self.prompt_template and self.attempts[img] == 1 and not tiles:
+                # Pack the next fresh images into the same call while they fit
+                room = batch_budget(attempt_cfg["model"], self.cfg["batch_context_share"])
+                room -= batch_cost(self.batch_size(img), slot.name)
+                # Spread a short queue over the free slots instead of one big call
+                free = max(1, self.pool.limit - self.busy())
+                limit = min(self.cfg["batch_max"], math.ceil((len(self.queue) + 1) / free))
+                while (len(batch) < limit and self.queue and self.batchable(self.queue[0], slot, route)
+                       and (self.shard is None or self.shard.holds(self.queue[0]))):
+                    cost = batch_cost(self.batch_size(self.queue[0]), slot.name)
+                    if cost > room:
+                        break
+                    if self.budget.enabled:
+                        member_estimate = self.estimate_for(self.queue[0], slot)
+                        if self.over_budget(combine(batch_estimates + [member_estimate])):
+                            break
+                        batch_estimates.append(member_estimate)
+                    room -= cost
+                    member = self.queue.popleft()
+                    member_span = self.new_span(member, slot)
+                    self.begin_attempt(member, slot, member_span)
+                    if route is not None:
+                        self.route_for(member, slot, member_span)
+                    batch.append(member)
+                    batch_spans.append(member_span)
+            if len(batch) > 1:
+                batch_prep = {m: self.prepared[m] for m in batch if m in self.prepared}
+                future = self.engine.submit(run_batch(batch, template, attempt_cfg, self.journal, self.live,
+                                                      batch_prep, batch_spans, self.check, self.optimize, self.salvage))
+                self.batch_calls += 1
+                self.batched_images += len(batch)
+                self.batch_members.update(batch)
+            elif tiles:
+                future = self.engine.submit(run_tiled(img, template, attempt_cfg, self.journal, self.live, span, self.check,
+                                                      self.optimize, self.split_input, self.stitch_output, calls,
+                                                      self.salvage))
+            else:
+                if self.hedging is not None and not fixing:
+                    # May be hedged: write where a second attempt cannot collide
+                    attempt_cfg = self.private_cfg(img, attempt_cfg)
+                future = self.engine.submit(run_conversion(img, template, attempt_cfg, self.journal, self.live,
+                                                           self.prepared.get(img), span, self.check, self.optimize,
+                                                           salvage=self.salvage))
+            self.pool.start(slot, len(batch), calls)
+            call = self.calls[future] = Call(batch, batch_spans, slot, route)
+            call.held = calls
+            if self.budget.enabled:
+                call.estimate = combine(batch_estimates)
+                self.budget.reserve(future, call.estimate)
+            if self.hedging is not None and len(batch) == 1 and not fixing and not tiles:
+                call.hedgeable = (template, time.monotonic())
+                call.private = attempt_cfg
+
+    def record(self, src_img, span, slot, route, result, failed_over):
+        """
+        Settle one image's attempt: queue it again (failover, escalation,
+        continuation, fix prompt, single try after a batch, retry, full prompt
+        after a diff), or count it as converted or failed.
+        """
+        filename, success, elapsed, size_kb, error, tokens = result
+        batched = src_img in self.batch_members
+        self.batch_members.discard(src_img)
+        if error == ERR_CANCELLED:
+            # Aborted run: back to the queue, --resume picks it up
+            self.queue.appendleft(src_img)
+            if self.journal is not None:
+                self.journal.record(filename, STATE_QUEUED, attempt=self.attempts.get(src_img, 0) + 1,
+                                    retry_of=ERR_CANCELLED)
+            return
+        self.last_finish = time.monotonic()
+        err_class = None if success or src_img in self.copy_from else classify_error(error)
+        # Recorded after this batch of completions, so archive and
+        # cache writes below still land in the span
+        self.finished.append((span, success, elapsed, tokens, err_class))
+        model = None
+        if slot is not None:
+            model = route["model"] if route is not None else slot.cfg["model"]
+        if self.history is not None and slot is not None:
+            self.history.record(self.run_id, source_name(src_img, self.cfg), slot.name, model, self.size_of(src_img),
+                                elapsed, tokens, success, err_class, self.attempts[src_img])
+        if src_img in self.copy_from and not success:
+            # The SVG to copy is gone; convert this image normally
+            del self.copy_from[src_img]
+            self.queue.append(src_img)
+            return
+        if failed_over:
+            # The provider is out of rotation; another one takes the image
+            self.queue.appendleft(src_img)
+            self.ready_at[src_img] = time.monotonic()
+            self.add_usage(tokens, slot.name, model)
+            if self.journal is not None:
+                self.journal.record(filename, STATE_QUEUED, attempt=self.attempts[src_img] + 1,
+                                    retry_of=err_class)
+            return
+
+        if error == "cli_not_found":
+            cli_name = "claude" if slot.name == PROVIDER_CLAUDE else "codex"
+            print(colorize(f"    Error: '{cli_name}' CLI not found. Make sure it's installed and in PATH.", C.RED))
+            pause(self.cfg, 1)
+
+        if error and error not in ("cli_not_found",):
+            print(f"    {colorize('Error:', C.RED)} {error}")
+
+        # Accumulate token usage
+        self.add_usage(tokens, slot.name if slot is not None else None, model)
+
+        report = self.svg_checks.pop(str(output_path_for(src_img, self.cfg)), None)
+        salvaged = self.salvage_reports.pop(str(output_path_for(src_img, self.cfg)), None)
+        tiled = self.tile_reports.pop(str(output_path_for(src_img, self.cfg)), None)
+        # A cut-off SVG is finished with the continuation prompt before anything else
+        resume_svg = (not success and salvaged is not None and salvaged["state"] == SALVAGE_PARTIAL
+                      and self.continue_attempts.get(src_img, 0) < self.cfg["salvage_attempts"])
+        if route is not None:
+            router = self.routers[slot.name]
+            escalate = not success and not resume_svg and router.can_escalate(route["tier"], err_class)
+            router.record(route["model"], src_img not in self.routed, success, escalate, elapsed, tokens)
+            self.routed.add(src_img)
+            if escalate:
+                # A stronger model starts from scratch (no fix prompt)
+                self.escalations[src_img] = self.escalations.get(src_img, 0) + 1
+                self.escalated_count += 1
+                self.queue.append(src_img)
+                self.ready_at[src_img] = time.monotonic()
+                if self.journal is not None:
+                    self.journal.record(filename, STATE_QUEUED, attempt=self.attempts[src_img] + 1,
+                                        retry_of=err_class)
+                print(f"  {colorize('[ESCALATE]', C.YELLOW)} {filename} "
+                      f"{route['model']} -> {router.models[route['tier'] + 1]} ({err_class})")
+                return
+        if resume_svg:
+            self.continue_attempts[src_img] = self.continue_attempts.get(src_img, 0) + 1
+            self.continue_issues[src_img] = salvaged["issues"]
+            self.queue.append(src_img)
+            self.ready_at[src_img] = time.monotonic()
+            if self.journal is not None:
+                self.journal.record(filename, STATE_QUEUED, attempt=self.attempts[src_img] + 1,
+                                    retry_of=err_class)
+            print(f"  {colorize('[CONTINUE]', C.YELLOW)} {filename} from its cut-off SVG "
+                  f"({format_size(salvaged['size'])} written, {err_class})")
+            return
+        if (err_class == ERR_INVALID_SVG and report is not None
+                and self.fix_attempts.get(src_img, 0) < self.cfg["svg_fix_attempts"]):
+            # Ask the CLI to fix the existing SVG rather than redo it
+            self.fix_attempts[src_img] = self.fix_attempts.get(src_img, 0) + 1
+            self.fix_issues[src_img] = report["issues"]
+            self.queue.append(src_img)
+            self.ready_at[src_img] = time.monotonic()
+            if self.journal is not None:
+                self.journal.record(filename, STATE_QUEUED, attempt=self.attempts[src_img] + 1,
+                                    retry_of=err_class)
+            print(f"  {colorize('[FIX]', C.YELLOW)} {filename} with the fix prompt "
+                  f"({len(report['issues'])} issue(s))")
+            return
+
+        if not success and batched and err_class not in PROVIDER_ERRORS:
+            self.unbatched.add(src_img)
+            self.queue.append(src_img)
+            self.ready_at[src_img] = time.monotonic()
+            if self.journal is not None:
+                self.journal.record(filename, STATE_QUEUED, attempt=self.attempts[src_img] + 1,
+                                    retry_of=err_class)
+            print(f"  {colorize('[SINGLE]', C.YELLOW)} {filename} on its own "
+                  f"({err_class} in a batched call)")
+            return
+
+        if not success and self.retry is not None:
+            # The single try after a failed batch does not count against the policy
+            decision = self.retry.next_retry(
+                err_class, self.attempts[src_img] - (src_img in self.unbatched),
+                self.timeouts.get(src_img, slot.cfg["timeout"]))
+            if decision is not None:
+                delay, self.timeouts[src_img] = decision
+                heapq.heappush(self.delayed, (time.monotonic() + delay, next(self.seq), src_img))
+                self.retry_count += 1
+                if self.journal is not None:
+                    self.journal.record(filename, STATE_QUEUED, attempt=self.attempts[src_img] + 1,
+                                        retry_of=err_class)
+                print(f"  {colorize('[RETRY]', C.YELLOW)} {filename} in {format_time(delay)} "
+                      f"({err_class}, attempt {self.attempts[src_img] + 1})")
+                return
+
+        if not success and src_img in self.diff_bases:
+            # The diff prompt did not work out; fall back to a full conversion
+            del self.diff_bases[src_img]
+            print(f"  {colorize('[RETRY]', C.YELLOW)} {filename} with the full prompt (diff failed)")
+            self.queue.append(src_img)
+            return
+
+        self.completed += 1
+
+        time_str = format_time(elapsed)
+        name = Path(filename).with_suffix("").as_posix()
+        bar = progress_label(self.completed, self.total, self.growing())
+        tok_str = f"{format_tokens(tokens['total'])} tok"
+        if tokens.get("cache_read") and tokens["input"]:
+            tok_str += f", {tokens['cache_read'] / tokens['input']:.0%} cached"
+        cost_str = f"${tokens['cost_usd']:.4f}"
+
+        if success:
+            self.success_count += 1
+            if slot is not None and elapsed > 0:
+                self.schedule_errors.append(abs(self.predicted(src_img) - elapsed) / elapsed)
+            if src_img in self.cache_digests and slot is not None:
+                try:
+                    with span.phase("cache_store"):
+                        key = self.provider_cache_key(self.cache_digests[src_img], slot.name,
+                                                      route["model"] if route else None)
+                        self.cache.store(key, output_path_for(src_img, self.cfg),
+                                         filename, tokens, elapsed)
+                except OSError:
+                    pass  # non-critical; next run converts again
+            salvage_state = None
+            if salvaged is not None and salvaged["state"] in (SALVAGE_COMPLETE, SALVAGE_REPAIRED):
+                salvage_state = salvaged["state"]
+            elif src_img in self.continue_attempts:
+                salvage_state = "continued"
+            if self.journal is not None:
+                extra = {"salvaged": salvage_state} if salvage_state else {}
+                self.journal.record(source_name(src_img, self.cfg), STATE_DONE, result=result, **extra)
+            output_svg = output_path_for(src_img, self.cfg)
+            if self.dedupe_index is not None and src_img in self.image_hashes:
+                self.dedupe_index.add(self.image_hashes[src_img], filename,
+                                      self.file_digest(src_img), output_svg)
+            for member, _ in self.followers.pop(src_img, []):
+                self.release_follower(member, output_svg, self.file_digest(src_img))
+                self.queue.append(member)
+                self.ready_at[member] = time.monotonic()
+            label = "[OK]"
+            if src_img in self.copy_from:
+                self.dedupe_copied += 1
+                label = "[COPY]"
+            elif salvage_state == "continued":
+                self.salvaged_continued += 1
+                label = "[CONTINUED]"
+            elif salvage_state is not None:
+                self.salvaged_local += 1
+                label = "[SALVAGED]"
+            elif src_img in self.fix_attempts:
+                self.svg_fixed += 1
+                label = "[FIXED]"
+            elif src_img in self.diff_bases:
+                self.dedupe_diffed += 1
+                label = "[DIFF]"
+            elif src_img in self.hedge_wins:
+                label = "[HEDGE]"
+            elif tiled is not None:
+                self.tiled_count += 1
+                self.tiled_bands += tiled["bands"]
+                label = "[TILED]"
+            self.hedge_wins.discard(src_img)
+            # Move source image to archive
+            with span.phase("archive"):
+                archived = archive_image(src_img, self.cfg)
+            if not archived and self.shard is not None:
+                print(colorize(f"  [WARN] Lease on {source_name(src_img, self.cfg)} was lost while converting; it may be converted twice", C.YELLOW))
+            size_str = f"{size_kb}KB"
+            opt = self.svg_stats.pop(str(output_svg), None)
+            if opt is not None:
+                self.opt_before += opt["before"]
+                self.opt_after += opt["after"]
+            if opt is not None and opt["after"] < opt["before"]:
+                size_str = f"{format_size(opt['before'])} -> {format_size(opt['after'])}"
+            print(f"  {colorize(bar, C.CYAN)}  {colorize(label, C.GREEN)} {name}.svg ({size_str}, {time_str}, {tok_str}, {cost_str})")
+            if salvage_state == SALVAGE_REPAIRED:
+                closed_str = f"closed {salvaged['closed']} open element(s)"
+                if salvaged["dropped"]:
+                    closed_str += f", dropped {salvaged['dropped']} byte(s) of a cut-off tag"
+                print(f"    {colorize('Salvaged: ' + closed_str, C.DIM)}")
+            elif salvage_state == SALVAGE_COMPLETE:
+                print(f"    {colorize('Salvaged: the SVG was complete when the CLI stopped', C.DIM)}")
+            if label == "[TILED]":
+                tile_str = f"Tiled: {tiled['bands']} bands stitched, {tiled['variants']} variant(s)"
+                if tiled["shared"]:
+                    tile_str += f", {tiled['shared']} shared def(s)"
+                if tiled["renamed"]:
+                    tile_str += f", {tiled['renamed']} id(s) renamed"
+                print(f"    {colorize(tile_str, C.DIM)}")
+            if report is not None and report["fixed"]:
+                self.svg_repaired += 1
+                print(f"    {colorize('Repaired: ' + ', '.join(report['fixed']), C.DIM)}")
+        else:
+            self.fail_count += 1
+            self.failed_files.append(filename)
+            if self.journal is not None:
+                self.journal.record(filename, STATE_FAILED, result=result)
+            # Promote the next cluster member so the rest still get converted
+            members = self.followers.pop(src_img, [])
+            if members:
+                new_rep = members[0][0]
+                rest = [(m, hamming(self.image_hashes[new_rep], self.image_hashes[m])) for m, _ in members[1:]]
+                if rest:
+                    self.followers[new_rep] = rest
+                self.queue.append(new_rep)
+            print(f"  {colorize(bar, C.CYAN)}  {colorize('[FAIL]', C.RED)} {filename} ({time_str})")
+
+        # Live running total, ETA and projected cost
+        line = f"  Token: {format_tokens(self.total_tokens)} total | Cost: ${self.total_cost:.4f}"
+        if success and src_img not in self.copy_from:
+            self.eta.add(elapsed, tokens["cost_usd"])
+        remaining = self.total - self.completed
+        if remaining > 0 and not self.scanning:  # no ETA until the folder has been read
+            _, per_image_cost = self.eta.per_image()
+            line += f" | ETA {format_time(self.eta.eta(remaining, self.pool.limit))}"
+            if per_image_cost is not None:
+                line += f", ~${self.total_cost + per_image_cost * remaining:.2f} projected"
+        print(f"  {colorize(line, C.DIM)}")
+
+    def finish(self):
+        """Stop the watcher, shard and worker pools; close the journal, metrics and run history."""
+        print()
+
+        self.shutdown.restore()
+        self.not_started = len(self.queue) + len(self.delayed) + sum(len(m) for m in self.followers.values())
+        self.stopped = self.shutdown.requested or self.budget.exceeded is not None
+        self.unread = self.stopped and self.scanning and self.shard is None  # the rest of the folder was never read
+        if self.stopped and (self.not_started or self.unread):
+            left = f"{self.not_started} image(s)" + (" and the unread rest of the folder" if self.unread else "")
+            print(colorize(f"  [STOP] {left} not started; run again (or --resume) to convert them", C.YELLOW))
+            print()
+        if self.watcher is not None:
+            self.watcher.close()
+            self.heartbeat("stopped")
+        if self.shard is not None:
+            self.shard.close()  # unconverted images go back to the shared folder
+
+        if self.hedging is not None:
+            clear_hedge_dir(self.cfg["output_dir"])
+        if self.cfg["tile"]:
+            clear_tile_dir(self.cfg["output_dir"])
+        if self.svg_pool is not None:
+            self.svg_pool.shutdown()
+        if self.prep_pool is not None:
+            self.prep_pool.shutdown(cancel_futures=True)
+            prune_preprocessed(self.cfg["preprocess_dir"], self.cfg["cache_max_age_days"] * 86400)
+        if self.route_pool is not None:
+            self.route_pool.shutdown(cancel_futures=True)
+        if self.cache is not None:
+            self.cache.evict()
+        if self.dedupe_index is not None:
+            try:
+                self.dedupe_index.save()
+            except OSError:
+                pass  # non-critical; the next run re-hashes
+        try:
+            self.metrics.write_prometheus()
+        except OSError:
+            pass  # non-critical
+        self.metrics.close()
+        if self.journal is not None:
+            self.journal.event("end", converted=self.success_count, failed=self.fail_count,
+                               stopped=self.stopped, budget_exceeded=self.budget.exceeded, cache_read=self.prompt_cache["read"],
+                               cache_write=self.prompt_cache["write"])
+            self.journal.close()
+        if self.history is not None:
+            try:
+                self.history.end_run(self.run_id, self.total, self.success_count, self.fail_count, self.total_tokens, self.total_cost)
+                self.history.close()
+            except sqlite3.Error:
+                pass  # non-critical
+
+    def summary(self):
+        """Print the results, the provider and routing tables and the phase timings."""
+        total_elapsed = time.time() - self.start_time
+        total_time_str = format_time(total_elapsed)
+
+        print(f"  {colorize('----------------------------------------------------', C.DIM)}")
+        print()
+
+        if self.stopped and (self.not_started or self.unread):
+            print(colorize("  +=====================================================+", C.YELLOW))
+            print(colorize("  |   RUN STOPPED BEFORE ALL IMAGES WERE CONVERTED      |", C.YELLOW))
+            print(colorize("  +=====================================================+", C.YELLOW))
+        elif self.fail_count == 0:
+            print(colorize("  +=====================================================+", C.GREEN))
+            print(colorize("  |                                                     |", C.GREEN))
+            print(colorize("  |   ALL IMAGES CONVERTED SUCCESSFULLY!                |", C.GREEN))
+            print(colorize("  |                                                     |", C.GREEN))
+            print(colorize("  +=====================================================+", C.GREEN))
+        else:
+            print(colorize("  +=====================================================+", C.YELLOW))
+            print(colorize("  |   CONVERSION COMPLETE WITH ERRORS                   |", C.YELLOW))
+            print(colorize("  +=====================================================+", C.YELLOW))
+
+        print()
+        print(f"  {colorize('Results:', C.BOLD)}")
+        print(f"    Total images:   {self.total}")
+        print(f"    {colorize(f'Converted:      {self.success_count}', C.GREEN)}")
+        if self.fail_count > 0:
+            print(f"    {colorize(f'Failed:         {self.fail_count}', C.RED)}")
+        print(f"    {colorize(f'Total time:     {total_time_str}', C.DIM)}")
+        print(f"    {colorize(f'Total tokens:   {format_tokens(self.total_tokens)}', C.DIM)}")
+        print(f"    {colorize(f'Total cost:     ${self.total_cost:.4f}', C.DIM)}")
+        if self.prep_orig_bytes > 0:
+            print(f"    {colorize(f'Preprocess:     {format_size(self.prep_orig_bytes)} -> {format_size(self.prep_bytes)}, ~{format_tokens(self.prep_orig_tokens)} -> ~{format_tokens(self.prep_tokens)} image tok', C.DIM)}")
+        if self.retry_count > 0:
+            print(f"    {colorize(f'Retries:        {self.retry_count}', C.DIM)}")
+        if self.prompt_cache["read"] or self.prompt_cache["write"]:
+            hit_ratio = self.prompt_cache["read"] / self.prompt_cache["input"] if self.prompt_cache["input"] else 0.0
+            read_str, write_str = format_tokens(self.prompt_cache["read"]), format_tokens(self.prompt_cache["write"])
+            saved_str = f"${self.prompt_cache['saved']:.4f}"
+            print(f"    {colorize(f'Prompt cache:   {hit_ratio:.0%} of input read from cache ({read_str} read, {write_str} written), saved ~{saved_str}', C.DIM)}")
+        if self.escalated_count > 0:
+            print(f"    {colorize(f'Escalations:    {self.escalated_count}', C.DIM)}")
+        if self.batch_calls > 0:
+            print(f"    {colorize(f'Batched:        {self.batched_images} image(s) in {self.batch_calls} call(s)', C.DIM)}")
+        if self.budget.enabled:
+            used = [f"${self.total_cost:.4f} of ${self.budget.max_usd:.2f}"] if self.budget.max_usd is not None else []
+            if self.budget.max_tokens is not None:
+                used.append(f"{format_tokens(self.total_tokens)} of {format_tokens(self.budget.max_tokens)} tok")
+            used_str = " / ".join(used) + (", stopped early" if self.budget.exceeded else "")
+            color = C.YELLOW if self.budget.exceeded else C.DIM
+            print(f"    {colorize(f'Budget:         {used_str}', color)}")
+        if self.predicted_makespan is None and self.watcher is None and self.shard is None and len(self.scheduled) > 1:
+            # Streamed walk: the images are all known now
+            self.predicted_makespan = predict_makespan([self.predicted(img) for img in self.policy_order(self.scheduled)],
+                                                       self.total_parallel)
+        if self.predicted_makespan is not None and self.schedule_errors and not self.stopped:
+            makespan_str = f"{format_time(self.last_finish - self.loop_start)} vs ~{format_time(self.predicted_makespan)} predicted"
+            error_str = f"{sum(self.schedule_errors) / len(self.schedule_errors):.0%}"
+            print(f"    {colorize(f'Schedule:       {self.policy.name}, makespan {makespan_str} (per-image error ~{error_str})', C.DIM)}")
+        if self.hedging is not None and self.hedging.started:
+            hedge_str = (f"{self.hedging.started} started, {self.hedging.won} won, "
+                         f"+{format_tokens(self.hedging.extra_tokens)} tok / ${self.hedging.extra_cost:.4f} extra")
+            print(f"    {colorize(f'Hedges:         {hedge_str}', C.DIM)}")
+        if self.shard is not None:
+            shard_str = f"worker {self.shard.worker_id} claimed {self.shard.claimed}, returned {self.shard.released} to the folder"
+            if self.shard.reclaimed:
+                shard_str += f", reclaimed {self.shard.reclaimed} from dead workers"
+            if self.shard.lost:
+                shard_str += f", lost {self.shard.lost} lease(s)"
+            print(f"    {colorize(f'Shard:          {shard_str}', C.DIM)}")
+        if self.retry is not None and self.retry.exhausted > 0:
+            print(f"    {colorize(f'Retry budget:   exhausted ({self.retry.exhausted} retry(s) skipped)', C.YELLOW)}")
+        if self.opt_after < self.opt_before:
+            print(f"    {colorize(f'SVG optimize:   {format_size(self.opt_before)} -> {format_size(self.opt_after)} ({(self.opt_after - self.opt_before) / self.opt_before:+.0%})', C.DIM)}")
+        if self.svg_repaired or self.svg_fixed:
+            print(f"    {colorize(f'SVG checks:     {self.svg_repaired} repaired locally, {self.svg_fixed} fixed by the CLI', C.DIM)}")
+        if self.salvaged_local or self.salvaged_continued:
+            print(f"    {colorize(f'Salvaged:       {self.salvaged_local} closed locally, {self.salvaged_continued} continued by the CLI', C.DIM)}")
+        if self.tiled_count:
+            print(f"    {colorize(f'Tiled:          {self.tiled_count} image(s) as {self.tiled_bands} bands', C.DIM)}")
+        if self.dedupe_copied or self.dedupe_diffed:
+            print(f"    {colorize(f'Near-duplicates: {self.dedupe_copied} copied, {self.dedupe_diffed} diffed', C.DIM)}")
+        if self.cache_hits > 0:
+            print(f"    {colorize(f'Cache hits:     {self.cache_hits} (saved {format_tokens(self.saved_tokens)} tok, ${self.saved_cost:.4f})', C.DIM)}")
+        print()
+
+        if self.pool.mixed:
+            print(f"  {colorize('Providers:', C.BOLD)}       {colorize('ok  fail  img/min   tokens       cost  avg time', C.DIM)}")
+            for s in self.pool.slots:
+                rate = s.converted / (total_elapsed / 60) if total_elapsed > 0 else 0.0
+                avg = format_time(s.busy_seconds / s.attempts) if s.attempts else "-"
+                note = f"  ({s.disabled_reason})" if s.disabled_reason else ""
+                print(f"    {s.name:<12} {s.converted:4d} {s.failed:5d} {rate:8.1f} {format_tokens(s.tokens):>8} "
+                      f"{f'${s.cost_usd:.4f}':>10} {avg:>9}{note}")
+            print()
+
+        if any(router.stats for router in self.routers.values()):
+            print(f"  {colorize('Routing:', C.BOLD)}         {colorize('routed  ok  escal.  avg time  avg cost', C.DIM)}")
+            for name, router in self.routers.items():
+                for model in router.models:
+                    s = router.stats.get(model)
+                    if s is None:
+                        continue
+                    label = f"{name}/{model}" if self.mixed else model
+                    avg_cost = f"${s['cost_usd'] / s['attempts']:.4f}"
+                    print(f"    {label:<34} {s['routed']:4d} {s['converted']:4d} {s['escalated']:6d} "
+                          f"{format_time(s['seconds'] / s['attempts']):>9} {avg_cost:>9}")
+            print()
+
+        phase_stats = self.metrics.phase_stats() if self.cfg["metrics"] else []
+        if phase_stats:
+            print(f"  {colorize('Phase timings:', C.BOLD)}   {colorize('count      p50      p95      max', C.DIM)}")
+            for phase, count, p50, p95, longest in phase_stats:
+                print(f"    {phase:<12} {count:6d} {format_duration(p50):>8} {format_duration(p95):>8} {format_duration(longest):>8}")
+            print(f"    {colorize(f'Trace: {self.metrics.trace_path}', C.DIM)}")
+            print()
+
+        if self.fail_count > 0:
+            print(colorize("  Failed files:", C.RED))
+            for f in self.failed_files:
+                print(f"    {colorize('X', C.RED)} {f}")
+            print()
+
+        print(colorize("  Import into Figma:", C.CYAN))
+        print(f"    {colorize('1.', C.CYAN)} Open Figma > New File")
+        print(f"    {colorize('2.', C.CYAN)} File > Place Image (or drag and drop)")
+        print(f"    {colorize('3.', C.CYAN)} Select SVG files from:")
+        print(f"       {colorize(str(self.cfg['output_dir']), C.BOLD)}")
+        print(f"    {colorize('4.', C.CYAN)} All layers and components will be editable")
+        print()
+        print(f"  {colorize('SVG layers named with Figma conventions', C.DIM)}")
+        print(f"  {colorize('Component variants included (Hover/Active/Disabled/Focus)', C.DIM)}")
+        print(f"  {colorize('Prototyping interactions annotated via data-* attributes', C.DIM)}")
+
@@ -0,0 +1,133 @@
+"""
+Salvaging SVGs that were cut off before the CLI finished writing them.
+
+A conversion stopped by the timeout or the turn limit (CLAUDE_MAX_TURNS)
+often leaves most of the drawing in its output file, and a CLI that exits
+cleanly may still leave the file without its closing `</svg>`.
+salvage_svg() (run in the SVG process pool) looks at such a file:
+
+    complete   it parses: the model finished the file before it was stopped
+    repaired   only closing tags were missing: the tail is trimmed back to the
+               last complete tag and the open elements are closed, in place
+    partial    content is missing too (the Frame/ComponentVariants panel,
+               which the template puts last, was never written): the file is
+               left as it is for the short CONTINUE_PROMPT
+    none       there is no <svg> to continue
+
+svg_closed() is the cheap check on every output: a file without `</svg>`
+near its end is reported as truncated instead of converted.
+"""
+
+import io
+import os
+import re
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+from .svgcheck import VARIANTS_ID
+
+SALVAGE_COMPLETE = "complete"
+SALVAGE_REPAIRED = "repaired"
+SALVAGE_PARTIAL = "partial"
+SALVAGE_NONE = "none"
+
+TAIL_BYTES = 4096          # read from the end of each output for svg_closed()
+OPEN_PATH_DEPTH = 4        # innermost open elements named in the continuation prompt
+
+# Markup that is not an element, then start/end/empty tags
+_TOKEN = re.compile(
+    r"<!--.*?-->|<!\[CDATA\[.*?\]\]>|<\?.*?\?>|<!DOCTYPE[^>]*>"
+    r"|<(/?)([A-Za-z_][\w:.-]*)((?:\"[^\"]*\"|'[^']*'|[^'\">])*)>",
+    re.S)
+_ID = re.compile(r"""\bid\s*=\s*(["'])(.*?)\1""")
+
+
+def svg_closed(path):
+    """True if the file at `path` has a closing </svg> near its end (False if it is gone)."""
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - TAIL_BYTES))
+            return b"</svg>" in f.read()
+    except OSError:
+        return False
+
+
+def _parses(text):
+    try:
+        ET.parse(io.StringIO(text))
+        return True
+    except ET.ParseError:
+        return False
+
+
+def _label(name, attrs):
+    match = _ID.search(attrs)
+    return f'<{name} id="{match.group(2)}">' if match else f"<{name}>"
+
+
+def close_open(text):
+    """
+    Cut `text` back to its last complete tag and close the elements still
+    open.  Returns (text, open elements [(name, label)] outermost first,
+    bytes dropped), or None if no <svg> element was started.
+    """
+    stack = []
+    end = None
+    for match in _TOKEN.finditer(text):
+        closing, name, attrs = match.group(1), match.group(2), match.group(3)
+        if name is not None:
+            if closing:
+                if stack and stack[-1][0] == name:
+                    stack.pop()
+            elif not attrs.rstrip().endswith("/"):
+                stack.append((name, _label(name, attrs)))
+        if stack or name == "svg":
+            end = match.end()
+        if name == "svg" and closing:
+            break
+    if end is None or not any(name == "svg" for name, _ in stack):
+        return None
+    opened = list(stack)
+    closed = text[:end] + "".join(f"</{name}>" for name, _ in reversed(stack)) + "\n"
+    return closed, opened, len(text) - end
+
+
+def salvage_svg(path):
+    """
+    Inspect the SVG at `path` after a cut-off conversion, closing it in
+    place if only closing tags are missing.  Safe to run in a worker process.
+
+    Returns {"path", "state", "size", "closed", "dropped", "issues"}:
+    `closed` elements were closed and `dropped` bytes of a half-written tag
+    removed; `issues` describe a partial file for the continuation prompt.
+    """
+    path = Path(path)
+    report = {"path": str(path), "state": SALVAGE_NONE, "size": 0, "closed": 0, "dropped": 0,
+              "issues": []}
+    try:
+        text = path.read_text(encoding="utf-8", errors="replace")
+    except OSError:
+        return report
+    report["size"] = len(text.encode("utf-8"))
+    if _parses(text):
+        report["state"] = SALVAGE_COMPLETE
+        return report
+    result = close_open(text)
+    if result is None:
+        return report
+    closed, opened, dropped = result
+    if VARIANTS_ID in closed and _parses(closed):
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_text(closed, encoding="utf-8")
+        tmp.replace(path)
+        report.update(state=SALVAGE_REPAIRED, size=len(closed.encode("utf-8")),
+                      closed=len(opened), dropped=dropped)
+        return report
+    inner = [label for _, label in opened[-OPEN_PATH_DEPTH:]]
+    where = " > ".join(inner) if len(opened) <= OPEN_PATH_DEPTH else "... > " + " > ".join(inner)
+    report["state"] = SALVAGE_PARTIAL
+    report["issues"] = [f"it stops after {report['size']:,} bytes, inside {where}"]
+    if VARIANTS_ID not in closed:
+        report["issues"].append(f'the <g id="{VARIANTS_ID}"> panel is not written yet')
+    return report
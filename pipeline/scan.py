@@ -0,0 +1,79 @@
+"""
+Input folder scanning.
+
+iter_images() walks INPUT_DIR with os.scandir and yields image files one at
+a time, so the first conversion can start while the rest of a large folder
+is still unread.  Each entry's extension is lower-cased once and looked up
+in a set built from IMAGE_EXTENSIONS; no per-pattern globbing, no second
+pass for upper-case names.
+
+Subfolders are walked depth-first, each directory's files in name order
+before its subfolders.  Hidden entries (names starting with ".", such as
+the shard lease directory) and the directories in `exclude` (an output or
+archive folder placed inside the input folder) are skipped.  Symlinked
+directories are not followed, so a link loop cannot trap the walk.
+"""
+
+import os
+import fnmatch
+from pathlib import Path
+
+
+def suffix_matcher(patterns):
+    """Case-insensitive match on file names for glob `patterns` like "*.png"."""
+    patterns = [p.lower() for p in patterns]
+    suffixes = {p[1:] for p in patterns if p.startswith("*.") and not any(c in p[2:] for c in "*?[")}
+    others = [p for p in patterns if p[1:] not in suffixes]
+
+    def matches(name):
+        name = name.lower()
+        if os.path.splitext(name)[1] in suffixes:
+            return True
+        return any(fnmatch.fnmatchcase(name, p) for p in others)
+
+    return matches
+
+
+def _walk(root, recursive, exclude, dirs):
+    exclude = {os.path.realpath(d) for d in exclude}
+    stack = [str(root)]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue  # removed or unreadable while walking
+        subdirs = []
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive and os.path.realpath(entry.path) not in exclude:
+                        subdirs.append(entry.path)
+                elif not dirs and entry.is_file():
+                    yield Path(entry.path)
+            except OSError:
+                continue
+        if dirs:
+            yield from (Path(d) for d in subdirs)
+        stack.extend(reversed(subdirs))
+
+
+def walk_files(root, recursive=True, exclude=()):
+    """Yield the files below `root` (see the module docstring for the order)."""
+    return _walk(root, recursive, exclude, dirs=False)
+
+
+def walk_dirs(root, exclude=()):
+    """Yield the subdirectories below `root`, skipping the same ones as walk_files()."""
+    return _walk(root, True, exclude, dirs=True)
+
+
+def iter_images(root, patterns, recursive=True, exclude=()):
+    """Yield the image files below `root` whose names match `patterns`."""
+    matches = suffix_matcher(patterns)
+    for path in walk_files(root, recursive, exclude):
+        if matches(path.name):
+            yield path
@@ -0,0 +1,161 @@
+"""
+Job ordering: which queued image goes to the next free slot.
+
+CostModel predicts each image's conversion time before it runs:
+
+  - with run history, the median time of the past conversions (same
+    provider and model) whose images were closest in pixel count,
+  - otherwise the static per-model estimate scaled by pixel count relative
+    to REFERENCE_MP and by a mild file-size factor (a busier screenshot
+    compresses worse).
+
+A SchedulingPolicy turns the predictions into an order, and JobQueue is the
+priority queue the orchestrator takes work from.  predict_makespan()
+simulates list scheduling over the parallel slots, so a run can report its
+predicted against its actual makespan.
+
+Policies (SCHEDULE=...):
+    lpt    longest predicted time first: big screens start early, so the
+           run does not end waiting on one straggler (default)
+    spt    shortest first: most results as early as possible
+    name   file-name order (no reordering)
+
+A new policy subclasses SchedulingPolicy and is added to POLICIES.
+"""
+
+import heapq
+import math
+import itertools
+
+from .history import megapixels
+
+REFERENCE_MP = 1.0         # ~1280x800: the static estimate's image
+REFERENCE_KB = 300.0       # file size of a typical screenshot
+PIXEL_EXPONENT = 0.5       # time grows ~ sqrt(pixels) (image tokens are capped)
+BYTES_EXPONENT = 0.2
+FACTOR_RANGE = (0.25, 4.0)
+NEAREST = 9                # past conversions a history estimate is based on
+MIN_SAMPLES = 5
+
+
+class CostModel:
+    """Predicted seconds per image from its size, file size and run history."""
+
+    def __init__(self, default_seconds, samples=()):
+        self.default_seconds = default_seconds
+        # (log megapixels, elapsed) of past successes, sorted for the neighbour search
+        self.samples = sorted((math.log(max(megapixels(w, h), 1e-3)), elapsed)
+                              for w, h, elapsed in samples if w and h)
+
+    @property
+    def learned(self):
+        return len(self.samples) >= MIN_SAMPLES
+
+    def _nearest(self, mp):
+        """Median time of the NEAREST past images closest in (log) pixel count."""
+        x = math.log(max(mp, 1e-3))
+        nearest = sorted(self.samples, key=lambda s: abs(s[0] - x))[:NEAREST]
+        times = sorted(s[1] for s in nearest)
+        return times[len(times) // 2]
+
+    def estimate(self, size, nbytes=None):
+        """Seconds for an image of `size` ((w, h) or None) and `nbytes` on disk."""
+        low, high = FACTOR_RANGE
+        mp = megapixels(*size) if size else REFERENCE_MP
+        if self.learned:
+            return self._nearest(mp)
+        seconds = self.default_seconds * min(high, max(low, (mp / REFERENCE_MP) ** PIXEL_EXPONENT))
+        if nbytes:
+            seconds *= min(high, max(low, (nbytes / 1024 / REFERENCE_KB) ** BYTES_EXPONENT))
+        return seconds
+
+
+class SchedulingPolicy:
+    """Orders jobs by key(); lower keys start first, ties keep arrival order."""
+
+    name = ""
+    description = ""
+
+    def key(self, seconds):
+        raise NotImplementedError
+
+    def order(self, jobs):
+        """`jobs` [(img, seconds)] in the order this policy starts them."""
+        return [job for _, job in sorted(enumerate(jobs), key=lambda e: (self.key(e[1][1]), e[0]))]
+
+
+class LongestFirst(SchedulingPolicy):
+    name = "lpt"
+    description = "longest first"
+
+    def key(self, seconds):
+        return -seconds
+
+
+class ShortestFirst(SchedulingPolicy):
+    name = "spt"
+    description = "shortest first"
+
+    def key(self, seconds):
+        return seconds
+
+
+class NameOrder(SchedulingPolicy):
+    name = "name"
+    description = "file-name order"
+
+    def key(self, seconds):
+        return 0
+
+
+POLICIES = {p.name: p for p in (LongestFirst(), ShortestFirst(), NameOrder())}
+
+
+def predict_makespan(durations, slots):
+    """Wall time for `durations`, started in this order on `slots` parallel slots."""
+    free_at = [0.0] * max(1, slots)
+    for seconds in durations:
+        heapq.heappush(free_at, heapq.heappop(free_at) + seconds)
+    return max(free_at)
+
+
+class JobQueue:
+    """
+    Priority queue of images with the deque operations ConversionRun uses.
+
+    append()/extend() place images by the policy's key on their predicted
+    time (`cost(img)`); appendleft() puts one ahead of everything (work
+    that was already due: expired backoffs, failovers, cancellations).
+    """
+
+    def __init__(self, policy, cost, images=()):
+        self.policy = policy
+        self.cost = cost
+        self._heap = []
+        self._seq = itertools.count()
+        self._urgent = itertools.count(-1, -1)
+        self.extend(images)
+
+    def append(self, img):
+        heapq.heappush(self._heap, (1, self.policy.key(self.cost(img)), next(self._seq), img))
+
+    def extend(self, images):
+        for img in images:
+            self.append(img)
+
+    def appendleft(self, img):
+        heapq.heappush(self._heap, (0, 0, next(self._urgent), img))
+
+    def popleft(self):
+        return heapq.heappop(self._heap)[3]
+
+    def __getitem__(self, index):
+        if index != 0:
+            raise IndexError("JobQueue only exposes its head")
+        return self._heap[0][3]
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __iter__(self):
+        return (entry[3] for entry in self._heap)
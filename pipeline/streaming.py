@@ -0,0 +1,312 @@
+"""
+Streaming subprocess engine.
+
+CLI processes are started with asyncio.create_subprocess_exec (coroutines
+run on pipeline.engine.AsyncEngine).  Instead of buffering the whole CLI
+output until exit, run_streaming() reads stdout line by line and feeds each
+JSONL event into a token accumulator as it arrives:
+
+  - running token totals are reported through a callback, so the progress
+    display can show tokens for conversions that are still in flight;
+  - a Codex `{"type": "error"}` event kills the child immediately instead of
+    waiting for it to exit (or for cfg["timeout"]).
+
+run_captured() is the buffered variant (STREAM_OUTPUT=0).  Both kill the
+child's whole process tree on timeout and when the calling task is
+cancelled, so no CLI outlives its conversion.  Only a short head of stdout
+and a bounded tail of stderr are kept in memory.
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import asyncio
+import threading
+import subprocess
+from collections import deque
+
+STDOUT_HEAD_CHARS = 500    # kept for debug output
+STDERR_TAIL_LINES = 50     # kept for error messages
+STREAM_LINE_LIMIT = 64 * 1024 * 1024  # one stream-json event can carry a whole SVG
+HELPER_JOIN_SECONDS = 1.0  # wait for stderr/stdin pipes after the child exits
+
+
+# -- Token accumulators ---------------------------------------------------------
+
+class CodexTokenAccumulator:
+    """Sums `usage` blocks from Codex JSONL events; remembers the first error event."""
+
+    def __init__(self):
+        self.input = 0
+        self.cache_read = 0
+        self.output = 0
+        self.error = None
+
+    def feed(self, line):
+        """Consume one stdout line.  Returns True if the running totals changed."""
+        line = line.strip()
+        if not line:
+            return False
+        try:
+            event = json.loads(line)
+        except json.JSONDecodeError:
+            return False
+        if not isinstance(event, dict):
+            return False
+        if event.get("type") == "error" and self.error is None:
+            self.error = str(event.get("message", "") or "error event")
+        usage = event.get("usage") or {}
+        if not usage:
+            return False
+        self.input += usage.get("input_tokens", 0)
+        self.cache_read += usage.get("cached_input_tokens", 0)
+        self.output += usage.get("output_tokens", 0)
+        return True
+
+    def totals(self):
+        # Codex input_tokens already include the cached part
+        return {
+            "input": self.input,
+            "output": self.output,
+            "total": self.input + self.output,
+            "cache_read": self.cache_read,
+            "cache_write": 0,
+            "cost_usd": 0.0,
+        }
+
+
+class ClaudeTokenAccumulator:
+    """
+    Tracks usage from Claude `--output-format stream-json` events.
+
+    Each `assistant` event carries the usage of one API call, summed as a
+    running estimate; the final `result` event carries the authoritative
+    totals and cost and replaces the estimate.
+    """
+
+    def __init__(self):
+        self.input = 0
+        self.cache_write = 0
+        self.cache_read = 0
+        self.output = 0
+        self.cost_usd = 0.0
+        self.error = None
+        self.subtype = None   # of the result event: "success", "error_max_turns", ...
+
+    def _apply(self, usage, replace):
+        if replace:
+            self.input = self.cache_write = self.cache_read = self.output = 0
+        self.input += usage.get("input_tokens", 0)
+        self.cache_write += usage.get("cache_creation_input_tokens", 0)
+        self.cache_read += usage.get("cache_read_input_tokens", 0)
+        self.output += usage.get("output_tokens", 0)
+
+    def feed(self, line):
+        line = line.strip()
+        if not line:
+            return False
+        try:
+            event = json.loads(line)
+        except json.JSONDecodeError:
+            return False
+        if not isinstance(event, dict):
+            return False
+        kind = event.get("type")
+        if kind == "error" and self.error is None:
+            self.error = str(event.get("message", "") or "error event")
+            return False
+        if kind == "result":
+            self._apply(event.get("usage") or {}, replace=True)
+            self.cost_usd = event.get("total_cost_usd", 0.0) or 0.0
+            self.subtype = event.get("subtype")
+            return True
+        if kind == "assistant":
+            usage = (event.get("message") or {}).get("usage") or {}
+            if usage:
+                self._apply(usage, replace=False)
+                return True
+        return False
+
+    def totals(self):
+        total_input = self.input + self.cache_write + self.cache_read
+        return {
+            "input": total_input,
+            "output": self.output,
+            "total": total_input + self.output,
+            "cache_read": self.cache_read,
+            "cache_write": self.cache_write,
+            "cost_usd": self.cost_usd,
+        }
+
+
+# -- Process control ------------------------------------------------------------
+
+def popen_kwargs():
+    """Subprocess options that put the child in its own process group/session."""
+    if sys.platform == "win32":
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"start_new_session": True}
+
+
+def kill_process_tree(proc):
+    """Kill a child started with popen_kwargs() together with its descendants."""
+    if proc.returncode is not None:
+        return
+    try:
+        if sys.platform == "win32":
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(proc.pid)],
+                           capture_output=True)
+        else:
+            os.killpg(proc.pid, signal.SIGKILL)
+    except (OSError, subprocess.SubprocessError):
+        pass
+    try:
+        proc.kill()
+    except (OSError, ProcessLookupError):
+        pass
+
+
+async def spawn(cmd, stdin_text):
+    """Start `cmd` in its own process group with piped stdout/stderr."""
+    return await asyncio.create_subprocess_exec(
+        *cmd,
+        stdin=asyncio.subprocess.PIPE if stdin_text is not None else asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        limit=STREAM_LINE_LIMIT,
+        **popen_kwargs(),
+    )
+
+
+async def feed_stdin(proc, stdin_text):
+    try:
+        proc.stdin.write(stdin_text.encode("utf-8"))
+        await proc.stdin.drain()
+        proc.stdin.close()
+    except (OSError, ConnectionError):
+        pass
+
+
+async def reap(proc, helpers=()):
+    """Kill `proc`'s tree if it is still running, wait for it, then (briefly) for its pipe readers."""
+    if proc.returncode is None:
+        kill_process_tree(proc)
+    await proc.wait()
+    if helpers:
+        _, pending = await asyncio.wait(helpers, timeout=HELPER_JOIN_SECONDS)
+        for task in pending:
+            task.cancel()
+
+
+class StreamResult:
+    """Outcome of run_streaming()."""
+
+    def __init__(self, returncode, stdout_head, stderr, killed_on_error,
+                 spawn_seconds=0.0, first_output_seconds=None):
+        self.returncode = returncode
+        self.stdout_head = stdout_head
+        self.stderr = stderr
+        self.killed_on_error = killed_on_error
+        self.spawn_seconds = spawn_seconds                # process creation
+        self.first_output_seconds = first_output_seconds  # spawn -> first stdout line
+
+
+async def run_streaming(cmd, stdin_text, timeout, accumulator, on_update=None):
+    """
+    Run `cmd`, feeding stdout lines to `accumulator` as they arrive.
+
+    `on_update(totals)` is called whenever the running token totals change.
+    Raises subprocess.TimeoutExpired after `timeout` seconds, like
+    subprocess.run.  On timeout, error event or cancellation of the calling
+    task the child's whole process tree is killed before this returns.
+    """
+    spawn_start = time.perf_counter()
+    proc = await spawn(cmd, stdin_text)
+    spawned = time.perf_counter()
+
+    stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+
+    async def drain_stderr():
+        async for line in proc.stderr:
+            stderr_tail.append(line.decode("utf-8", "replace"))
+
+    helpers = [asyncio.ensure_future(drain_stderr())]
+    if stdin_text is not None:
+        helpers.append(asyncio.ensure_future(feed_stdin(proc, stdin_text)))
+
+    head = []
+    head_len = 0
+    killed_on_error = False
+    first_output = None
+
+    async def read_stdout():
+        nonlocal head_len, killed_on_error, first_output
+        async for raw in proc.stdout:
+            line = raw.decode("utf-8", "replace")
+            if first_output is None:
+                first_output = time.perf_counter() - spawned
+            if head_len < STDOUT_HEAD_CHARS:
+                head.append(line)
+                head_len += len(line)
+            if accumulator.feed(line) and on_update is not None:
+                on_update(accumulator.totals())
+            if accumulator.error is not None:
+                killed_on_error = True
+                return
+        await proc.wait()
+
+    try:
+        await asyncio.wait_for(read_stdout(), timeout)
+    except asyncio.TimeoutError:
+        raise subprocess.TimeoutExpired(cmd, timeout) from None
+    finally:
+        await reap(proc, helpers)
+
+    return StreamResult(proc.returncode, "".join(head)[:STDOUT_HEAD_CHARS],
+                        "".join(stderr_tail), killed_on_error,
+                        spawned - spawn_start, first_output)
+
+
+async def run_captured(cmd, stdin_text, timeout):
+    """
+    asyncio counterpart of subprocess.run(capture_output=True).
+
+    Returns (returncode, stdout, stderr).  Raises subprocess.TimeoutExpired
+    after `timeout` seconds; the process tree is killed on timeout or
+    cancellation.
+    """
+    proc = await spawn(cmd, stdin_text)
+    data = stdin_text.encode("utf-8") if stdin_text is not None else None
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(data), timeout)
+    except asyncio.TimeoutError:
+        raise subprocess.TimeoutExpired(cmd, timeout) from None
+    finally:
+        await reap(proc)
+    return proc.returncode, stdout.decode("utf-8", "replace"), stderr.decode("utf-8", "replace")
+
+
+class LiveTokens:
+    """Thread-safe running token totals of conversions still in flight."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_image = {}
+
+    def update(self, image, tokens):
+        with self._lock:
+            self._by_image[image] = tokens
+
+    def pop(self, image):
+        """Stop tracking `image`; returns its last running totals (None if it had none)."""
+        with self._lock:
+            return self._by_image.pop(image, None)
+
+    def snapshot(self):
+        """Return (tokens, cost_usd) summed over in-flight conversions."""
+        with self._lock:
+            tokens = sum(t["total"] for t in self._by_image.values())
+            cost = sum(t["cost_usd"] for t in self._by_image.values())
+        return tokens, cost
@@ -0,0 +1,396 @@
+"""
+Validation and local repair of generated SVGs.
+
+validate_svg() (run in a process pool on every output) checks the rules
+prompt-template.txt sets and fixes the mechanical ones in place:
+
+  - well-formed XML: stray prose / code fences around the <svg>, bare `&`
+    and HTML-only entities are repaired; anything else (e.g. a truncated
+    file) is reported,
+  - no `<filter>`: filter elements and `filter` references are stripped,
+  - no `opacity="0"` groups: invisible groups are removed,
+  - the content fits the viewBox: element bounding boxes (transforms
+    applied) are compared with it and the viewBox grows to fit,
+  - the `Frame/ComponentVariants` panel exists (reported, not fixable).
+
+Whatever cannot be fixed is returned in `issues`; the caller sends those
+to the CLI with the short FIX_PROMPT instead of re-running the full
+conversion.
+"""
+
+import io
+import re
+import math
+import html.entities
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+from .svgopt import SVG_NS, parse_style
+
+VARIANTS_ID = "Frame/ComponentVariants"
+VIEWBOX_TOLERANCE = 2.0    # px of overflow ignored (anti-aliasing, strokes)
+VIEWBOX_MARGIN = 20.0      # px added around content when the viewBox grows
+DEFAULT_FONT_SIZE = 16.0
+
+# Not rendered in place, so they do not count towards the drawing's extent
+NON_RENDERED = {"defs", "symbol", "clipPath", "mask", "pattern", "marker", "linearGradient",
+                "radialGradient", "filter", "style", "title", "desc", "metadata", "script"}
+
+_XML_ENTITIES = {"amp", "lt", "gt", "quot", "apos"}
+_BARE_AMP = re.compile(r"&(?!(?:#\d+|#x[0-9a-fA-F]+|[A-Za-z][A-Za-z0-9]*);)")
+_NAMED_ENTITY = re.compile(r"&([A-Za-z][A-Za-z0-9]*);")
+_NUMBER = re.compile(r"[-+]?(?:\d+\.\d*|\.\d+|\d+)(?:[eE][-+]?\d+)?")
+_TRANSFORM = re.compile(r"(matrix|translate|scale|rotate|skewX|skewY)\s*\(([^)]*)\)")
+_PATH_TOKEN = re.compile(r"[MmLlHhVvCcSsQqTtAaZz]|[-+]?(?:\d+\.\d*|\.\d+|\d+)(?:[eE][-+]?\d+)?")
+_PATH_ARITY = {"m": 2, "l": 2, "h": 1, "v": 1, "c": 6, "s": 4, "q": 4, "t": 2, "a": 7, "z": 0}
+
+
+def _local(tag):
+    return tag.rsplit("}", 1)[-1] if isinstance(tag, str) else ""
+
+
+def _length(value):
+    """Plain number or px length as float; None for %, em and other units."""
+    if value is None:
+        return None
+    value = value.strip()
+    if value.endswith("px"):
+        value = value[:-2]
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def _numbers(text):
+    return [float(n) for n in _NUMBER.findall(text or "")]
+
+
+# -- Well-formedness -----------------------------------------------------------
+
+def repair_text(text):
+    """Return (text, [fixes]) with the common non-XML slips corrected."""
+    fixes = []
+    start = text.find("<?xml")
+    if start < 0:
+        start = text.find("<svg")
+    end = text.rfind("</svg>")
+    if start > 0 or (end >= 0 and text[end + 6:].strip()):
+        text = text[max(start, 0):end + 6 if end >= 0 else len(text)]
+        fixes.append("removed text around <svg>")
+
+    def entity(match):
+        name = match.group(1)
+        if name in _XML_ENTITIES or name not in html.entities.name2codepoint:
+            return match.group(0)
+        return f"&#{html.entities.name2codepoint[name]};"
+
+    replaced = _NAMED_ENTITY.sub(entity, text)
+    if replaced != text:
+        text = replaced
+        fixes.append("replaced HTML entities")
+    escaped = _BARE_AMP.sub("&amp;", text)
+    if escaped != text:
+        text = escaped
+        fixes.append("escaped bare '&'")
+    return text, fixes
+
+
+def _parse(text):
+    """Parse SVG text, registering its namespace prefixes for serialization."""
+    root = None
+    for event, item in ET.iterparse(io.BytesIO(text.encode("utf-8")), events=("start-ns", "start")):
+        if event == "start-ns":
+            prefix, uri = item
+            ET.register_namespace("" if uri == SVG_NS else prefix, uri)
+        elif root is None:
+            root = item
+    return root
+
+
+# -- Geometry -------------------------------------------------------------------
+
+IDENTITY = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+
+def _multiply(m1, m2):
+    a1, b1, c1, d1, e1, f1 = m1
+    a2, b2, c2, d2, e2, f2 = m2
+    return (a1 * a2 + c1 * b2, b1 * a2 + d1 * b2,
+            a1 * c2 + c1 * d2, b1 * c2 + d1 * d2,
+            a1 * e2 + c1 * f2 + e1, b1 * e2 + d1 * f2 + f1)
+
+
+def parse_transform(text):
+    """SVG transform list -> affine matrix (a, b, c, d, e, f)."""
+    matrix = IDENTITY
+    for name, args in _TRANSFORM.findall(text or ""):
+        v = _numbers(args)
+        if name == "matrix" and len(v) == 6:
+            m = tuple(v)
+        elif name == "translate" and v:
+            m = (1, 0, 0, 1, v[0], v[1] if len(v) > 1 else 0)
+        elif name == "scale" and v:
+            m = (v[0], 0, 0, v[1] if len(v) > 1 else v[0], 0, 0)
+        elif name == "rotate" and v:
+            rad = math.radians(v[0])
+            cos, sin = math.cos(rad), math.sin(rad)
+            m = (cos, sin, -sin, cos, 0, 0)
+            if len(v) == 3:
+                m = _multiply(_multiply((1, 0, 0, 1, v[1], v[2]), m), (1, 0, 0, 1, -v[1], -v[2]))
+        elif name == "skewX" and v:
+            m = (1, 0, math.tan(math.radians(v[0])), 1, 0, 0)
+        elif name == "skewY" and v:
+            m = (1, math.tan(math.radians(v[0])), 0, 1, 0, 0)
+        else:
+            continue
+        matrix = _multiply(matrix, m)
+    return matrix
+
+
+def path_points(d):
+    """End and control points of path data (a conservative outline of its extent)."""
+    points = []
+    x = y = start_x = start_y = 0.0
+    command = None
+    tokens = _PATH_TOKEN.findall(d or "")
+    i = 0
+    while i < len(tokens):
+        if tokens[i].isalpha():
+            command = tokens[i]
+            i += 1
+            if command in "Zz":
+                x, y = start_x, start_y
+                continue
+        if command is None:
+            break
+        arity = _PATH_ARITY[command.lower()]
+        args = tokens[i:i + arity]
+        if len(args) < arity or any(a.isalpha() for a in args):
+            break
+        i += arity
+        v = [float(a) for a in args]
+        rel = command.islower()
+        lower = command.lower()
+        if lower == "h":
+            x = x + v[0] if rel else v[0]
+        elif lower == "v":
+            y = y + v[0] if rel else v[0]
+        elif lower == "a":
+            x, y = (x + v[5], y + v[6]) if rel else (v[5], v[6])
+        else:
+            for j in range(0, arity, 2):
+                px, py = (x + v[j], y + v[j + 1]) if rel else (v[j], v[j + 1])
+                points.append((px, py))
+            x, y = points[-1]
+        points.append((x, y))
+        if lower == "m":
+            start_x, start_y = x, y
+            command = "l" if rel else "L"  # further pairs are implicit lineto
+    return points
+
+
+def _element_points(elem, font_size):
+    """Local-coordinate points outlining `elem` (empty if unknown)."""
+    tag = _local(elem.tag)
+    get = lambda name, default=None: _length(elem.get(name, default))
+    if tag in ("rect", "image", "use", "foreignObject"):
+        x, y = get("x", "0"), get("y", "0")
+        w, h = get("width", "0"), get("height", "0")
+        if None in (x, y, w, h):
+            return []
+        return [(x, y), (x + w, y + h)]
+    if tag in ("circle", "ellipse"):
+        cx, cy = get("cx", "0"), get("cy", "0")
+        rx = get("r", "0") if tag == "circle" else get("rx", "0")
+        ry = get("r", "0") if tag == "circle" else get("ry", "0")
+        if None in (cx, cy, rx, ry):
+            return []
+        return [(cx - rx, cy - ry), (cx + rx, cy + ry)]
+    if tag == "line":
+        vals = [get(n, "0") for n in ("x1", "y1", "x2", "y2")]
+        return [] if None in vals else [(vals[0], vals[1]), (vals[2], vals[3])]
+    if tag in ("polyline", "polygon"):
+        v = _numbers(elem.get("points"))
+        return list(zip(v[0::2], v[1::2]))
+    if tag == "path":
+        return path_points(elem.get("d"))
+    if tag in ("text", "tspan"):
+        xs, ys = _numbers(elem.get("x")), _numbers(elem.get("y"))
+        if not xs or not ys:
+            return []
+        # Width is unknown without font metrics; the baseline anchor and the
+        # ascent are enough to catch text placed below the viewBox.
+        return [(xs[0], ys[0] - font_size), (xs[0], ys[0])]
+    return []
+
+
+def content_bbox(root):
+    """(min_x, min_y, max_x, max_y) of rendered content in user space, or None."""
+    bbox = None
+    stack = [(root, IDENTITY, DEFAULT_FONT_SIZE)]
+    while stack:
+        elem, matrix, font_size = stack.pop()
+        tag = _local(elem.tag)
+        if tag in NON_RENDERED or elem.get("display") == "none":
+            continue
+        if elem is not root:
+            matrix = _multiply(matrix, parse_transform(elem.get("transform")))
+        size = _length(elem.get("font-size"))
+        if size is not None:
+            font_size = size
+        a, b, c, d, e, f = matrix
+        for x, y in _element_points(elem, font_size):
+            tx, ty = a * x + c * y + e, b * x + d * y + f
+            if bbox is None:
+                bbox = [tx, ty, tx, ty]
+            else:
+                bbox = [min(bbox[0], tx), min(bbox[1], ty), max(bbox[2], tx), max(bbox[3], ty)]
+        for child in elem:
+            stack.append((child, matrix, font_size))
+    return tuple(bbox) if bbox else None
+
+
+def _fmt(v):
+    return f"{v:.2f}".rstrip("0").rstrip(".")
+
+
+# -- Rule checks ----------------------------------------------------------------
+
+def _strip_filters(root, parents):
+    removed = 0
+    for elem in list(root.iter()):
+        if _local(elem.tag) == "filter" and parents.get(elem) is not None:
+            parents[elem].remove(elem)
+            removed += 1
+            continue
+        if "filter" in elem.attrib:
+            del elem.attrib["filter"]
+            removed += 1
+        style = elem.get("style")
+        if style and "filter" in parse_style(style):
+            rest = [f"{k}:{v}" for k, v in parse_style(style).items() if k != "filter"]
+            if rest:
+                elem.set("style", ";".join(rest))
+            else:
+                del elem.attrib["style"]
+            removed += 1
+    return removed
+
+
+def _is_hidden_group(elem):
+    if _local(elem.tag) != "g":
+        return False
+    opacity = elem.get("opacity")
+    style = elem.get("style")
+    if style:
+        opacity = parse_style(style).get("opacity", opacity)
+    if opacity is None:
+        return False
+    value = _length(opacity.rstrip("%"))
+    return value is not None and value == 0
+
+
+def _fit_viewbox(root):
+    """Grow the viewBox to the content; returns a description or None."""
+    vb = _numbers(root.get("viewBox"))
+    width, height = _length(root.get("width")), _length(root.get("height"))
+    bbox = content_bbox(root)
+    if len(vb) != 4:
+        if width and height:
+            vb = [0.0, 0.0, width, height]
+        elif bbox is not None:
+            vb = [min(0.0, bbox[0]), min(0.0, bbox[1]), bbox[2] + VIEWBOX_MARGIN, bbox[3] + VIEWBOX_MARGIN]
+        else:
+            return None
+        root.set("viewBox", " ".join(_fmt(v) for v in vb))
+        return f"added viewBox {root.get('viewBox')}"
+    if bbox is None:
+        return None
+    min_x, min_y, vb_w, vb_h = vb
+    left, top = min_x, min_y
+    right, bottom = min_x + vb_w, min_y + vb_h
+    if bbox[0] < left - VIEWBOX_TOLERANCE:
+        left = bbox[0] - VIEWBOX_MARGIN
+    if bbox[1] < top - VIEWBOX_TOLERANCE:
+        top = bbox[1] - VIEWBOX_MARGIN
+    if bbox[2] > right + VIEWBOX_TOLERANCE:
+        right = bbox[2] + VIEWBOX_MARGIN
+    if bbox[3] > bottom + VIEWBOX_TOLERANCE:
+        bottom = bbox[3] + VIEWBOX_MARGIN
+    new = [left, top, right - left, bottom - top]
+    if new == vb:
+        return None
+    root.set("viewBox", " ".join(_fmt(v) for v in new))
+    # Keep the rendered scale: width/height grow with the viewBox
+    if width and vb_w:
+        root.set("width", _fmt(width * new[2] / vb_w))
+    if height and vb_h:
+        root.set("height", _fmt(height * new[3] / vb_h))
+    return f"grew viewBox {_fmt(vb_w)}x{_fmt(vb_h)} -> {_fmt(new[2])}x{_fmt(new[3])}"
+
+
+def validate_svg(path):
+    """
+    Check the SVG at `path` and fix what can be fixed in place.
+    Safe to run in a worker process.
+
+    Returns {"path", "fixed": [...], "issues": [...]}; an empty `issues`
+    list means the file is usable.
+    """
+    path = Path(path)
+    report = {"path": str(path), "fixed": [], "issues": []}
+    try:
+        original = path.read_text(encoding="utf-8", errors="replace")
+    except OSError as exc:
+        report["issues"].append(f"cannot read the SVG ({exc.strerror})")
+        return report
+
+    text, fixes = original, []
+    try:
+        root = _parse(text)
+    except ET.ParseError:
+        text, fixes = repair_text(original)
+        try:
+            root = _parse(text)
+        except ET.ParseError as exc:
+            truncated = "</svg>" not in original
+            report["issues"].append("the file is truncated (no closing </svg>)" if truncated
+                                    else f"not well-formed XML ({exc})")
+            return report
+    if root is None or _local(root.tag) != "svg":
+        report["issues"].append(f"root element is <{_local(root.tag) if root is not None else ''}>, not <svg>")
+        return report
+
+    tree_fixes = []
+    parents = {child: parent for parent in root.iter() for child in parent}
+
+    removed = _strip_filters(root, parents)
+    if removed:
+        tree_fixes.append(f"stripped {removed} filter(s)")
+
+    hidden = [elem for elem in root.iter() if _is_hidden_group(elem) and elem in parents]
+    for elem in hidden:
+        parents[elem].remove(elem)
+    if hidden:
+        tree_fixes.append(f"removed {len(hidden)} opacity=0 group(s)")
+
+    fitted = _fit_viewbox(root)
+    if fitted:
+        tree_fixes.append(fitted)
+
+    if not any(elem.get("id") == VARIANTS_ID for elem in root.iter()):
+        report["issues"].append(f'no <g id="{VARIANTS_ID}"> panel (component variants are missing)')
+
+    if "}" not in root.tag and root.get("xmlns") is None:
+        root.set("xmlns", SVG_NS)
+        tree_fixes.append("added xmlns")
+
+    if tree_fixes:
+        text = ET.tostring(root, encoding="unicode")
+    if tree_fixes or fixes:
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_text(text, encoding="utf-8")
+        tmp.replace(path)
+    report["fixed"] = fixes + tree_fixes
+    return report
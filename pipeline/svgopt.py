@@ -0,0 +1,309 @@
+"""
+SVG post-processing: make model output smaller and faster to import.
+
+optimize_svg() (run in a process pool after each successful conversion)
+parses the file with iterparse and, as each element closes:
+
+  - turns `style="..."` declarations into presentation attributes,
+  - rounds coordinates, path data and transforms to `precision` decimals,
+  - drops formatting whitespace (text content is left alone),
+  - merges identical gradients / symbols / clip paths in <defs>,
+  - splices out groups that carry no attributes.
+
+A final pass rewrites `url(#id)` / `href="#id"` references to merged
+definitions and removes presentation attributes a child inherits with the
+same value anyway.  A `<style>` rule beats a presentation attribute, so
+properties the document's stylesheet sets (the template's
+`text { font-family: ... }`) are neither moved out of `style="..."` nor
+dropped as inherited duplicates.  `id` (Figma layer names) and `data-*`
+attributes are never changed.  The file is only replaced when the result is
+smaller; if it cannot be parsed it is left as the model wrote it.
+"""
+
+import io
+import os
+import re
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+SVG_NS = "http://www.w3.org/2000/svg"
+XLINK_NS = "http://www.w3.org/1999/xlink"
+XLINK_HREF = f"{{{XLINK_NS}}}href"
+
+TRANSFORM_EXTRA_PRECISION = 3   # matrix/scale factors need more decimals
+
+# Definitions merged when two are identical apart from their id
+MERGEABLE = {"linearGradient", "radialGradient", "symbol", "clipPath", "mask", "pattern"}
+
+# Rendered through a reference, so they do not inherit from their DOM parent
+ISOLATED = {"defs", "symbol", "clipPath", "mask", "pattern", "marker"}
+
+# Elements whose text is content, not formatting
+TEXT_ELEMENTS = {"text", "tspan", "textPath", "title", "desc", "style", "script"}
+
+NUMBER_ATTRS = {
+    "x", "y", "x1", "y1", "x2", "y2", "cx", "cy", "r", "rx", "ry", "fx", "fy",
+    "width", "height", "stroke-width", "font-size", "letter-spacing", "offset",
+    "opacity", "fill-opacity", "stroke-opacity", "stop-opacity", "viewBox",
+    "stroke-dasharray", "stroke-dashoffset",
+}
+PATH_ATTRS = {"d", "points"}
+TRANSFORM_ATTRS = {"transform", "gradientTransform", "patternTransform"}
+
+# CSS properties that may be written as attributes (subset Figma understands)
+PRESENTATION_ATTRS = {
+    "fill", "fill-opacity", "fill-rule", "stroke", "stroke-width", "stroke-opacity",
+    "stroke-linecap", "stroke-linejoin", "stroke-miterlimit", "stroke-dasharray",
+    "stroke-dashoffset", "opacity", "font-family", "font-size", "font-weight",
+    "font-style", "letter-spacing", "text-anchor", "dominant-baseline",
+    "stop-color", "stop-opacity", "clip-rule", "visibility", "display",
+    "clip-path", "mask", "filter",
+}
+# Inherited properties: a child repeating its parent's value can drop it
+INHERITED_ATTRS = {
+    "fill", "fill-opacity", "fill-rule", "stroke", "stroke-width", "stroke-opacity",
+    "stroke-linecap", "stroke-linejoin", "stroke-miterlimit", "stroke-dasharray",
+    "stroke-dashoffset", "font-family", "font-size", "font-weight", "font-style",
+    "letter-spacing", "text-anchor", "dominant-baseline", "clip-rule", "visibility",
+}
+
+# Shorthand properties and the longhands they set
+SHORTHANDS = {
+    "font": {"font-family", "font-size", "font-weight", "font-style"},
+}
+
+_NUMBER = re.compile(r"[-+]?(?:\d+\.\d*|\.\d+|\d+)(?:[eE][-+]?\d+)?")
+_URL_REF = re.compile(r"url\(\s*['\"]?#([^'\")\s]+)['\"]?\s*\)")
+_CSS_COMMENT = re.compile(r"/\*.*?\*/", re.DOTALL)
+_CSS_BLOCK = re.compile(r"\{([^{}]*)\}")
+
+
+def _local(tag):
+    return tag.rsplit("}", 1)[-1] if isinstance(tag, str) else ""
+
+
+def format_number(value, precision):
+    """Shortest form of `value` rounded to `precision` decimals ('0.50' -> '.5')."""
+    text = f"{value:.{precision}f}"
+    if "." in text:
+        text = text.rstrip("0").rstrip(".")
+    if text in ("-0", ""):
+        return "0"
+    if text.startswith("0."):
+        text = text[1:]
+    elif text.startswith("-0."):
+        text = "-" + text[2:]
+    return text
+
+
+def round_numbers(text, precision):
+    return _NUMBER.sub(lambda m: format_number(float(m.group()), precision), text)
+
+
+def minify_path(d, precision):
+    """Round path data and drop the whitespace around commands and commas."""
+    d = round_numbers(d, precision)
+    d = re.sub(r"\s*,\s*", ",", d)
+    d = re.sub(r"\s+", " ", d)
+    d = re.sub(r"\s*([A-Za-z])\s*", r"\1", d)
+    d = re.sub(r"[ ,]-", "-", d)  # "1 -2" -> "1-2"
+    return d.strip()
+
+
+def parse_style(style):
+    decls = {}
+    for part in style.split(";"):
+        name, sep, value = part.partition(":")
+        if sep and name.strip():
+            decls[name.strip()] = value.strip()
+    return decls
+
+
+def stylesheet_properties(css):
+    """Property names the rules of a <style> sheet set (shorthands expanded)."""
+    names = set()
+    for block in _CSS_BLOCK.findall(_CSS_COMMENT.sub("", css)):
+        for name in parse_style(block):
+            name = name.lower()
+            names.add(name)
+            names.update(SHORTHANDS.get(name, ()))
+    return names
+
+
+def _styled_properties(data):
+    """Properties set by any <style> element of the document in `data` (bytes)."""
+    names = set()
+    for _, elem in ET.iterparse(io.BytesIO(data)):
+        if _local(elem.tag) == "style":
+            names |= stylesheet_properties("".join(elem.itertext()))
+    return names
+
+
+def _optimize_attrs(elem, precision, styled=frozenset()):
+    """Style -> attributes and number rounding for one element (in place).
+
+    Properties in `styled` stay in `style="..."`: as attributes they would
+    lose to the stylesheet's rules.
+    """
+    style = elem.attrib.pop("style", None)
+    if style:
+        rest = []
+        for name, value in parse_style(style).items():
+            if name in PRESENTATION_ATTRS and "!important" not in value and name not in styled:
+                elem.set(name, value)  # without a rule for it, the attribute renders the same
+            else:
+                rest.append(f"{name}:{value}")
+        if rest:
+            elem.set("style", ";".join(rest))
+    for name, value in list(elem.attrib.items()):
+        if name.startswith("data-") or name == "id":
+            continue
+        if name in PATH_ATTRS:
+            elem.set(name, minify_path(value, precision))
+        elif name in TRANSFORM_ATTRS:
+            value = round_numbers(value, precision + TRANSFORM_EXTRA_PRECISION)
+            elem.set(name, re.sub(r"\s*,\s*|\s+", " ", value).replace("( ", "(").replace(" )", ")"))
+        elif name in NUMBER_ATTRS:
+            elem.set(name, round_numbers(value, precision))
+
+
+def _signature(elem):
+    """Hashable description of `elem` ignoring its own id."""
+    attrs = tuple(sorted((k, v) for k, v in elem.attrib.items() if k != "id"))
+    return (elem.tag, attrs, (elem.text or "").strip(), tuple(_full_signature(c) for c in elem))
+
+
+def _full_signature(elem):
+    attrs = tuple(sorted(elem.attrib.items()))
+    return (elem.tag, attrs, (elem.text or "").strip(), (elem.tail or "").strip(),
+            tuple(_full_signature(c) for c in elem))
+
+
+def _rewrite_refs(elem, aliases):
+    for name, value in elem.attrib.items():
+        if name in ("href", XLINK_HREF):
+            if value.startswith("#") and value[1:] in aliases:
+                elem.set(name, "#" + aliases[value[1:]])
+        elif "url(" in value:
+            elem.set(name, _URL_REF.sub(
+                lambda m: f"url(#{aliases.get(m.group(1), m.group(1))})", value))
+
+
+def _is_bare_group(elem):
+    return _local(elem.tag) == "g" and not elem.attrib and not (elem.text or "").strip()
+
+
+def _flatten(group):
+    out = []
+    for child in group:
+        if _is_bare_group(child):
+            out.extend(_flatten(child))
+        else:
+            out.append(child)
+    return out
+
+
+def _finish(root, aliases, used_ids, styled=frozenset()):
+    """Top-down pass: rewrite references, drop inherited duplicates, splice bare groups.
+
+    A stylesheet rule for a property in `styled` may match the child but
+    not its parent, so the child's own value is kept.
+    """
+    droppable = INHERITED_ATTRS - styled
+    stack = [(root, {})]
+    while stack:
+        elem, inherited = stack.pop()
+        if aliases:
+            _rewrite_refs(elem, aliases)
+        # <use> clones inherit from the <use>, not from the DOM parent
+        if _local(elem.tag) in ISOLATED or elem.get("id") in used_ids:
+            inherited = {}
+        for name in droppable & set(elem.attrib):
+            if inherited.get(name) == elem.get(name):
+                del elem.attrib[name]
+        if any(_is_bare_group(c) for c in elem):
+            elem[:] = [g for c in elem for g in (_flatten(c) if _is_bare_group(c) else [c])]
+        scope = dict(inherited)
+        scope.update((k, v) for k, v in elem.attrib.items() if k in INHERITED_ATTRS)
+        for child in elem:
+            stack.append((child, scope))
+
+
+def optimize_tree(source, precision):
+    """Parse `source` (path or file object) and return (root, merged_count)."""
+    if hasattr(source, "read"):
+        data = source.read()
+    else:
+        data = Path(source).read_bytes()
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    # The stylesheet may come after the elements it styles: read it first
+    styled = _styled_properties(data)
+    root = None
+    parents = []          # open elements
+    definitions = {}      # signature -> id kept
+    aliases = {}          # merged id -> kept id
+    used_ids = set()      # targets of href="#id"
+    for event, item in ET.iterparse(io.BytesIO(data), events=("start-ns", "start", "end")):
+        if event == "start-ns":
+            prefix, uri = item
+            # SVG always goes out as the default namespace (no "ns0:" prefixes)
+            ET.register_namespace("" if uri == SVG_NS else prefix, uri)
+            continue
+        if event == "start":
+            if root is None:
+                root = item
+            parents.append(item)
+            continue
+
+        elem = parents.pop()
+        _optimize_attrs(elem, precision, styled)
+        href = elem.get("href") or elem.get(XLINK_HREF)
+        if href and href.startswith("#"):
+            used_ids.add(href[1:])
+        keep_text = _local(elem.tag) in TEXT_ELEMENTS
+        if not keep_text and elem.text is not None and not elem.text.strip():
+            elem.text = None
+        parent = parents[-1] if parents else None
+        for child in elem:
+            if child.tail is not None and not child.tail.strip() and not keep_text:
+                child.tail = None
+
+        if parent is not None and _local(elem.tag) in MERGEABLE and elem.get("id"):
+            sig = _signature(elem)
+            kept = definitions.get(sig)
+            if kept is None:
+                definitions[sig] = elem.get("id")
+            else:
+                aliases[elem.get("id")] = kept
+                parent.remove(elem)
+    if root is None:
+        raise ET.ParseError("empty document")
+    _finish(root, aliases, {aliases.get(i, i) for i in used_ids}, styled)
+    return root, len(aliases)
+
+
+def optimize_svg(path, precision=2):
+    """
+    Optimize the SVG at `path` in place.  Safe to run in a worker process.
+
+    Returns {"path", "before", "after", "merged", "error"}; `after` equals
+    `before` when the file was left unchanged.
+    """
+    path = Path(path)
+    before = path.stat().st_size
+    stats = {"path": str(path), "before": before, "after": before, "merged": 0, "error": None}
+    try:
+        root, merged = optimize_tree(str(path), precision)
+        text = ET.tostring(root, encoding="unicode")
+    except (ET.ParseError, ValueError) as exc:
+        stats["error"] = str(exc)[:200]
+        return stats
+    data = text.encode("utf-8")
+    if len(data) >= before:
+        return stats
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+    stats.update(after=len(data), merged=merged)
+    return stats
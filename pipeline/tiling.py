@@ -0,0 +1,462 @@
+"""
+Tiled conversion of tall screenshots.
+
+A full-page capture or a long dashboard is the slowest and least reliable
+single call: one model has to reproduce thousands of pixels of layout and
+is the one that hits the timeout or the turn limit.  With TILE=1 an image
+taller than TILE_MIN_HEIGHT is converted as horizontal bands instead:
+
+  1. split_image() (run in the SVG process pool) measures how busy each
+     pixel row is (share of FIND_EDGES pixels, smoothed over QUIET_ROWS) and
+     cuts near evenly spaced targets at the quietest row within reach, so
+     cuts fall in whitespace between sections rather than through text.
+     Each band is cropped with `overlap` pixels of its neighbours as
+     context and saved under OUTPUT_DIR/.tiles/<image>/<key>/, where the
+     key covers the image's contents and the band settings: band SVGs left
+     by an interrupted run are reused only for the same screenshot.
+  2. Every band is a separate CLI call with the full template plus
+     tile_note(), which says which rows of the band are its own.
+  3. stitch_svgs() joins the band SVGs: the top-level groups of each band
+     (Background, Frame/*) are translated down by the band's offset and
+     merged with the other bands' groups of the same id, so every Figma
+     layer keeps its name.  Identical <defs> entries are shared, other
+     clashing ids renamed (in references and `#id` selectors), and the
+     bands' Frame/ComponentVariants panels are stacked into one, keeping
+     each Variant/* group once.
+
+Requires Pillow (optional dependency; see pipeline.imaging.HAVE_PIL).
+"""
+
+import hashlib
+import math
+import re
+import shutil
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+from .cache import hash_file
+from .imaging import Image
+from .salvage import close_open
+from .svgcheck import VARIANTS_ID, VIEWBOX_MARGIN, content_bbox, repair_text
+from .svgopt import SVG_NS, XLINK_NS, XLINK_HREF
+
+TILE_DIR_NAME = ".tiles"
+EDGE_LEVEL = 24          # FIND_EDGES response that counts as an edge
+QUIET_ROWS = 9           # rows on each side averaged when rating a cut
+SEARCH_SHARE = 0.2       # a cut may move this share of a band away from its target
+PANEL_GAP = 24.0         # px between the variants of consecutive bands
+
+_URL_REF = re.compile(r"url\(\s*['\"]?#([^'\")\s]+)['\"]?\s*\)")
+_ID_SELECTOR = re.compile(r"#((?:[\w-]|\\.)+)")
+_TRANSLATE = re.compile(r"translate\(\s*([^,\s)]+)(?:[\s,]+([^\s)]+))?\s*\)")
+
+
+def _local(tag):
+    return tag.rsplit("}", 1)[-1] if isinstance(tag, str) else ""
+
+
+def _fmt(v):
+    return f"{v:.2f}".rstrip("0").rstrip(".")
+
+
+def band_count(height, band_height):
+    """Bands a screenshot `height` pixels tall is split into."""
+    return max(1, math.ceil(height / band_height))
+
+
+def tile_dir(output_dir, rel):
+    """Folder for the bands of the image at `rel` (its path below the input folder)."""
+    return output_dir / TILE_DIR_NAME / rel.with_suffix("")
+
+
+def tile_key(src, band_height, overlap):
+    """Short key for the bands of the screenshot at `src` cut with these settings."""
+    return hashlib.sha256(f"{hash_file(src)}:{band_height}:{overlap}".encode("utf-8")).hexdigest()[:16]
+
+
+def clear_tile_dir(output_dir):
+    """Remove the bands left by images that did not convert."""
+    shutil.rmtree(output_dir / TILE_DIR_NAME, ignore_errors=True)
+
+
+# -- Splitting ------------------------------------------------------------------
+
+def row_activity(im):
+    """Per-row edge share of `im` (0-255), one value per pixel row."""
+    from PIL import ImageFilter
+
+    edges = im.convert("L").filter(ImageFilter.FIND_EDGES)
+    edges = edges.point(lambda v: 255 if v > EDGE_LEVEL else 0)
+    # BOX-downscaling every row to one pixel gives its edge share
+    return list(edges.resize((1, im.height), Image.BOX).tobytes())
+
+
+def quiet_cuts(activity, count):
+    """
+    Rows at which to cut `activity` into `count` bands: for each evenly
+    spaced target, the row with the least smoothed activity within reach
+    (the nearer one on a tie).  Returns [(row, activity 0-1)].
+    """
+    height = len(activity)
+    prefix = [0]
+    for value in activity:
+        prefix.append(prefix[-1] + value)
+
+    def smoothed(row):
+        lo, hi = max(0, row - QUIET_ROWS), min(height, row + QUIET_ROWS + 1)
+        return (prefix[hi] - prefix[lo]) / (hi - lo) / 255
+
+    step = height / count
+    reach = max(1, int(step * SEARCH_SHARE))
+    cuts, previous = [], 0
+    for k in range(1, count):
+        target = round(k * step)
+        lo = max(previous + reach, target - reach)
+        hi = min(height - reach, target + reach)
+        if lo >= hi:
+            continue
+        row = min(range(lo, hi), key=lambda r: (round(smoothed(r), 3), abs(r - target)))
+        cuts.append((row, smoothed(row)))
+        previous = row
+    return cuts
+
+
+def split_image(src, dest_dir, band_height, overlap):
+    """
+    Cut the screenshot at `src` into bands saved in a tile_key() folder of
+    `dest_dir`.  Safe to run in a worker process.
+
+    Returns {"width", "height", "dir", "bands": [...]}; each band has its
+    "path", its own rows "top"/"bottom", the cropped rows
+    "crop_top"/"crop_bottom" (with the overlap) and the "quiet" activity at
+    its top cut.  `bands` is empty if the image fits in one band.
+    """
+    dest_dir = Path(dest_dir) / tile_key(src, band_height, overlap)
+    with Image.open(src) as im:
+        im.load()
+        width, height = im.size
+        plan = {"width": width, "height": height, "dir": str(dest_dir), "bands": []}
+        count = band_count(height, band_height)
+        if count < 2:
+            return plan
+        if im.mode not in ("RGB", "RGBA"):
+            im = im.convert("RGBA" if "transparency" in im.info or im.mode in ("LA", "PA") else "RGB")
+        cuts = quiet_cuts(row_activity(im), count)
+        if not cuts:
+            return plan
+        dest_dir.mkdir(parents=True, exist_ok=True)
+        tops = [(0, 0.0)] + cuts
+        bottoms = [row for row, _ in cuts] + [height]
+        for number, ((top, quiet), bottom) in enumerate(zip(tops, bottoms), 1):
+            crop_top, crop_bottom = max(0, top - overlap), min(height, bottom + overlap)
+            path = dest_dir / f"band-{number:02d}.png"
+            im.crop((0, crop_top, width, crop_bottom)).save(path, "PNG")
+            plan["bands"].append({"path": str(path), "top": top, "bottom": bottom,
+                                  "crop_top": crop_top, "crop_bottom": crop_bottom,
+                                  "quiet": round(quiet, 3)})
+    return plan
+
+
+def tile_note(band, number, count, width, height):
+    """Prompt text telling the model which part of the screenshot a band is."""
+    own_top = band["top"] - band["crop_top"]
+    own_bottom = band["bottom"] - band["crop_top"]
+    lines = [
+        "",
+        "## IMAGE BAND",
+        f"The attached image is band {number} of {count} of a tall {width}x{height} screenshot: "
+        f"rows {band['crop_top']}-{band['crop_bottom']} of it. The bands are converted separately "
+        "and stacked into one SVG afterwards.",
+        f"Draw only the elements whose top edge lies between y={own_top} and y={own_bottom} of this "
+        "image, at the positions you measure on it (y=0 is its top edge). An element that continues "
+        "below that range is drawn in full; one that starts above it belongs to the band above.",
+    ]
+    if band["top"] != band["crop_top"] or band["bottom"] != band["crop_bottom"]:
+        lines.append("The rows outside that range overlap the neighbouring bands and are context only.")
+    lines.append(f"Make the LEFT panel {width}px wide. In the Component Variants panel, include "
+                 "only the components that appear in your part of the screenshot.")
+    return "\n".join(lines) + "\n"
+
+
+# -- Stitching ------------------------------------------------------------------
+
+def _parse_band(path):
+    """Root of a band's SVG, repaired or closed if needed; None if it cannot be read."""
+    try:
+        text = Path(path).read_text(encoding="utf-8", errors="replace")
+    except OSError:
+        return None
+    for attempt in (text, repair_text(text)[0]):
+        try:
+            return ET.fromstring(attempt)
+        except ET.ParseError:
+            pass
+    closed = close_open(repair_text(text)[0])
+    if closed is None:
+        return None
+    try:
+        return ET.fromstring(closed[0])
+    except ET.ParseError:
+        return None
+
+
+def _signature(elem):
+    """Serialized `elem` without its id, to find identical definitions."""
+    attrs, tail = dict(elem.attrib), elem.tail
+    elem.attrib.pop("id", None)
+    elem.tail = None
+    try:
+        return ET.tostring(elem)
+    finally:
+        elem.attrib.clear()
+        elem.attrib.update(attrs)
+        elem.tail = tail
+
+
+def _rewrite_refs(root, aliases):
+    for elem in root.iter():
+        for name, value in elem.attrib.items():
+            if name in ("href", XLINK_HREF):
+                if value.startswith("#") and value[1:] in aliases:
+                    elem.set(name, "#" + aliases[value[1:]])
+            elif "url(" in value:
+                elem.set(name, _URL_REF.sub(
+                    lambda m: f"url(#{aliases.get(m.group(1), m.group(1))})", value))
+
+
+def _rewrite_selectors(style, aliases):
+    """Rename the `#id` selectors of a <style> element (declarations are left alone)."""
+    def rename(match):
+        old = match.group(1).replace("\\", "")
+        return "#" + aliases[old].replace("/", "\\/") if old in aliases else match.group()
+
+    if aliases and style.text:
+        # Outside {...} only: "#fff" in a declaration is a colour, not an id
+        parts = re.split(r"(\{[^{}]*\})", style.text)
+        style.text = "".join(part if part.startswith("{") else _ID_SELECTOR.sub(rename, part)
+                             for part in parts)
+
+
+def _translate(elem, dy, dx=0.0):
+    if dx or dy:
+        transform = elem.get("transform")
+        elem.set("transform", f"translate({_fmt(dx)},{_fmt(dy)})" + (f" {transform}" if transform else ""))
+
+
+def _offset(elem):
+    """(x, y) `elem` is moved by if its transform is translate() only (or none); else None."""
+    transform = elem.get("transform") or ""
+    x = y = 0.0
+    for match in _TRANSLATE.finditer(transform):
+        try:
+            x += float(match.group(1))
+            y += float(match.group(2) or 0)
+        except ValueError:
+            return None
+    return None if _TRANSLATE.sub("", transform).strip(" ,") else (x, y)
+
+
+def _band_layer(elem):
+    """True for the top-level layers every band draws its part of (Background, Frame/*)."""
+    layer_id = elem.get("id") or ""
+    return layer_id == "Background" or (layer_id.startswith("Frame/") and layer_id != VARIANTS_ID)
+
+
+def _merge_group(kept, extra, dx, dy):
+    """
+    Move the content of `extra`, a later band's copy of the group `kept`,
+    into `kept`; (dx, dy) is where extra's parent sits in kept's parent.
+    Child groups with the same id are merged the same way.  Returns the
+    elements moved, or None (nothing moved) if the two groups differ in
+    more than a translate().
+    """
+    kept_at, extra_at = _offset(kept), _offset(extra)
+    if _local(kept.tag) != "g" or _local(extra.tag) != "g" or kept_at is None or extra_at is None:
+        return None
+    if ({k: v for k, v in kept.attrib.items() if k not in ("id", "transform")}
+            != {k: v for k, v in extra.attrib.items() if k not in ("id", "transform")}):
+        return None
+    dx, dy = dx + extra_at[0] - kept_at[0], dy + extra_at[1] - kept_at[1]
+    twins = {c.get("id"): c for c in kept if c.get("id")}
+    moved = []
+    for child in list(extra):
+        twin = twins.get(child.get("id"))
+        nested = _merge_group(twin, child, dx, dy) if twin is not None else None
+        if nested is not None:
+            moved += nested
+            continue
+        extra.remove(child)
+        _translate(child, dy, dx)
+        kept.append(child)
+        moved.append(child)
+    return moved
+
+
+def _viewbox(root):
+    try:
+        values = [float(v) for v in re.split(r"[\s,]+", (root.get("viewBox") or "").strip())]
+    except ValueError:
+        return None
+    return values if len(values) == 4 else None
+
+
+def stitch_svgs(parts, dest, width, height):
+    """
+    Join band SVGs into one at `dest`.  Safe to run in a worker process.
+
+    `parts` is [(band svg path, y offset)] from top to bottom.  Returns
+    {"path", "bands", "shared", "merged", "renamed", "variants", "size"}:
+    `shared` definitions were identical in several bands, `merged` band
+    layers joined an earlier band's layer of the same id, `renamed` ids
+    clashed with an earlier band's.  Raises ValueError naming a band that
+    cannot be parsed; that band's SVG is deleted so the next attempt
+    converts it again.
+    """
+    dest = Path(dest)
+    stats = {"path": str(dest), "bands": len(parts), "shared": 0, "merged": 0, "renamed": 0,
+             "variants": 0, "size": 0}
+    ET.register_namespace("", SVG_NS)
+    ET.register_namespace("xlink", XLINK_NS)
+    root = defs = panel = None
+    taken = set()        # ids used by earlier bands
+    definitions = {}     # signature -> id kept
+    styles = set()       # <style> texts already in <defs>
+    variants = set()     # Variant/* ids already in the panel
+    layers = []
+    band_layers = {}     # Background / Frame/* id -> its group in `layers`
+    wrappers = set()     # groups made to hold layers that could not be merged
+    vb_width = float(width)
+    for number, (path, dy) in enumerate(parts, 1):
+        band = _parse_band(path)
+        if band is None or _local(band.tag) != "svg":
+            Path(path).unlink(missing_ok=True)
+            raise ValueError(f"band {number} of {len(parts)} is not a readable SVG")
+        ns = band.tag[:-len("svg")]
+        if root is None:
+            root = ET.Element(band.tag)
+            if not ns:
+                root.set("xmlns", SVG_NS)
+            defs = ET.SubElement(root, ns + "defs")
+        viewbox = _viewbox(band)
+        if viewbox is not None:
+            vb_width = max(vb_width, viewbox[0] + viewbox[2])
+
+        band_panel = next((c for c in band if c.get("id") == VARIANTS_ID), None)
+        if band_panel is not None:
+            band.remove(band_panel)
+            if panel is not None:
+                # Only the variants this band adds; titles and rules come from the first panel
+                band_panel[:] = [c for c in band_panel if (c.get("id") or "").startswith("Variant/")
+                                 and c.get("id") not in variants]
+        band_defs = [d for c in band if _local(c.tag) == "defs" for d in c]
+
+        aliases, dropped = {}, set()
+        for d in band_defs:
+            if _local(d.tag) == "style":
+                continue
+            sig = _signature(d)
+            if d.get("id") and sig in definitions:
+                aliases[d.get("id")] = definitions[sig]
+                dropped.add(d)
+                stats["shared"] += 1
+
+        # Layers an earlier band has too are merged into its group, which
+        # keeps the id; their content is renamed below like everything else
+        placed, moved, styles_in = [], [], [d for d in band_defs if _local(d.tag) == "style"]
+        for child in list(band):
+            tag = _local(child.tag)
+            if tag == "defs":
+                continue
+            if tag == "style":
+                styles_in.append(child)
+                continue
+            kept = band_layers.get(child.get("id")) if _band_layer(child) else None
+            if kept is None:
+                placed.append(child)
+                continue
+            band.remove(child)
+            stats["merged"] += 1
+            merged = None if kept in wrappers else _merge_group(kept, child, 0.0, dy)
+            if merged is None:
+                if kept not in wrappers:
+                    wrapper = ET.Element(ns + "g", id=kept.attrib.pop("id"))
+                    wrapper.append(kept)
+                    layers[layers.index(kept)] = band_layers[wrapper.get("id")] = wrapper
+                    wrappers.add(wrapper)
+                    kept = wrapper
+                del child.attrib["id"]
+                _translate(child, dy)
+                kept.append(child)
+                merged = [child]
+            moved += merged
+
+        own = [e for e in band.iter() if e.get("id") and e not in dropped
+               and not (e in placed and _band_layer(e))]
+        for elem in moved:
+            own += [e for e in elem.iter() if e.get("id")]
+        if band_panel is not None:
+            own += [e for e in band_panel.iter() if e.get("id") and e is not band_panel]
+        for elem in own:
+            old = elem.get("id")
+            if old in taken:
+                new, n = f"{old}-{number}", number
+                while new in taken:
+                    n += 1
+                    new = f"{old}-{n}"
+                aliases[old] = new
+                elem.set("id", new)
+                stats["renamed"] += 1
+        _rewrite_refs(band, aliases)
+        for elem in moved:
+            _rewrite_refs(elem, aliases)
+        if band_panel is not None:
+            _rewrite_refs(band_panel, aliases)
+        taken.update(e.get("id") for e in own)
+        for d in band_defs:
+            if d in dropped or _local(d.tag) == "style":
+                continue
+            definitions[_signature(d)] = d.get("id")
+            defs.append(d)
+        for style in styles_in:
+            _rewrite_selectors(style, aliases)
+            if (style.text or "").strip() not in styles:
+                styles.add((style.text or "").strip())
+                defs.append(style)
+
+        for child in placed:
+            _translate(child, dy)
+            layers.append(child)
+            if _band_layer(child):
+                band_layers[child.get("id")] = child
+                taken.add(child.get("id"))
+
+        if band_panel is None:
+            continue
+        if panel is None:
+            panel = band_panel
+        elif len(band_panel):
+            bottom = (content_bbox(panel) or (0, 0, 0, 0))[3]
+            top = (content_bbox(band_panel) or (0, 0, 0, 0))[1]
+            for child in list(band_panel):
+                _translate(child, bottom + PANEL_GAP - top)
+                panel.append(child)
+        variants.update(e.get("id") for e in panel.iter() if (e.get("id") or "").startswith("Variant/"))
+
+    root.extend(layers)
+    if panel is not None:
+        root.append(panel)
+        stats["variants"] = len(variants)
+    bbox = content_bbox(root)
+    vb_height = max(float(height), bbox[3] + VIEWBOX_MARGIN if bbox else 0.0)
+    if bbox:
+        vb_width = max(vb_width, bbox[2] + VIEWBOX_MARGIN)
+    root.set("viewBox", f"0 0 {_fmt(vb_width)} {_fmt(vb_height)}")
+    root.set("width", _fmt(vb_width))
+    root.set("height", _fmt(vb_height))
+
+    text = ET.tostring(root, encoding="unicode") + "\n"
+    tmp = dest.with_suffix(dest.suffix + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    tmp.replace(dest)
+    stats["size"] = len(text.encode("utf-8"))
+    return stats
@@ -0,0 +1,254 @@
+"""
+Watch-folder support for the long-running mode (convert.py --watch).
+
+FolderWatcher reports image files in the input folder and its subfolders
+once they have stopped changing (same size and mtime for `settle` seconds),
+so half-copied screenshots are never picked up.  On Linux it sleeps on
+inotify (via ctypes, no extra dependency), with one watch per directory, and
+only stats the files named in events; a new subfolder gets its own watch and
+is scanned once.  Elsewhere, or if inotify is unavailable, it rescans the
+folder tree every `poll_interval` (pipeline.scan).
+
+GracefulShutdown turns SIGTERM/SIGINT into a "drain" request: in-flight
+conversions finish, nothing new starts.  A second signal aborts: `on_abort`
+cancels the in-flight conversions (the engine kills their CLI process
+trees) and the run ends normally.  A third signal, or a second one without
+`on_abort`, exits at once.
+
+StatusFile writes a small JSON heartbeat that service managers and scripts
+can poll.
+"""
+
+import os
+import sys
+import json
+import time
+import errno
+import select
+import signal
+import struct
+from pathlib import Path
+
+from .scan import suffix_matcher, walk_dirs, walk_files
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+def _inotify_init():
+    """Return (libc, fd) for a non-blocking inotify instance, or None."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        import ctypes
+        import ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            return None
+        return libc, fd
+    except (OSError, AttributeError):
+        return None
+
+
+class FolderWatcher:
+    """Yields new, fully written image files from a directory tree."""
+
+    def __init__(self, directory, patterns, settle=2.0, poll_interval=2.0, use_inotify=True,
+                 recursive=True, exclude=()):
+        self.directory = Path(directory)
+        self.settle = settle
+        self.poll_interval = poll_interval
+        self.recursive = recursive
+        self.exclude = exclude
+        self._matches = suffix_matcher(patterns)
+        self._libc = self._fd = None
+        self._wds = {}         # inotify watch descriptor -> directory
+        self._candidates = {}  # path -> (size, mtime_ns, unchanged_since)
+        self._seen = {}        # path -> (size, mtime_ns) already reported
+        self._next_scan = 0.0
+        inotify = _inotify_init() if use_inotify else None
+        if inotify is not None:
+            self._libc, self._fd = inotify
+            if self._add_watch(self.directory):
+                self._next_scan = float("inf")  # events name the files; rescan only on overflow
+                if recursive:
+                    for sub in walk_dirs(self.directory, exclude):
+                        self._add_watch(sub)
+            else:
+                self.close()
+
+    @property
+    def backend(self):
+        return "inotify" if self._fd is not None else "polling"
+
+    def _add_watch(self, directory):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(str(directory)), WATCH_MASK)
+        if wd < 0:
+            return False
+        self._wds[wd] = Path(directory)
+        return True
+
+    def mark_seen(self, paths):
+        """Do not report `paths` (e.g. the initial batch) unless they change later."""
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            self._seen[Path(path)] = (st.st_size, st.st_mtime_ns)
+
+    def seen(self, path):
+        """True if `path` was reported or marked seen (and may be in the run already)."""
+        return Path(path) in self._seen
+
+    def _scan(self, root=None):
+        for path in walk_files(root or self.directory, self.recursive, self.exclude):
+            if self._matches(path.name):
+                self._candidates.setdefault(path, None)
+
+    def _read_events(self):
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except OSError as exc:
+            if exc.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return
+            raise
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0").decode("utf-8", "surrogateescape")
+            offset += length
+            directory = self._wds.get(wd)
+            if mask & IN_Q_OVERFLOW:
+                self._next_scan = 0.0
+            elif directory is None or not name or name.startswith("."):
+                continue
+            elif mask & IN_ISDIR:
+                sub = directory / name
+                if self.recursive and os.path.realpath(sub) not in {os.path.realpath(d) for d in self.exclude}:
+                    # Files may have landed before the watch existed: scan the new subtree once
+                    self._add_watch(sub)
+                    for deeper in walk_dirs(sub, self.exclude):
+                        self._add_watch(deeper)
+                    self._scan(sub)
+            elif self._matches(name):
+                self._candidates[directory / name] = None
+
+    def wait(self, timeout):
+        """Sleep up to `timeout` seconds, waking early on a folder event."""
+        if self._fd is None:
+            time.sleep(timeout)
+            return
+        try:
+            select.select([self._fd], [], [], timeout)
+        except InterruptedError:
+            pass
+
+    def poll(self):
+        """Return files that have settled since the last call (non-blocking)."""
+        now = time.monotonic()
+        if self._fd is not None:
+            self._read_events()
+        if now >= self._next_scan:
+            self._scan()
+            if self._fd is None:
+                self._next_scan = now + self.poll_interval
+            else:
+                self._next_scan = float("inf")
+
+        ready = []
+        for path, state in list(self._candidates.items()):
+            try:
+                st = os.stat(path)
+            except OSError:
+                del self._candidates[path]  # moved away or deleted
+                continue
+            sig = (st.st_size, st.st_mtime_ns)
+            if self._seen.get(path) == sig:
+                del self._candidates[path]
+                continue
+            if state is None or state[:2] != sig:
+                self._candidates[path] = (sig[0], sig[1], now)
+            elif now - state[2] >= self.settle and st.st_size > 0:
+                del self._candidates[path]
+                self._seen[path] = sig
+                ready.append(path)
+        return sorted(ready)
+
+    @property
+    def settling(self):
+        """Number of files seen but not yet stable."""
+        return len(self._candidates)
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class GracefulShutdown:
+    """First SIGTERM/SIGINT requests a drain, the second aborts, the last resort exits immediately."""
+
+    def __init__(self, signals=(signal.SIGTERM, signal.SIGINT), on_request=None, on_abort=None):
+        self.requested = False
+        self.aborted = False
+        self.on_request = on_request
+        self.on_abort = on_abort
+        self._previous = {}
+        for sig in signals:
+            try:
+                self._previous[sig] = signal.signal(sig, self._handle)
+            except (ValueError, OSError):
+                pass  # not in the main thread, or unsupported on this platform
+
+    def _handle(self, signum, frame):
+        if self.requested and self.on_abort is not None and not self.aborted:
+            self.aborted = True
+            self.on_abort(signum)
+            return
+        if self.requested:
+            # The journal already marks in-flight images RUNNING, so
+            # --resume redoes them.
+            sys.stdout.flush()
+            os._exit(128 + signum)
+        self.requested = True
+        if self.on_request is not None:
+            self.on_request(signum)
+
+    def restore(self):
+        for sig, handler in self._previous.items():
+            signal.signal(sig, handler)
+        self._previous.clear()
+
+
+class StatusFile:
+    """Atomically rewritten JSON status file (the daemon heartbeat)."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.started = time.time()
+
+    def write(self, state, **fields):
+        data = {
+            "pid": os.getpid(),
+            "state": state,
+            "started": self.started,
+            "updated": time.time(),
+        }
+        data.update(fields)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(data, indent=2), encoding="utf-8")
+        os.replace(tmp, self.path)
@@ -0,0 +1,63 @@
+import unittest
+
+from pipeline.batching import (
+    UNKNOWN_IMAGE_TOKENS, apportion, batch_budget, batch_timeout, context_window, image_tokens,
+    split_usage,
+)
+
+USAGE = {"input": 1000, "output": 200, "total": 1200, "cache_read": 700, "cache_write": 101,
+         "cost_usd": 0.1}
+
+
+class SplitUsageTest(unittest.TestCase):
+    def test_parts_add_up_to_the_call(self):
+        shares, parts = split_usage(USAGE, [1, 1, 1])
+        self.assertAlmostEqual(sum(shares), 1.0)
+        for key, value in USAGE.items():
+            self.assertEqual(sum(part[key] for part in parts), value, key)
+
+    def test_three_way_split_of_100(self):
+        _, parts = split_usage({"total": 100}, [1, 1, 1])
+        self.assertEqual(sorted(part["total"] for part in parts), [33, 33, 34])
+
+    def test_weights_are_proportional(self):
+        shares, parts = split_usage({"total": 1000, "cost_usd": 1.0}, [3, 1])
+        self.assertEqual(shares, [0.75, 0.25])
+        self.assertEqual([part["total"] for part in parts], [750, 250])
+        self.assertAlmostEqual(parts[0]["cost_usd"], 0.75)
+
+    def test_zero_weights_split_evenly(self):
+        shares, parts = split_usage({"total": 10}, [0, 0])
+        self.assertEqual(shares, [0.5, 0.5])
+        self.assertEqual([part["total"] for part in parts], [5, 5])
+
+
+class ApportionTest(unittest.TestCase):
+    def test_largest_remainder(self):
+        self.assertEqual(apportion(7, [0.5, 0.25, 0.25]), [3, 2, 2])
+        self.assertEqual(apportion(10, [0.55, 0.45]), [6, 4])
+
+    def test_parts_are_floor_or_ceiling(self):
+        shares = [0.1, 0.2, 0.3, 0.4]
+        for value in range(50):
+            parts = apportion(value, shares)
+            self.assertEqual(sum(parts), value)
+            for part, share in zip(parts, shares):
+                self.assertLessEqual(abs(part - value * share), 1)
+
+
+class BatchLimitsTest(unittest.TestCase):
+    def test_timeout_grows_by_step_per_extra_image(self):
+        self.assertEqual(batch_timeout(600, 1, 0.25), 600)
+        self.assertEqual(batch_timeout(600, 4, 0.25), 1050)
+        self.assertEqual(batch_timeout(600, 4, 0), 600)
+
+    def test_context_budget(self):
+        self.assertEqual(batch_budget("claude-sonnet-4-5", 0.5), context_window("claude") // 2)
+
+    def test_unreadable_image(self):
+        self.assertEqual(image_tokens(None, "claude"), UNKNOWN_IMAGE_TOKENS)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+
+from config.constants import CLI_OVERHEAD_TOKENS, ESTIMATE_OUTPUT_TOKENS, ESTIMATE_TURNS, PROVIDER_CLAUDE
+from pipeline.batching import image_tokens
+from pipeline.budget import Budget, combine, estimate_call, template_tokens
+
+
+def estimate(total, cost_usd):
+    return {"total": total, "cost_usd": cost_usd}
+
+
+class EstimateTest(unittest.TestCase):
+    def test_call_estimate(self):
+        tokens = estimate_call((1000, 800), 2000, None, PROVIDER_CLAUDE)
+        context = CLI_OVERHEAD_TOKENS[PROVIDER_CLAUDE] + 2000
+        image = image_tokens((1000, 800), PROVIDER_CLAUDE)
+        self.assertEqual(tokens["input"], context * ESTIMATE_TURNS + image * (ESTIMATE_TURNS - 1))
+        self.assertEqual(tokens["cache_read"], context * (ESTIMATE_TURNS - 1))
+        self.assertEqual(tokens["total"], tokens["input"] + ESTIMATE_OUTPUT_TOKENS)
+        self.assertGreater(tokens["cost_usd"], 0)
+        self.assertEqual(template_tokens("x" * 400), 100)
+
+    def test_combine_sums_every_key(self):
+        self.assertEqual(combine([estimate(10, 0.5), estimate(5, 0.25)]), estimate(15, 0.75))
+
+
+class BudgetTest(unittest.TestCase):
+    def test_disabled_by_default(self):
+        budget = Budget()
+        self.assertFalse(budget.enabled)
+        self.assertTrue(budget.allows(10 ** 9, 10 ** 6, estimate(10 ** 6, 100.0)))
+
+    def test_in_flight_calls_make_a_submission_wait(self):
+        budget = Budget(max_usd=1.0)
+        budget.reserve("a", estimate(100, 0.4))
+        budget.reserve("b", estimate(100, 0.4))
+        self.assertFalse(budget.allows(0, 0.1, estimate(100, 0.4)))
+        self.assertIsNone(budget.exceeded)
+        budget.release("a")
+        self.assertTrue(budget.allows(0, 0.1, estimate(100, 0.4)))
+
+    def test_spent_money_exceeds_the_budget(self):
+        budget = Budget(max_usd=1.0)
+        self.assertFalse(budget.allows(0, 0.8, estimate(100, 0.4)))
+        self.assertIn("$0.80 spent", budget.exceeded)
+        self.assertFalse(budget.allows(0, 0.0, estimate(100, 0.01)))  # stays stopped
+
+    def test_token_limit(self):
+        budget = Budget(max_tokens=1000)
+        self.assertTrue(budget.allows(500, 0.0, estimate(500, 0.0)))
+        self.assertFalse(budget.allows(600, 0.0, estimate(500, 0.0)))
+        self.assertIn("1,000 tok", budget.exceeded)
+
+    def test_projections_follow_actual_usage(self):
+        budget = Budget(max_tokens=10 ** 6)
+        budget.release("a", estimate(100, 0.01), {"total": 200, "cost_usd": 0.02})
+        self.assertEqual(budget.scale(), (1.0, 1.0))  # not enough calls yet
+        budget.release("b", estimate(100, 0.01), {"total": 200, "cost_usd": 0.02})
+        self.assertEqual(budget.project(estimate(50, 0.1)), (100, 0.2))
+        budget.release("c", estimate(100, 0.01), {"total": 10 ** 5, "cost_usd": 0.0})
+        self.assertEqual(budget.scale()[0], 4.0)  # clamped
+
+    def test_failed_call_does_not_calibrate(self):
+        budget = Budget(max_usd=1.0)
+        budget.reserve("a", estimate(100, 0.1))
+        budget.release("a", estimate(100, 0.1), {"total": 0})
+        self.assertEqual((budget.reserved, budget.calls), ({}, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from pipeline.cache import ConversionCache, cache_key, hash_file
+
+CFG = {"provider": "claude", "model": "claude-sonnet-4-5", "max_turns": 3, "sandbox": None,
+       "svg_validate": True, "svg_optimize": True, "svg_precision": 2, "salvage": False}
+
+
+class CacheKeyTest(unittest.TestCase):
+    def test_same_inputs_same_key(self):
+        self.assertEqual(cache_key("abc", "prompt", CFG), cache_key("abc", "prompt", dict(CFG)))
+
+    def test_every_part_changes_the_key(self):
+        key = cache_key("abc", "prompt", CFG)
+        self.assertNotEqual(cache_key("abd", "prompt", CFG), key)
+        self.assertNotEqual(cache_key("abc", "prompt!", CFG), key)
+        self.assertNotEqual(cache_key("abc", "prompt", CFG, "1600,trim"), key)
+        for name, value in (("provider", "codex"), ("model", "claude-opus-4-1"), ("max_turns", 5),
+                            ("svg_optimize", False), ("svg_precision", 1), ("salvage", True)):
+            self.assertNotEqual(cache_key("abc", "prompt", dict(CFG, **{name: value})), key, name)
+
+    def test_fields_are_length_prefixed(self):
+        self.assertNotEqual(cache_key("ab", "c", CFG), cache_key("a", "bc", CFG))
+
+
+class ConversionCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.svg = self.tmp / "page.svg"
+        self.svg.write_text("<svg/>", encoding="utf-8")
+
+    def test_store_and_restore(self):
+        cache = ConversionCache(self.tmp / "cache", max_bytes=1 << 20, max_age_seconds=3600)
+        cache.store("k1", self.svg, "page.png", {"total": 10}, 1.5)
+        out = self.tmp / "out" / "page.svg"
+        meta = cache.restore("k1", out)
+        self.assertEqual(meta["tokens"], {"total": 10})
+        self.assertEqual(out.read_text(encoding="utf-8"), "<svg/>")
+        self.assertIsNone(cache.restore("k2", out))
+
+    def test_expired_entries_miss(self):
+        cache = ConversionCache(self.tmp / "cache", max_bytes=1 << 20, max_age_seconds=-1)
+        cache.store("k1", self.svg, "page.png", {}, 1.0)
+        self.assertIsNone(cache.get("k1"))
+
+    def test_evict_least_recently_used(self):
+        cache = ConversionCache(self.tmp / "cache", max_bytes=10, max_age_seconds=3600)
+        for key, when in (("old", 1000), ("new", 2000)):
+            cache.store(key, self.svg, "page.png", {}, 1.0)
+            meta = self.tmp / "cache" / key[:2] / f"{key}.json"
+            os.utime(meta, (when, when))
+        self.assertEqual(cache.evict(), 1)
+        self.assertIsNone(cache.get("old"))
+        self.assertIsNotNone(cache.get("new"))
+
+    def test_hash_file(self):
+        self.assertEqual(hash_file(self.svg), hash_file(self.svg))
+        other = self.tmp / "other.svg"
+        other.write_text("<svg></svg>", encoding="utf-8")
+        self.assertNotEqual(hash_file(other), hash_file(self.svg))
+
+
+if __name__ == "__main__":
+    unittest.main()
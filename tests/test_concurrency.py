@@ -0,0 +1,67 @@
+import unittest
+
+from pipeline.concurrency import LATENCY_WARMUP, AdaptiveConcurrency
+from pipeline.failures import ERR_AUTH, ERR_RATE_LIMIT
+
+
+class AdaptiveConcurrencyTest(unittest.TestCase):
+    def controller(self, **kwargs):
+        changes = []
+        kwargs.setdefault("cooldown", 0.0)
+        limiter = AdaptiveConcurrency(4, 1, 8, on_change=lambda old, new, reason: changes.append((old, new)),
+                                      **kwargs)
+        return limiter, changes
+
+    def test_additive_increase(self):
+        limiter, changes = self.controller()
+        for _ in range(4):
+            limiter.record(None, 10.0)
+        self.assertEqual(limiter.limit, 4)  # 4 + 1/4 + ... stays below 5
+        for _ in range(2):
+            limiter.record(None, 10.0)
+        self.assertEqual(limiter.limit, 5)
+        self.assertEqual(changes, [(4, 5)])
+
+    def test_rate_limit_halves(self):
+        limiter, changes = self.controller()
+        limiter.record(ERR_RATE_LIMIT, 1.0)
+        self.assertEqual(limiter.limit, 2)
+        limiter.record(ERR_RATE_LIMIT, 1.0)
+        limiter.record(ERR_RATE_LIMIT, 1.0)
+        self.assertEqual(limiter.limit, 1)  # never below min_limit
+
+    def test_cooldown_counts_a_burst_once(self):
+        limiter, _ = self.controller(cooldown=60.0)
+        for _ in range(3):
+            limiter.record(ERR_RATE_LIMIT, 1.0)
+        self.assertEqual(limiter.limit, 2)
+
+    def test_capped_at_max(self):
+        limiter, _ = self.controller()
+        for _ in range(200):
+            limiter.record(None, 10.0)
+        self.assertEqual(limiter.limit, 8)
+
+    def test_latency_rise_decreases(self):
+        limiter, _ = self.controller(latency_factor=2.0)
+        for _ in range(LATENCY_WARMUP + 1):
+            limiter.record(None, 10.0)
+        before = limiter.limit
+        for _ in range(5):
+            limiter.record(None, 100.0)
+        self.assertLess(limiter.limit, before)
+
+    def test_other_failures_are_ignored(self):
+        limiter, changes = self.controller()
+        for _ in range(10):
+            limiter.record(ERR_AUTH, 1.0)
+        self.assertEqual((limiter.limit, changes), (4, []))
+
+    def test_disabled(self):
+        limiter, _ = self.controller(enabled=False)
+        limiter.record(ERR_RATE_LIMIT, 1.0)
+        self.assertEqual(limiter.limit, 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import random
+import tempfile
+import unittest
+from pathlib import Path
+
+from pipeline.dedupe import HASH_DHASH, HASH_PHASH, BKTree, PHashIndex, cluster, compute_hash, hamming
+from pipeline.imaging import HAVE_PIL
+
+
+class HammingTest(unittest.TestCase):
+    def test_counts_differing_bits(self):
+        self.assertEqual(hamming(0b1011, 0b1011), 0)
+        self.assertEqual(hamming(0b1011, 0b0010), 2)
+        self.assertEqual(hamming(0, (1 << 64) - 1), 64)
+
+
+class BKTreeTest(unittest.TestCase):
+    def test_query_matches_a_full_scan(self):
+        rng = random.Random(3)
+        hashes = [rng.getrandbits(64) for _ in range(300)]
+        tree = BKTree()
+        for n, h in enumerate(hashes):
+            tree.add(h, n)
+        for probe in hashes[:20] + [rng.getrandbits(64) for _ in range(5)]:
+            for max_dist in (0, 6, 28):
+                found = tree.query(probe, max_dist)
+                expected = sorted(d for d in (hamming(probe, h) for h in hashes) if d <= max_dist)
+                self.assertEqual([d for d, _ in found], expected)
+
+    def test_empty_tree(self):
+        self.assertEqual(BKTree().query(5, 64), [])
+
+
+class ClusterTest(unittest.TestCase):
+    def test_members_join_the_closest_earlier_representative(self):
+        hashed = [("a", 0b0000), ("b", 0b0001), ("c", 0b1111_0000), ("d", 0b1111_0001), ("e", 0b0011)]
+        self.assertEqual(cluster(hashed, 2),
+                         [("a", [("b", 1), ("e", 2)]), ("c", [("d", 1)])])
+
+    def test_threshold_zero_groups_equal_hashes(self):
+        self.assertEqual(cluster([("a", 7), ("b", 7), ("c", 6)], 0), [("a", [("b", 0)]), ("c", [])])
+
+
+class PHashIndexTest(unittest.TestCase):
+    def test_saved_entries_match_on_the_next_run(self):
+        tmp = Path(tempfile.mkdtemp())
+        svg = tmp / "home.svg"
+        svg.write_text("<svg/>", encoding="utf-8")
+        index = PHashIndex(tmp / "index.json", HASH_DHASH)
+        index.add(0xF0F0, "home.png", "digest", svg)
+        index.add(0x0F0F, "gone.png", "digest", tmp / "gone.svg")
+        index.save()
+
+        again = PHashIndex(tmp / "index.json", HASH_DHASH)
+        dist, entry = again.nearest(0xF0F1, 4)
+        self.assertEqual((dist, entry["image"]), (1, "home.png"))
+        self.assertIsNone(again.nearest(0x0F0F, 4))  # its SVG no longer exists
+        # Hashes of another method are not comparable
+        self.assertIsNone(PHashIndex(tmp / "index.json", HASH_PHASH).nearest(0xF0F0, 4))
+
+
+@unittest.skipUnless(HAVE_PIL, "needs Pillow")
+class ComputeHashTest(unittest.TestCase):
+    def test_near_duplicates_hash_close(self):
+        from PIL import Image, ImageDraw
+
+        tmp = Path(tempfile.mkdtemp())
+        base = Image.new("RGB", (320, 240), "white")
+        draw = ImageDraw.Draw(base)
+        draw.rectangle((20, 20, 150, 200), fill="navy")
+        draw.ellipse((180, 40, 300, 160), fill="orange")
+        base.save(tmp / "a.png")
+        draw.text((30, 210), "hover", fill="black")  # a small state change
+        base.save(tmp / "b.png")
+        other = Image.new("RGB", (320, 240), "white")
+        ImageDraw.Draw(other).rectangle((170, 20, 300, 200), fill="navy")
+        other.save(tmp / "c.png")
+
+        for method in (HASH_DHASH, HASH_PHASH):
+            a, b, c = (compute_hash(tmp / name, method) for name in ("a.png", "b.png", "c.png"))
+            self.assertLess(hamming(a, b), hamming(a, c), method)
+            self.assertLess(max(a, b, c), 1 << 64)
+        (tmp / "broken.png").write_bytes(b"not a png")
+        self.assertIsNone(compute_hash(tmp / "broken.png", HASH_DHASH))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,230 @@
+"""
+convert.py end to end against the fake CLI (bench/fake_cli.py): no API calls.
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+import zlib
+from pathlib import Path
+
+from config import load_config
+from pipeline.conversion import run_tiled
+from pipeline.journal import STATE_DONE, STATE_FAILED, STATE_QUEUED, STATE_RUNNING, RunJournal
+from pipeline.salvage import salvage_svg
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+FAKE_CLI = PROJECT_DIR / "bench" / "fake_cli.py"
+
+
+def write_png(path, width, height):
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    raw = b"".join(b"\x00" + bytes((x * 7 + y) % 256 for x in range(width * 3)) for y in range(height))
+    path.write_bytes(b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+                     + chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b""))
+
+
+@unittest.skipIf(sys.platform == "win32", "the fake CLI is started through its #! line")
+class EndToEndTest(unittest.TestCase):
+    def setUp(self):
+        self.work = Path(tempfile.mkdtemp(prefix="figma-e2e-"))
+        self.addCleanup(shutil.rmtree, self.work, True)
+        self.input = self.work / "in"
+        self.output = self.work / "out"
+        self.archive = self.work / "archive"
+        self.input.mkdir()
+
+    def add_images(self, count, width=64, height=48):
+        for n in range(count):
+            write_png(self.input / f"screen{n:02d}.png", width + n, height)
+
+    def command(self, *args):
+        return [sys.executable, str(PROJECT_DIR / "convert.py"), "--no-input", *args]
+
+    def environment(self, **env):
+        run_env = dict(os.environ)
+        run_env.update({
+            "AI_PROVIDER": "claude",
+            "AI_CLI_PATH": str(FAKE_CLI),
+            "CLAUDE_PARALLEL": "2",
+            "PARALLEL_MAX": "2",
+            "ADAPTIVE_PARALLEL": "0",
+            "INPUT_DIR": str(self.input),
+            "OUTPUT_DIR": str(self.output),
+            "ARCHIVE_DIR": str(self.archive),
+            "JOURNAL_DIR": str(self.work / "runs"),
+            "METRICS_DIR": str(self.work / "metrics"),
+            "HISTORY_DB": str(self.work / "history.sqlite3"),
+            "STATUS_FILE": str(self.work / "status.json"),
+            "CACHE_ENABLED": "0",
+            "DEDUPE": "0",
+            "PREPROCESS": "0",
+            "ROUTING": "0",
+            "TILE": "0",
+            "HEDGE": "0",
+            "BATCH_MAX": "1",
+            "FAKE_LATENCY": "fixed:0.05",
+        })
+        run_env.update(env)
+        run_env.pop("CLAUDECODE", None)
+        return run_env
+
+    def convert(self, *args, **env):
+        proc = subprocess.run(self.command(*args), cwd=PROJECT_DIR, env=self.environment(**env),
+                              stdin=subprocess.DEVNULL, capture_output=True, text=True, timeout=120)
+        return proc.returncode, proc.stdout
+
+    def outputs(self):
+        return sorted(p.name for p in self.output.glob("*.svg"))
+
+    def journal_states(self, pattern="run-*.jsonl"):
+        (journal,) = (self.work / "runs").glob(pattern)
+        states = {}
+        for line in journal.read_text(encoding="utf-8").splitlines():
+            entry = json.loads(line)
+            if "image" in entry:
+                states.setdefault(entry["image"], []).append(entry["state"])
+        return states
+
+    def test_converts_and_archives(self):
+        self.add_images(4)
+        code, out = self.convert()
+        self.assertEqual(code, 0, out)
+        self.assertEqual(self.outputs(), [f"screen{n:02d}.svg" for n in range(4)])
+        self.assertEqual(list(self.input.iterdir()), [])
+        self.assertEqual(len(list(self.archive.glob("*.png"))), 4)
+        for states in self.journal_states().values():
+            self.assertEqual(states[-1], STATE_DONE)
+
+    def test_default_schedule_streams_the_folder(self):
+        self.add_images(6)
+        code, out = self.convert(QUEUE_WINDOW="2")  # SCHEDULE=lpt by default
+        self.assertEqual(code, 0, out)
+        self.assertIn("queued, the rest are read as slots free up", out)
+        self.assertIn("1 done / 2 found so far", out)  # not a pre-scan of all six
+        self.assertEqual(len(self.outputs()), 6)
+
+    def test_shard_workers_split_one_folder(self):
+        self.add_images(12)
+        workers = [subprocess.Popen(self.command("--shard", "--worker-id", f"w{n}"), cwd=PROJECT_DIR,
+                                    env=self.environment(FAKE_LATENCY="uniform:0.05,0.2"),
+                                    stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                    stderr=subprocess.STDOUT, text=True)
+                   for n in range(3)]
+        outs = [worker.communicate(timeout=120)[0] for worker in workers]
+        for worker, out in zip(workers, outs):
+            self.assertEqual(worker.returncode, 0, out)
+
+        images = [f"screen{n:02d}.png" for n in range(12)]
+        self.assertEqual(sorted(p.name for p in self.archive.glob("*.png")), images)  # no screen00-2.png
+        self.assertEqual(self.outputs(), [name.replace(".png", ".svg") for name in images])
+        self.assertEqual(list(self.input.rglob("*.png")), [])  # none left in the folder or a lease
+        done = {}
+        for n in range(3):
+            for image, states in self.journal_states(f"run-*@w{n}.jsonl").items():
+                done[image] = done.get(image, 0) + states.count(STATE_DONE)
+        self.assertEqual(done, dict.fromkeys(images, 1))  # converted by exactly one worker
+        self.assertEqual(sum(out.count("[OK]") for out in outs), 12)
+
+    def test_resume_skips_finished_images(self):
+        self.add_images(3)
+        self.output.mkdir()
+        (self.output / "screen01.svg").write_text("<svg", encoding="utf-8")  # half-written
+        journal = RunJournal(self.work / "runs" / "run-20260101-000000.jsonl")
+        journal.record("screen00.png", STATE_DONE, result=("screen00.png", True, 1.0, 8, None,
+                                                           {"total": 1, "cost_usd": 0.0}))
+        journal.record("screen01.png", STATE_RUNNING)
+        journal.record("screen02.png", STATE_QUEUED)
+        journal.close()
+        (self.output / "screen00.svg").write_text("<svg/>", encoding="utf-8")
+
+        code, out = self.convert("--resume")
+        self.assertEqual(code, 0, out)
+        self.assertIn("finished before interruption", out)
+        self.assertEqual(out.count("[OK]"), 2)  # only the unfinished two reach the CLI
+        self.assertEqual((self.output / "screen00.svg").read_text(encoding="utf-8"), "<svg/>")
+        ET.parse(self.output / "screen01.svg")
+        self.assertEqual(self.journal_states()["screen01.png"][-1], STATE_DONE)
+
+    def test_batching(self):
+        self.add_images(6)
+        code, out = self.convert(BATCH_MAX="3", CLAUDE_PARALLEL="1", PARALLEL_MAX="1")
+        self.assertEqual(code, 0, out)
+        self.assertIn("Batched:        6 image(s) in 2 call(s)", out)
+        self.assertEqual(len(self.outputs()), 6)
+
+    def test_hedging_a_straggler(self):
+        self.add_images(7, 32, 24)
+        write_png(self.input / "large.png", 1000, 1000)  # ~3s with 3s per megapixel
+        code, out = self.convert(HEDGE="1", HEDGE_MAX_SHARE="0.5", CLAUDE_PARALLEL="4", PARALLEL_MAX="4",
+                                 SCHEDULE="name", FAKE_LATENCY_PER_MP="3")
+        self.assertEqual(code, 0, out)
+        self.assertIn("Hedging large.png", out)
+        self.assertIn("Hedges:         1 started", out)
+        self.assertEqual(len(self.outputs()), 8)
+        ET.parse(self.output / "large.svg")
+        self.assertFalse((self.output / ".hedge").exists())
+
+    def test_salvage_closes_a_cut_off_svg(self):
+        self.add_images(2)
+        code, out = self.convert(SALVAGE="1", FAKE_CUT_RATE="1", FAKE_CUT_AT="fixed:0.9995")
+        self.assertEqual(code, 0, out)
+        self.assertEqual(out.count("[SALVAGED]"), 2)
+        for name in self.outputs():
+            ET.parse(self.output / name)
+
+    def test_salvage_continues_a_partial_svg(self):
+        self.add_images(1)
+        code, out = self.convert(SALVAGE="1", SALVAGE_ATTEMPTS="1", RETRY_ENABLED="0",
+                                 FAKE_CUT_RATE="1", FAKE_CUT_AT="fixed:0.5")
+        # The fake CLI cuts the continuation off as well
+        self.assertEqual(code, 1, out)
+        self.assertIn("[CONTINUE]", out)
+        self.assertIn("screen00.png from its cut-off SVG", out)
+        states = self.journal_states()["screen00.png"]
+        self.assertEqual(states.count(STATE_QUEUED), 2)  # the first attempt and the continuation
+        self.assertEqual(states[-1], STATE_FAILED)
+
+
+
+@unittest.skipIf(sys.platform == "win32", "the fake CLI is started through its #! line")
+class TiledFallbackTest(unittest.TestCase):
+    """run_tiled() on a tall image its plan leaves whole: one plain call."""
+
+    def setUp(self):
+        self.work = Path(tempfile.mkdtemp(prefix="figma-tile-"))
+        self.addCleanup(shutil.rmtree, self.work, True)
+        (self.work / "in").mkdir()
+        (self.work / "out").mkdir()
+        self.img = self.work / "in" / "tall.png"
+        write_png(self.img, 64, 48)
+        env = {"AI_PROVIDER": "claude", "AI_CLI_PATH": str(FAKE_CLI), "INPUT_DIR": str(self.work / "in"),
+               "OUTPUT_DIR": str(self.work / "out"), "FAKE_LATENCY": "fixed:0.01",
+               "FAKE_CUT_RATE": "1", "FAKE_CUT_AT": "fixed:0.9995"}  # every SVG is cut off at the very end
+        saved = dict(os.environ)
+        self.addCleanup(lambda: (os.environ.clear(), os.environ.update(saved)))
+        os.environ.update(env)
+
+    def convert(self, salvage):
+        cfg = load_config()
+        plan = {"width": 64, "height": 48, "dir": str(self.work / "out" / ".tiles"), "bands": []}
+        template = cfg["prompt_tpl"].read_text(encoding="utf-8")
+        return asyncio.run(run_tiled(self.img, template, cfg, split=lambda img: plan, salvage=salvage))
+
+    def test_salvages_a_cut_off_svg(self):
+        self.assertFalse(self.convert(None)[1])
+        result = self.convert(salvage_svg)
+        self.assertTrue(result[1], result)
+        ET.parse(self.work / "out" / "tall.svg")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import asyncio
+import concurrent.futures
+import threading
+import unittest
+
+from pipeline.engine import AsyncEngine
+
+
+class AsyncEngineTest(unittest.TestCase):
+    def setUp(self):
+        self.engine = AsyncEngine()
+        self.addCleanup(self.engine.close)
+
+    def test_submit_returns_a_concurrent_future(self):
+        async def double(n):
+            await asyncio.sleep(0.01)
+            return n * 2
+
+        futures = [self.engine.submit(double(n)) for n in range(5)]
+        done, _ = concurrent.futures.wait(futures, timeout=5)
+        self.assertEqual(len(done), 5)
+        self.assertEqual([f.result() for f in futures], [0, 2, 4, 6, 8])
+
+    def test_run_sync_leaves_the_loop_free(self):
+        release = threading.Event()
+        blocked = self.engine.run_sync(release.wait, 5)
+        self.assertEqual(self.engine.submit(asyncio.sleep(0, "ran")).result(5), "ran")
+        release.set()
+        self.assertTrue(blocked.result(5))
+
+    def test_cancel_reaches_the_task(self):
+        cancelled = threading.Event()
+
+        async def slow():
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        futures = [self.engine.submit(slow()) for _ in range(3)]
+        self.engine.submit(asyncio.sleep(0.05)).result(5)  # let them start
+        self.assertEqual(self.engine.cancel_all(futures), 3)
+        self.assertTrue(cancelled.wait(5))
+        self.assertTrue(all(f.cancelled() for f in futures))
+
+    def test_close_cancels_what_is_left(self):
+        cleaned = []
+
+        async def slow():
+            try:
+                await asyncio.sleep(60)
+            finally:
+                cleaned.append(True)
+
+        self.engine.submit(slow())
+        self.engine.submit(asyncio.sleep(0.05)).result(5)
+        self.engine.close()
+        self.assertEqual(cleaned, [True])
+        self.assertTrue(self.engine.loop.is_closed())
+        self.engine.close()  # a second close is a no-op
+
+
+if __name__ == "__main__":
+    unittest.main()
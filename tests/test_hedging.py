@@ -0,0 +1,44 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from pipeline.hedging import HEDGE_DIR_NAME, HedgePolicy, clear_hedge_dir
+
+
+class HedgePolicyTest(unittest.TestCase):
+    def test_threshold_waits_for_samples(self):
+        policy = HedgePolicy(quantile=0.9, min_samples=5)
+        for elapsed in (9.0, 1.0, 3.0, 2.0):
+            policy.observe(elapsed)
+        self.assertIsNone(policy.threshold())
+        policy.observe(4.0)
+        self.assertEqual(policy.latencies, [1.0, 2.0, 3.0, 4.0, 9.0])
+        self.assertEqual(policy.threshold(), 9.0)
+        self.assertEqual(HedgePolicy(quantile=0.5, min_samples=1).label, "p50")
+
+    def test_limit_is_a_share_of_capacity(self):
+        policy = HedgePolicy(max_share=0.1)
+        self.assertEqual(policy.limit(40), 4)
+        self.assertEqual(policy.limit(4), 1)  # always at least one
+        self.assertEqual(HedgePolicy(max_share=0.5).limit(5), 2)
+
+    def test_wasted_tokens(self):
+        policy = HedgePolicy()
+        policy.wasted({"total": 1200, "cost_usd": 0.03})
+        policy.wasted({})
+        self.assertEqual((policy.extra_tokens, policy.extra_cost), (1200, 0.03))
+
+
+class ClearHedgeDirTest(unittest.TestCase):
+    def test_removes_leftovers(self):
+        output = Path(tempfile.mkdtemp())
+        (output / HEDGE_DIR_NAME / "a-1").mkdir(parents=True)
+        (output / HEDGE_DIR_NAME / "a-1" / "a.svg").write_text("<svg", encoding="utf-8")
+        (output / "a.svg").write_text("<svg/>", encoding="utf-8")
+        clear_hedge_dir(output)
+        clear_hedge_dir(output)  # nothing left: no error
+        self.assertEqual([p.name for p in output.iterdir()], ["a.svg"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from pipeline.history import MIN_SAMPLES, EtaEstimator, RunHistory, size_factor
+
+
+class RunHistoryTest(unittest.TestCase):
+    def setUp(self):
+        self.history = RunHistory(Path(tempfile.mkdtemp()) / "db" / "history.sqlite3")
+        self.addCleanup(self.history.close)
+
+    def test_profile_needs_enough_successes(self):
+        run = self.history.start_run(["claude"], ["sonnet"], 10)
+        for n in range(MIN_SAMPLES - 1):
+            self.history.record(run, f"{n}.png", "claude", "sonnet", (1000, 1000), 10.0 + n,
+                                {"total": 100, "cost_usd": 0.01}, True)
+        self.history.record(run, "x.png", "claude", "sonnet", (1000, 1000), 99.0, {}, False, "timeout")
+        self.history.flush()
+        self.assertIsNone(self.history.profile("claude", "sonnet"))
+
+        self.history.record(run, "last.png", "claude", "sonnet", (2000, 2000), 20.0,
+                            {"total": 100, "cost_usd": 0.01}, True)
+        self.history.flush()
+        profile = self.history.profile("claude", "sonnet")
+        self.assertEqual((profile["count"], profile["p50"], profile["p90"]), (5, 12.0, 20.0))
+        self.assertEqual(profile["megapixels"], 1.0)
+        self.assertAlmostEqual(profile["cost_usd"], 0.01)
+        self.assertEqual(len(self.history.samples("claude", "sonnet")), 5)
+        self.assertIsNone(self.history.profile("claude", "opus"))
+
+    def test_reports(self):
+        run = self.history.start_run(["claude", "codex"], ["sonnet", None], 2)
+        self.history.record(run, "a.png", "claude", "sonnet", None, 8.0, {"total": 10, "cost_usd": 0.5}, True)
+        self.history.record(run, "b.png", "codex", None, None, 5.0, {"total": 10}, False, "auth")
+        self.history.end_run(run, 2, 1, 1, 20, 0.5)
+
+        stats = {(s["provider"], s["model"]): s for s in self.history.model_stats(0)}
+        self.assertEqual((stats["claude", "sonnet"]["converted"], stats["claude", "sonnet"]["p50"]), (1, 8.0))
+        self.assertEqual(stats["codex", ""]["converted"], 0)
+        (last,) = self.history.recent_runs(5)
+        self.assertEqual((last["providers"], last["models"], last["failed"]), ("claude,codex", "sonnet", 1))
+
+
+class SizeFactorTest(unittest.TestCase):
+    PROFILE = {"megapixels": 1.0}
+
+    def test_scales_with_the_square_root_of_pixels(self):
+        self.assertEqual(size_factor(self.PROFILE, (1500, 1000)), 1.5 ** 0.5)
+        self.assertEqual(size_factor(self.PROFILE, None), 1.0)
+        self.assertEqual(size_factor({"megapixels": 0}, (10, 10)), 1.0)
+
+    def test_clamped(self):
+        self.assertEqual(size_factor(self.PROFILE, (10000, 10000)), 2.0)
+        self.assertEqual(size_factor(self.PROFILE, (10, 10)), 0.5)
+
+
+class EtaEstimatorTest(unittest.TestCase):
+    def test_blends_the_prior_with_completions(self):
+        eta = EtaEstimator(10.0, 0.02)
+        self.assertEqual(eta.per_image(), (10.0, 0.02))
+        for _ in range(5):
+            eta.add(20.0, 0.04)
+        seconds, cost = eta.per_image()
+        self.assertEqual(seconds, 15.0)
+        self.assertAlmostEqual(cost, 0.03)
+        self.assertEqual(eta.eta(8, 4), 30.0)
+        self.assertEqual(eta.eta(2, 4), 15.0)  # fewer images than slots
+        self.assertEqual(eta.eta(0, 4), 0.0)
+
+    def test_cost_unknown_until_a_completion(self):
+        eta = EtaEstimator(10.0)
+        self.assertIsNone(eta.per_image()[1])
+        eta.add(10.0, 0.05)
+        self.assertEqual(eta.per_image()[1], 0.05)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from pipeline.journal import (
+    STATE_DONE, STATE_QUEUED, STATE_RUNNING, RunJournal, latest_journal, new_journal_path, replay,
+)
+
+RESULT = ("a.png", True, 12.5, 8, None, {"total": 100, "cost_usd": 0.01})
+
+
+class ReplayTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp())
+
+    def write(self, *events):
+        journal = RunJournal(new_journal_path(self.dir))
+        journal.event("start", images=2)
+        for image, state, result in events:
+            journal.record(image, state, result=result)
+        journal.close()
+        return journal.path
+
+    def test_last_state_wins(self):
+        path = self.write(("a.png", STATE_QUEUED, None), ("b.png", STATE_QUEUED, None),
+                          ("a.png", STATE_RUNNING, None), ("a.png", STATE_DONE, RESULT),
+                          ("b.png", STATE_RUNNING, None))
+        states = replay(path)
+        self.assertEqual(set(states), {"a.png", "b.png"})
+        self.assertEqual(states["a.png"]["state"], STATE_DONE)
+        self.assertEqual(states["a.png"]["tokens"], RESULT[5])
+        self.assertEqual(states["b.png"]["state"], STATE_RUNNING)
+
+    def test_truncated_last_line_is_ignored(self):
+        path = self.write(("a.png", STATE_QUEUED, None))
+        with open(path, "a", encoding="utf-8") as f:
+            f.write('{"ts": 1, "image": "a.png", "state": "do')
+        self.assertEqual(replay(path)["a.png"]["state"], STATE_QUEUED)
+
+    def test_missing_journal(self):
+        self.assertEqual(replay(self.dir / "nope.jsonl"), {})
+
+
+class JournalPathTest(unittest.TestCase):
+    def test_paths_do_not_collide(self):
+        tmp = Path(tempfile.mkdtemp())
+        first = new_journal_path(tmp)
+        first.touch()
+        self.assertNotEqual(new_journal_path(tmp), first)
+
+    def test_latest_per_worker(self):
+        tmp = Path(tempfile.mkdtemp())
+        mine = new_journal_path(tmp, "host-1")
+        mine.touch()
+        self.assertEqual(latest_journal(tmp, "host-1"), mine)
+        self.assertIsNone(latest_journal(tmp, "host-2"))
+        self.assertIsNone(latest_journal(tmp / "empty"))
+
+    def test_worker_ids_match_exactly(self):
+        tmp = Path(tempfile.mkdtemp())
+        longer = new_journal_path(tmp, "host-12")
+        longer.touch()
+        self.assertIsNone(latest_journal(tmp, "host-1"))
+        mine = new_journal_path(tmp, "host-1")
+        mine.touch()
+        again = new_journal_path(tmp, "host-1")  # same second: numbered before the "@"
+        self.assertTrue(again.name.endswith("@host-1.jsonl"))
+        again.touch()
+        os.utime(again, (time.time() + 5, time.time() + 5))
+        self.assertEqual(latest_journal(tmp, "host-1"), again)
+        self.assertEqual(latest_journal(tmp, "host-12"), longer)
+
+
+if __name__ == "__main__":
+    unittest.main()
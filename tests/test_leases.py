@@ -0,0 +1,110 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from pipeline.leases import (HEARTBEAT_FILE, LEASE_DIR_NAME, PARKED_PREFIX, LeaseManager,
+                             commit_file)
+
+
+class CommitFileTest(unittest.TestCase):
+    def test_idempotent(self):
+        tmp = Path(tempfile.mkdtemp())
+        src, dst = tmp / "a.png", tmp / "archive.png"
+        src.write_bytes(b"png")
+        self.assertEqual(commit_file(src, dst), dst)
+        self.assertEqual(commit_file(src, dst), dst)  # a retry after a crash
+        self.assertIsNone(commit_file(tmp / "b.png", tmp / "never.png"))
+        self.assertEqual(dst.read_bytes(), b"png")
+
+    def test_never_overwrites(self):
+        tmp = Path(tempfile.mkdtemp())
+        dst = tmp / "archive.png"
+        dst.write_bytes(b"first")
+        src = tmp / "a.png"
+        src.write_bytes(b"second")
+        self.assertEqual(commit_file(src, dst), tmp / "archive-2.png")
+        self.assertEqual(dst.read_bytes(), b"first")
+        self.assertEqual((tmp / "archive-2.png").read_bytes(), b"second")
+        self.assertFalse(src.exists())
+
+    def test_crash_between_link_and_unlink(self):
+        tmp = Path(tempfile.mkdtemp())
+        src, dst = tmp / "a.png", tmp / "archive.png"
+        src.write_bytes(b"png")
+        os.link(src, dst)
+        self.assertEqual(commit_file(src, dst), dst)
+        self.assertFalse(src.exists())
+        self.assertEqual(sorted(p.name for p in tmp.iterdir()), ["archive.png"])
+
+
+class LeaseManagerTest(unittest.TestCase):
+    def setUp(self):
+        self.input = Path(tempfile.mkdtemp())
+        for name in ("a.png", "b.png", "c.png"):
+            (self.input / name).write_bytes(name.encode())
+        (self.input / "sub").mkdir()
+        (self.input / "sub" / "d.png").write_bytes(b"d")
+
+    def worker(self, name, ttl=120.0):
+        manager = LeaseManager(self.input, name, ttl=ttl, heartbeat=60.0)
+        self.addCleanup(manager.close)
+        return manager
+
+    def images(self):
+        return sorted(p.relative_to(self.input).as_posix() for p in self.input.rglob("*.png")
+                      if LEASE_DIR_NAME not in p.parts)
+
+    def test_each_image_is_claimed_once(self):
+        first, second = self.worker("one"), self.worker("two")
+        candidates = [self.input / "a.png", self.input / "b.png", self.input / "sub" / "d.png"]
+        leased = first.claim(candidates, 2)
+        self.assertEqual([p.name for p in leased], ["a.png", "b.png"])
+        self.assertEqual([p.name for p in second.claim(candidates, 5)], ["d.png"])
+        self.assertEqual(second.held(), [second.dir / "sub" / "d.png"])
+        self.assertEqual(first.claim(candidates, 0), [])
+        self.assertEqual(self.images(), ["c.png"])
+
+    def test_release_and_close_return_images(self):
+        manager = self.worker("one")
+        leased = manager.claim([self.input / "a.png", self.input / "sub" / "d.png"], 2)
+        self.assertEqual(manager.release(leased[:1]), 1)
+        self.assertEqual((self.input / "a.png").read_bytes(), b"a.png")
+        manager.close()
+        self.assertFalse(manager.dir.exists())
+        self.assertIn("sub/d.png", self.images())
+
+    def test_return_keeps_the_name_when_a_newer_drop_took_it(self):
+        manager = self.worker("one", ttl=0.0)
+        leased = manager.claim([self.input / "a.png"], 1)
+        (self.input / "a.png").write_bytes(b"newer drop")
+        self.assertEqual(manager.release(leased), 0)
+        self.assertEqual((self.input / "a.png").read_bytes(), b"newer drop")  # not overwritten
+        parked = [p for p in (self.input / LEASE_DIR_NAME).glob(f"{PARKED_PREFIX}*/a.png")]
+        self.assertEqual([p.read_bytes() for p in parked], [b"a.png"])
+        self.assertEqual(self.images(), ["a.png", "b.png", "c.png", "sub/d.png"])  # no a-2.png
+
+        (self.input / "a.png").unlink()  # the newer drop was converted and archived
+        self.assertEqual(sum(self.worker("two", ttl=0.0).reclaim().values()), 1)
+        self.assertEqual((self.input / "a.png").read_bytes(), b"a.png")
+
+    def test_dead_workers_are_reclaimed(self):
+        dead = LeaseManager(self.input, "dead", heartbeat=60.0)
+        dead.claim([self.input / "a.png", self.input / "b.png"], 2)
+        dead._stop.set()  # crashed: no more heartbeats, no close()
+        beat = json.loads((dead.dir / HEARTBEAT_FILE).read_text(encoding="utf-8"))
+        beat["ts"] = time.time() - 600
+        (dead.dir / HEARTBEAT_FILE).write_text(json.dumps(beat), encoding="utf-8")
+
+        alive = self.worker("alive", ttl=120.0)
+        self.assertEqual(alive.reclaim(), {"dead": 2})
+        self.assertFalse(dead.dir.exists())
+        self.assertEqual(self.images(), ["a.png", "b.png", "c.png", "sub/d.png"])
+        self.assertEqual(alive.reclaim(), {})
+        self.assertEqual(self.worker("late", ttl=120.0).reclaim(), {})  # live heartbeats are left alone
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from pipeline.metrics import MetricsRecorder, Span, SpanGroup, percentile
+
+TOKENS = {"total": 100, "cache_read": 40, "cache_write": 10, "cost_usd": 0.01}
+
+
+class PercentileTest(unittest.TestCase):
+    def test_nearest_rank(self):
+        values = list(range(1, 11))
+        self.assertEqual(percentile(values, 0.5), 5)
+        self.assertEqual(percentile(values, 0.95), 10)
+        self.assertEqual(percentile(values, 0.0), 1)
+        self.assertEqual(percentile([], 0.5), 0.0)
+
+
+class SpanTest(unittest.TestCase):
+    def test_phases_add_up(self):
+        span = Span("a.png")
+        span.add("model", 2.0)
+        span.add("model", 1.0)
+        span.add("spawn", -1.0)  # clock skew never counts negative
+        with span.phase("validate"):
+            pass
+        self.assertEqual(span.phases["model"], 3.0)
+        self.assertEqual(span.phases["spawn"], 0.0)
+        self.assertIn("validate", span.phases)
+
+    def test_group_shares_phases(self):
+        spans = [Span("a.png"), Span("b.png")]
+        SpanGroup(spans).add("model", 4.0)
+        self.assertEqual([s.phases["model"] for s in spans], [4.0, 4.0])
+
+
+class MetricsRecorderTest(unittest.TestCase):
+    def test_trace_stats_and_textfile(self):
+        tmp = Path(tempfile.mkdtemp())
+        recorder = MetricsRecorder(tmp / "trace.jsonl", tmp / "convert.prom")
+        for n, seconds in enumerate((1.0, 2.0, 9.0)):
+            span = Span(f"{n}.png", provider="claude")
+            span.add("model", seconds)
+            span.add("custom", 0.5)
+            recorder.record(span, n != 2, seconds, TOKENS, None if n != 2 else "timeout")
+        recorder.write_prometheus()
+        recorder.close()
+
+        stats = recorder.phase_stats()
+        self.assertEqual([s[0] for s in stats], ["model", "custom"])  # known phases first
+        self.assertEqual(stats[0][1:], (3, 2.0, 9.0, 9.0))
+
+        trace = [json.loads(line) for line in (tmp / "trace.jsonl").read_text(encoding="utf-8").splitlines()]
+        self.assertEqual([e["success"] for e in trace], [True, True, False])
+        self.assertEqual(trace[2]["error_class"], "timeout")
+        self.assertEqual(trace[0]["provider"], "claude")
+
+        prom = (tmp / "convert.prom").read_text(encoding="utf-8")
+        self.assertIn('figma_converter_attempts_total{result="failure"} 1', prom)
+        self.assertIn("figma_converter_tokens_total 300", prom)
+        self.assertIn('figma_converter_prompt_cache_tokens_total{op="read"} 120', prom)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import struct
+import tempfile
+import unittest
+import zlib
+from pathlib import Path
+
+from config.constants import PROVIDER_CLAUDE, PROVIDER_CODEX
+from pipeline.imaging import HAVE_PIL, estimate_image_tokens, image_size
+from pipeline.preprocess import preprocess_image, scale_note, settings_signature
+
+
+def png_bytes(width, height):
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    raw = b"".join(b"\x00" + b"\xff" * (width * 3) for _ in range(height))
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b""))
+
+
+class ImageSizeTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+
+    def write(self, name, data):
+        path = self.tmp / name
+        path.write_bytes(data)
+        return path
+
+    def test_headers(self):
+        self.assertEqual(image_size(self.write("a.png", png_bytes(30, 20))), (30, 20))
+        self.assertEqual(image_size(self.write("a.gif", b"GIF89a" + struct.pack("<HH", 640, 480) + b"\0" * 24)),
+                         (640, 480))
+
+    def test_unknown_or_missing(self):
+        self.assertIsNone(image_size(self.write("a.txt", b"hello world")))
+        self.assertIsNone(image_size(self.tmp / "missing.png"))
+
+
+class TokenEstimateTest(unittest.TestCase):
+    def test_claude_scales_the_long_edge(self):
+        self.assertEqual(estimate_image_tokens(750, 100, PROVIDER_CLAUDE), 100)
+        # Anything larger is downsized to a 1568px long edge first
+        self.assertEqual(estimate_image_tokens(3136, 3136, PROVIDER_CLAUDE),
+                         estimate_image_tokens(1568, 1568, PROVIDER_CLAUDE))
+
+    def test_codex_tiles(self):
+        self.assertEqual(estimate_image_tokens(1024, 1024, PROVIDER_CODEX), 85 + 170 * 4)
+        self.assertEqual(estimate_image_tokens(512, 512, PROVIDER_CODEX), 85 + 170)
+        self.assertEqual(estimate_image_tokens(0, 512, PROVIDER_CODEX), 0)
+
+
+class ScaleNoteTest(unittest.TestCase):
+    PREP = {"scale": 0.5, "crop_left": 4, "crop_top": 0, "width": 800, "height": 600,
+            "orig_width": 1608, "orig_height": 1200}
+
+    def test_untouched_image_needs_no_note(self):
+        self.assertEqual(scale_note(None), "")
+        self.assertEqual(scale_note(dict(self.PREP, scale=1.0, crop_left=0)), "")
+
+    def test_note_gives_factor_and_offset(self):
+        note = scale_note(self.PREP)
+        self.assertIn("by 2.0000", note)
+        self.assertIn("x + 4, y + 0", note)
+        self.assertIn("1608x1200", note)
+
+    def test_signature_follows_settings(self):
+        self.assertNotEqual(settings_signature(1600, True, "webp"), settings_signature(1600, False, "webp"))
+
+
+@unittest.skipUnless(HAVE_PIL, "needs Pillow")
+class PreprocessImageTest(unittest.TestCase):
+    def test_downscale_and_cache(self):
+        tmp = Path(tempfile.mkdtemp())
+        src = tmp / "big.png"
+        src.write_bytes(png_bytes(400, 200))
+        prep = preprocess_image(str(src), str(tmp / "prep"), 100, False, "png")
+        self.assertEqual((prep["width"], prep["height"], prep["scale"]), (100, 50, 0.25))
+        self.assertFalse(prep["cached"])
+        self.assertTrue(preprocess_image(str(src), str(tmp / "prep"), 100, False, "png")["cached"])
+
+    def test_small_image_passes_through(self):
+        tmp = Path(tempfile.mkdtemp())
+        src = tmp / "small.png"
+        src.write_bytes(png_bytes(40, 20))
+        prep = preprocess_image(str(src), str(tmp / "prep"), 100, False, "png")
+        self.assertEqual(prep["scale"], 1.0)
+        self.assertEqual(image_size(prep["path"]), (40, 20))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+from pathlib import Path
+
+from config.constants import PLACEHOLDER_BASE_SVG, PLACEHOLDER_IMAGE, PLACEHOLDER_ISSUES, PLACEHOLDER_OUTPUT
+from pipeline.prompts import (
+    BATCH_HEADING, FIX_PROMPT, IMAGE_POINTER, OUTPUT_POINTER, TASK_HEADING,
+    batch_layout, cache_layout, render, split_template,
+)
+
+TEMPLATE = (Path(__file__).resolve().parent.parent / "prompt-template.txt").read_text(encoding="utf-8")
+SMALL = f"Convert the screenshot.\nRead: {PLACEHOLDER_IMAGE}\nRules.\nWrite to: {PLACEHOLDER_OUTPUT}\nDone.\n"
+
+
+class LayoutTest(unittest.TestCase):
+    def test_split_keeps_line_order(self):
+        static, task = split_template(SMALL)
+        self.assertEqual(static, f"Convert the screenshot.\n{IMAGE_POINTER}\nRules.\n{OUTPUT_POINTER}\nDone.")
+        self.assertEqual(task, (f"Read: {PLACEHOLDER_IMAGE}", f"Write to: {PLACEHOLDER_OUTPUT}"))
+
+    def test_cache_layout_puts_per_image_lines_last(self):
+        prompt = cache_layout(TEMPLATE)
+        static, tail = prompt.split(f"\n\n{TASK_HEADING}\n")
+        self.assertNotIn(PLACEHOLDER_IMAGE, static)
+        self.assertNotIn(PLACEHOLDER_OUTPUT, static)
+        self.assertIn(PLACEHOLDER_IMAGE, tail)
+        self.assertIn(PLACEHOLDER_OUTPUT, tail)
+
+    def test_template_without_placeholders_is_unchanged(self):
+        self.assertEqual(cache_layout("Just text.\n"), "Just text.\n")
+
+    def test_batch_shares_the_static_prefix(self):
+        prompt = batch_layout(SMALL, [("a.png", "a.svg", ""), ("b.png", "b.svg", "  Scaled by 2.  ")])
+        static, _ = split_template(SMALL)
+        self.assertTrue(prompt.startswith(static + "\n\n" + BATCH_HEADING))
+        self.assertTrue(cache_layout(SMALL).startswith(static))
+        self.assertIn("### Image 1\nRead: a.png\nWrite to: a.svg\n", prompt)
+        self.assertTrue(prompt.endswith("### Image 2\nRead: b.png\nWrite to: b.svg\nScaled by 2.\n"))
+
+
+class RenderTest(unittest.TestCase):
+    def test_fills_base_svg_and_issues_only(self):
+        prompt = render(FIX_PROMPT, "/out/a.svg", ["no closing </svg>", "no panel"])
+        self.assertIn("Read: /out/a.svg", prompt)
+        self.assertIn("- no closing </svg>\n- no panel", prompt)
+        self.assertNotIn(PLACEHOLDER_BASE_SVG, prompt)
+        self.assertNotIn(PLACEHOLDER_ISSUES, prompt)
+        self.assertIn(PLACEHOLDER_IMAGE, prompt)  # left for adapt_prompt()
+
+
+if __name__ == "__main__":
+    unittest.main()
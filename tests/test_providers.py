@@ -0,0 +1,74 @@
+import unittest
+
+from config.constants import PROVIDER_CLAUDE, PROVIDER_CODEX
+from pipeline.concurrency import AdaptiveConcurrency
+from pipeline.failures import ERR_AUTH, ERR_QUOTA, ERR_TIMEOUT
+from pipeline.providers import ProviderPool, ProviderSlot
+
+TOKENS = {"total": 50, "cost_usd": 0.002}
+
+
+class ProviderPoolTest(unittest.TestCase):
+    def pool(self, *names, limit=2):
+        failovers = []
+        slots = [ProviderSlot({"provider": name}, AdaptiveConcurrency(limit, 1, limit, enabled=False))
+                 for name in names]
+        pool = ProviderPool(slots, quota_cooldown=60.0,
+                            on_failover=lambda slot, err, cooldown: failovers.append((slot.name, err, cooldown)))
+        return pool, slots, failovers
+
+    def test_pick_prefers_free_and_fast(self):
+        pool, (claude, codex), _ = self.pool(PROVIDER_CLAUDE, PROVIDER_CODEX)
+        claude.latency, codex.latency = 5.0, 2.0
+        self.assertIs(pool.pick(), codex)
+        pool.start(codex, calls=2)
+        self.assertIs(pool.pick(), claude)
+        pool.start(claude, calls=2)
+        self.assertIsNone(pool.pick())
+        pool.cancel(claude)
+        self.assertIs(pool.pick(), claude)
+
+    def test_finish_tracks_totals_and_latency(self):
+        pool, (slot,), _ = self.pool(PROVIDER_CLAUDE)
+        pool.start(slot, images=3)
+        self.assertFalse(pool.finish(slot, None, 9.0, TOKENS, converted=2, images=3))
+        self.assertEqual((slot.in_flight, slot.attempts, slot.converted, slot.failed), (0, 3, 2, 1))
+        self.assertEqual(slot.latency, 3.0)  # per image
+        pool.start(slot)
+        pool.finish(slot, None, 13.0, TOKENS)
+        self.assertAlmostEqual(slot.latency, 3.0 + 0.3 * 10.0)
+        self.assertEqual(slot.tokens, 100)
+
+    def test_quota_fails_over_for_the_cooldown(self):
+        pool, (claude, codex), failovers = self.pool(PROVIDER_CLAUDE, PROVIDER_CODEX)
+        pool.start(claude)
+        self.assertTrue(pool.finish(claude, ERR_QUOTA, 1.0, {}))
+        self.assertFalse(claude.available)
+        self.assertEqual(failovers, [(PROVIDER_CLAUDE, ERR_QUOTA, 60.0)])
+        self.assertEqual(pool.limit, 2)
+        self.assertIs(pool.pick(), codex)
+
+    def test_auth_disables_for_the_run(self):
+        pool, (claude, codex), failovers = self.pool(PROVIDER_CLAUDE, PROVIDER_CODEX)
+        pool.start(claude, calls=2)
+        self.assertTrue(pool.finish(claude, ERR_AUTH, 1.0, {}))
+        self.assertEqual(failovers[0][2], float("inf"))
+        self.assertTrue(pool.finish(claude, ERR_AUTH, 1.0, {}))  # already out of rotation
+        self.assertEqual(len(failovers), 1)
+
+    def test_last_provider_is_never_disabled(self):
+        pool, (slot,), failovers = self.pool(PROVIDER_CLAUDE)
+        pool.start(slot)
+        self.assertFalse(pool.finish(slot, ERR_QUOTA, 1.0, {}))
+        self.assertTrue(slot.available)
+        self.assertEqual(failovers, [])
+
+    def test_other_errors_do_not_fail_over(self):
+        pool, (claude, _), _ = self.pool(PROVIDER_CLAUDE, PROVIDER_CODEX)
+        pool.start(claude)
+        self.assertFalse(pool.finish(claude, ERR_TIMEOUT, 1.0, {}))
+        self.assertTrue(claude.available)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import random
+import unittest
+
+from pipeline.failures import (
+    ERR_AUTH, ERR_CANCELLED, ERR_EMPTY_OUTPUT, ERR_INVALID_SVG, ERR_OTHER, ERR_OVERLOADED, ERR_QUOTA,
+    ERR_RATE_LIMIT, ERR_TIMEOUT, ERR_TRUNCATED, classify_error,
+)
+from pipeline.retry import RetryBudget, RetryEngine, RetryPolicy, backoff_delay
+
+
+class ClassifyErrorTest(unittest.TestCase):
+    def test_classes(self):
+        cases = {
+            None: ERR_EMPTY_OUTPUT,
+            "timeout": ERR_TIMEOUT,
+            "cancelled": ERR_CANCELLED,
+            "truncated_svg: 12KB": ERR_TRUNCATED,
+            "invalid_svg: no viewBox": ERR_INVALID_SVG,
+            "API Error: 429 rate_limit_error": ERR_RATE_LIMIT,
+            "529 Overloaded": ERR_OVERLOADED,
+            "Invalid API key · Please run /login": ERR_AUTH,
+            "You exceeded your current quota (429)": ERR_QUOTA,
+            "something odd": ERR_OTHER,
+        }
+        for error, err_class in cases.items():
+            self.assertEqual(classify_error(error), err_class, error)
+
+
+class BackoffTest(unittest.TestCase):
+    def test_equal_jitter_within_bounds(self):
+        policy = RetryPolicy(max_attempts=5, base_delay=10.0, max_delay=35.0)
+        rng = random.Random(7)
+        for attempt, full in ((1, 10.0), (2, 20.0), (3, 35.0), (4, 35.0)):
+            for _ in range(20):
+                delay = backoff_delay(policy, attempt, rng)
+                self.assertTrue(full / 2 <= delay <= full, (attempt, delay))
+
+
+class RetryBudgetTest(unittest.TestCase):
+    def test_minimum_plus_ratio(self):
+        budget = RetryBudget(0.5, 1)
+        for _ in range(4):
+            budget.record_attempt()
+        self.assertEqual(budget.allowed(), 3)
+        self.assertEqual([budget.try_spend() for _ in range(4)], [True, True, True, False])
+
+
+class RetryEngineTest(unittest.TestCase):
+    def engine(self, ratio=10.0, minimum=10):
+        return RetryEngine(RetryBudget(ratio, minimum), rng=random.Random(1))
+
+    def test_retries_until_max_attempts(self):
+        engine = self.engine()
+        delay, timeout = engine.next_retry(ERR_TIMEOUT, 1, 600)
+        self.assertGreater(delay, 0)
+        self.assertEqual(timeout, 900)
+        self.assertIsNone(engine.next_retry(ERR_TIMEOUT, 2, 900))
+
+    def test_never_retried(self):
+        engine = self.engine()
+        self.assertIsNone(engine.next_retry(ERR_AUTH, 1, 600))
+        self.assertIsNone(engine.next_retry(ERR_QUOTA, 1, 600))
+        self.assertIsNone(engine.next_retry(ERR_INVALID_SVG, 1, 600))
+
+    def test_exhausted_budget(self):
+        engine = self.engine(ratio=0.0, minimum=1)
+        self.assertIsNotNone(engine.next_retry(ERR_RATE_LIMIT, 1, 600))
+        self.assertIsNone(engine.next_retry(ERR_RATE_LIMIT, 1, 600))
+        self.assertEqual(engine.exhausted, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
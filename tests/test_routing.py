@@ -0,0 +1,75 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from pipeline.failures import ERR_AUTH, ERR_INVALID_SVG, ERR_TIMEOUT
+from pipeline.imaging import HAVE_PIL
+from pipeline.routing import WEIGHTS, ModelRouter, complexity_score, score_image
+
+MODELS = ["haiku", "sonnet", "opus"]
+
+
+class ModelRouterTest(unittest.TestCase):
+    def test_thresholds_pick_the_tier(self):
+        router = ModelRouter(MODELS, [0.7, 0.35])
+        self.assertEqual([router.tier_for(s) for s in (0.0, 0.35, 0.69, 0.7, 1.0)], [0, 1, 1, 2, 2])
+        self.assertEqual(router.tier_for(None), 1)
+        self.assertEqual(router.tier_for(0.1, escalations=5), 2)
+        self.assertEqual(router.describe(), "haiku < 0.35 <= sonnet < 0.7 <= opus")
+
+    def test_mismatched_thresholds_are_spread_evenly(self):
+        router = ModelRouter(MODELS, [0.5])
+        self.assertEqual(router.thresholds, [1 / 3, 2 / 3])
+        self.assertFalse(ModelRouter(["sonnet"], []).enabled)
+
+    def test_escalation(self):
+        router = ModelRouter(MODELS, [0.35, 0.7])
+        self.assertTrue(router.can_escalate(0, ERR_INVALID_SVG))
+        self.assertTrue(router.can_escalate(1, ERR_TIMEOUT))
+        self.assertFalse(router.can_escalate(2, ERR_INVALID_SVG))  # already the top tier
+        self.assertFalse(router.can_escalate(0, ERR_AUTH))  # a stronger model will not help
+
+    def test_record(self):
+        router = ModelRouter(MODELS, [0.35, 0.7])
+        router.record("haiku", True, False, True, 4.0, {"total": 10, "cost_usd": 0.001})
+        router.record("sonnet", False, True, False, 6.0, {"total": 30, "cost_usd": 0.01})
+        self.assertEqual(router.stats["haiku"]["escalated"], 1)
+        self.assertEqual((router.stats["sonnet"]["routed"], router.stats["sonnet"]["converted"]), (0, 1))
+
+
+class ScoreTest(unittest.TestCase):
+    def test_weighted_sum(self):
+        self.assertEqual(complexity_score({k: 1.0 for k in WEIGHTS}), 1.0)
+        features = dict.fromkeys(WEIGHTS, 0.0)
+        features["edges"] = 1.0
+        self.assertEqual(complexity_score(features), WEIGHTS["edges"])
+
+
+@unittest.skipUnless(HAVE_PIL, "needs Pillow")
+class ScoreImageTest(unittest.TestCase):
+    def test_busy_image_scores_higher(self):
+        from PIL import Image, ImageDraw
+
+        tmp = Path(tempfile.mkdtemp())
+        Image.new("RGB", (400, 300), "white").save(tmp / "plain.png")
+        busy = Image.new("RGB", (400, 300), "white")
+        draw = ImageDraw.Draw(busy)
+        for y in range(0, 300, 12):
+            for x in range(0, 400, 30):
+                draw.text((x, y), "Ab1", fill=((x * 5) % 256, (y * 3) % 256, 90))
+        busy.save(tmp / "busy.png")
+
+        plain, dense = score_image(tmp / "plain.png"), score_image(tmp / "busy.png")
+        self.assertLess(plain["score"], dense["score"])
+        self.assertEqual(plain["features"]["colors"], 0.0)  # a single colour
+
+    def test_unreadable_image_is_unscored(self):
+        path = Path(tempfile.mkdtemp()) / "broken.png"
+        path.write_bytes(b"not a png")
+        result = score_image(path)
+        self.assertIsNone(result["score"])
+        self.assertTrue(result["error"])
+
+
+if __name__ == "__main__":
+    unittest.main()
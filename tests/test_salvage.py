@@ -0,0 +1,76 @@
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+from pipeline.salvage import (
+    SALVAGE_COMPLETE, SALVAGE_NONE, SALVAGE_PARTIAL, SALVAGE_REPAIRED, TAIL_BYTES,
+    close_open, salvage_svg, svg_closed,
+)
+from pipeline.svgcheck import VARIANTS_ID
+
+HEAD = '<?xml version="1.0"?>\n<!-- generated -->\n<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 10 10">'
+
+
+class CloseOpenTest(unittest.TestCase):
+    def test_trims_a_half_written_tag_and_closes_the_rest(self):
+        text = HEAD + '<g id="Frame/Content"><rect x="0"/><text>Save</text><rect x="1" wid'
+        closed, opened, dropped = close_open(text)
+        self.assertEqual([name for name, _ in opened], ["svg", "g"])
+        self.assertEqual(opened[1][1], '<g id="Frame/Content">')
+        self.assertEqual(dropped, len('<rect x="1" wid'))
+        self.assertTrue(closed.endswith("<text>Save</text></g></svg>\n"))
+        ET.fromstring(closed)
+
+    def test_markup_inside_comments_and_cdata_is_ignored(self):
+        text = HEAD + '<style><![CDATA[ a > b { } ]]></style><!-- <g> -->'
+        closed, opened, _ = close_open(text)
+        self.assertEqual([name for name, _ in opened], ["svg"])
+        self.assertTrue(closed.endswith("<!-- <g> --></svg>\n"))
+
+    def test_no_svg(self):
+        self.assertIsNone(close_open("I could not finish the conversion."))
+        self.assertIsNone(close_open("<html><body>"))
+
+
+class SalvageSvgTest(unittest.TestCase):
+    def salvage(self, text):
+        path = Path(tempfile.mkdtemp()) / "out.svg"
+        path.write_text(text, encoding="utf-8")
+        return salvage_svg(path), path
+
+    def test_complete(self):
+        report, _ = self.salvage(HEAD + "</svg>")
+        self.assertEqual(report["state"], SALVAGE_COMPLETE)
+
+    def test_repaired_in_place(self):
+        report, path = self.salvage(HEAD + f'<g id="{VARIANTS_ID}"><rect x="0"/><rect')
+        self.assertEqual((report["state"], report["closed"], report["dropped"]), (SALVAGE_REPAIRED, 2, 5))
+        ET.parse(path)
+        self.assertTrue(svg_closed(path))
+
+    def test_partial_without_the_variants_panel(self):
+        text = HEAD + "".join(f'<g id="L{n}">' for n in range(6)) + "<rect"
+        report, path = self.salvage(text)
+        self.assertEqual(report["state"], SALVAGE_PARTIAL)
+        self.assertIn('... > <g id="L2"> > <g id="L3"> > <g id="L4"> > <g id="L5">', report["issues"][0])
+        self.assertIn(VARIANTS_ID, report["issues"][1])
+        self.assertEqual(path.read_text(encoding="utf-8"), text)  # left for the continuation
+
+    def test_nothing_to_salvage(self):
+        self.assertEqual(self.salvage("Error: turn limit")[0]["state"], SALVAGE_NONE)
+        self.assertEqual(salvage_svg(Path(tempfile.mkdtemp()) / "missing.svg")["state"], SALVAGE_NONE)
+
+
+class SvgClosedTest(unittest.TestCase):
+    def test_only_the_tail_is_read(self):
+        path = Path(tempfile.mkdtemp()) / "out.svg"
+        path.write_text("<svg></svg>" + " " * TAIL_BYTES, encoding="utf-8")
+        self.assertFalse(svg_closed(path))
+        path.write_text(HEAD + "x" * TAIL_BYTES + "</svg>\n", encoding="utf-8")
+        self.assertTrue(svg_closed(path))
+        self.assertFalse(svg_closed(path.with_name("missing.svg")))
+
+
+if __name__ == "__main__":
+    unittest.main()
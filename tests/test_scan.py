@@ -0,0 +1,51 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from pipeline.scan import iter_images, suffix_matcher, walk_dirs
+
+PATTERNS = ("*.png", "*.jpg", "shot-??.webp")
+
+
+class SuffixMatcherTest(unittest.TestCase):
+    def test_case_insensitive(self):
+        matches = suffix_matcher(PATTERNS)
+        self.assertTrue(matches("a.PNG"))
+        self.assertTrue(matches("Shot-01.WEBP"))
+        self.assertFalse(matches("shot-001.webp"))
+        self.assertFalse(matches("png"))
+        self.assertFalse(matches("a.png.txt"))
+
+
+class IterImagesTest(unittest.TestCase):
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+        for name in ("b.png", "a.JPG", "notes.txt", ".hidden.png", "z/c.png", "z/y/d.png",
+                     "m/e.png", ".leases/w/f.png", "out/g.png"):
+            path = self.root / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(b"x")
+
+    def names(self, **kwargs):
+        return [p.relative_to(self.root).as_posix() for p in iter_images(self.root, PATTERNS, **kwargs)]
+
+    def test_files_before_subfolders_depth_first(self):
+        self.assertEqual(self.names(), ["a.JPG", "b.png", "m/e.png", "out/g.png", "z/c.png", "z/y/d.png"])
+
+    def test_not_recursive(self):
+        self.assertEqual(self.names(recursive=False), ["a.JPG", "b.png"])
+
+    def test_excluded_folders(self):
+        self.assertNotIn("out/g.png", self.names(exclude=[self.root / "out"]))
+        dirs = [p.relative_to(self.root).as_posix() for p in walk_dirs(self.root, exclude=[self.root / "out"])]
+        self.assertEqual(dirs, ["m", "z", "z/y"])
+
+    @unittest.skipUnless(hasattr(os, "symlink"), "needs symlinks")
+    def test_symlinked_folders_are_not_followed(self):
+        os.symlink(self.root, self.root / "z" / "loop")
+        self.assertEqual(len(self.names()), 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
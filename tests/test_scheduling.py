@@ -0,0 +1,76 @@
+import unittest
+
+from pipeline.scheduling import POLICIES, CostModel, JobQueue, predict_makespan
+
+TIMES = {"a": 10, "b": 50, "c": 20, "d": 50}
+
+
+class PolicyTest(unittest.TestCase):
+    def order(self, name):
+        return [img for img, _ in POLICIES[name].order(list(TIMES.items()))]
+
+    def test_longest_first_keeps_ties_in_arrival_order(self):
+        self.assertEqual(self.order("lpt"), ["b", "d", "c", "a"])
+
+    def test_shortest_first(self):
+        self.assertEqual(self.order("spt"), ["a", "c", "b", "d"])
+
+    def test_name_order_is_unchanged(self):
+        self.assertEqual(self.order("name"), list(TIMES))
+
+
+class MakespanTest(unittest.TestCase):
+    def test_single_slot_is_the_sum(self):
+        self.assertEqual(predict_makespan([1, 2, 3], 1), 6)
+
+    def test_straggler_last_costs_more(self):
+        short_first = predict_makespan([1, 1, 1, 1, 4], 2)
+        long_first = predict_makespan([4, 1, 1, 1, 1], 2)
+        self.assertEqual((short_first, long_first), (6, 4))
+
+    def test_zero_slots_count_as_one(self):
+        self.assertEqual(predict_makespan([2, 3], 0), 5)
+
+
+class JobQueueTest(unittest.TestCase):
+    def test_pops_in_policy_order(self):
+        queue = JobQueue(POLICIES["lpt"], TIMES.get, TIMES)
+        self.assertEqual([queue.popleft() for _ in range(len(TIMES))], ["b", "d", "c", "a"])
+
+    def test_appendleft_goes_ahead_of_everything(self):
+        queue = JobQueue(POLICIES["lpt"], TIMES.get, ["a", "b"])
+        queue.appendleft("c")
+        queue.appendleft("d")
+        # Like deque.appendleft: the last one put back goes first
+        self.assertEqual(queue[0], "d")
+        self.assertEqual([queue.popleft() for _ in range(4)], ["d", "c", "b", "a"])
+
+    def test_only_the_head_is_indexable(self):
+        queue = JobQueue(POLICIES["name"], TIMES.get, ["a", "b"])
+        with self.assertRaises(IndexError):
+            queue[1]
+
+
+class CostModelTest(unittest.TestCase):
+    def test_static_estimate_scales_with_pixels(self):
+        model = CostModel(60)
+        self.assertAlmostEqual(model.estimate(None), 60)
+        big = model.estimate((2560, 1600))
+        self.assertGreater(big, model.estimate((1280, 800)))
+        self.assertLessEqual(big, 60 * 4)
+
+    def test_history_estimate_is_the_nearest_median(self):
+        samples = [(1000, 1000, 30)] * 5 + [(4000, 4000, 300)] * 5
+        model = CostModel(60, samples)
+        self.assertTrue(model.learned)
+        self.assertEqual(model.estimate((1000, 1000)), 30)
+        self.assertEqual(model.estimate((4000, 4000)), 300)
+
+    def test_few_samples_fall_back_to_static(self):
+        model = CostModel(60, [(1000, 1000, 5)])
+        self.assertFalse(model.learned)
+        self.assertAlmostEqual(model.estimate(None), 60)
+
+
+if __name__ == "__main__":
+    unittest.main()
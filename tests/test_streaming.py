@@ -0,0 +1,95 @@
+import asyncio
+import json
+import subprocess
+import sys
+import time
+import unittest
+
+from pipeline.streaming import (
+    ClaudeTokenAccumulator, CodexTokenAccumulator, LiveTokens, run_streaming,
+)
+
+
+def lines(*events):
+    return [json.dumps(e) + "\n" for e in events]
+
+
+class CodexAccumulatorTest(unittest.TestCase):
+    def test_sums_usage_and_keeps_the_first_error(self):
+        acc = CodexTokenAccumulator()
+        changed = [acc.feed(line) for line in lines(
+            {"type": "turn.completed", "usage": {"input_tokens": 100, "cached_input_tokens": 40,
+                                                  "output_tokens": 10}},
+            {"type": "error", "message": "rate limit"},
+            {"type": "turn.completed", "usage": {"input_tokens": 50, "output_tokens": 5}},
+            {"type": "error", "message": "later"},
+        )]
+        self.assertEqual(changed, [True, False, True, False])
+        self.assertFalse(acc.feed("not json\n"))
+        totals = acc.totals()
+        self.assertEqual((totals["input"], totals["cache_read"], totals["output"], totals["total"]),
+                         (150, 40, 15, 165))
+        self.assertEqual(acc.error, "rate limit")
+
+
+class ClaudeAccumulatorTest(unittest.TestCase):
+    def test_result_replaces_the_running_estimate(self):
+        acc = ClaudeTokenAccumulator()
+        for line in lines({"type": "assistant", "message": {"usage": {"input_tokens": 10, "output_tokens": 5}}},
+                          {"type": "assistant", "message": {"usage": {"input_tokens": 10, "output_tokens": 5}}}):
+            acc.feed(line)
+        self.assertEqual(acc.totals()["total"], 30)
+        acc.feed(lines({"type": "result", "subtype": "success", "total_cost_usd": 0.02,
+                        "usage": {"input_tokens": 12, "cache_read_input_tokens": 100,
+                                  "cache_creation_input_tokens": 8, "output_tokens": 40}})[0])
+        totals = acc.totals()
+        self.assertEqual((totals["input"], totals["output"], totals["total"]), (120, 40, 160))
+        self.assertEqual((totals["cache_read"], totals["cache_write"], totals["cost_usd"]), (100, 8, 0.02))
+        self.assertEqual(acc.subtype, "success")
+
+
+class LiveTokensTest(unittest.TestCase):
+    def test_snapshot_and_pop(self):
+        live = LiveTokens()
+        live.update("a.png", {"total": 10, "cost_usd": 0.1})
+        live.update("b.png", {"total": 5, "cost_usd": 0.05})
+        self.assertEqual(live.snapshot()[0], 15)
+        self.assertEqual(live.pop("a.png")["total"], 10)
+        self.assertIsNone(live.pop("a.png"))
+        self.assertEqual(live.snapshot()[0], 5)
+
+
+def child(script):
+    return [sys.executable, "-c", script]
+
+
+class RunStreamingTest(unittest.TestCase):
+    def test_updates_arrive_before_exit(self):
+        script = ("import json, sys, time\n"
+                  "for n in range(3):\n"
+                  "    print(json.dumps({'type': 'turn.completed', 'usage': {'input_tokens': 10}}), flush=True)\n"
+                  "    time.sleep(0.05)\n")
+        updates = []
+        result = asyncio.run(run_streaming(child(script), None, 10, CodexTokenAccumulator(),
+                                           lambda totals: updates.append(totals["input"])))
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(updates, [10, 20, 30])
+
+    def test_error_event_kills_the_child(self):
+        script = ("import json, time\n"
+                  "print(json.dumps({'type': 'error', 'message': '429'}), flush=True)\n"
+                  "time.sleep(30)\n")
+        start = time.monotonic()
+        acc = CodexTokenAccumulator()
+        result = asyncio.run(run_streaming(child(script), None, 30, acc))
+        self.assertTrue(result.killed_on_error)
+        self.assertEqual(acc.error, "429")
+        self.assertLess(time.monotonic() - start, 10)
+
+    def test_timeout(self):
+        with self.assertRaises(subprocess.TimeoutExpired):
+            asyncio.run(run_streaming(child("import time; time.sleep(30)"), None, 0.5, CodexTokenAccumulator()))
+
+
+if __name__ == "__main__":
+    unittest.main()
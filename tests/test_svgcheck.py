@@ -0,0 +1,81 @@
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+from pipeline.svgcheck import VARIANTS_ID, content_bbox, parse_transform, path_points, repair_text, validate_svg
+
+VARIANTS = f'<g id="{VARIANTS_ID}"/>'
+
+
+class TransformTest(unittest.TestCase):
+    def apply(self, text, x, y):
+        a, b, c, d, e, f = parse_transform(text)
+        return round(a * x + c * y + e, 6), round(b * x + d * y + f, 6)
+
+    def test_lists_compose_left_to_right(self):
+        self.assertEqual(self.apply("translate(10 20) scale(2)", 1, 1), (12, 22))
+        self.assertEqual(self.apply("scale(2) translate(10, 20)", 1, 1), (22, 42))
+
+    def test_rotate_about_a_point(self):
+        self.assertEqual(self.apply("rotate(90 10 10)", 20, 10), (10, 20))
+
+    def test_unknown_or_empty(self):
+        self.assertEqual(parse_transform(None), (1.0, 0.0, 0.0, 1.0, 0.0, 0.0))
+        self.assertEqual(parse_transform("bogus(1)"), (1.0, 0.0, 0.0, 1.0, 0.0, 0.0))
+
+
+class GeometryTest(unittest.TestCase):
+    def test_relative_path_and_implicit_lineto(self):
+        self.assertEqual(sorted(set(path_points("m10 10 5 0 h5 v5 z"))),
+                         [(10, 10), (15, 10), (20, 10), (20, 15)])
+
+    def test_bbox_follows_nested_transforms(self):
+        root = ET.fromstring('<svg><g transform="translate(100 0)"><rect x="0" y="0" width="10" height="5"/>'
+                             '<defs><rect x="-500" y="-500" width="1" height="1"/></defs></g></svg>')
+        self.assertEqual(content_bbox(root), (100, 0, 110, 5))
+
+
+class RepairTextTest(unittest.TestCase):
+    def test_fence_entities_and_ampersand(self):
+        text, fixes = repair_text("Here you go:\n```xml\n<svg><text>A &amp; B &nbsp;& C</text></svg>\n```")
+        self.assertEqual(text, "<svg><text>A &amp; B &#160;&amp; C</text></svg>")
+        self.assertEqual(len(fixes), 3)
+
+
+class ValidateSvgTest(unittest.TestCase):
+    def check(self, text):
+        path = Path(tempfile.mkdtemp()) / "out.svg"
+        path.write_text(text, encoding="utf-8")
+        return validate_svg(path), path
+
+    def test_clean_file_is_left_alone(self):
+        text = f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 100 100">{VARIANTS}</svg>'
+        report, path = self.check(text)
+        self.assertEqual((report["fixed"], report["issues"]), ([], []))
+        self.assertEqual(path.read_text(encoding="utf-8"), text)
+
+    def test_mechanical_rules_are_fixed(self):
+        report, path = self.check(
+            '<svg xmlns="http://www.w3.org/2000/svg" width="100" height="100" viewBox="0 0 100 100">'
+            '<rect x="0" y="0" width="10" height="10" filter="url(#f)"/>'
+            '<g opacity="0"><rect x="0" y="0" width="1" height="1"/></g>'
+            f'<rect x="0" y="150" width="10" height="10"/>{VARIANTS}</svg>')
+        self.assertEqual(report["issues"], [])
+        self.assertEqual(len(report["fixed"]), 3)
+        root = ET.parse(path).getroot()
+        self.assertEqual(root.get("viewBox"), "0 0 100 180")
+        self.assertEqual(root.get("height"), "180")
+        self.assertNotIn("filter", path.read_text(encoding="utf-8"))
+
+    def test_unfixable_problems_are_reported(self):
+        report, _ = self.check('<svg xmlns="http://www.w3.org/2000/svg"><rect x="0"')
+        self.assertEqual(report["issues"], ["the file is truncated (no closing </svg>)"])
+        report, _ = self.check('<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 10 10"/>')
+        self.assertIn(VARIANTS_ID, report["issues"][0])
+        report, _ = self.check("<html/>")
+        self.assertEqual(report["issues"], ["root element is <html>, not <svg>"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+import io
+import re
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+from pipeline.svgopt import SVG_NS, format_number, minify_path, optimize_svg, optimize_tree, stylesheet_properties
+
+ROOT = Path(__file__).resolve().parent.parent
+TEMPLATE = ROOT / "prompt-template.txt"
+
+# Labels a model writes into Frame/Content of the template skeleton
+LABELS = """
+    <text id="Label/Code" x="0" y="20" style="font-family:Courier;fill:#FFFFFF">code</text>
+    <g id="Frame/Quote" style="font-family:Georgia;fill:#9E9AB5">
+      <text id="Label/Quote" x="0" y="40" style="font-family:Georgia;fill:#9E9AB5">quote</text>
+    </g>
+"""
+
+
+def skeleton(labels=LABELS):
+    """The template's SVG skeleton with `labels` in Frame/Content."""
+    text = TEMPLATE.read_text(encoding="utf-8")
+    svg = re.search(r"```xml\n(.*?)```", text, re.DOTALL).group(1)
+    return svg.replace("<!-- rows: inputs, buttons, dropdown, progress, preview -->", labels)
+
+
+def optimized(svg):
+    path = Path(tempfile.mkdtemp()) / "out.svg"
+    path.write_text(svg, encoding="utf-8")
+    optimize_svg(path, 2)
+    return ET.parse(path).getroot()
+
+
+def by_id(root, ident):
+    return next(e for e in root.iter() if e.get("id") == ident)
+
+
+def declared(elem, name):
+    """Value of `name` in the element's style attribute, None if it is not there."""
+    for part in (elem.get("style") or "").split(";"):
+        key, _, value = part.partition(":")
+        if key.strip() == name:
+            return value.strip()
+    return None
+
+
+class NumberTest(unittest.TestCase):
+    def test_shortest_form(self):
+        self.assertEqual([format_number(v, 2) for v in (0.5, -0.25, 3.0, -0.001, 12.345, 100)],
+                         [".5", "-.25", "3", "0", "12.35", "100"])
+
+    def test_path_whitespace(self):
+        self.assertEqual(minify_path("M 10.004 , 20 L -3.5 -4.25 z", 2), "M10,20L-3.5-4.25z")
+
+
+class StylesheetPropertiesTest(unittest.TestCase):
+    def test_template_rules(self):
+        css = ':root { /* colors */ }\n text { font-family: "Inter",sans-serif; }'
+        self.assertEqual(stylesheet_properties(css), {"font-family"})
+
+    def test_shorthand_and_comments(self):
+        css = "/* p { fill: red } */ .title { font: 700 14px Inter; stroke : none }"
+        self.assertEqual(stylesheet_properties(css),
+                         {"font", "font-family", "font-size", "font-weight", "font-style", "stroke"})
+
+
+class TemplateStylesheetTest(unittest.TestCase):
+    def test_font_family_stays_in_style_attribute(self):
+        root = optimized(skeleton())
+        code = by_id(root, "Label/Code")
+        self.assertEqual(declared(code, "font-family"), "Courier")
+        self.assertIsNone(code.get("font-family"))
+        # fill has no stylesheet rule, so it still becomes an attribute
+        self.assertEqual(code.get("fill"), "#FFFFFF")
+
+    def test_repeated_font_family_is_kept(self):
+        root = optimized(skeleton())
+        quote = by_id(root, "Label/Quote")
+        self.assertEqual(declared(quote, "font-family"), "Georgia")
+        # An inherited duplicate without a stylesheet rule is still dropped
+        self.assertIsNone(quote.get("fill"))
+        self.assertEqual(by_id(root, "Frame/Quote").get("fill"), "#9E9AB5")
+
+    def test_without_stylesheet_font_family_becomes_attribute(self):
+        svg = re.sub(r"<style>.*?</style>", "", skeleton(), flags=re.DOTALL)
+        code = by_id(optimized(svg), "Label/Code")
+        self.assertEqual(code.get("font-family"), "Courier")
+        self.assertIsNone(code.get("style"))
+
+    def test_stylesheet_after_the_elements(self):
+        svg = (f'<svg xmlns="{SVG_NS}"><text id="t" style="font-family:Courier">a</text>'
+               "<style>text { font-family: Inter; }</style></svg>")
+        root, _ = optimize_tree(io.BytesIO(svg.encode()), 2)
+        self.assertEqual(declared(by_id(root, "t"), "font-family"), "Courier")
+
+
+class OptimizeSvgTest(unittest.TestCase):
+    def test_rounds_and_merges_definitions(self):
+        svg = (f'<svg xmlns="{SVG_NS}" viewBox="0 0 10.123 10">'
+               '<defs><linearGradient id="a"><stop offset="0" stop-color="#fff"/></linearGradient>'
+               '<linearGradient id="b"><stop offset="0" stop-color="#fff"/></linearGradient></defs>'
+               '<rect id="r" x="1.23456" width="2" height="2" fill="url(#b)"/></svg>')
+        root = optimized(svg)
+        self.assertEqual(root.get("viewBox"), "0 0 10.12 10")
+        rect = by_id(root, "r")
+        self.assertEqual(rect.get("x"), "1.23")
+        self.assertEqual(rect.get("fill"), "url(#a)")
+        self.assertEqual(len(root.findall(f".//{{{SVG_NS}}}linearGradient")), 1)
+
+    def test_unparseable_file_is_left_alone(self):
+        path = Path(tempfile.mkdtemp()) / "bad.svg"
+        path.write_text("<svg><g>", encoding="utf-8")
+        stats = optimize_svg(path)
+        self.assertIsNotNone(stats["error"])
+        self.assertEqual(path.read_text(encoding="utf-8"), "<svg><g>")
+
+
+if __name__ == "__main__":
+    unittest.main()
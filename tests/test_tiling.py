@@ -0,0 +1,152 @@
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+from pipeline.imaging import HAVE_PIL
+from pipeline.svgopt import SVG_NS
+from pipeline.tiling import band_count, quiet_cuts, split_image, stitch_svgs, tile_key, tile_note
+
+NS = f"{{{SVG_NS}}}"
+
+BAND = """<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 600 400" width="600" height="400">
+<defs>
+  <style>#Frame\\/Main text {{ fill: #333; }} #{button} {{ opacity: .9; }}</style>
+  <linearGradient id="bg-gradient"><stop offset="0" stop-color="#fff"/></linearGradient>
+</defs>
+<g id="Background"><rect width="560" height="380" fill="url(#bg-gradient)"/></g>
+<g id="Frame/Main" transform="translate(20,12)">
+  <g id="Frame/Header"><text>{label}</text></g>
+  <g id="Frame/Content" transform="translate(0,38)"><rect id="{button}" width="80" height="24"/></g>
+</g>
+<g id="Frame/ComponentVariants" transform="translate(590,0)">
+  <text>Component Variants</text>
+  <g id="Variant/Button/Default"><rect width="80" height="24"/></g>
+</g>
+</svg>
+"""
+
+
+class BandCountTest(unittest.TestCase):
+    def test_counts(self):
+        self.assertEqual(band_count(100, 1600), 1)
+        self.assertEqual(band_count(1600, 1600), 1)
+        self.assertEqual(band_count(1601, 1600), 2)
+
+
+class TileKeyTest(unittest.TestCase):
+    def test_key_follows_contents_and_settings(self):
+        path = Path(tempfile.mkdtemp()) / "tall.png"
+        path.write_bytes(b"first")
+        key = tile_key(path, 1400, 48)
+        self.assertEqual(tile_key(path, 1400, 48), key)
+        self.assertNotEqual(tile_key(path, 1200, 48), key)
+        path.write_bytes(b"second")
+        self.assertNotEqual(tile_key(path, 1400, 48), key)
+
+
+class QuietCutsTest(unittest.TestCase):
+    def test_cut_lands_in_the_quiet_gap(self):
+        activity = [255] * 100
+        activity[40:60] = [0] * 20
+        (row, quiet), = quiet_cuts(activity, 2)
+        self.assertTrue(40 <= row < 60, row)
+        self.assertLess(quiet, 0.5)
+
+    def test_even_activity_cuts_at_the_target(self):
+        cuts = quiet_cuts([0] * 300, 3)
+        self.assertEqual([row for row, _ in cuts], [100, 200])
+
+
+class TileNoteTest(unittest.TestCase):
+    def test_own_rows_are_relative_to_the_band(self):
+        band = {"top": 1400, "bottom": 2800, "crop_top": 1352, "crop_bottom": 2848}
+        note = tile_note(band, 2, 3, 1200, 4000)
+        self.assertIn("band 2 of 3 of a tall 1200x4000 screenshot: rows 1352-2848", note)
+        self.assertIn("between y=48 and y=1448", note)
+        self.assertIn("context only", note)
+
+    def test_no_overlap_no_context_line(self):
+        band = {"top": 0, "bottom": 1400, "crop_top": 0, "crop_bottom": 1400}
+        self.assertNotIn("context only", tile_note(band, 1, 2, 800, 2800))
+
+
+@unittest.skipUnless(HAVE_PIL, "needs Pillow")
+class SplitImageTest(unittest.TestCase):
+    def test_bands_overlap_and_cover_the_image(self):
+        from PIL import Image
+
+        tmp = Path(tempfile.mkdtemp())
+        Image.new("RGB", (200, 1000), "white").save(tmp / "tall.png")
+        plan = split_image(tmp / "tall.png", tmp / "tiles", 400, 16)
+        bands = plan["bands"]
+        self.assertEqual(len(bands), 3)
+        self.assertEqual((bands[0]["top"], bands[-1]["bottom"]), (0, 1000))
+        for upper, lower in zip(bands, bands[1:]):
+            self.assertEqual(upper["bottom"], lower["top"])
+            self.assertEqual(lower["crop_top"], lower["top"] - 16)
+        with Image.open(bands[1]["path"]) as im:
+            self.assertEqual(im.size, (200, bands[1]["crop_bottom"] - bands[1]["crop_top"]))
+
+    def test_short_image_is_not_split(self):
+        from PIL import Image
+
+        tmp = Path(tempfile.mkdtemp())
+        Image.new("RGB", (200, 300), "white").save(tmp / "short.png")
+        self.assertEqual(split_image(tmp / "short.png", tmp / "tiles", 400, 16)["bands"], [])
+
+
+class StitchTest(unittest.TestCase):
+    def stitch(self, *bands):
+        tmp = Path(tempfile.mkdtemp())
+        parts = []
+        for number, (button, label) in enumerate(bands):
+            path = tmp / f"band-{number}.svg"
+            path.write_text(BAND.format(button=button, label=label), encoding="utf-8")
+            parts.append((str(path), number * 380))
+        stats = stitch_svgs(parts, tmp / "out.svg", 600, 380 * len(bands))
+        return ET.parse(tmp / "out.svg").getroot(), stats
+
+    def test_layers_keep_their_ids(self):
+        root, stats = self.stitch(("btn-a", "one"), ("btn-b", "two"))
+        ids = [e.get("id") for e in root.iter() if e.get("id")]
+        for layer in ("Background", "Frame/Main", "Frame/Header", "Frame/Content"):
+            self.assertEqual(ids.count(layer), 1, layer)
+        self.assertFalse([i for i in ids if i.startswith(("Frame/Main-", "Background-"))])
+        self.assertEqual(stats["merged"], 2)
+
+    def test_second_band_content_moves_down(self):
+        root, _ = self.stitch(("btn-a", "one"), ("btn-b", "two"))
+        header = next(e for e in root.iter() if e.get("id") == "Frame/Header")
+        texts = [t for t in header if t.tag == NS + "text"]
+        self.assertEqual([t.text for t in texts], ["one", "two"])
+        self.assertIsNone(texts[0].get("transform"))
+        self.assertEqual(texts[1].get("transform"), "translate(0,380)")
+        button = next(e for e in root.iter() if e.get("id") == "btn-b")
+        self.assertEqual(button.get("transform"), "translate(0,380)")
+
+    def test_clashing_ids_are_renamed_in_selectors(self):
+        root, stats = self.stitch(("btn", "one"), ("btn", "two"))
+        ids = [e.get("id") for e in root.iter() if e.get("id")]
+        self.assertIn("btn", ids)
+        self.assertIn("btn-2", ids)
+        css = " ".join(e.text for e in root.iter(NS + "style"))
+        self.assertIn("#btn-2 {", css)
+        self.assertIn("#Frame\\/Main text", css)
+        self.assertIn("fill: #333", css)
+
+    def test_identical_definitions_are_shared(self):
+        root, stats = self.stitch(("btn-a", "one"), ("btn-b", "two"))
+        gradients = [e for e in root.iter(NS + "linearGradient")]
+        self.assertEqual(len(gradients), 1)
+        self.assertEqual(stats["shared"], 1)
+
+    def test_variants_panel_once(self):
+        root, stats = self.stitch(("btn-a", "one"), ("btn-b", "two"))
+        panels = [e for e in root if e.get("id") == "Frame/ComponentVariants"]
+        self.assertEqual(len(panels), 1)
+        self.assertEqual(stats["variants"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import json
+import os
+import signal
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from pipeline.watch import FolderWatcher, GracefulShutdown, StatusFile
+
+PATTERNS = ("*.png", "*.jpg")
+
+
+class FolderWatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp())
+
+    def watch(self, use_inotify):
+        watcher = FolderWatcher(self.dir, PATTERNS, settle=0.1, poll_interval=0.0, use_inotify=use_inotify)
+        self.addCleanup(watcher.close)
+        return watcher
+
+    def settle(self, watcher, rounds=10):
+        ready = []
+        for _ in range(rounds):
+            ready += watcher.poll()
+            watcher.wait(0.05)
+        return ready
+
+    def check_reports_settled_files_once(self, use_inotify):
+        watcher = self.watch(use_inotify)
+        (self.dir / "sub").mkdir()
+        (self.dir / "a.png").write_bytes(b"png")
+        (self.dir / "sub" / "b.jpg").write_bytes(b"jpg")
+        (self.dir / "notes.txt").write_bytes(b"txt")
+        (self.dir / "empty.png").touch()
+        self.assertEqual(self.settle(watcher), [self.dir / "a.png", self.dir / "sub" / "b.jpg"])
+        self.assertEqual(self.settle(watcher, 3), [])
+
+    def test_polling(self):
+        self.check_reports_settled_files_once(False)
+
+    def test_inotify_or_fallback(self):
+        self.check_reports_settled_files_once(True)
+
+    def test_marked_files_are_not_reported(self):
+        (self.dir / "old.png").write_bytes(b"png")
+        watcher = self.watch(False)
+        watcher.mark_seen([self.dir / "old.png"])
+        self.assertTrue(watcher.seen(self.dir / "old.png"))
+        self.assertEqual(self.settle(watcher, 4), [])
+
+
+@unittest.skipUnless(hasattr(signal, "SIGUSR1"), "needs SIGUSR1")
+class GracefulShutdownTest(unittest.TestCase):
+    def test_first_signal_requests_a_drain_second_aborts(self):
+        calls = []
+        shutdown = GracefulShutdown(signals=(signal.SIGUSR1,), on_request=lambda s: calls.append("drain"),
+                                    on_abort=lambda s: calls.append("abort"))
+        try:
+            os.kill(os.getpid(), signal.SIGUSR1)
+            self.assertTrue(shutdown.requested)
+            os.kill(os.getpid(), signal.SIGUSR1)
+            self.assertTrue(shutdown.aborted)
+        finally:
+            shutdown.restore()
+        self.assertEqual(calls, ["drain", "abort"])
+
+
+class StatusFileTest(unittest.TestCase):
+    def test_write(self):
+        path = Path(tempfile.mkdtemp()) / "status" / "convert.json"
+        status = StatusFile(path)
+        status.write("running", queued=3)
+        data = json.loads(path.read_text(encoding="utf-8"))
+        self.assertEqual((data["state"], data["queued"], data["pid"]), ("running", 3, os.getpid()))
+        self.assertLessEqual(data["started"], time.time())
+
+
+if __name__ == "__main__":
+    unittest.main()